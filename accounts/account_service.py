@@ -0,0 +1,130 @@
+"""
+accounts/account_service.py - Données des pages « Mon compte »
+==============================================================
+
+Le tableau de bord client faisait une requête par chiffre (nombre de
+commandes, commandes en attente) plus la liste des commandes récentes, et
+les pages de commandes rechargeaient les articles commande par commande.
+
+get_account_summary() rassemble ces données pour un client :
+- un agrégat conditionnel : nombre de commandes, total et par statut
+- les commandes récentes, articles préchargés (2 requêtes)
+- les adresses (1 requête)
+Le résumé est mis en cache par client (ACCOUNT_CACHE_TIMEOUT) et invalidé
+à chaque changement d'une commande ou d'une adresse du client
+(accounts.signals pour les sauvegardes, orders.status_service pour les
+mises à jour en masse) : un client qui navigue dans son compte ne relit
+pas son historique de commandes à chaque clic.
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Prefetch, Q
+
+from orders.models import Order, OrderItem
+
+from .models import Address
+
+logger = logging.getLogger(__name__)
+
+# Commandes affichées sur le tableau de bord
+ACCOUNT_RECENT_ORDERS = 5
+
+
+def get_account_cache_key(customer_id):
+    """Clé de cache du résumé d'un client"""
+    return f"accounts:summary:{customer_id}"
+
+
+def prefetch_order_items(queryset):
+    """Commandes avec leurs articles (et produit / variante pour les images) en 2 requêtes"""
+    return queryset.prefetch_related(
+        Prefetch('items', queryset=OrderItem.objects.select_related('product', 'variant'))
+    )
+
+
+# ============================================
+# RÉSUMÉ DU COMPTE
+# ============================================
+
+@dataclass
+class AccountSummary:
+    """Chiffres et listes du tableau de bord d'un client"""
+    total_orders: int = 0
+    orders_by_status: Dict[str, int] = field(default_factory=dict)
+    recent_orders: List[Order] = field(default_factory=list)
+    addresses: List[Address] = field(default_factory=list)
+
+    @property
+    def pending_orders(self) -> int:
+        return self.orders_by_status.get('pending', 0)
+
+    @property
+    def delivered_orders(self) -> int:
+        return self.orders_by_status.get('delivered', 0)
+
+
+def compute_account_summary(customer_id) -> AccountSummary:
+    """Résumé du compte lu en base (4 requêtes, quel que soit l'historique)"""
+    orders = Order.objects.filter(customer_id=customer_id)
+    counts = orders.order_by().aggregate(
+        total=Count('pk'),
+        **{
+            status: Count('pk', filter=Q(status=status))
+            for status, _ in Order.STATUS_CHOICES
+        }
+    )
+    total = counts.pop('total')
+
+    recent_orders = []
+    if total:
+        recent_orders = list(prefetch_order_items(orders.order_by('-created_at'))[:ACCOUNT_RECENT_ORDERS])
+
+    return AccountSummary(
+        total_orders=total,
+        orders_by_status=counts,
+        recent_orders=recent_orders,
+        addresses=list(Address.objects.filter(customer_id=customer_id)),
+    )
+
+
+def get_account_summary(customer) -> AccountSummary:
+    """
+    Résumé du compte d'un client, depuis le cache si possible
+
+    Args:
+        customer: Client (ou son identifiant)
+
+    Returns:
+        AccountSummary
+    """
+    customer_id = getattr(customer, 'pk', customer)
+    cache_key = get_account_cache_key(customer_id)
+    summary = cache.get(cache_key)
+    if summary is None:
+        summary = compute_account_summary(customer_id)
+        cache.set(cache_key, summary, getattr(settings, 'ACCOUNT_CACHE_TIMEOUT', 300))
+    return summary
+
+
+def invalidate_account_cache(customer_ids: Iterable[int]) -> None:
+    """
+    Supprime du cache le résumé de ces clients
+
+    Fait tout de suite puis répété après le commit : une page lue avant le
+    commit remettrait sinon en cache l'ancien état.
+    """
+    keys = [get_account_cache_key(customer_id) for customer_id in set(customer_ids) if customer_id]
+    if not keys:
+        return
+
+    def invalidate():
+        cache.delete_many(keys)
+
+    invalidate()
+    transaction.on_commit(invalidate)
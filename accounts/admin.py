@@ -1,7 +1,9 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
+from django.db.models import Q
 from django.utils.html import format_html
+from core.admin_search import RankedAutocompleteMixin, normalize_phone, phone_prefix_filter
 from .models import Customer, Address
 
 
@@ -56,8 +58,9 @@ class UserAdmin(BaseUserAdmin):
         if hasattr(obj, 'customer'):
             customer = obj.customer
             return format_html(
-                '<strong>{}</strong> commande(s)<br><strong>{} FCFA</strong> dépensés',
+                '<strong>{}</strong> commande(s), {} payée(s)<br><strong>{} FCFA</strong> dépensés',
                 customer.total_orders,
+                customer.paid_orders,
                 customer.total_spent
             )
         return '-'
@@ -70,7 +73,7 @@ admin.site.register(User, UserAdmin)
 
 
 @admin.register(Customer)
-class CustomerAdmin(admin.ModelAdmin):
+class CustomerAdmin(RankedAutocompleteMixin, admin.ModelAdmin):
     """
     Administration des clients
     """
@@ -79,7 +82,9 @@ class CustomerAdmin(admin.ModelAdmin):
         'user_email',
         'phone',
         'total_orders',
+        'paid_orders',
         'total_spent_display',
+        'last_order_at',
         'account_status',
         'notification_preferences',
         'created_at'
@@ -98,7 +103,11 @@ class CustomerAdmin(admin.ModelAdmin):
         'user__last_name',
         'phone'
     ]
-    readonly_fields = ['created_at', 'updated_at', 'total_orders', 'total_spent']
+    readonly_fields = [
+        'created_at', 'updated_at', 'total_orders', 'paid_orders',
+        'total_spent', 'average_order_value', 'last_order_at'
+    ]
+    autocomplete_fields = ['user']
     # ✅ CORRECTION : date_hierarchy commenté pour éviter l'erreur timezone MySQL
     # date_hierarchy = 'created_at'
     ordering = ['-created_at']
@@ -116,7 +125,7 @@ class CustomerAdmin(admin.ModelAdmin):
             'fields': ('email_notifications', 'sms_notifications', 'whatsapp_notifications')
         }),
         ('Statistiques', {
-            'fields': ('total_orders', 'total_spent'),
+            'fields': ('total_orders', 'paid_orders', 'total_spent', 'average_order_value', 'last_order_at'),
             'classes': ('collapse',)
         }),
         ('Gestion du compte', {
@@ -135,6 +144,23 @@ class CustomerAdmin(admin.ModelAdmin):
         qs = super().get_queryset(request)
         return qs.select_related('user')
     
+    def get_ranked_search_filters(self, term):
+        """
+        Autocomplete : email exact, téléphone, début d'email, d'identifiant ou de nom
+        Un numéro saisi avec espaces ou tirets est normalisé avant comparaison
+        """
+        filters = [Q(user__email__iexact=term)]
+        phone = normalize_phone(term)
+        if phone:
+            filters.append(phone_prefix_filter('phone', phone))
+        filters += [
+            Q(user__email__istartswith=term),
+            Q(user__username__istartswith=term),
+            Q(user__last_name__istartswith=term),
+            Q(user__first_name__istartswith=term),
+        ]
+        return filters
+    
     def full_name(self, obj):
         """Affiche le nom complet du client"""
         return obj.full_name
@@ -149,6 +175,7 @@ class CustomerAdmin(admin.ModelAdmin):
         """Affiche le montant total dépensé avec formatage"""
         return format_html('<strong>{} FCFA</strong>', obj.total_spent)
     total_spent_display.short_description = "Total dépensé"
+    total_spent_display.admin_order_field = 'total_spent'
     
     def account_status(self, obj):
         """Affiche le statut du compte avec code couleur"""
@@ -193,7 +220,7 @@ class CustomerAdmin(admin.ModelAdmin):
 
 
 @admin.register(Address)
-class AddressAdmin(admin.ModelAdmin):
+class AddressAdmin(RankedAutocompleteMixin, admin.ModelAdmin):
     """
     Administration des adresses
     """
@@ -218,6 +245,7 @@ class AddressAdmin(admin.ModelAdmin):
         'postal_code'
     ]
     list_editable = ['is_default']
+    autocomplete_fields = ['customer']
     # ✅ CORRECTION : date_hierarchy commenté pour éviter l'erreur timezone MySQL
     # date_hierarchy = 'created_at'
     ordering = ['-created_at']
@@ -250,6 +278,19 @@ class AddressAdmin(admin.ModelAdmin):
         qs = super().get_queryset(request)
         return qs.select_related('customer__user')
     
+    def get_ranked_search_filters(self, term):
+        """Autocomplete : téléphone, début du nom, de l'email client, puis ville"""
+        filters = []
+        phone = normalize_phone(term)
+        if phone:
+            filters.append(phone_prefix_filter('phone', phone))
+        filters += [
+            Q(full_name__istartswith=term),
+            Q(customer__user__email__istartswith=term),
+            Q(city__istartswith=term),
+        ]
+        return filters
+    
     def address_type_display(self, obj):
         """Affiche le type d'adresse avec icône"""
         if obj.address_type == 'shipping':
@@ -0,0 +1,58 @@
+"""
+accounts/backends.py - Chargement de l'utilisateur et de son profil client
+==========================================================================
+
+Les vues client lisent request.user.customer : avec le ModelBackend de
+Django, cet accès coûtait une seconde requête à chaque page, et chaque vue
+vérifiait (puis créait au besoin) le profil.
+
+CustomerBackend charge l'utilisateur de la session joint à son profil
+Customer en une requête, et crée le profil s'il manque (une seule fois :
+il est joint aux requêtes suivantes). AuthenticationMiddleware garde
+l'utilisateur chargé pour toute la durée de la requête.
+"""
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from .models import Customer
+
+# Chemin enregistré dans les sessions ouvertes avant CustomerBackend
+LEGACY_BACKEND = 'django.contrib.auth.backends.ModelBackend'
+CUSTOMER_BACKEND = 'accounts.backends.CustomerBackend'
+
+
+def ensure_customer(user):
+    """
+    Profil client de l'utilisateur, créé s'il n'existe pas encore
+
+    Returns:
+        Customer: Profil, également mis en cache sur user.customer
+    """
+    try:
+        return user.customer
+    except Customer.DoesNotExist:
+        customer, _ = Customer.objects.get_or_create(user=user)
+        user.customer = customer
+        return customer
+
+
+class CustomerBackend(ModelBackend):
+    """
+    ModelBackend dont get_user() joint le profil Customer
+
+    L'authentification (identifiant / mot de passe) et les permissions
+    restent celles de ModelBackend.
+    """
+
+    def get_user(self, user_id):
+        user = (
+            get_user_model()._default_manager
+            .select_related('customer')
+            .filter(pk=user_id)
+            .first()
+        )
+        if user is None or not self.user_can_authenticate(user):
+            return None
+        ensure_customer(user)
+        return user
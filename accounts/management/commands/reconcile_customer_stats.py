@@ -0,0 +1,33 @@
+"""
+Commande : reconcile_customer_stats
+===================================
+
+Recalcule les compteurs cumulés de tous les clients (commandes, commandes
+payées, total dépensé, panier moyen, dernière commande) à partir des
+commandes, et corrige ceux qui ont dérivé (accounts/services.py).
+
+Usage (cron, chaque nuit, ou après une reprise de données) :
+    0 4 * * * python manage.py reconcile_customer_stats
+"""
+
+from django.core.management.base import BaseCommand
+
+from accounts.services import RECONCILE_BATCH_SIZE, reconcile_customer_stats
+
+
+class Command(BaseCommand):
+    help = "Recalcule et corrige les compteurs cumulés des clients"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=RECONCILE_BATCH_SIZE,
+            help=f'Clients traités par lot (défaut : {RECONCILE_BATCH_SIZE})'
+        )
+
+    def handle(self, *args, **options):
+        stats = reconcile_customer_stats(batch_size=max(1, options['batch_size']))
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['corrected']} client(s) corrigé(s) sur {stats['checked']}"
+        ))
@@ -0,0 +1,29 @@
+"""
+accounts/middleware.py - Sessions ouvertes avant CustomerBackend
+================================================================
+
+Django n'accepte une session que si le backend qui l'a ouverte figure
+dans AUTHENTICATION_BACKENDS : sans ce middleware, remplacer ModelBackend
+par CustomerBackend déconnecterait tous les clients. Les sessions
+existantes sont reprises par CustomerBackend à leur prochaine requête.
+
+À placer après AuthenticationMiddleware (request.user y est encore
+paresseux : la session est corrigée avant le chargement de l'utilisateur).
+"""
+
+from django.contrib.auth import BACKEND_SESSION_KEY
+
+from .backends import CUSTOMER_BACKEND, LEGACY_BACKEND
+
+
+class CustomerBackendSessionMiddleware:
+    """Rattache à CustomerBackend les sessions ouvertes par ModelBackend"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        session = getattr(request, 'session', None)
+        if session is not None and session.get(BACKEND_SESSION_KEY) == LEGACY_BACKEND:
+            session[BACKEND_SESSION_KEY] = CUSTOMER_BACKEND
+        return self.get_response(request)
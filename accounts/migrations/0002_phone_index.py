@@ -0,0 +1,19 @@
+# Generated by Django 4.2.26 on 2026-10-19 07:04
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customer',
+            name='phone',
+            field=models.CharField(blank=True, db_index=True, max_length=17, validators=[django.core.validators.RegexValidator(message="Le numéro de téléphone doit être au format : '+999999999'. 9 à 15 chiffres.", regex='^\\+?1?\\d{9,15}$')], verbose_name='Téléphone'),
+        ),
+    ]
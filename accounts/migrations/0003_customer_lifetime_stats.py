@@ -0,0 +1,77 @@
+# Generated by Django 4.2.26 on 2026-10-19 07:13
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Q, Sum
+
+# Même règle que accounts.services (figée : les migrations n'importent pas le code courant)
+UNCOUNTED_ORDER_STATUSES = ('cancelled', 'refunded')
+BACKFILL_BATCH_SIZE = 1000
+
+
+def backfill_customer_stats(apps, schema_editor):
+    """Compteurs des clients existants, par tranches d'identifiants (une requête groupée par tranche)"""
+    Customer = apps.get_model('accounts', 'Customer')
+    Order = apps.get_model('orders', 'Order')
+    counted = ~Q(status__in=UNCOUNTED_ORDER_STATUSES)
+    paid = counted & Q(is_paid=True)
+    fields = ['total_orders', 'paid_orders', 'total_spent', 'average_order_value', 'last_order_at']
+
+    last_pk = 0
+    while True:
+        customers = list(
+            Customer.objects.filter(pk__gt=last_pk).order_by('pk').only('pk', *fields)[:BACKFILL_BATCH_SIZE]
+        )
+        if not customers:
+            break
+        first_pk, last_pk = customers[0].pk, customers[-1].pk
+
+        rows = Order.objects.filter(customer_id__gte=first_pk, customer_id__lte=last_pk).order_by().values(
+            'customer_id'
+        ).annotate(
+            counted_orders=Count('pk', filter=counted),
+            counted_paid_orders=Count('pk', filter=paid),
+            paid_total=Sum('total', filter=paid),
+            last_counted_at=Max('created_at', filter=counted),
+        )
+        stats = {row['customer_id']: row for row in rows}
+
+        for customer in customers:
+            row = stats.get(customer.pk, {})
+            customer.total_orders = row.get('counted_orders', 0)
+            customer.paid_orders = row.get('counted_paid_orders', 0)
+            customer.total_spent = row.get('paid_total') or Decimal('0')
+            customer.average_order_value = (
+                (customer.total_spent / customer.paid_orders).quantize(Decimal('0.01'))
+                if customer.paid_orders else Decimal('0')
+            )
+            customer.last_order_at = row.get('last_counted_at')
+        Customer.objects.bulk_update(customers, fields, batch_size=BACKFILL_BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_phone_index'),
+        ('orders', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='average_order_value',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Panier moyen'),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='last_order_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Dernière commande'),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='paid_orders',
+            field=models.IntegerField(default=0, verbose_name='Commandes payées'),
+        ),
+        migrations.RunPython(backfill_customer_stats, migrations.RunPython.noop),
+    ]
@@ -25,6 +25,7 @@ class Customer(models.Model):
         validators=[phone_regex],
         max_length=17,
         blank=True,
+        db_index=True,  # Recherche par préfixe (autocomplete admin)
         verbose_name="Téléphone"
     )
     date_of_birth = models.DateField(
@@ -53,17 +54,33 @@ class Customer(models.Model):
         verbose_name="Notifications par WhatsApp"
     )
     
-    # Statistiques
+    # Statistiques (maintenues par accounts/services.py, hors commandes
+    # annulées ou remboursées)
     total_orders = models.IntegerField(
         default=0,
         verbose_name="Nombre total de commandes"
     )
+    paid_orders = models.IntegerField(
+        default=0,
+        verbose_name="Commandes payées"
+    )
     total_spent = models.DecimalField(
         max_digits=10,
         decimal_places=2,
         default=0,
         verbose_name="Montant total dépensé"
     )
+    average_order_value = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=0,
+        verbose_name="Panier moyen"
+    )
+    last_order_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Dernière commande"
+    )
     
     # Gestion du compte
     is_blocked = models.BooleanField(
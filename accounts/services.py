@@ -0,0 +1,180 @@
+"""
+accounts/services.py - Compteurs cumulés des clients
+====================================================
+
+Customer porte des compteurs dénormalisés (nombre de commandes, commandes
+payées, total dépensé, panier moyen, date de dernière commande) lus par
+l'admin, les exports et la segmentation sans réagréger les commandes.
+
+Définitions :
+- une commande « comptée » n'est ni annulée ni remboursée
+- total_spent / paid_orders ne portent que sur les commandes comptées payées
+
+À chaque changement qui modifie ces valeurs (paiement, annulation,
+remboursement), refresh_customer_stats() recalcule les compteurs des seuls
+clients concernés, dans la transaction du changement et sous verrou des
+lignes clients : une valeur qui aurait dérivé est corrigée au passage. reconcile_customer_stats() fait de
+même pour tous les clients (commande reconcile_customer_stats).
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Iterable, Optional
+import logging
+
+from django.db import transaction
+from django.db.models import Count, Max, Q, Sum
+
+from orders.models import Order
+
+from .models import Customer
+
+logger = logging.getLogger(__name__)
+
+# Statuts qui retirent une commande des compteurs
+UNCOUNTED_ORDER_STATUSES = ('cancelled', 'refunded')
+
+# Champs de Customer maintenus par ce module
+CUSTOMER_STATS_FIELDS = ['total_orders', 'paid_orders', 'total_spent', 'average_order_value', 'last_order_at']
+
+# Clients traités par lot lors de la réconciliation complète
+RECONCILE_BATCH_SIZE = 1000
+
+
+@dataclass(frozen=True)
+class CustomerStats:
+    """Valeurs attendues des compteurs d'un client"""
+    total_orders: int = 0
+    paid_orders: int = 0
+    total_spent: Decimal = Decimal('0')
+    last_order_at: Optional[datetime] = None
+
+    @property
+    def average_order_value(self) -> Decimal:
+        if not self.paid_orders:
+            return Decimal('0')
+        return (self.total_spent / self.paid_orders).quantize(Decimal('0.01'))
+
+    def differs_from(self, customer: Customer) -> bool:
+        return any(getattr(customer, name) != getattr(self, name) for name in CUSTOMER_STATS_FIELDS)
+
+    def apply_to(self, customer: Customer) -> None:
+        for name in CUSTOMER_STATS_FIELDS:
+            setattr(customer, name, getattr(self, name))
+
+
+def compute_customer_stats(orders=None) -> Dict[int, CustomerStats]:
+    """
+    Compteurs attendus, par client, en UNE requête groupée
+
+    Args:
+        orders: QuerySet de commandes à agréger (défaut : toutes)
+
+    Returns:
+        dict: customer_id -> CustomerStats (absents : aucune commande)
+    """
+    orders = Order.objects.all() if orders is None else orders
+    counted = ~Q(status__in=UNCOUNTED_ORDER_STATUSES)
+    paid = counted & Q(is_paid=True)
+
+    rows = orders.order_by().values('customer_id').annotate(
+        counted_orders=Count('pk', filter=counted),
+        counted_paid_orders=Count('pk', filter=paid),
+        paid_total=Sum('total', filter=paid),
+        last_counted_at=Max('created_at', filter=counted),
+    )
+    return {
+        row['customer_id']: CustomerStats(
+            total_orders=row['counted_orders'],
+            paid_orders=row['counted_paid_orders'],
+            total_spent=row['paid_total'] or Decimal('0'),
+            last_order_at=row['last_counted_at'],
+        )
+        for row in rows
+    }
+
+
+def _sync_customers(customers: Iterable[Customer], stats: Dict[int, CustomerStats]) -> int:
+    """Met à jour (bulk_update) les clients dont les compteurs diffèrent"""
+    changed = []
+    for customer in customers:
+        expected = stats.get(customer.pk, CustomerStats())
+        if expected.differs_from(customer):
+            expected.apply_to(customer)
+            changed.append(customer)
+
+    if changed:
+        Customer.objects.bulk_update(changed, CUSTOMER_STATS_FIELDS, batch_size=RECONCILE_BATCH_SIZE)
+    return len(changed)
+
+
+def refresh_customer_stats(customer_ids: Iterable[int]) -> int:
+    """
+    Recalcule les compteurs des clients donnés (3 requêtes au plus)
+
+    À appeler dans la transaction qui paie, annule ou rembourse les commandes.
+
+    Returns:
+        int: Nombre de clients corrigés
+    """
+    customer_ids = set(customer_ids)
+    if not customer_ids:
+        return 0
+
+    # Pas de point de sauvegarde : appelé dans la transaction de l'appelant
+    with transaction.atomic(savepoint=False):
+        # Clients verrouillés (ordre des ids : pas d'interblocage) AVANT l'agrégat :
+        # un paiement et une annulation simultanés pour un même client ne peuvent
+        # pas écrire chacun un état calculé sans voir l'autre
+        customers = list(
+            Customer.objects.select_for_update()
+            .filter(pk__in=customer_ids)
+            .order_by('pk')
+            .only('pk', *CUSTOMER_STATS_FIELDS)
+        )
+        stats = compute_customer_stats(Order.objects.filter(customer_id__in=customer_ids))
+        return _sync_customers(customers, stats)
+
+
+def refresh_stats_for_orders(order_ids: Iterable[int]) -> int:
+    """Recalcule les compteurs des clients de ces commandes"""
+    customer_ids = Order.objects.filter(pk__in=list(order_ids)).order_by().values_list(
+        'customer_id', flat=True
+    ).distinct()
+    return refresh_customer_stats(customer_ids)
+
+
+def reconcile_customer_stats(batch_size: int = RECONCILE_BATCH_SIZE) -> Dict[str, int]:
+    """
+    Recalcule les compteurs de tous les clients
+
+    Les clients sont parcourus par tranches d'identifiants : pour chaque
+    tranche, une requête groupée sur les commandes et un bulk_update des
+    seuls clients dont les valeurs ont dérivé. La mémoire reste bornée par
+    batch_size quel que soit le nombre de clients.
+
+    Returns:
+        dict: {'checked': n, 'corrected': n}
+    """
+    checked = corrected = 0
+    last_pk = 0
+    while True:
+        customers = list(
+            Customer.objects.filter(pk__gt=last_pk)
+            .order_by('pk')
+            .only('pk', *CUSTOMER_STATS_FIELDS)[:batch_size]
+        )
+        if not customers:
+            break
+
+        first_pk, last_pk = customers[0].pk, customers[-1].pk
+        with transaction.atomic(savepoint=False):
+            stats = compute_customer_stats(
+                Order.objects.filter(customer_id__gte=first_pk, customer_id__lte=last_pk)
+            )
+            corrected += _sync_customers(customers, stats)
+        checked += len(customers)
+
+    logger.info(f"Compteurs clients réconciliés : {corrected} corrigé(s) sur {checked}")
+    return {'checked': checked, 'corrected': corrected}
@@ -0,0 +1,29 @@
+"""
+Signaux pour l'application Accounts
+===================================
+
+Invalide le résumé « Mon compte » mis en cache (accounts.account_service)
+quand une commande ou une adresse du client est créée, modifiée ou
+supprimée. Les mises à jour en masse des commandes (queryset.update),
+qui ne déclenchent pas ces signaux, invalident elles-mêmes le cache
+(orders.status_service).
+"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .account_service import invalidate_account_cache
+
+
+@receiver(post_save, sender='orders.Order')
+@receiver(post_delete, sender='orders.Order')
+def invalidate_account_cache_on_order_change(sender, instance, **kwargs):
+    """Commande créée, modifiée ou supprimée : résumé de son client à recalculer"""
+    invalidate_account_cache([instance.customer_id])
+
+
+@receiver(post_save, sender='accounts.Address')
+@receiver(post_delete, sender='accounts.Address')
+def invalidate_account_cache_on_address_change(sender, instance, **kwargs):
+    """Adresse créée, modifiée ou supprimée : résumé de son client à recalculer"""
+    invalidate_account_cache([instance.customer_id])
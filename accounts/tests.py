@@ -1,3 +1,247 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from importlib import import_module
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.contrib.auth import BACKEND_SESSION_KEY
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from orders.models import Order, OrderItem
+from orders.status_service import mark_orders_paid, transition_orders
+
+from .account_service import get_account_summary
+from .backends import CUSTOMER_BACKEND, LEGACY_BACKEND
+from .models import Address, Customer
+from .services import reconcile_customer_stats, refresh_customer_stats
+
+TEST_STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+class CustomerStatsMixin:
+
+    def create_customer(self, username='client'):
+        return User.objects.create_user(username, f'{username}@test.ga').customer
+
+    def create_order(self, customer, total, status='pending', is_paid=False, days_ago=0):
+        order = Order.objects.create(
+            order_number=f'ORD-{Order.objects.count():05d}',
+            customer=customer,
+            customer_email=customer.user.email,
+            customer_phone='+24101020304',
+            subtotal=Decimal(total),
+            total=Decimal(total),
+            status=status,
+            is_paid=is_paid,
+        )
+        if days_ago:
+            Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - timedelta(days=days_ago))
+        return order
+
+
+@mock.patch('orders.status_service._start_followup_worker')
+class CustomerStatsTransitionTests(CustomerStatsMixin, TestCase):
+
+    def test_payment_updates_counters(self, start_worker):
+        customer = self.create_customer()
+        first = self.create_order(customer, '3000', days_ago=2)
+        second = self.create_order(customer, '5000')
+        self.create_order(customer, '9000')
+
+        mark_orders_paid([first.pk, second.pk])
+
+        customer.refresh_from_db()
+        self.assertEqual(customer.total_orders, 3)
+        self.assertEqual(customer.paid_orders, 2)
+        self.assertEqual(customer.total_spent, Decimal('8000'))
+        self.assertEqual(customer.average_order_value, Decimal('4000'))
+        self.assertEqual(customer.last_order_at, Order.objects.order_by('-created_at')[0].created_at)
+
+    def test_cancellation_and_refund_remove_orders(self, start_worker):
+        customer = self.create_customer()
+        pending = self.create_order(customer, '2000', is_paid=True)
+        delivered = self.create_order(customer, '6000', status='delivered', is_paid=True)
+        kept = self.create_order(customer, '1000', is_paid=True, days_ago=10)
+        refresh_customer_stats([customer.pk])
+
+        transition_orders([pending.pk], 'cancelled')
+        transition_orders([delivered.pk], 'refunded')
+
+        customer.refresh_from_db()
+        self.assertEqual((customer.total_orders, customer.paid_orders), (1, 1))
+        self.assertEqual(customer.total_spent, Decimal('1000'))
+        self.assertEqual(customer.last_order_at, Order.objects.get(pk=kept.pk).created_at)
+
+    def test_refresh_query_count_does_not_depend_on_customers(self, start_worker):
+        customers = [self.create_customer(f'client{i}') for i in range(20)]
+        orders = [self.create_order(customer, '1000') for customer in customers]
+
+        with self.assertNumQueries(8):
+            # SELECT FOR UPDATE + UPDATE + clients concernés + agrégat + clients + bulk_update
+            # + SAVEPOINT / RELEASE de la transaction imbriquée dans celle du test
+            mark_orders_paid([order.pk for order in orders])
+
+        self.assertEqual(Customer.objects.filter(paid_orders=1).count(), 20)
+
+
+class CustomerStatsReconciliationTests(CustomerStatsMixin, TestCase):
+
+    def test_drifted_counters_are_corrected(self):
+        healthy = self.create_customer('healthy')
+        drifted = self.create_customer('drifted')
+        self.create_customer('no_orders')
+        self.create_order(healthy, '4000', is_paid=True)
+        self.create_order(drifted, '2500', is_paid=True)
+        self.create_order(drifted, '7000', status='cancelled', is_paid=True)
+        refresh_customer_stats([healthy.pk])
+        # Ancien comportement : toutes les commandes créées étaient comptées
+        Customer.objects.filter(pk=drifted.pk).update(total_orders=2, total_spent=Decimal('9500'))
+
+        out = StringIO()
+        call_command('reconcile_customer_stats', '--batch-size', '2', stdout=out)
+
+        self.assertIn('1 client(s) corrigé(s) sur 3', out.getvalue())
+        drifted.refresh_from_db()
+        self.assertEqual((drifted.total_orders, drifted.paid_orders), (1, 1))
+        self.assertEqual(drifted.total_spent, Decimal('2500'))
+        self.assertEqual(drifted.average_order_value, Decimal('2500'))
+
+    def test_batches_use_a_fixed_number_of_queries(self):
+        for i in range(6):
+            self.create_order(self.create_customer(f'client{i}'), '1000', is_paid=True)
+
+        # Par lot : clients + agrégat groupé + bulk_update ; puis un lot vide
+        with self.assertNumQueries(3 * 2 + 1):
+            stats = reconcile_customer_stats(batch_size=3)
+
+        self.assertEqual(stats, {'checked': 6, 'corrected': 6})
+        with self.assertNumQueries(2 * 2 + 1):
+            self.assertEqual(reconcile_customer_stats(batch_size=3)['corrected'], 0)
+
+    def test_migration_backfills_existing_customers(self):
+        migration = import_module('accounts.migrations.0003_customer_lifetime_stats')
+        buyer = self.create_customer('buyer')
+        idle = self.create_customer('idle')
+        self.create_order(buyer, '3000', is_paid=True, days_ago=3)
+        self.create_order(buyer, '4000', status='refunded', is_paid=True)
+        self.create_order(buyer, '1000')
+        Customer.objects.update(total_orders=0, total_spent=0, paid_orders=0, average_order_value=0)
+
+        with mock.patch.object(migration, 'BACKFILL_BATCH_SIZE', 1):
+            migration.backfill_customer_stats(apps, None)
+
+        buyer.refresh_from_db()
+        self.assertEqual((buyer.total_orders, buyer.paid_orders), (2, 1))
+        self.assertEqual((buyer.total_spent, buyer.average_order_value), (Decimal('3000'), Decimal('3000')))
+        self.assertEqual(buyer.last_order_at, Order.objects.get(total=Decimal('1000')).created_at)
+        idle.refresh_from_db()
+        self.assertEqual((idle.total_orders, idle.last_order_at), (0, None))
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class CustomerLoaderTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('client', 'client@test.ga')
+        self.client.force_login(self.user)
+        # Paramètres du site mis en cache par la première page
+        self.client.get(reverse('accounts:profile'))
+
+    def test_account_pages_load_user_and_customer_together(self):
+        # Session + utilisateur joint à son profil, puis les requêtes propres à la page
+        for name, queries in (('accounts:profile', 2), ('accounts:profile_edit', 2), ('accounts:address_list', 3)):
+            with self.subTest(page=name), self.assertNumQueries(queries):
+                self.assertEqual(self.client.get(reverse(name)).status_code, 200)
+
+    def test_missing_profile_is_created_once(self):
+        Customer.objects.filter(user=self.user).delete()
+
+        self.assertEqual(self.client.get(reverse('accounts:profile')).status_code, 200)
+        self.assertEqual(Customer.objects.filter(user=self.user).count(), 1)
+
+        with self.assertNumQueries(2):
+            self.client.get(reverse('accounts:profile'))
+
+    def test_sessions_opened_by_model_backend_stay_logged_in(self):
+        self.client.force_login(self.user, backend=LEGACY_BACKEND)
+
+        self.assertEqual(self.client.get(reverse('accounts:profile')).status_code, 200)
+        self.assertEqual(self.client.session[BACKEND_SESSION_KEY], CUSTOMER_BACKEND)
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+@mock.patch('orders.status_service._start_followup_worker')
+class AccountSummaryTests(CustomerStatsMixin, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.customer = self.create_customer()
+        self.client.force_login(self.customer.user)
+
+    def add_orders(self, count, status='pending'):
+        orders = [self.create_order(self.customer, '5000', status=status) for _ in range(count)]
+        for order in orders:
+            OrderItem.objects.create(order=order, product_name='Produit', unit_price=Decimal('2500'), quantity=2)
+        return orders
+
+    def test_summary_counts_and_recent_orders(self, start_worker):
+        self.add_orders(4)
+        self.add_orders(3, status='delivered')
+
+        with self.assertNumQueries(4):
+            summary = get_account_summary(self.customer)
+
+        self.assertEqual((summary.total_orders, summary.pending_orders, summary.delivered_orders), (7, 4, 3))
+        self.assertEqual(len(summary.recent_orders), 5)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_account_summary(self.customer).recent_orders[0].item_count, 2)
+
+    def test_order_and_address_changes_invalidate_the_summary(self, start_worker):
+        order, = self.add_orders(1)
+        self.assertEqual(get_account_summary(self.customer).pending_orders, 1)
+
+        # Mise à jour en masse (sans signal)
+        transition_orders([order.pk], 'processing')
+        self.assertEqual(get_account_summary(self.customer).pending_orders, 0)
+
+        self.add_orders(1)
+        self.assertEqual(get_account_summary(self.customer).total_orders, 2)
+
+        Address.objects.create(
+            customer=self.customer, full_name='Client', phone='+24101020304',
+            address_line1='Rue 1', city='Libreville'
+        )
+        self.assertEqual(len(get_account_summary(self.customer).addresses), 1)
+
+    def test_account_pages_query_count_does_not_grow_with_history(self, start_worker):
+        self.add_orders(2)
+        order_number = Order.objects.first().order_number
+        pages = [reverse('accounts:dashboard'), reverse('accounts:order_list'),
+                 reverse('accounts:order_detail', args=[order_number])]
+        for url in pages:
+            self.client.get(url)
+        small = {}
+        for url in pages:
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            small[url] = len(queries)
+
+        self.add_orders(10, status='delivered')
+        for url in pages:
+            self.client.get(url)
+            with self.subTest(page=url), self.assertNumQueries(small[url]):
+                self.client.get(url)
+
+        # Tableau de bord servi depuis le cache : session et utilisateur seulement
+        self.assertEqual(small[reverse('accounts:dashboard')], 2)
@@ -13,7 +13,8 @@ from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, force_str
 from django.urls import reverse
 
-from .models import Customer, Address
+from .account_service import get_account_summary, prefetch_order_items
+from .models import Address
 from orders.models import Order
 from core.email_service import EmailService
 from .forms import PasswordResetRequestForm, SetPasswordForm
@@ -119,10 +120,8 @@ def login_view(request):
         user = authenticate(request, username=username, password=password)
         
         if user is not None:
-            # Vérifier que le profil Customer existe
-            if not hasattr(user, 'customer'):
-                Customer.objects.create(user=user)
-            
+            # Le profil Customer est créé au besoin au chargement de
+            # l'utilisateur (accounts/backends.py)
             login(request, user)
             messages.success(request, f'Bienvenue {user.get_full_name() or user.username} !')
             
@@ -150,27 +149,19 @@ def logout_view(request):
 def dashboard(request):
     """
     Tableau de bord client
-    """
-    # Vérifier l'existence du profil Customer
-    if not hasattr(request.user, 'customer'):
-        Customer.objects.create(user=request.user)
     
+    Chiffres, commandes récentes et adresses : résumé mis en cache par
+    client (accounts/account_service.py)
+    """
     customer = request.user.customer
-    
-    # Statistiques
-    recent_orders = Order.objects.filter(customer=customer).order_by('-created_at')[:5]
-    total_orders = Order.objects.filter(customer=customer).count()
-    pending_orders = Order.objects.filter(customer=customer, status='pending').count()
-    
-    # Adresses
-    addresses = Address.objects.filter(customer=customer)
+    summary = get_account_summary(customer)
     
     context = {
         'customer': customer,
-        'recent_orders': recent_orders,
-        'total_orders': total_orders,
-        'pending_orders': pending_orders,
-        'addresses': addresses,
+        'recent_orders': summary.recent_orders,
+        'total_orders': summary.total_orders,
+        'pending_orders': summary.pending_orders,
+        'addresses': summary.addresses,
         'page_title': 'Mon tableau de bord',
     }
     return render(request, 'accounts/dashboard.html', context)
@@ -181,9 +172,6 @@ def profile(request):
     """
     Affichage du profil client
     """
-    if not hasattr(request.user, 'customer'):
-        Customer.objects.create(user=request.user)
-    
     customer = request.user.customer
     
     context = {
@@ -198,9 +186,6 @@ def profile_edit(request):
     """
     Modification du profil client
     """
-    if not hasattr(request.user, 'customer'):
-        Customer.objects.create(user=request.user)
-    
     customer = request.user.customer
     
     if request.method == 'POST':
@@ -242,9 +227,6 @@ def address_list(request):
     """
     Liste des adresses du client
     """
-    if not hasattr(request.user, 'customer'):
-        Customer.objects.create(user=request.user)
-    
     addresses = Address.objects.filter(customer=request.user.customer).order_by('-is_default', '-created_at')
     
     context = {
@@ -259,9 +241,6 @@ def address_add(request):
     """
     Ajout d'une nouvelle adresse (avec redirection intelligente)
     """
-    if not hasattr(request.user, 'customer'):
-        Customer.objects.create(user=request.user)
-    
     if request.method == 'POST':
         try:
             # Récupérer toutes les données du formulaire
@@ -333,9 +312,6 @@ def address_edit(request, pk):
     """
     Modification d'une adresse
     """
-    if not hasattr(request.user, 'customer'):
-        Customer.objects.create(user=request.user)
-    
     address = get_object_or_404(Address, pk=pk, customer=request.user.customer)
     
     if request.method == 'POST':
@@ -382,9 +358,6 @@ def address_delete(request, pk):
     """
     Suppression d'une adresse
     """
-    if not hasattr(request.user, 'customer'):
-        Customer.objects.create(user=request.user)
-    
     address = get_object_or_404(Address, pk=pk, customer=request.user.customer)
     
     if request.method == 'POST':
@@ -405,9 +378,6 @@ def address_set_default(request, address_id):
     """
     ✅ CORRECTION : Définir une adresse comme adresse par défaut
     """
-    if not hasattr(request.user, 'customer'):
-        Customer.objects.create(user=request.user)
-    
     try:
         # Récupérer l'adresse appartenant à l'utilisateur
         address = get_object_or_404(Address, id=address_id, customer=request.user.customer)
@@ -431,15 +401,16 @@ def address_set_default(request, address_id):
 @login_required
 def order_list(request):
     """
-    Liste des commandes du client
+    Liste des commandes du client (articles préchargés, chiffres du résumé en cache)
     """
-    if not hasattr(request.user, 'customer'):
-        Customer.objects.create(user=request.user)
-    
-    orders = Order.objects.filter(customer=request.user.customer).order_by('-created_at')
+    customer = request.user.customer
+    summary = get_account_summary(customer)
+    orders = prefetch_order_items(Order.objects.filter(customer=customer).order_by('-created_at'))
     
     context = {
         'orders': orders,
+        'total_orders': summary.total_orders,
+        'delivered_count': summary.delivered_orders,
         'page_title': 'Mes commandes',
     }
     return render(request, 'accounts/order_list.html', context)
@@ -450,11 +421,10 @@ def order_detail(request, order_number):
     """
     Détail d'une commande
     """
-    if not hasattr(request.user, 'customer'):
-        Customer.objects.create(user=request.user)
-    
     order = get_object_or_404(
-        Order, 
+        prefetch_order_items(
+            Order.objects.select_related('shipping_address', 'billing_address', 'shipping_zone')
+        ).prefetch_related('status_history'),
         order_number=order_number, 
         customer=request.user.customer
     )
@@ -471,9 +441,6 @@ def order_invoice(request, order_number):
     """
     Génération de la facture PDF pour une commande
     """
-    if not hasattr(request.user, 'customer'):
-        Customer.objects.create(user=request.user)
-    
     order = get_object_or_404(
         Order, 
         order_number=order_number, 
@@ -503,9 +470,6 @@ def order_packing_slip(request, order_number):
     """
     Génération du bon de livraison PDF pour une commande
     """
-    if not hasattr(request.user, 'customer'):
-        Customer.objects.create(user=request.user)
-    
     order = get_object_or_404(
         Order, 
         order_number=order_number, 
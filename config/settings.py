@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 
 from pathlib import Path
 import os
+import sys
 from decouple import config, UndefinedValueError
 import dj_database_url
 
@@ -68,6 +69,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'accounts.middleware.CustomerBackendSessionMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -221,21 +223,100 @@ CRISPY_TEMPLATE_PACK = "bootstrap5"
 
 
 # Authentication
+# Utilisateur de la session chargé avec son profil Customer (une requête)
+AUTHENTICATION_BACKENDS = ['accounts.backends.CustomerBackend']
 LOGIN_URL = 'accounts:login'
 LOGIN_REDIRECT_URL = 'accounts:dashboard'
 LOGOUT_REDIRECT_URL = 'core:home'
 
 
 # ========================================
-# CONFIGURATION CACHE (CORRIGÉE DÉFINITIVEMENT)
+# CONFIGURATION CACHE
 # ========================================
-# FORCER le cache en mémoire - NE JAMAIS utiliser Redis sauf configuration explicite
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
+# Pas de Redis : cache dans un fichier SQLite (WAL) partagé par tous les
+# workers de la machine (core/cache_backends.py), pour que les invalidations
+# atteignent tous les processus. CACHE_BACKEND=locmem : cache par processus.
+# Les tests gardent un cache en mémoire, vide à chaque lancement.
+TESTING = sys.argv[1:2] == ['test']
+CACHE_BACKEND = 'locmem' if TESTING else config('CACHE_BACKEND', default='sqlite')
+
+if CACHE_BACKEND == 'sqlite':
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache_backends.SQLiteCache',
+            'LOCATION': config('CACHE_LOCATION', default=str(BASE_DIR / 'cache' / 'default.sqlite3')),
+            'OPTIONS': {
+                'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=50000, cast=int),
+            },
+        }
     }
-}
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'unique-snowflake',
+        }
+    }
+
+# Durée (secondes) pendant laquelle les indicateurs du dashboard sont servis
+# depuis le cache sans recalcul ; au-delà, recalcul unique en arrière-plan
+DASHBOARD_METRICS_FRESHNESS = config('DASHBOARD_METRICS_FRESHNESS', default=60, cast=int)
+
+# Durée (secondes) de mise en cache du résumé « Mon compte » de chaque client,
+# invalidé à chaque changement de ses commandes ou adresses
+ACCOUNT_CACHE_TIMEOUT = config('ACCOUNT_CACHE_TIMEOUT', default=300, cast=int)
+
+# Suites des changements de statut de commande (emails, libération du stock)
+# exécutées en arrière-plan après le commit ; False pour les exécuter sur place
+ORDER_FOLLOWUPS_ASYNC = config('ORDER_FOLLOWUPS_ASYNC', default=True, cast=bool)
+
+# Journal des actions admin : écriture par lots en arrière-plan, puis
+# archivage (manage.py archive_activity_logs) au-delà de la rétention
+ADMIN_ACTIVITY_LOG_ASYNC = config('ADMIN_ACTIVITY_LOG_ASYNC', default=True, cast=bool)
+ADMIN_ACTIVITY_LOG_BATCH_SIZE = config('ADMIN_ACTIVITY_LOG_BATCH_SIZE', default=100, cast=int)
+ADMIN_ACTIVITY_LOG_FLUSH_INTERVAL = config('ADMIN_ACTIVITY_LOG_FLUSH_INTERVAL', default=5, cast=int)
+ADMIN_ACTIVITY_LOG_RETENTION_DAYS = config('ADMIN_ACTIVITY_LOG_RETENTION_DAYS', default=180, cast=int)
+
+# Durée (secondes) de mise en cache des codes promo consultés, y compris des
+# codes inconnus (cache négatif) ; les limites restent vérifiées à la commande
+COUPON_CACHE_TIMEOUT = config('COUPON_CACHE_TIMEOUT', default=300, cast=int)
+# Tentatives de codes promo par client : rafale maximale, puis recharge par minute
+COUPON_RATE_LIMIT_BURST = config('COUPON_RATE_LIMIT_BURST', default=10, cast=int)
+COUPON_RATE_LIMIT_PER_MINUTE = config('COUPON_RATE_LIMIT_PER_MINUTE', default=10, cast=int)
+
+# Campagnes email (manage.py send_campaign) : destinataires par lot, débit
+# maximal (messages/seconde, 0 = illimité), connexions SMTP simultanées et
+# nombre de tentatives avant abandon d'un destinataire
+CAMPAIGN_BATCH_SIZE = config('CAMPAIGN_BATCH_SIZE', default=200, cast=int)
+CAMPAIGN_SEND_RATE = config('CAMPAIGN_SEND_RATE', default=10, cast=float)
+CAMPAIGN_WORKERS = config('CAMPAIGN_WORKERS', default=2, cast=int)
+CAMPAIGN_MAX_ATTEMPTS = config('CAMPAIGN_MAX_ATTEMPTS', default=3, cast=int)
+
+# Notifications de paiement (webhooks) : tentatives de traitement avant abandon
+PAYMENT_WEBHOOK_MAX_ATTEMPTS = config('PAYMENT_WEBHOOK_MAX_ATTEMPTS', default=5, cast=int)
+
+# Fournisseurs de paiement mobile : URL de l'API (vide = simulation, paiement
+# accepté immédiatement) et clé d'accès
+AITEL_MONEY_API_URL = config('AITEL_MONEY_API_URL', default='')
+AITEL_MONEY_API_KEY = config('AITEL_MONEY_API_KEY', default='')
+MOOV_MONEY_API_URL = config('MOOV_MONEY_API_URL', default='')
+MOOV_MONEY_API_KEY = config('MOOV_MONEY_API_KEY', default='')
+# Appels aux fournisseurs : délais de connexion et de réponse (secondes),
+# nouvelles tentatives, connexions conservées par fournisseur, puis disjoncteur
+# (échecs consécutifs avant coupure, durée de la coupure en secondes)
+PAYMENT_PROVIDER_CONNECT_TIMEOUT = config('PAYMENT_PROVIDER_CONNECT_TIMEOUT', default=3.0, cast=float)
+PAYMENT_PROVIDER_READ_TIMEOUT = config('PAYMENT_PROVIDER_READ_TIMEOUT', default=10.0, cast=float)
+PAYMENT_PROVIDER_MAX_RETRIES = config('PAYMENT_PROVIDER_MAX_RETRIES', default=2, cast=int)
+PAYMENT_PROVIDER_POOL_SIZE = config('PAYMENT_PROVIDER_POOL_SIZE', default=10, cast=int)
+PAYMENT_PROVIDER_BREAKER_THRESHOLD = config('PAYMENT_PROVIDER_BREAKER_THRESHOLD', default=5, cast=int)
+PAYMENT_PROVIDER_BREAKER_RESET = config('PAYMENT_PROVIDER_BREAKER_RESET', default=30, cast=int)
+
+# Vérification des paiements mobiles restés en attente (manage.py
+# poll_pending_payments) : âge minimal avant vérification (minutes), âge au-delà
+# duquel un paiement non confirmé passe en échec (heures), appels simultanés
+PAYMENT_POLL_MIN_AGE = config('PAYMENT_POLL_MIN_AGE', default=5, cast=int)
+PAYMENT_POLL_MAX_AGE = config('PAYMENT_POLL_MAX_AGE', default=24, cast=int)
+PAYMENT_POLL_WORKERS = config('PAYMENT_POLL_WORKERS', default=8, cast=int)
 
 
 # ========================================
@@ -266,6 +347,8 @@ SITE_NAME = config('SITE_NAME', default='Ma Boutique E-Commerce')
 SHOP_NAME = config('SHOP_NAME', default='E-Commerce Gabon')
 SHOP_EMAIL = config('SHOP_EMAIL', default='contact@ecommerce-gabon.com')
 SHOP_PHONE = config('SHOP_PHONE', default='+241 XX XX XX XX')
+# Indicatif ajouté aux numéros locaux dans les recherches de l'admin
+PHONE_COUNTRY_CODE = config('PHONE_COUNTRY_CODE', default='241')
 SHOP_ADDRESS = config('SHOP_ADDRESS', default='Libreville, Gabon')
 SHOP_WEBSITE = config('SHOP_WEBSITE', default='http://localhost:8000')
 SHOP_LOGO_URL = config('SHOP_LOGO_URL', default='')
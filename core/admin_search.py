@@ -0,0 +1,88 @@
+"""
+core/admin_search.py - Recherche classée pour les widgets autocomplete
+======================================================================
+
+Les autocomplete_fields de l'admin interrogent la vue /admin/autocomplete/,
+qui appelle ModelAdmin.get_search_results(). Par défaut, Django combine un
+icontains sur chaque champ de search_fields : parcours complet de la table
+et résultats dans l'ordre par défaut.
+
+RankedAutocompleteMixin remplace cette recherche, pour les seules requêtes
+autocomplete, par une liste de filtres classés (égalité puis préfixe sur des
+colonnes indexées) : les meilleures correspondances remontent en premier.
+La recherche des listes (changelist) reste inchangée.
+"""
+
+from functools import reduce
+from operator import or_
+import re
+
+from django.conf import settings
+from django.db.models import Case, IntegerField, Q, Value, When
+
+# Caractères ignorés dans un numéro de téléphone saisi
+PHONE_SEPARATORS = re.compile(r'[\s.\-()]')
+PHONE_PATTERN = re.compile(r'^\+?\d{4,15}$')
+
+
+def normalize_phone(term: str):
+    """
+    Numéro de téléphone sans séparateurs, ou None si term n'en est pas un
+
+    Exemple : '+241 07 12-34-56' -> '+24107123456'
+    """
+    phone = PHONE_SEPARATORS.sub('', term)
+    return phone if PHONE_PATTERN.match(phone) else None
+
+
+def phone_prefix_filter(field: str, phone: str) -> Q:
+    """
+    Numéro cherché par préfixe, saisi avec ou sans indicatif pays
+
+    Les numéros sont enregistrés avec ou sans indicatif : '07123456' cherche
+    aussi '+24107123456' et '24107123456'. Uniquement des préfixes, servis
+    par l'index de la colonne (un endswith parcourrait toute la table).
+    """
+    country_code = getattr(settings, 'PHONE_COUNTRY_CODE', '241')
+    digits = phone.lstrip('+')
+    if phone.startswith('+') and not digits.startswith(country_code):
+        # Numéro étranger : tel que saisi
+        return Q(**{f'{field}__startswith': phone})
+    if digits.startswith(country_code):
+        digits = digits[len(country_code):]
+    prefixes = [digits, f'{country_code}{digits}', f'+{country_code}{digits}']
+    return reduce(or_, [Q(**{f'{field}__startswith': prefix}) for prefix in prefixes])
+
+
+class RankedAutocompleteMixin:
+    """
+    À placer avant admin.ModelAdmin ; définir get_ranked_search_filters()
+
+    Les filtres ne doivent suivre que des relations directes (ForeignKey
+    vers l'avant) pour ne pas dupliquer les lignes.
+    """
+
+    def get_ranked_search_filters(self, term):
+        """Liste de Q, de la correspondance la plus forte à la plus faible"""
+        return []
+
+    def is_autocomplete_request(self, request) -> bool:
+        match = getattr(request, 'resolver_match', None)
+        return bool(match and match.url_name == 'autocomplete')
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        filters = self.get_ranked_search_filters(term) if term else []
+        if not filters or not self.is_autocomplete_request(request):
+            return super().get_search_results(request, queryset, search_term)
+
+        rank = Case(
+            *[When(condition, then=Value(position)) for position, condition in enumerate(filters)],
+            default=Value(len(filters)),
+            output_field=IntegerField()
+        )
+        ordering = list(self.get_ordering(request) or ()) + ['pk']
+        queryset = queryset.filter(reduce(or_, filters)).annotate(
+            search_rank=rank
+        ).order_by('search_rank', *ordering)
+        return queryset, False
@@ -0,0 +1,298 @@
+"""
+core/cache_backends.py - Cache partagé entre processus, sans Redis
+==================================================================
+
+Avec LocMemCache, chaque worker gunicorn a son propre cache : une
+invalidation (core.signals, marketing.signals, accounts.signals) ne vide
+que le cache du worker qui a traité la modification, les autres servent
+l'ancienne valeur jusqu'à expiration.
+
+SQLiteCache stocke le cache dans un fichier SQLite en mode WAL, partagé
+par tous les processus de la machine :
+- lectures concurrentes sans blocage (WAL), écritures courtes sérialisées
+  par SQLite (busy_timeout)
+- add(), incr() / decr(), touch() et incr_version() atomiques entre
+  processus (une requête conditionnelle ou une transaction IMMEDIATE)
+- entiers stockés tels quels, autres valeurs picklées
+- clés versionnées de Django (VERSION, KEY_PREFIX, incr_version)
+- au-delà de MAX_ENTRIES, suppression des entrées expirées puis de la
+  fraction 1/CULL_FREQUENCY qui expire le plus tôt
+
+Une connexion par thread et par processus (reconnexion après fork).
+Mesures comparées aux backends de Django : manage.py benchmark_cache.
+
+Configuration :
+    CACHES = {'default': {
+        'BACKEND': 'core.cache_backends.SQLiteCache',
+        'LOCATION': '/var/tmp/dh-shop/cache.sqlite3',
+        'OPTIONS': {'MAX_ENTRIES': 50000, 'BUSY_TIMEOUT': 5},
+    }}
+"""
+
+from contextlib import contextmanager
+from pathlib import Path
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# Entiers stockés nativement par SQLite (sinon picklés)
+SQLITE_INT_MIN = -(2 ** 63)
+SQLITE_INT_MAX = 2 ** 63 - 1
+
+# Nombre d'écritures d'un processus entre deux vérifications de la taille
+CULL_CHECK_INTERVAL = 100
+
+# Clés par requête IN (...) : sous la limite de variables de SQLite
+SQLITE_BATCH_SIZE = 500
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS cache_entries ("
+    " key TEXT PRIMARY KEY,"
+    " value BLOB NOT NULL,"
+    " expires REAL"
+    ") WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS cache_entries_expires ON cache_entries (expires)",
+)
+
+# Entrée valide à l'instant ? (NULL : sans expiration)
+VALID = "(expires IS NULL OR expires > ?)"
+
+
+class SQLiteCache(BaseCache):
+    """
+    Cache Django dans un fichier SQLite (WAL) partagé par les processus
+
+    Args:
+        location: Chemin du fichier (dossier créé au besoin)
+        params: Paramètres CACHES ; OPTIONS accepte BUSY_TIMEOUT (secondes
+            d'attente du verrou d'écriture, défaut 5) en plus de MAX_ENTRIES
+            et CULL_FREQUENCY
+    """
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        self._busy_timeout = float(params.get('OPTIONS', {}).get('BUSY_TIMEOUT', 5))
+        self._local = threading.local()
+
+    # ============================================
+    # CONNEXION
+    # ============================================
+
+    def _connection(self):
+        """Connexion du thread courant, rouverte après un fork"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = self._connect()
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+            self._local.writes = 0
+        return connection
+
+    def _connect(self):
+        Path(self._path).parent.mkdir(parents=True, exist_ok=True)
+        # isolation_level=None : autocommit, transactions explicites (_transaction)
+        connection = sqlite3.connect(self._path, timeout=self._busy_timeout, isolation_level=None)
+        connection.execute('PRAGMA journal_mode=WAL')
+        # WAL + NORMAL : pas de fsync à chaque écriture (un cache peut perdre
+        # les dernières écritures en cas de coupure, jamais se corrompre)
+        connection.execute('PRAGMA synchronous=NORMAL')
+        for statement in SCHEMA:
+            connection.execute(statement)
+        return connection
+
+    @contextmanager
+    def _transaction(self):
+        """Transaction IMMEDIATE : verrou d'écriture pris dès le début"""
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    # ============================================
+    # ENCODAGE
+    # ============================================
+
+    def _encode(self, value):
+        if type(value) is int and SQLITE_INT_MIN <= value <= SQLITE_INT_MAX:
+            return value
+        return pickle.dumps(value, self.pickle_protocol)
+
+    @staticmethod
+    def _decode(value):
+        return value if isinstance(value, int) else pickle.loads(value)
+
+    # ============================================
+    # LECTURE
+    # ============================================
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._connection().execute(
+            f"SELECT value FROM cache_entries WHERE key = ? AND {VALID}", (key, time.time())
+        ).fetchone()
+        return default if row is None else self._decode(row[0])
+
+    def get_many(self, keys, version=None):
+        keys_by_cache_key = {self.make_and_validate_key(key, version=version): key for key in keys}
+        cache_keys = list(keys_by_cache_key)
+        connection = self._connection()
+        now = time.time()
+        values = {}
+        for start in range(0, len(cache_keys), SQLITE_BATCH_SIZE):
+            batch = cache_keys[start:start + SQLITE_BATCH_SIZE]
+            rows = connection.execute(
+                f"SELECT key, value FROM cache_entries "
+                f"WHERE key IN ({', '.join('?' * len(batch))}) AND {VALID}",
+                (*batch, now)
+            )
+            for cache_key, value in rows:
+                values[keys_by_cache_key[cache_key]] = self._decode(value)
+        return values
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._connection().execute(
+            f"SELECT 1 FROM cache_entries WHERE key = ? AND {VALID}", (key, time.time())
+        ).fetchone() is not None
+
+    # ============================================
+    # ÉCRITURE
+    # ============================================
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        expires = self.get_backend_timeout(timeout)
+        if expires is not None and expires <= time.time():
+            self._connection().execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+            return
+        self._connection().execute(
+            "INSERT OR REPLACE INTO cache_entries (key, value, expires) VALUES (?, ?, ?)",
+            (key, self._encode(value), expires)
+        )
+        self._maybe_cull()
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        rows = [
+            (self.make_and_validate_key(key, version=version), self._encode(value), expires)
+            for key, value in data.items()
+        ]
+        with self._transaction() as connection:
+            if expires is not None and expires <= time.time():
+                connection.executemany("DELETE FROM cache_entries WHERE key = ?", [row[:1] for row in rows])
+            else:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO cache_entries (key, value, expires) VALUES (?, ?, ?)", rows
+                )
+        self._maybe_cull(len(rows))
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        """Écrit la valeur si la clé est absente ou expirée (atomique entre processus)"""
+        key = self.make_and_validate_key(key, version=version)
+        expires = self.get_backend_timeout(timeout)
+        cursor = self._connection().execute(
+            "INSERT INTO cache_entries (key, value, expires) VALUES (?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires "
+            "WHERE cache_entries.expires IS NOT NULL AND cache_entries.expires <= ?",
+            (key, self._encode(value), expires, time.time())
+        )
+        added = cursor.rowcount == 1
+        if added:
+            self._maybe_cull()
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._connection().execute(
+            f"UPDATE cache_entries SET expires = ? WHERE key = ? AND {VALID}",
+            (self.get_backend_timeout(timeout), key, time.time())
+        )
+        return cursor.rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        """
+        Ajoute delta à une valeur entière (atomique entre processus)
+
+        Raises:
+            ValueError: Si la clé est absente ou expirée
+        """
+        key = self.make_and_validate_key(key, version=version)
+        # Verrou d'écriture pris avant la lecture : lecture et écriture
+        # ne peuvent pas être séparées par un autre processus
+        with self._transaction() as connection:
+            row = connection.execute(
+                f"SELECT value FROM cache_entries WHERE key = ? AND {VALID}", (key, time.time())
+            ).fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            # Addition en Python : en SQL, un dépassement de 64 bits donnerait un REAL
+            value = self._decode(row[0]) + delta
+            connection.execute("UPDATE cache_entries SET value = ? WHERE key = ?", (self._encode(value), key))
+        return value
+
+    def incr_version(self, key, delta=1, version=None):
+        """Déplace la valeur vers la version version + delta (atomique entre processus)"""
+        if version is None:
+            version = self.version
+        old_key = self.make_and_validate_key(key, version=version)
+        new_key = self.make_and_validate_key(key, version=version + delta)
+        with self._transaction() as connection:
+            if not connection.execute(
+                f"SELECT 1 FROM cache_entries WHERE key = ? AND {VALID}", (old_key, time.time())
+            ).fetchone():
+                raise ValueError(f"Key '{key}' not found")
+            connection.execute("DELETE FROM cache_entries WHERE key = ?", (new_key,))
+            connection.execute("UPDATE cache_entries SET key = ? WHERE key = ?", (new_key, old_key))
+        return version + delta
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._connection().execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+        return cursor.rowcount == 1
+
+    def delete_many(self, keys, version=None):
+        rows = [(self.make_and_validate_key(key, version=version),) for key in keys]
+        if rows:
+            with self._transaction() as connection:
+                connection.executemany("DELETE FROM cache_entries WHERE key = ?", rows)
+
+    def clear(self):
+        self._connection().execute("DELETE FROM cache_entries")
+
+    # ============================================
+    # TAILLE
+    # ============================================
+
+    def _maybe_cull(self, writes=1):
+        """Vérifie la taille toutes les CULL_CHECK_INTERVAL écritures du processus"""
+        self._local.writes += writes
+        if self._local.writes >= CULL_CHECK_INTERVAL:
+            self._local.writes = 0
+            self._cull()
+
+    def _cull(self):
+        with self._transaction() as connection:
+            connection.execute(
+                "DELETE FROM cache_entries WHERE expires IS NOT NULL AND expires <= ?", (time.time(),)
+            )
+            count = connection.execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0]
+            if count <= self._max_entries:
+                return
+            # Entrées sans expiration en dernier
+            connection.execute(
+                "DELETE FROM cache_entries WHERE key IN ("
+                " SELECT key FROM cache_entries ORDER BY expires IS NULL, expires LIMIT ?"
+                ")",
+                (max(1, count // self._cull_frequency) if self._cull_frequency else count,)
+            )
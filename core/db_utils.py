@@ -0,0 +1,35 @@
+"""
+core/db_utils.py - Expressions d'agrégation réutilisables
+=========================================================
+
+Agrégats calculés par sous-requête corrélée plutôt que par JOIN + GROUP BY :
+plusieurs agrégats sur des relations différentes peuvent être annotés sur
+le même QuerySet sans se multiplier entre eux, et le résultat reste
+triable (ORDER BY) comme une colonne ordinaire.
+
+Utilisé par les get_queryset() des ModelAdmin pour éviter une requête
+d'agrégat par ligne dans les listes.
+"""
+
+from django.db.models import Count, DecimalField, IntegerField, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def subquery_count(queryset, group_by: str):
+    """
+    Nombre de lignes de queryset (déjà filtré sur OuterRef), 0 si aucune
+
+    Exemple :
+        subquery_count(Order.objects.filter(shipping_zone=OuterRef('pk')), 'shipping_zone')
+    """
+    counts = queryset.order_by().values(group_by).annotate(count=Count('pk')).values('count')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def subquery_sum(queryset, group_by: str, expression, output_field=None):
+    """
+    Somme de expression sur queryset (déjà filtré sur OuterRef), 0 si aucune ligne
+    """
+    output_field = output_field or DecimalField(max_digits=14, decimal_places=2)
+    sums = queryset.order_by().values(group_by).annotate(total=Sum(expression)).values('total')
+    return Coalesce(Subquery(sums, output_field=output_field), Value(0), output_field=output_field)
@@ -0,0 +1,156 @@
+"""
+Commande : benchmark_cache
+==========================
+
+Compare les backends de cache sur les opérations du site : écriture,
+lecture (présente / absente), get_many, add, incr, et un compteur
+incrémenté par plusieurs processus en parallèle (partage du cache et
+atomicité de incr entre workers).
+
+Backends mesurés, dans des emplacements temporaires :
+- locmem   : LocMemCache (un cache par processus)
+- file     : FileBasedCache
+- database : DatabaseCache (table temporaire dans la base configurée)
+- sqlite   : SQLiteCache (core/cache_backends.py)
+
+Usage :
+    python manage.py benchmark_cache
+    python manage.py benchmark_cache --operations 20000 --processes 8 --backend sqlite --backend locmem
+"""
+
+from contextlib import contextmanager
+from multiprocessing import get_context
+import shutil
+import tempfile
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.core.management.commands.createcachetable import Command as CreateCacheTableCommand
+from django.db import connection, connections
+from django.utils.module_loading import import_string
+
+BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'database': 'django.core.cache.backends.db.DatabaseCache',
+    'sqlite': 'core.cache_backends.SQLiteCache',
+}
+
+
+def _increment(cache, count, results):
+    """Processus enfant : incr() répétés sur le compteur partagé"""
+    errors = 0
+    for _ in range(count):
+        try:
+            cache.incr('bench:counter')
+        except Exception:
+            errors += 1
+    connections.close_all()
+    results.put(errors)
+
+
+class Command(BaseCommand):
+    help = "Compare les performances des backends de cache (dont le cache SQLite partagé)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--operations', type=int, default=5000, help='Opérations par mesure (défaut : 5000)')
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=4,
+            help='Processus du test de compteur partagé (défaut : 4)'
+        )
+        parser.add_argument(
+            '--backend',
+            action='append',
+            choices=list(BACKENDS),
+            help='Backend à mesurer (répétable, défaut : tous)'
+        )
+
+    def handle(self, *args, **options):
+        operations = max(1, options['operations'])
+        processes = max(1, options['processes'])
+
+        self.stdout.write(
+            f"{'backend':<10}{'set':>10}{'get':>10}{'miss':>10}{'get_many':>10}"
+            f"{'add':>10}{'incr':>10}   compteur partagé"
+        )
+        self.stdout.write(f"{'':<10}{'(opérations par seconde)':>60}")
+        for name in options['backend'] or list(BACKENDS):
+            with self._cache(name) as cache:
+                rates = self._measure(cache, operations)
+                shared = self._shared_counter(cache, processes, max(1, operations // processes))
+            self.stdout.write(
+                f"{name:<10}" + ''.join(f"{rate:>10.0f}" for rate in rates) + f"   {shared}"
+            )
+
+    @contextmanager
+    def _cache(self, name):
+        """Cache du backend dans un emplacement temporaire, supprimé après la mesure"""
+        directory = tempfile.mkdtemp(prefix='benchmark-cache-')
+        table = f'benchmark_cache_{uuid.uuid4().hex[:8]}'
+        location = {
+            'locmem': f'benchmark-{uuid.uuid4().hex}',
+            'file': directory,
+            'database': table,
+            'sqlite': f'{directory}/cache.sqlite3',
+        }[name]
+        if name == 'database':
+            create_table = CreateCacheTableCommand(stdout=self.stdout)
+            create_table.verbosity = 0
+            create_table.create_table('default', table, False)
+        try:
+            yield import_string(BACKENDS[name])(location, {'OPTIONS': {'MAX_ENTRIES': 10 ** 7}})
+        finally:
+            if name == 'database':
+                with connection.cursor() as cursor:
+                    cursor.execute(f'DROP TABLE {connection.ops.quote_name(table)}')
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def _measure(self, cache, operations):
+        """Débit (opérations par seconde) de chaque opération"""
+        keys = [f'bench:{index}' for index in range(operations)]
+        value = {'id': 42, 'name': 'Produit', 'price': '15000.00', 'tags': ['a', 'b', 'c']}
+
+        def rate(function):
+            started = time.perf_counter()
+            function()
+            return operations / (time.perf_counter() - started)
+
+        cache.set('bench:counter', 0, None)
+        return [
+            rate(lambda: [cache.set(key, value, 300) for key in keys]),
+            rate(lambda: [cache.get(key) for key in keys]),
+            rate(lambda: [cache.get(f'{key}:absent') for key in keys]),
+            rate(lambda: [cache.get_many(keys[start:start + 50]) for start in range(0, operations, 50)]),
+            rate(lambda: [cache.add(f'{key}:add', 1, 300) for key in keys]),
+            rate(lambda: [cache.incr('bench:counter') for _ in keys]),
+        ]
+
+    def _shared_counter(self, cache, processes, increments):
+        """
+        incr() simultanés depuis plusieurs processus, puis lecture du total
+        par le processus principal (attendu : processes x increments)
+        """
+        cache.set('bench:counter', 0, None)
+        connections.close_all()
+        started = time.perf_counter()
+        # fork : le cache est hérité par les enfants (les backends ne sont pas picklables)
+        context = get_context('fork')
+        results = context.Queue()
+        workers = [
+            context.Process(target=_increment, args=(cache, increments, results))
+            for _ in range(processes)
+        ]
+        for worker in workers:
+            worker.start()
+        errors = sum(results.get() for _ in workers)
+        for worker in workers:
+            worker.join()
+        duration = time.perf_counter() - started
+
+        expected = processes * increments
+        total = cache.get('bench:counter')
+        status = 'OK' if total == expected else 'PERTES'
+        return f"{total}/{expected} {status} en {duration:.2f} s" + (f", {errors} erreur(s)" if errors else '')
@@ -0,0 +1,128 @@
+"""
+core/paginator.py - Pagination des grandes listes de l'administration
+=====================================================================
+
+L'admin Django exécute un COUNT(*) exact à chaque affichage de liste. Sur
+des tables de plusieurs millions de lignes (commandes, paiements, journaux),
+ce comptage domine le temps de réponse. ApproximateCountPaginator le remplace :
+- liste non filtrée : estimation du catalogue (pg_class.reltuples) sous
+  PostgreSQL, comptage exact mis en cache sur les autres bases
+- liste filtrée : comptage plafonné (« 10 000+ ») via un LIMIT
+
+Les petites tables gardent un comptage exact.
+"""
+
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+
+logger = logging.getLogger(__name__)
+
+# En dessous de ce volume, le comptage exact reste bon marché
+DEFAULT_COUNT_ESTIMATE_THRESHOLD = 10000
+
+# Plafond des comptages filtrés
+DEFAULT_FILTERED_COUNT_CAP = 10000
+
+# Durée de conservation des comptages exacts (bases sans statistiques)
+COUNT_CACHE_TIMEOUT = 300
+
+
+def get_table_estimate(queryset: QuerySet):
+    """
+    Nombre de lignes estimé par les statistiques PostgreSQL
+
+    Returns:
+        int ou None si la base n'est pas PostgreSQL ou la table jamais analysée
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+
+    table = connection.ops.quote_name(queryset.model._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+        row = cursor.fetchone()
+
+    # reltuples vaut -1 tant que la table n'a pas été analysée (PostgreSQL 14+)
+    if not row or row[0] < 0:
+        return None
+    return row[0]
+
+
+class ApproximateCountPaginator(Paginator):
+    """
+    Paginator à comptage approximatif pour les ModelAdmin de grandes tables
+
+    Attributs renseignés après lecture de count (utilisés par le template) :
+        is_estimated : le total affiché est une estimation
+        is_capped    : le total réel dépasse le plafond affiché
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.is_estimated = False
+        self.is_capped = False
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not isinstance(queryset, QuerySet):
+            return super().count
+        if queryset.query.where:
+            return self._capped_count(queryset)
+        return self._unfiltered_count(queryset)
+
+    @property
+    def estimate_threshold(self) -> int:
+        return getattr(settings, 'ADMIN_COUNT_ESTIMATE_THRESHOLD', DEFAULT_COUNT_ESTIMATE_THRESHOLD)
+
+    @property
+    def filtered_count_cap(self) -> int:
+        return getattr(settings, 'ADMIN_FILTERED_COUNT_CAP', DEFAULT_FILTERED_COUNT_CAP)
+
+    def _unfiltered_count(self, queryset: QuerySet) -> int:
+        try:
+            estimate = get_table_estimate(queryset)
+        except Exception as e:
+            logger.warning(f'Estimation indisponible pour {queryset.model.__name__}: {str(e)}')
+            estimate = None
+
+        if estimate is not None and estimate >= self.estimate_threshold:
+            self.is_estimated = True
+            return estimate
+
+        cache_key = f'admin_count:{queryset.db}:{queryset.model._meta.db_table}'
+        cached = cache.get(cache_key)
+        if cached is not None:
+            self.is_estimated = True
+            return cached
+
+        count = queryset.count()
+        if count >= self.estimate_threshold:
+            cache.set(cache_key, count, COUNT_CACHE_TIMEOUT)
+        return count
+
+    def _capped_count(self, queryset: QuerySet) -> int:
+        cap = self.filtered_count_cap
+        # SELECT COUNT(*) FROM (SELECT id ... LIMIT cap + 1) : le parcours s'arrête au plafond
+        count = queryset.order_by().values('pk')[:cap + 1].count()
+        if count > cap:
+            self.is_capped = True
+            return cap
+        return count
+
+
+class LargeTableAdminMixin:
+    """
+    À placer avant admin.ModelAdmin pour les tables volumineuses
+
+    Désactive aussi le second COUNT(*) non filtré affiché à côté de la recherche.
+    """
+    paginator = ApproximateCountPaginator
+    show_full_result_count = False
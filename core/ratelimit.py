@@ -0,0 +1,96 @@
+"""
+core/ratelimit.py - Limitation de débit par seau à jetons
+=========================================================
+
+Chaque client (utilisateur connecté, sinon adresse IP) dispose d'un seau de
+`capacity` jetons, rechargé de `refill_rate` jetons par seconde. Chaque
+requête consomme un jeton ; seau vide -> réponse 429 sans exécuter la vue.
+
+Les seaux sont stockés dans le cache partagé : la limite s'applique à tous
+les processus. La lecture-écriture n'est pas atomique ; sous une rafale
+simultanée, quelques requêtes de plus peuvent passer, ce qui suffit à
+freiner un script sans ajouter de verrou.
+"""
+
+from functools import wraps
+import time
+
+from django.core.cache import cache
+from django.http import JsonResponse
+
+
+def get_client_identifier(request):
+    """Identifiant du client : utilisateur connecté, sinon première IP transmise"""
+    if request.user.is_authenticated:
+        return f"user:{request.user.pk}"
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    if forwarded:
+        return f"ip:{forwarded.split(',')[0].strip()}"
+    return f"ip:{request.META.get('REMOTE_ADDR', '')}"
+
+
+class TokenBucket:
+    """
+    Seau à jetons stocké dans le cache sous la forme (jetons, horodatage)
+
+    Args:
+        key: Clé de cache du seau
+        capacity: Nombre maximum de jetons (taille de la rafale autorisée)
+        refill_rate: Jetons ajoutés par seconde (strictement positif)
+
+    Raises:
+        ValueError: refill_rate nul ou négatif (le seau ne se rechargerait jamais)
+    """
+
+    def __init__(self, key, capacity, refill_rate):
+        if refill_rate <= 0:
+            raise ValueError(f"refill_rate doit être strictement positif (reçu : {refill_rate})")
+        self.key = key
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+
+    def consume(self, tokens=1, now=None):
+        """
+        Consomme des jetons si le seau en contient assez
+
+        Returns:
+            tuple: (autorisé: bool, secondes avant le prochain jeton disponible)
+        """
+        # Horloge murale : le seau est partagé entre processus
+        now = time.time() if now is None else now
+        available, updated = cache.get(self.key, (self.capacity, now))
+        available = min(self.capacity, available + (now - updated) * self.refill_rate)
+
+        allowed = available >= tokens
+        if allowed:
+            available -= tokens
+
+        # Un seau plein et inactif n'a pas besoin d'être conservé
+        cache.set(self.key, (available, now), int(self.capacity / self.refill_rate) + 1)
+        retry_after = 0 if allowed else (tokens - available) / self.refill_rate
+        return allowed, retry_after
+
+
+def rate_limit(scope, capacity, refill_rate, message="Trop de tentatives, veuillez réessayer plus tard."):
+    """
+    Décorateur de vue : seau à jetons par client pour cette portée
+
+    capacity et refill_rate peuvent être des callables (lecture des settings
+    à chaque requête, surchargeables dans les tests).
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            bucket = TokenBucket(
+                f"ratelimit:{scope}:{get_client_identifier(request)}",
+                capacity() if callable(capacity) else capacity,
+                refill_rate() if callable(refill_rate) else refill_rate,
+            )
+            allowed, retry_after = bucket.consume()
+            if not allowed:
+                response = JsonResponse({'success': False, 'message': message}, status=429)
+                response['Retry-After'] = str(int(retry_after) + 1)
+                return response
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -1,3 +1,354 @@
-from django.test import TestCase
+from decimal import Decimal
+from multiprocessing import get_context
+import shutil
+import tempfile
+import time
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from orders.models import Order
+
+from .cache_backends import SQLiteCache
+from .paginator import ApproximateCountPaginator, get_table_estimate
+from .ratelimit import TokenBucket
+
+TEST_STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+def create_orders(count, status='pending'):
+    user, _ = User.objects.get_or_create(username='client', email='client@test.ga')
+    start = Order.objects.count()
+    Order.objects.bulk_create([
+        Order(
+            order_number=f'ORD-{start + i:06d}',
+            customer=user.customer,
+            customer_email=user.email,
+            customer_phone='+24101020304',
+            subtotal=Decimal('1000'),
+            total=Decimal('1000'),
+            status=status,
+        )
+        for i in range(count)
+    ])
+
+
+@override_settings(ADMIN_COUNT_ESTIMATE_THRESHOLD=20, ADMIN_FILTERED_COUNT_CAP=10)
+class ApproximateCountPaginatorTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_small_tables_are_counted_exactly(self):
+        create_orders(5)
+        paginator = ApproximateCountPaginator(Order.objects.all(), 100)
+
+        self.assertEqual(paginator.count, 5)
+        self.assertFalse(paginator.is_estimated)
+
+    def test_large_unfiltered_count_is_cached_outside_postgresql(self):
+        create_orders(25)
+        self.assertIsNone(get_table_estimate(Order.objects.all()))
+        self.assertEqual(ApproximateCountPaginator(Order.objects.all(), 100).count, 25)
+
+        create_orders(3)
+        with self.assertNumQueries(0):
+            paginator = ApproximateCountPaginator(Order.objects.all(), 100)
+            self.assertEqual(paginator.count, 25)
+        self.assertTrue(paginator.is_estimated)
+
+    def test_filtered_count_is_capped(self):
+        create_orders(15, status='processing')
+        create_orders(3, status='shipped')
+
+        capped = ApproximateCountPaginator(Order.objects.filter(status='processing'), 5)
+        exact = ApproximateCountPaginator(Order.objects.filter(status='shipped'), 5)
+
+        self.assertEqual(capped.count, 10)
+        self.assertTrue(capped.is_capped)
+        self.assertEqual(capped.num_pages, 2)
+        self.assertEqual(exact.count, 3)
+        self.assertFalse(exact.is_capped)
+
+    @override_settings(STORAGES=TEST_STORAGES)
+    def test_changelist_shows_capped_total(self):
+        create_orders(15, status='processing')
+        admin = User.objects.create_superuser('admin', 'admin@test.ga', 'pass')
+        self.client.force_login(admin)
+
+        response = self.client.get('/admin/orders/order/', {'status__exact': 'processing'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '10+ Commandes')
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class RankedAutocompleteTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser('admin', 'admin@test.ga', 'pass')
+        self.client.force_login(self.admin)
+
+    def create_variants(self, skus):
+        from shop.models import Category, Product, ProductVariant
+
+        category, _ = Category.objects.get_or_create(name='Vêtements', slug='vetements')
+        variants = []
+        for sku in skus:
+            product = Product.objects.create(
+                name=f'Produit {sku}',
+                slug=sku.lower(),
+                description='Description',
+                category=category,
+                base_price=Decimal('5000'),
+                main_image='products/test.jpg',
+            )
+            variants.append(ProductVariant.objects.create(product=product, sku=sku, size='M'))
+        return variants
+
+    def create_addresses(self, count, start=0):
+        from accounts.models import Address
+
+        addresses = []
+        for i in range(start, start + count):
+            user = User.objects.create_user(f'client{i}', f'client{i}@test.ga')
+            addresses.append(Address.objects.create(
+                customer=user.customer,
+                full_name=f'Client {i}',
+                phone=f'+2410700{i:04d}',
+                address_line1='Quartier Louis',
+                city='Libreville',
+            ))
+        return addresses
+
+    def autocomplete(self, term, app_label, model_name, field_name):
+        response = self.client.get('/admin/autocomplete/', {
+            'term': term,
+            'app_label': app_label,
+            'model_name': model_name,
+            'field_name': field_name,
+        })
+        self.assertEqual(response.status_code, 200)
+        return [result['text'] for result in response.json()['results']]
+
+    def test_exact_sku_is_ranked_first(self):
+        self.create_variants(['AB-100', 'XAB-1', 'AB-1', 'CD-1'])
+
+        results = self.autocomplete('ab-1', 'shop', 'stock', 'variant')
+
+        self.assertEqual(len(results), 2)
+        self.assertIn('AB-1', results[0])
+        self.assertIn('AB-100', results[1])
+
+    def test_mixed_case_sku_is_stored_and_found_in_uppercase(self):
+        variant, = self.create_variants(['ab-7x'])
+        self.create_variants(['AB-70'])
+
+        variant.refresh_from_db()
+        results = self.autocomplete('Ab-7', 'shop', 'stock', 'variant')
+
+        self.assertEqual(variant.sku, 'AB-7X')
+        self.assertEqual(len(results), 2)
+        self.assertEqual(self.autocomplete('ab-7x', 'shop', 'stock', 'variant'), [str(variant)])
+
+    def test_local_phone_matches_stored_international_number(self):
+        from accounts.models import Customer
+
+        user = User.objects.create_user('awa', 'awa@test.ga')
+        Customer.objects.filter(user=user).update(phone='+24107123456')
+        other = User.objects.create_user('ines', 'ines@test.ga')
+        Customer.objects.filter(user=other).update(phone='07123499')
+
+        self.assertEqual(len(self.autocomplete('07 12 34 56', 'accounts', 'address', 'customer')), 1)
+        self.assertEqual(len(self.autocomplete('+241 07 12 34', 'accounts', 'address', 'customer')), 2)
+
+    def test_customer_found_by_formatted_phone(self):
+        from accounts.models import Customer
+
+        user = User.objects.create_user('awa', 'awa@test.ga')
+        Customer.objects.filter(user=user).update(phone='+24107123456')
+        User.objects.create_user('awa.bis', 'awa.bis@test.ga')
+
+        by_phone = self.autocomplete('07 12-34-56', 'accounts', 'address', 'customer')
+        by_email = self.autocomplete('AWA@test.ga', 'accounts', 'address', 'customer')
+
+        self.assertEqual(len(by_phone), 1)
+        self.assertEqual(by_email[0], str(Customer.objects.get(user=user)))
+
+    def test_change_forms_do_not_grow_with_related_tables(self):
+        from marketing.models import Promotion
+
+        addresses = self.create_addresses(3)
+        variants = self.create_variants(['SKU-0'])
+        create_orders(1)
+        order = Order.objects.get()
+        Order.objects.filter(pk=order.pk).update(shipping_address=addresses[0])
+        promotion = Promotion.objects.create(
+            name='Soldes',
+            discount_value=Decimal('10'),
+            valid_from=timezone.now(),
+            valid_until=timezone.now(),
+        )
+        urls = [
+            f'/admin/orders/order/{order.pk}/change/',
+            '/admin/payments/payment/add/',
+            f'/admin/marketing/promotion/{promotion.pk}/change/',
+            '/admin/shop/stock/add/',
+            f'/admin/accounts/address/{addresses[0].pk}/change/',
+            f'/admin/shop/productvariant/{variants[0].pk}/change/',
+        ]
+
+        def measure(url):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            return len(queries), len(response.content)
+
+        for url in urls:
+            self.client.get(url)
+        small = [measure(url) for url in urls]
+
+        self.create_addresses(50, start=3)
+        self.create_variants([f'SKU-{i}' for i in range(1, 51)])
+        create_orders(50)
+        large = [measure(url) for url in urls]
+
+        self.assertEqual(small, large)
+
+
+def increment_shared_counter(location, count):
+    """Processus enfant : incr() répétés avec son propre backend sur le même fichier"""
+    backend = SQLiteCache(location, {})
+    for _ in range(count):
+        backend.incr('counter')
+
+
+class SQLiteCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = f'{self.directory}/cache.sqlite3'
+        self.cache = self.make_cache()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def make_cache(self, **options):
+        return SQLiteCache(self.location, {'OPTIONS': options})
+
+    def test_values_are_shared_between_instances(self):
+        self.cache.set('product', {'name': 'Pagne', 'price': Decimal('15000')})
+        self.cache.set('count', 3)
+
+        other = self.make_cache()
+
+        self.assertEqual(other.get('product'), {'name': 'Pagne', 'price': Decimal('15000')})
+        self.assertEqual(other.get('count'), 3)
+        self.assertEqual(other.get_many(['product', 'count', 'absent']), {
+            'product': {'name': 'Pagne', 'price': Decimal('15000')},
+            'count': 3,
+        })
+        self.assertEqual(other.get('absent', 'défaut'), 'défaut')
+
+    def test_add_only_writes_missing_or_expired_keys(self):
+        self.assertTrue(self.cache.add('lock', 'a'))
+        self.assertFalse(self.cache.add('lock', 'b'))
+        self.assertEqual(self.cache.get('lock'), 'a')
+
+        self.cache.set('expired', 'old', 0.05)
+        time.sleep(0.1)
+        self.assertTrue(self.cache.add('expired', 'new'))
+        self.assertEqual(self.cache.get('expired'), 'new')
+
+    def test_expiry_and_touch(self):
+        self.cache.set('short', 1, 0.05)
+        self.cache.set('kept', 1, 0.05)
+        self.assertTrue(self.cache.touch('kept', None))
+        time.sleep(0.1)
+
+        self.assertFalse(self.cache.has_key('short'))
+        self.assertTrue(self.cache.has_key('kept'))
+        self.assertFalse(self.cache.touch('short'))
+
+    def test_incr_decr(self):
+        self.cache.set('views', 10)
+        self.cache.set('big', 2 ** 63 - 1)
+
+        self.assertEqual(self.cache.incr('views'), 11)
+        self.assertEqual(self.cache.decr('views', 5), 6)
+        self.assertEqual(self.cache.incr('big'), 2 ** 63)
+        self.assertEqual(self.cache.get('big'), 2 ** 63)
+        with self.assertRaises(ValueError):
+            self.cache.incr('absent')
+
+    def test_versions(self):
+        self.cache.set('menu', 'v1')
+        self.cache.set('menu', 'v2', version=2)
+
+        self.assertEqual(self.cache.get('menu'), 'v1')
+        self.assertEqual(self.cache.incr_version('menu'), 2)
+        self.assertIsNone(self.cache.get('menu'))
+        self.assertEqual(self.cache.get('menu', version=2), 'v1')
+        with self.assertRaises(ValueError):
+            self.cache.incr_version('absent')
+
+    def test_delete_and_clear(self):
+        self.cache.set_many({'a': 1, 'b': 2, 'c': 3})
+
+        self.assertTrue(self.cache.delete('a'))
+        self.assertFalse(self.cache.delete('a'))
+        self.cache.delete_many(['b'])
+        self.assertEqual(self.cache.get_many(['a', 'b', 'c']), {'c': 3})
+        self.cache.clear()
+        self.assertIsNone(self.cache.get('c'))
+
+    def test_cull_removes_soonest_expiring_entries(self):
+        cache = self.make_cache(MAX_ENTRIES=50, CULL_FREQUENCY=2)
+        cache.set('permanent', 1, None)
+        for index in range(199):
+            cache.set(f'key{index}', index, 300 + index)
+
+        count = cache._connection().execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0]
+        self.assertLessEqual(count, 100)
+        self.assertEqual(cache.get('permanent'), 1)
+        self.assertEqual(cache.get('key198'), 198)
+        self.assertIsNone(cache.get('key0'))
+
+    def test_incr_is_atomic_across_processes(self):
+        self.cache.set('counter', 0)
+        context = get_context('fork')
+        workers = [
+            context.Process(target=increment_shared_counter, args=(self.location, 200))
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(self.cache.get('counter'), 800)
+
+
+class TokenBucketTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_refill_and_retry_after(self):
+        bucket = TokenBucket('ratelimit:test', capacity=2, refill_rate=0.5)
+        self.assertEqual([bucket.consume(now=100)[0] for _ in range(3)], [True, True, False])
+        self.assertEqual(bucket.consume(now=100), (False, 2.0))
+        self.assertTrue(bucket.consume(now=102)[0])
+
+    def test_non_positive_refill_rate_is_rejected(self):
+        for refill_rate in (0, -1):
+            with self.assertRaises(ValueError):
+                TokenBucket('ratelimit:test', capacity=5, refill_rate=refill_rate)
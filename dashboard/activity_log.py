@@ -0,0 +1,294 @@
+"""
+dashboard/activity_log.py - Écriture différée et archivage du journal admin
+===========================================================================
+
+AdminActivityLog.log_action() ne fait plus d'INSERT pendant la requête
+admin : l'entrée est déposée dans un tampon en mémoire (file thread-safe)
+et un thread démon l'écrit par lots (bulk_create) :
+- dès que ADMIN_ACTIVITY_LOG_BATCH_SIZE entrées sont en attente
+- au plus tard toutes les ADMIN_ACTIVITY_LOG_FLUSH_INTERVAL secondes
+- à l'arrêt du processus (atexit)
+Si l'écriture groupée échoue, les entrées sont écrites une par une ; celles
+qui échouent encore sont remises en file pour l'écriture suivante, et ne
+sont abandonnées (contenu journalisé en erreur) qu'après
+MAX_WRITE_ATTEMPTS tentatives.
+
+archive_activity_logs() déplace les entrées anciennes vers des fichiers
+JSON Lines compressés, un par mois, pour que la table reste petite.
+"""
+
+from datetime import datetime, timedelta
+from pathlib import Path
+import atexit
+import gzip
+import json
+import logging
+import os
+import queue
+import threading
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .models import AdminActivityLog
+
+logger = logging.getLogger(__name__)
+
+# Nombre d'entrées qui déclenche une écriture sans attendre l'intervalle
+DEFAULT_BATCH_SIZE = 100
+
+# Délai maximum (secondes) entre une action et son écriture
+DEFAULT_FLUSH_INTERVAL = 5
+
+# Au-delà, log_action() écrit lui-même le tampon (la mémoire reste bornée)
+DEFAULT_MAX_PENDING = 10000
+
+# Tentatives d'écriture d'une entrée avant abandon
+MAX_WRITE_ATTEMPTS = 3
+
+# Taille des lots lus, écrits puis supprimés par l'archivage
+ARCHIVE_CHUNK_SIZE = 2000
+
+
+# ============================================
+# TAMPON D'ÉCRITURE
+# ============================================
+
+class ActivityLogBuffer:
+    """
+    File d'entrées AdminActivityLog non enregistrées, écrite par lots
+
+    Le thread d'écriture est démarré à la première entrée, et redémarré
+    dans un processus enfant après un fork (workers gunicorn en --preload).
+    """
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 max_pending=DEFAULT_MAX_PENDING):
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._wakeup = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._pid = None
+
+    def add(self, entry: AdminActivityLog):
+        """Ajoute une entrée ; ne fait aucune requête sauf si le tampon est plein"""
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            logger.warning("Tampon du journal admin plein, écriture synchrone")
+            self.flush()
+            self._queue.put_nowait(entry)
+
+        self._ensure_worker()
+        if self._queue.qsize() >= self.batch_size:
+            self._wakeup.set()
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def flush(self) -> int:
+        """
+        Écrit toutes les entrées en attente
+
+        Returns:
+            int: Nombre d'entrées enregistrées
+        """
+        with self._flush_lock:
+            entries = []
+            while True:
+                try:
+                    entries.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            if not entries:
+                return 0
+
+            try:
+                AdminActivityLog.objects.bulk_create(entries)
+                return len(entries)
+            except Exception as e:
+                logger.warning(f"Écriture groupée du journal admin impossible, écriture ligne par ligne: {str(e)}")
+
+            # Une entrée invalide ne doit pas faire perdre les autres
+            written = 0
+            for entry in entries:
+                try:
+                    with transaction.atomic():
+                        AdminActivityLog.objects.bulk_create([entry])
+                    written += 1
+                except Exception as e:
+                    self._retry_later(entry, e)
+            return written
+
+    def _retry_later(self, entry: AdminActivityLog, error: Exception):
+        """Remet une entrée non écrite en file, ou l'abandonne en journalisant son contenu"""
+        entry._write_attempts = getattr(entry, '_write_attempts', 0) + 1
+        if entry._write_attempts < MAX_WRITE_ATTEMPTS:
+            try:
+                self._queue.put_nowait(entry)
+                return
+            except queue.Full:
+                pass
+        logger.error(
+            f"Entrée du journal admin perdue après {entry._write_attempts} tentative(s) "
+            f"({str(error)}): {describe_entry(entry)}"
+        )
+
+    def _ensure_worker(self):
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            _start_flush_worker(self)
+            atexit.register(self._flush_at_exit)
+
+    def run(self):
+        """Boucle du thread d'écriture"""
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            finally:
+                # Le thread ne sert pas de requête : pas de connexion gardée ouverte
+                connections.close_all()
+
+    def _flush_at_exit(self):
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Écriture du journal admin à l'arrêt impossible: {str(e)}")
+        # Entrées remises en file après un échec : dernière trace avant l'arrêt
+        while True:
+            try:
+                entry = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            logger.error(f"Entrée du journal admin non écrite à l'arrêt: {describe_entry(entry)}")
+
+
+def describe_entry(entry: AdminActivityLog) -> str:
+    """Contenu d'une entrée non enregistrée, pour les logs"""
+    return json.dumps({
+        'user_id': entry.user_id,
+        'action_date': entry.action_date,
+        'action_type': entry.action_type,
+        'action_description': entry.action_description,
+        'object_type': entry.object_type,
+        'object_id': entry.object_id,
+        'ip_address': entry.ip_address,
+        'data_before': entry.data_before,
+        'data_after': entry.data_after,
+    }, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+
+def _start_flush_worker(buffer: ActivityLogBuffer):
+    """Lance la boucle d'écriture dans un thread démon"""
+    thread = threading.Thread(
+        target=buffer.run,
+        name='admin-activity-log-writer',
+        daemon=True
+    )
+    thread.start()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_activity_log_buffer() -> ActivityLogBuffer:
+    """Tampon partagé par le processus, configuré depuis les settings"""
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = ActivityLogBuffer(
+                    batch_size=getattr(settings, 'ADMIN_ACTIVITY_LOG_BATCH_SIZE', DEFAULT_BATCH_SIZE),
+                    flush_interval=getattr(settings, 'ADMIN_ACTIVITY_LOG_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL),
+                )
+    return _buffer
+
+
+def flush_activity_logs() -> int:
+    """Écrit immédiatement les entrées en attente du processus courant"""
+    return get_activity_log_buffer().flush()
+
+
+# ============================================
+# RÉTENTION ET ARCHIVAGE
+# ============================================
+
+def get_archive_path(output_dir, month: datetime) -> Path:
+    return Path(output_dir) / f"admin_activity_{month.strftime('%Y-%m')}.jsonl.gz"
+
+
+def archive_activity_logs(before: datetime, output_dir, chunk_size: int = ARCHIVE_CHUNK_SIZE,
+                          dry_run: bool = False) -> dict:
+    """
+    Archive puis supprime les entrées antérieures à before
+
+    Les entrées sont lues par lots (ordre des ids), ajoutées au fichier du
+    mois de leur action_date, puis supprimées par id. Chaque exécution ajoute
+    un membre gzip au fichier : les archives d'un mois restent lisibles avec
+    gzip.open() ou zcat. Un arrêt entre l'écriture et la suppression d'un lot
+    peut le dupliquer dans l'archive (dédoublonnable sur « id »), jamais le perdre.
+    Le filtre porte sur action_date seule : un partitionnement mensuel de la
+    table sur cette colonne permettrait de remplacer la suppression par un
+    DETACH PARTITION sans changer le format des archives.
+
+    Returns:
+        dict: {'archived': n, 'files': [chemins]}
+    """
+    output_dir = Path(output_dir)
+    queryset = AdminActivityLog.objects.filter(action_date__lt=before).order_by('pk')
+    stats = {'archived': 0, 'files': []}
+
+    if dry_run:
+        stats['archived'] = queryset.count()
+        return stats
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    files = {}
+    last_pk = 0
+    try:
+        while True:
+            rows = list(queryset.filter(pk__gt=last_pk).values()[:chunk_size])
+            if not rows:
+                break
+
+            for row in rows:
+                month = timezone.localtime(row['action_date']).replace(day=1)
+                path = get_archive_path(output_dir, month)
+                if path not in files:
+                    files[path] = gzip.open(path, 'at', encoding='utf-8')
+                    stats['files'].append(str(path))
+                files[path].write(json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n')
+
+            # Les lignes doivent être sur disque avant d'être supprimées
+            for archive in files.values():
+                archive.flush()
+                os.fsync(archive.fileno())
+
+            # Intervalle d'ids plutôt qu'une liste : requête de taille fixe
+            chunk_end = rows[-1]['id']
+            queryset.filter(pk__gt=last_pk, pk__lte=chunk_end).delete()
+            stats['archived'] += len(rows)
+            last_pk = chunk_end
+    finally:
+        for archive in files.values():
+            archive.close()
+
+    return stats
+
+
+def get_retention_cutoff(days: int = None) -> datetime:
+    days = days if days is not None else getattr(settings, 'ADMIN_ACTIVITY_LOG_RETENTION_DAYS', 180)
+    return timezone.now() - timedelta(days=days)
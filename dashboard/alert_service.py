@@ -0,0 +1,429 @@
+"""
+dashboard/alert_service.py - Moteur de Règles des Alertes du Dashboard
+=======================================================================
+
+Les règles sont déclaratives (get_alert_rules) : chacune associe un type
+d'alerte, une sévérité et un seuil à un évaluateur qui exécute UNE requête
+groupée et retourne les conditions déclenchées.
+
+evaluate_alerts() (lancé par `manage.py evaluate_alerts`) :
+- évalue toutes les règles en un nombre fixe de requêtes
+- crée les nouvelles alertes en un seul bulk_create
+- met à jour les alertes déjà ouvertes (dédoublonnage par empreinte)
+- résout automatiquement celles dont la condition a disparu
+
+Le tableau de bord se contente ensuite de lire les alertes ouvertes.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q, F
+from django.urls import reverse
+from django.utils import timezone
+
+from orders.models import Order
+from shop.models import Stock
+from payments.models import Payment
+from payments.providers import PROVIDER_SETTINGS
+from payments.services import PENDING_PAYMENT_STATUSES
+from marketing.models import Coupon
+from .models import DashboardAlert
+
+logger = logging.getLogger(__name__)
+
+# Seuils par défaut, surchargeables via settings.DASHBOARD_ALERT_THRESHOLDS
+DEFAULT_ALERT_THRESHOLDS = {
+    'orders_pending': 10,       # Nombre de commandes en attente
+    'payment_failed': 20,       # Taux d'échec des paiements (%) sur la fenêtre
+    'payment_stale': 60,        # Minutes sans issue d'un paiement mobile
+    'coupon_exhausted': 90,     # Pourcentage de la limite d'utilisation atteint
+}
+
+# Fenêtre d'observation et échantillon minimum pour le taux d'échec
+PAYMENT_FAILURE_WINDOW = timedelta(hours=24)
+PAYMENT_FAILURE_MIN_SAMPLE = 5
+
+SEVERITY_ORDER = {'danger': 0, 'warning': 1, 'info': 2}
+
+
+# ============================================
+# CLASSES DE DONNÉES
+# ============================================
+
+@dataclass(frozen=True)
+class AlertRule:
+    """Définition déclarative d'une règle d'alerte"""
+    alert_type: str
+    severity: str
+    threshold: Optional[int] = None
+
+
+@dataclass
+class AlertCandidate:
+    """Condition déclenchée par une règle lors d'une évaluation"""
+    fingerprint: str
+    alert_type: str
+    severity: str
+    title: str
+    message: str
+    url: str = ''
+    threshold_value: Optional[int] = None
+
+
+# ============================================
+# ÉVALUATEURS (1 requête chacun)
+# ============================================
+
+def _evaluate_orders_pending(rule: AlertRule, now: datetime) -> List[AlertCandidate]:
+    """Trop de commandes en attente de traitement"""
+    pending = Order.objects.filter(status__in=['pending', 'processing']).count()
+    if pending <= rule.threshold:
+        return []
+
+    return [AlertCandidate(
+        fingerprint='orders_pending',
+        alert_type=rule.alert_type,
+        severity=rule.severity,
+        title='Commandes en attente',
+        message=f'{pending} commande(s) en attente de traitement (seuil : {rule.threshold})',
+        url='/admin/orders/order/?status__in=pending,processing',
+        threshold_value=rule.threshold,
+    )]
+
+
+def _stock_queryset():
+    """Stocks des variantes actives, annotés de la quantité disponible"""
+    return Stock.objects.filter(
+        variant__is_active=True,
+        variant__product__is_active=True
+    ).annotate(
+        available=F('quantity') - F('reserved_quantity')
+    ).values(
+        'variant_id',
+        'variant__sku',
+        'variant__product_id',
+        'variant__product__name',
+        'available',
+        'low_stock_threshold',
+    )
+
+
+def _stock_candidate(rule: AlertRule, row: Dict, title: str, message: str) -> AlertCandidate:
+    return AlertCandidate(
+        fingerprint=f"{rule.alert_type}:variant:{row['variant_id']}",
+        alert_type=rule.alert_type,
+        severity=rule.severity,
+        title=title,
+        message=message,
+        url=reverse('admin:shop_product_change', args=[row['variant__product_id']]),
+        threshold_value=row['low_stock_threshold'],
+    )
+
+
+def _evaluate_stock_out(rule: AlertRule, now: datetime) -> List[AlertCandidate]:
+    """Variantes en rupture de stock"""
+    return [
+        _stock_candidate(
+            rule, row,
+            title=f"Rupture : {row['variant__sku']}",
+            message=f"{row['variant__product__name']} ({row['variant__sku']}) est en rupture de stock",
+        )
+        for row in _stock_queryset().filter(available__lte=0)
+    ]
+
+
+def _evaluate_stock_low(rule: AlertRule, now: datetime) -> List[AlertCandidate]:
+    """Variantes sous leur seuil de stock faible (Stock.low_stock_threshold)"""
+    return [
+        _stock_candidate(
+            rule, row,
+            title=f"Stock faible : {row['variant__sku']}",
+            message=(
+                f"{row['variant__product__name']} ({row['variant__sku']}) : "
+                f"{row['available']} disponible(s), seuil {row['low_stock_threshold']}"
+            ),
+        )
+        for row in _stock_queryset().filter(
+            available__gt=0,
+            available__lte=F('low_stock_threshold')
+        )
+    ]
+
+
+def _evaluate_payment_failed(rule: AlertRule, now: datetime) -> List[AlertCandidate]:
+    """Taux d'échec des paiements sur la fenêtre d'observation"""
+    stats = Payment.objects.filter(
+        created_at__gte=now - PAYMENT_FAILURE_WINDOW
+    ).aggregate(
+        total=Count('id'),
+        failed=Count('id', filter=Q(status='failed')),
+    )
+    if stats['total'] < PAYMENT_FAILURE_MIN_SAMPLE:
+        return []
+
+    rate = round(stats['failed'] * 100 / stats['total'], 1)
+    if rate < rule.threshold:
+        return []
+
+    return [AlertCandidate(
+        fingerprint='payment_failed',
+        alert_type=rule.alert_type,
+        severity=rule.severity,
+        title='Taux d\'échec des paiements élevé',
+        message=(
+            f"{stats['failed']} paiement(s) échoué(s) sur {stats['total']} "
+            f"en 24h ({rate}%, seuil : {rule.threshold}%)"
+        ),
+        url='/admin/payments/payment/?status=failed',
+        threshold_value=rule.threshold,
+    )]
+
+
+def _evaluate_payment_stale(rule: AlertRule, now: datetime) -> List[AlertCandidate]:
+    """Paiements mobiles toujours en attente (notification perdue, vérification en échec)"""
+    stale = Payment.objects.filter(
+        status__in=PENDING_PAYMENT_STATUSES,
+        created_at__lt=now - timedelta(minutes=rule.threshold),
+        payment_method__slug__in=list(PROVIDER_SETTINGS),
+    ).count()
+    if not stale:
+        return []
+
+    return [AlertCandidate(
+        fingerprint='payment_stale',
+        alert_type=rule.alert_type,
+        severity=rule.severity,
+        title='Paiements mobiles non confirmés',
+        message=(
+            f"{stale} paiement(s) Aitel / Moov en attente depuis plus de {rule.threshold} min "
+            f"(vérification : manage.py poll_pending_payments)"
+        ),
+        url='/admin/payments/payment/?status__in=pending,processing',
+        threshold_value=rule.threshold,
+    )]
+
+
+def _evaluate_coupon_exhausted(rule: AlertRule, now: datetime) -> List[AlertCandidate]:
+    """Coupons actifs ayant consommé l'essentiel de leur limite d'utilisation"""
+    coupons = Coupon.objects.alias(
+        used_percent=F('times_used') * 100
+    ).filter(
+        is_active=True,
+        valid_until__gte=now,
+        usage_limit__isnull=False,
+        used_percent__gte=F('usage_limit') * rule.threshold,
+    ).values('id', 'code', 'times_used', 'usage_limit')
+
+    return [
+        AlertCandidate(
+            fingerprint=f"coupon_exhausted:coupon:{coupon['id']}",
+            alert_type=rule.alert_type,
+            severity='danger' if coupon['times_used'] >= coupon['usage_limit'] else rule.severity,
+            title=f"Coupon {coupon['code']} bientôt épuisé",
+            message=(
+                f"Le coupon {coupon['code']} a été utilisé "
+                f"{coupon['times_used']}/{coupon['usage_limit']} fois"
+            ),
+            url=reverse('admin:marketing_coupon_change', args=[coupon['id']]),
+            threshold_value=rule.threshold,
+        )
+        for coupon in coupons
+    ]
+
+
+RULE_EVALUATORS: Dict[str, Callable[[AlertRule, datetime], List[AlertCandidate]]] = {
+    'orders_pending': _evaluate_orders_pending,
+    'stock_out': _evaluate_stock_out,
+    'stock_low': _evaluate_stock_low,
+    'payment_failed': _evaluate_payment_failed,
+    'payment_stale': _evaluate_payment_stale,
+    'coupon_exhausted': _evaluate_coupon_exhausted,
+}
+
+
+# ============================================
+# RÈGLES
+# ============================================
+
+def get_alert_rules() -> List[AlertRule]:
+    """Règles actives avec les seuils de la configuration"""
+    thresholds = {
+        **DEFAULT_ALERT_THRESHOLDS,
+        **getattr(settings, 'DASHBOARD_ALERT_THRESHOLDS', {}),
+    }
+    return [
+        AlertRule('orders_pending', 'warning', thresholds['orders_pending']),
+        AlertRule('stock_out', 'danger'),
+        AlertRule('stock_low', 'warning'),
+        AlertRule('payment_failed', 'danger', thresholds['payment_failed']),
+        AlertRule('payment_stale', 'warning', thresholds['payment_stale']),
+        AlertRule('coupon_exhausted', 'warning', thresholds['coupon_exhausted']),
+    ]
+
+
+# ============================================
+# ÉVALUATION GROUPÉE
+# ============================================
+
+def evaluate_alerts(
+    alert_types: Optional[Iterable[str]] = None,
+    now: Optional[datetime] = None
+) -> Dict[str, int]:
+    """
+    Évalue les règles et synchronise la table DashboardAlert
+
+    Args:
+        alert_types: Limiter l'évaluation à ces types (toutes les règles par défaut)
+        now: Instant de référence
+
+    Returns:
+        Dict[str, int]: Nombre d'alertes créées, mises à jour et résolues
+    """
+    now = now or timezone.now()
+    rules = [
+        rule for rule in get_alert_rules()
+        if alert_types is None or rule.alert_type in alert_types
+    ]
+
+    candidates: Dict[str, AlertCandidate] = {}
+    for rule in rules:
+        for candidate in RULE_EVALUATORS[rule.alert_type](rule, now):
+            candidates[candidate.fingerprint] = candidate
+
+    evaluated_types = [rule.alert_type for rule in rules]
+
+    with transaction.atomic():
+        open_alerts = {
+            alert.fingerprint: alert
+            for alert in DashboardAlert.objects.select_for_update().filter(
+                is_resolved=False,
+                alert_type__in=evaluated_types
+            ).exclude(fingerprint='')
+        }
+
+        # Nouvelles conditions : un seul INSERT
+        new_alerts = [
+            DashboardAlert(
+                fingerprint=candidate.fingerprint,
+                alert_type=candidate.alert_type,
+                severity=candidate.severity,
+                title=candidate.title,
+                message=candidate.message,
+                url=candidate.url,
+                threshold_value=candidate.threshold_value,
+                last_checked=now,
+            )
+            for fingerprint, candidate in candidates.items()
+            if fingerprint not in open_alerts
+        ]
+        # Une évaluation concurrente a pu créer la même alerte entre-temps :
+        # la contrainte uniq_open_alert_fingerprint écarte le doublon
+        DashboardAlert.objects.bulk_create(new_alerts, batch_size=500, ignore_conflicts=True)
+        # Lignes réellement insérées : celles de cette évaluation (last_checked=now)
+        created = DashboardAlert.objects.filter(
+            is_resolved=False,
+            fingerprint__in=[alert.fingerprint for alert in new_alerts],
+            last_checked=now
+        ).count() if new_alerts else 0
+
+        # Conditions toujours vraies : mise à jour du message si nécessaire
+        changed = []
+        for fingerprint, alert in open_alerts.items():
+            candidate = candidates.get(fingerprint)
+            if candidate and (alert.message, alert.severity) != (candidate.message, candidate.severity):
+                alert.title = candidate.title
+                alert.message = candidate.message
+                alert.severity = candidate.severity
+                changed.append(alert)
+        DashboardAlert.objects.bulk_update(
+            changed, ['title', 'message', 'severity'], batch_size=500
+        )
+
+        # Conditions disparues : résolution automatique
+        gone = [alert.pk for fp, alert in open_alerts.items() if fp not in candidates]
+        resolved = DashboardAlert.objects.filter(pk__in=gone).update(
+            is_resolved=True,
+            resolved_at=now,
+            last_checked=now
+        )
+        DashboardAlert.objects.filter(
+            is_resolved=False,
+            alert_type__in=evaluated_types
+        ).exclude(fingerprint='').update(last_checked=now)
+
+    stats = {'created': created, 'updated': len(changed), 'resolved': resolved}
+    logger.info(
+        f"Alertes évaluées : {stats['created']} créée(s), "
+        f"{stats['updated']} mise(s) à jour, {stats['resolved']} résolue(s)"
+    )
+    return stats
+
+
+# ============================================
+# LECTURE POUR LE TABLEAU DE BORD
+# ============================================
+
+ALERT_ICONS = {
+    'stock_low': 'fas fa-exclamation-triangle',
+    'stock_out': 'fas fa-box-open',
+    'orders_pending': 'fas fa-clock',
+    'revenue_drop': 'fas fa-chart-line',
+    'customer_inactive': 'fas fa-user-clock',
+    'payment_failed': 'fas fa-credit-card',
+    'payment_stale': 'fas fa-hourglass-half',
+    'coupon_exhausted': 'fas fa-ticket-alt',
+    'custom': 'fas fa-bell',
+}
+
+# Libellé résumé quand plusieurs alertes du même type sont ouvertes
+ALERT_SUMMARIES = {
+    'stock_low': ('{count} variante(s) avec stock faible', '/admin/shop/product/'),
+    'stock_out': ('{count} variante(s) en rupture de stock', '/admin/shop/product/'),
+    'coupon_exhausted': ('{count} coupon(s) bientôt épuisé(s)', '/admin/marketing/coupon/'),
+}
+
+
+def get_open_alerts_for_display(limit: int = 200) -> List[Dict]:
+    """
+    Alertes ouvertes, regroupées par type, au format du template du dashboard
+
+    Une seule requête : aucune condition n'est recalculée ici.
+    """
+    alerts = DashboardAlert.objects.filter(
+        is_active=True,
+        is_resolved=False
+    ).only('alert_type', 'severity', 'message', 'url').order_by('-triggered_at')[:limit]
+
+    grouped: Dict[str, List[DashboardAlert]] = {}
+    for alert in alerts:
+        grouped.setdefault(alert.alert_type, []).append(alert)
+
+    display = []
+    for alert_type, items in grouped.items():
+        severity = min((item.severity for item in items), key=lambda s: SEVERITY_ORDER.get(s, 3))
+        if len(items) > 1 and alert_type in ALERT_SUMMARIES:
+            message, url = ALERT_SUMMARIES[alert_type]
+            display.append({
+                'type': severity,
+                'icon': ALERT_ICONS.get(alert_type, 'fas fa-bell'),
+                'message': message.format(count=len(items)),
+                'url': url,
+                'priority': SEVERITY_ORDER.get(severity, 3),
+            })
+            continue
+
+        for item in items:
+            display.append({
+                'type': item.severity,
+                'icon': ALERT_ICONS.get(alert_type, 'fas fa-bell'),
+                'message': item.message,
+                'url': item.url or '#',
+                'priority': SEVERITY_ORDER.get(item.severity, 3),
+            })
+
+    return display
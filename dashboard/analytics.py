@@ -0,0 +1,395 @@
+"""
+dashboard/analytics.py - Analyses clients RFM et cohortes (NumPy)
+=================================================================
+
+Calcul en lot, hors requête web, lancé par `manage.py compute_customer_analytics` :
+
+1. Les commandes payées sont lues par tranches (values_list + iterator)
+   et chargées dans des tableaux NumPy (client, date, montant).
+2. Récence / fréquence / montant, scores par quintile, segments, cohortes
+   mensuelles d'acquisition et matrice de rétention sont calculés de façon
+   vectorisée (np.unique, bincount, ufunc.at), sans boucle Python par client.
+3. Les résultats remplacent les tables de synthèse CustomerRFMScore et
+   CustomerCohort, lues par le tableau de bord en deux petites requêtes.
+"""
+
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from itertools import islice
+from typing import Dict, List
+import logging
+import time
+
+import numpy as np
+
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from orders.models import Order
+
+from .models import CustomerCohort, CustomerRFMScore
+
+logger = logging.getLogger(__name__)
+
+# Lignes lues par aller-retour avec la base
+ANALYTICS_CHUNK_SIZE = 50000
+
+# Lignes insérées par INSERT dans les tables de synthèse
+SUMMARY_BATCH_SIZE = 2000
+
+# Bornes des quintiles utilisées pour les scores 1 à 5
+QUINTILES = [0.2, 0.4, 0.6, 0.8]
+
+# Cohortes et périodes affichées sur le tableau de bord
+DASHBOARD_COHORTS = 6
+DASHBOARD_PERIODS = 6
+
+SECONDS_PER_DAY = 86400
+
+
+# ============================================
+# CHARGEMENT DES COMMANDES
+# ============================================
+
+@dataclass
+class OrderArrays:
+    """Commandes payées en colonnes (une position = une commande)"""
+    customer_ids: np.ndarray  # int64
+    created_at: np.ndarray    # datetime64[s], heure locale
+    totals: np.ndarray        # float64, FCFA
+
+    def __len__(self):
+        return len(self.customer_ids)
+
+
+def load_paid_orders(chunk_size: int = ANALYTICS_CHUNK_SIZE) -> OrderArrays:
+    """
+    Charge les commandes payées dans des tableaux NumPy, par tranches
+
+    Seules les trois colonnes utiles sont lues (pas d'instances de modèle) ;
+    les dates sont converties en heure locale pour que les cohortes suivent
+    les mois du calendrier de la boutique.
+    """
+    rows = Order.objects.filter(is_paid=True).order_by().values_list(
+        'customer_id', 'created_at', 'total'
+    ).iterator(chunk_size=chunk_size)
+
+    customers, dates, totals = [], [], []
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        customer_ids, created_at, amounts = zip(*chunk)
+        customers.append(np.array(customer_ids, dtype=np.int64))
+        dates.append(np.array(
+            [timezone.localtime(value).replace(tzinfo=None) for value in created_at],
+            dtype='datetime64[s]'
+        ))
+        totals.append(np.array(amounts, dtype=np.float64))
+
+    if not customers:
+        return OrderArrays(
+            np.empty(0, dtype=np.int64), np.empty(0, dtype='datetime64[s]'), np.empty(0)
+        )
+    return OrderArrays(np.concatenate(customers), np.concatenate(dates), np.concatenate(totals))
+
+
+# ============================================
+# RFM
+# ============================================
+
+@dataclass
+class RFMResult:
+    """Une position = un client"""
+    customer_ids: np.ndarray
+    recency_days: np.ndarray
+    frequency: np.ndarray
+    monetary: np.ndarray
+    last_order_at: np.ndarray
+    recency_score: np.ndarray
+    frequency_score: np.ndarray
+    monetary_score: np.ndarray
+    segments: np.ndarray
+
+    def __len__(self):
+        return len(self.customer_ids)
+
+
+def quintile_scores(values: np.ndarray) -> np.ndarray:
+    """
+    Score de 1 à 5 selon le quintile de chaque valeur (plus grand = meilleur)
+
+    Les valeurs égales à une borne restent dans le quintile inférieur : si
+    la plupart des clients n'ont qu'une commande, ils obtiennent tous 1.
+    """
+    if not len(values):
+        return np.empty(0, dtype=np.int8)
+    edges = np.quantile(values, QUINTILES)
+    return (np.searchsorted(edges, values, side='left') + 1).astype(np.int8)
+
+
+def assign_segments(r: np.ndarray, f: np.ndarray) -> np.ndarray:
+    """Segment de chaque client d'après ses scores de récence et de fréquence"""
+    conditions = [
+        (r >= 4) & (f >= 4),
+        (r <= 2) & (f >= 3),
+        f >= 4,
+        (r >= 4) & (f <= 2),
+        r == 1,
+    ]
+    return np.select(conditions, ['champions', 'at_risk', 'loyal', 'new', 'lost'], default='regular')
+
+
+def compute_rfm(orders: OrderArrays, now: np.datetime64) -> RFMResult:
+    """
+    Récence, fréquence, montant et scores de chaque client
+
+    Args:
+        orders: Commandes payées
+        now: Date de référence de la récence (datetime64, heure locale)
+    """
+    customer_ids, inverse = np.unique(orders.customer_ids, return_inverse=True)
+    size = len(customer_ids)
+
+    frequency = np.bincount(inverse, minlength=size)
+    monetary = np.bincount(inverse, weights=orders.totals, minlength=size)
+
+    seconds = orders.created_at.astype(np.int64)
+    last_order = np.full(size, np.iinfo(np.int64).min)
+    np.maximum.at(last_order, inverse, seconds)
+    recency_days = np.maximum((now.astype('datetime64[s]').astype(np.int64) - last_order) // SECONDS_PER_DAY, 0)
+
+    recency_score = quintile_scores(-recency_days)
+    frequency_score = quintile_scores(frequency)
+    monetary_score = quintile_scores(monetary)
+
+    return RFMResult(
+        customer_ids=customer_ids,
+        recency_days=recency_days,
+        frequency=frequency,
+        monetary=monetary,
+        last_order_at=last_order.astype('datetime64[s]'),
+        recency_score=recency_score,
+        frequency_score=frequency_score,
+        monetary_score=monetary_score,
+        segments=assign_segments(recency_score, frequency_score),
+    )
+
+
+# ============================================
+# COHORTES
+# ============================================
+
+@dataclass
+class CohortResult:
+    """Une position = une case (cohorte, période) de la matrice de rétention"""
+    cohort_months: np.ndarray  # datetime64[M]
+    periods: np.ndarray
+    cohort_sizes: np.ndarray
+    active_customers: np.ndarray
+
+    @property
+    def retention_rates(self) -> np.ndarray:
+        return self.active_customers / self.cohort_sizes
+
+    def __len__(self):
+        return len(self.periods)
+
+
+def compute_cohorts(orders: OrderArrays) -> CohortResult:
+    """
+    Cohortes d'acquisition mensuelles et clients actifs à chaque mois suivant
+
+    Un client compte une fois par mois, quel que soit son nombre de commandes
+    ce mois-là ; la période 0 donne la taille de la cohorte.
+    """
+    if not len(orders):
+        empty = np.empty(0, dtype=np.int64)
+        return CohortResult(empty.astype('datetime64[M]'), empty, empty, empty)
+
+    _, inverse = np.unique(orders.customer_ids, return_inverse=True)
+    months = orders.created_at.astype('datetime64[M]').astype(np.int64)
+
+    first_month = np.full(inverse.max() + 1, np.iinfo(np.int64).max)
+    np.minimum.at(first_month, inverse, months)
+    periods = months - first_month[inverse]
+
+    # Couples (client, période) distincts, encodés sur un seul entier
+    width = periods.max() + 1
+    active = np.unique(inverse * width + periods)
+    active_cohorts = first_month[active // width]
+    active_periods = active % width
+
+    # Clients actifs par (cohorte, période)
+    base = active_cohorts.min()
+    cells, counts = np.unique((active_cohorts - base) * width + active_periods, return_counts=True)
+    cohort_index = cells // width
+    cell_periods = cells % width
+
+    # Taille de chaque cohorte = clients actifs en période 0
+    sizes = np.zeros(cohort_index.max() + 1, dtype=np.int64)
+    sizes[cohort_index[cell_periods == 0]] = counts[cell_periods == 0]
+
+    return CohortResult(
+        cohort_months=(cohort_index + base).astype('datetime64[M]'),
+        periods=cell_periods,
+        cohort_sizes=sizes[cohort_index],
+        active_customers=counts,
+    )
+
+
+# ============================================
+# TABLES DE SYNTHÈSE
+# ============================================
+
+def _to_aware(value: np.datetime64) -> datetime:
+    return timezone.make_aware(value.astype('datetime64[s]').astype(datetime))
+
+
+def save_customer_analytics(rfm: RFMResult, cohorts: CohortResult, computed_at: datetime = None) -> Dict:
+    """Remplace le contenu des tables de synthèse (une transaction)"""
+    computed_at = computed_at or timezone.now()
+
+    scores = (
+        CustomerRFMScore(
+            customer_id=int(customer_id),
+            recency_days=int(recency),
+            frequency=int(frequency),
+            monetary=Decimal(f'{monetary:.2f}'),
+            last_order_at=_to_aware(last_order),
+            recency_score=int(r),
+            frequency_score=int(f),
+            monetary_score=int(m),
+            segment=str(segment),
+            computed_at=computed_at,
+        )
+        for customer_id, recency, frequency, monetary, last_order, r, f, m, segment in zip(
+            rfm.customer_ids, rfm.recency_days, rfm.frequency, rfm.monetary, rfm.last_order_at,
+            rfm.recency_score, rfm.frequency_score, rfm.monetary_score, rfm.segments,
+        )
+    )
+    cells = [
+        CustomerCohort(
+            cohort_month=cohort_month.astype('datetime64[D]').astype(date),
+            period=int(period),
+            cohort_size=int(size),
+            active_customers=int(active),
+            retention_rate=float(rate),
+            computed_at=computed_at,
+        )
+        for cohort_month, period, size, active, rate in zip(
+            cohorts.cohort_months, cohorts.periods, cohorts.cohort_sizes,
+            cohorts.active_customers, cohorts.retention_rates,
+        )
+    ]
+
+    with transaction.atomic():
+        CustomerRFMScore.objects.all().delete()
+        CustomerCohort.objects.all().delete()
+        while True:
+            batch = list(islice(scores, SUMMARY_BATCH_SIZE))
+            if not batch:
+                break
+            CustomerRFMScore.objects.bulk_create(batch)
+        CustomerCohort.objects.bulk_create(cells, batch_size=SUMMARY_BATCH_SIZE)
+
+    return {'customers': len(rfm), 'cohort_cells': len(cells)}
+
+
+def refresh_customer_analytics(chunk_size: int = ANALYTICS_CHUNK_SIZE) -> Dict:
+    """
+    Recalcule RFM et cohortes et met à jour les tables de synthèse
+
+    Returns:
+        dict: orders, customers, cohort_cells et durée de chaque étape (secondes)
+    """
+    timings = {}
+
+    started = time.perf_counter()
+    orders = load_paid_orders(chunk_size=chunk_size)
+    timings['load'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    now = np.datetime64(timezone.localtime().replace(tzinfo=None), 's')
+    rfm = compute_rfm(orders, now)
+    cohorts = compute_cohorts(orders)
+    timings['compute'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    stats = save_customer_analytics(rfm, cohorts)
+    timings['save'] = time.perf_counter() - started
+
+    logger.info(
+        f"Analyses clients : {len(orders)} commandes, {stats['customers']} clients, "
+        f"{stats['cohort_cells']} cases de cohorte"
+    )
+    return {'orders': len(orders), **stats, 'timings': timings}
+
+
+# ============================================
+# AFFICHAGE ET BENCHMARK
+# ============================================
+
+def get_customer_analytics_context() -> Dict:
+    """
+    Répartition par segment et dernières cohortes pour le tableau de bord
+
+    Deux requêtes sur les tables de synthèse, quel que soit le volume de commandes.
+    """
+    labels = dict(CustomerRFMScore.SEGMENT_CHOICES)
+    segments = [
+        {'segment': row['segment'], 'label': labels.get(row['segment'], row['segment']), 'count': row['count']}
+        for row in CustomerRFMScore.objects.order_by().values('segment').annotate(count=Count('pk'))
+    ]
+    segments.sort(key=lambda row: -row['count'])
+
+    cells = CustomerCohort.objects.filter(period__lt=DASHBOARD_PERIODS).order_by('-cohort_month', 'period')
+    cohorts: List[Dict] = []
+    for cell in cells:
+        if not cohorts or cohorts[-1]['month'] != cell.cohort_month:
+            if len(cohorts) == DASHBOARD_COHORTS:
+                break
+            cohorts.append({'month': cell.cohort_month, 'size': cell.cohort_size, 'rates': [None] * DASHBOARD_PERIODS})
+        cohorts[-1]['rates'][cell.period] = round(cell.retention_rate * 100)
+
+    return {
+        'customer_segments': segments,
+        'customer_cohorts': cohorts,
+        'cohort_periods': range(DASHBOARD_PERIODS),
+    }
+
+
+def generate_synthetic_orders(count: int, customers: int = None, months: int = 24, seed: int = 0) -> OrderArrays:
+    """Commandes aléatoires pour mesurer les calculs sans base de données"""
+    rng = np.random.default_rng(seed)
+    customers = customers or max(1, count // 5)
+    start = np.datetime64('today', 's') - np.timedelta64(months * 30, 'D')
+    offsets = rng.integers(0, months * 30 * SECONDS_PER_DAY, size=count)
+    return OrderArrays(
+        customer_ids=rng.integers(1, customers + 1, size=count, dtype=np.int64),
+        created_at=start + offsets.astype('timedelta64[s]'),
+        totals=rng.gamma(2.0, 15000.0, size=count).round(),
+    )
+
+
+def benchmark_analytics(count: int) -> Dict:
+    """Durée des calculs vectorisés sur count commandes synthétiques"""
+    orders = generate_synthetic_orders(count)
+    now = np.datetime64('now', 's')
+
+    started = time.perf_counter()
+    rfm = compute_rfm(orders, now)
+    rfm_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    cohorts = compute_cohorts(orders)
+    cohort_seconds = time.perf_counter() - started
+
+    return {
+        'orders': count,
+        'customers': len(rfm),
+        'cohort_cells': len(cohorts),
+        'timings': {'rfm': rfm_seconds, 'cohorts': cohort_seconds},
+    }
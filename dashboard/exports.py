@@ -0,0 +1,409 @@
+"""
+dashboard/exports.py - Exports en flux des commandes, clients et paiements
+==========================================================================
+
+Les lignes sont lues par paquets (QuerySet.iterator(chunk_size=...)) et
+écrites au fur et à mesure dans le format demandé :
+- csv   : séparateur ';' et BOM UTF-8 pour l'ouverture directe dans Excel
+- jsonl : un objet JSON par ligne
+- xlsx  : classeur écrit en flux (zip sans retour arrière, chaînes inline)
+
+La mémoire utilisée reste constante quel que soit le volume exporté : ni
+le QuerySet complet ni le fichier ne sont construits en mémoire.
+Utilisé par :
+- dashboard.views.dashboard_export_data (StreamingHttpResponse)
+- la commande manage.py export_data
+"""
+
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Callable, Dict, Iterable, Iterator, Optional, Sequence, Tuple
+import csv
+import json
+import re
+import zipfile
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch, QuerySet
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from xml.sax.saxutils import escape
+
+from accounts.models import Customer
+from orders.models import Order, OrderItem
+from payments.models import Payment
+
+# Nombre de lignes lues par aller-retour avec la base
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'jsonl': ('application/x-ndjson; charset=utf-8', 'jsonl'),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+}
+
+
+class ExportError(ValueError):
+    """Paramètres d'export invalides"""
+    pass
+
+
+# ============================================
+# FILTRES
+# ============================================
+
+@dataclass(frozen=True)
+class ExportFilters:
+    """Filtres communs à tous les exports"""
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+    status: Optional[str] = None
+
+    def created_at_range(self) -> Dict[str, datetime]:
+        """Bornes sur created_at (date_to incluse), en heure locale"""
+        lookups = {}
+        if self.date_from:
+            lookups['created_at__gte'] = timezone.make_aware(
+                datetime.combine(self.date_from, time.min)
+            )
+        if self.date_to:
+            lookups['created_at__lt'] = timezone.make_aware(
+                datetime.combine(self.date_to + timedelta(days=1), time.min)
+            )
+        return lookups
+
+
+def parse_export_filters(params) -> ExportFilters:
+    """
+    Construit les filtres depuis request.GET ou les options d'une commande
+
+    Raises:
+        ExportError: Si une date est mal formée ou si la période est inversée
+    """
+    parsed = {}
+    for key in ('date_from', 'date_to'):
+        value = params.get(key) or None
+        if value is None:
+            continue
+        if isinstance(value, str):
+            try:
+                value = parse_date(value)
+            except ValueError:
+                value = None
+            if value is None:
+                raise ExportError(f"Date invalide pour {key} (format attendu : AAAA-MM-JJ)")
+        parsed[key] = value
+
+    if parsed.get('date_from') and parsed.get('date_to') and parsed['date_from'] > parsed['date_to']:
+        raise ExportError("date_from doit précéder date_to")
+
+    return ExportFilters(status=params.get('status') or None, **parsed)
+
+
+# ============================================
+# JEUX DE DONNÉES
+# ============================================
+
+@dataclass(frozen=True)
+class ExportDataset:
+    """Description d'un export : en-têtes, permission requise et lignes"""
+    name: str
+    permission: str
+    statuses: Tuple[str, ...]
+    header: Tuple[str, ...]
+    rows: Callable[[ExportFilters, int], Iterator[Sequence]]
+
+
+def _filtered(queryset: QuerySet, filters: ExportFilters, status_lookup: Optional[str]) -> QuerySet:
+    queryset = queryset.filter(**filters.created_at_range())
+    if filters.status and status_lookup:
+        queryset = queryset.filter(**{status_lookup: filters.status})
+    # Tri sur la clé primaire : stable et sans tri coûteux côté base
+    return queryset.order_by('pk')
+
+
+def _order_rows(filters: ExportFilters, chunk_size: int) -> Iterator[Sequence]:
+    """Une ligne par article ; les commandes sans article gardent une ligne"""
+    orders = _filtered(Order.objects.all(), filters, 'status').only(
+        'order_number', 'created_at', 'status', 'is_paid', 'paid_at',
+        'customer_email', 'customer_phone', 'delivery_type', 'coupon_code',
+        'subtotal', 'shipping_cost', 'discount_amount', 'tax_amount', 'total',
+    ).prefetch_related(
+        Prefetch('items', queryset=OrderItem.objects.only(
+            'order_id', 'product_name', 'variant_details', 'unit_price', 'quantity', 'subtotal'
+        ).order_by('pk'))
+    )
+
+    for order in orders.iterator(chunk_size=chunk_size):
+        base = (
+            order.order_number, order.created_at, order.status, order.is_paid, order.paid_at,
+            order.customer_email, order.customer_phone, order.delivery_type, order.coupon_code,
+            order.subtotal, order.shipping_cost, order.discount_amount, order.tax_amount, order.total,
+        )
+        items = order.items.all()
+        if not items:
+            yield base + (None, None, None, None, None)
+        for item in items:
+            yield base + (
+                item.product_name, item.variant_details, item.unit_price, item.quantity, item.subtotal,
+            )
+
+
+def _customer_rows(filters: ExportFilters, chunk_size: int) -> Iterator[Sequence]:
+    customers = _filtered(Customer.objects.select_related('user'), filters, None)
+    if filters.status:
+        customers = customers.filter(is_blocked=(filters.status == 'blocked'))
+
+    for customer in customers.iterator(chunk_size=chunk_size):
+        user = customer.user
+        yield (
+            customer.pk, user.username, user.email, user.first_name, user.last_name,
+            customer.phone, customer.total_orders, customer.paid_orders, customer.total_spent,
+            customer.average_order_value, customer.last_order_at, customer.is_blocked, customer.created_at,
+        )
+
+
+def _payment_rows(filters: ExportFilters, chunk_size: int) -> Iterator[Sequence]:
+    payments = _filtered(
+        Payment.objects.select_related('order', 'payment_method'), filters, 'status'
+    ).only(
+        'transaction_id', 'order__order_number', 'payment_method__name', 'amount',
+        'fee_amount', 'total_amount', 'status', 'provider_transaction_id',
+        'created_at', 'completed_at',
+    )
+
+    for payment in payments.iterator(chunk_size=chunk_size):
+        yield (
+            payment.transaction_id,
+            payment.order.order_number,
+            payment.payment_method.name if payment.payment_method else '',
+            payment.amount, payment.fee_amount, payment.total_amount, payment.status,
+            payment.provider_transaction_id, payment.created_at, payment.completed_at,
+        )
+
+
+EXPORT_DATASETS: Dict[str, ExportDataset] = {
+    'orders': ExportDataset(
+        name='orders',
+        permission='orders.view_order',
+        statuses=tuple(code for code, _ in Order.STATUS_CHOICES),
+        header=(
+            'order_number', 'created_at', 'status', 'is_paid', 'paid_at',
+            'customer_email', 'customer_phone', 'delivery_type', 'coupon_code',
+            'subtotal', 'shipping_cost', 'discount_amount', 'tax_amount', 'total',
+            'item_product', 'item_variant', 'item_unit_price', 'item_quantity', 'item_subtotal',
+        ),
+        rows=_order_rows,
+    ),
+    'customers': ExportDataset(
+        name='customers',
+        permission='accounts.view_customer',
+        statuses=('active', 'blocked'),
+        header=(
+            'id', 'username', 'email', 'first_name', 'last_name', 'phone',
+            'total_orders', 'paid_orders', 'total_spent', 'average_order_value', 'last_order_at',
+            'is_blocked', 'created_at',
+        ),
+        rows=_customer_rows,
+    ),
+    'payments': ExportDataset(
+        name='payments',
+        permission='payments.view_payment',
+        statuses=tuple(code for code, _ in Payment.STATUS_CHOICES),
+        header=(
+            'transaction_id', 'order_number', 'payment_method', 'amount', 'fee_amount',
+            'total_amount', 'status', 'provider_transaction_id', 'created_at', 'completed_at',
+        ),
+        rows=_payment_rows,
+    ),
+}
+
+
+def get_export_dataset(name: str, filters: ExportFilters) -> ExportDataset:
+    """
+    Raises:
+        ExportError: Jeu de données ou statut inconnu
+    """
+    dataset = EXPORT_DATASETS.get(name)
+    if dataset is None:
+        raise ExportError(f"Export inconnu : {name} (choix : {', '.join(EXPORT_DATASETS)})")
+    if filters.status and filters.status not in dataset.statuses:
+        raise ExportError(f"Statut inconnu pour {name} : {filters.status}")
+    return dataset
+
+
+# ============================================
+# FORMATS
+# ============================================
+
+def _format_value(value):
+    """Représentation texte d'une cellule (CSV / XLSX)"""
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'oui' if value else 'non'
+    if isinstance(value, datetime):
+        return timezone.localtime(value).strftime('%Y-%m-%d %H:%M:%S')
+    return str(value)
+
+
+class _Echo:
+    """Pseudo-fichier : write() renvoie la ligne au lieu de la stocker"""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(header: Sequence[str], rows: Iterable[Sequence]) -> Iterator[str]:
+    writer = csv.writer(_Echo(), delimiter=';')
+    yield '\ufeff' + writer.writerow(header)
+    for row in rows:
+        yield writer.writerow([_format_value(value) for value in row])
+
+
+def iter_jsonl(header: Sequence[str], rows: Iterable[Sequence]) -> Iterator[str]:
+    for row in rows:
+        yield json.dumps(dict(zip(header, row)), cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+# ----- XLSX -----
+
+_XLSX_STATIC_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+_XLSX_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+
+# Caractères de contrôle interdits en XML 1.0
+_XML_ILLEGAL_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+class _ChunkBuffer:
+    """
+    Flux d'écriture non positionnable pour zipfile
+
+    Sans seek(), zipfile écrit des descripteurs de données après chaque
+    fichier : rien n'a besoin d'être réécrit, les octets peuvent partir
+    immédiatement vers le client.
+    """
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _xlsx_cell(value) -> str:
+    if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+        return f'<c><v>{value}</v></c>'
+    text = _XML_ILLEGAL_CHARS.sub('', _format_value(value))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(text)}</t></is></c>'
+
+
+def _xlsx_row(values: Sequence) -> str:
+    return '<row>' + ''.join(_xlsx_cell(value) for value in values) + '</row>'
+
+
+def iter_xlsx(header: Sequence[str], rows: Iterable[Sequence],
+              sheet_name: str = 'Export', rows_per_flush: int = 500) -> Iterator[bytes]:
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, mode='w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in _XLSX_STATIC_PARTS.items():
+            archive.writestr(name, content)
+        archive.writestr('xl/workbook.xml', _XLSX_WORKBOOK.format(name=escape(sheet_name[:31])))
+
+        with archive.open('xl/worksheets/sheet1.xml', mode='w', force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                b'<sheetData>'
+            )
+            sheet.write(_xlsx_row(header).encode('utf-8'))
+            pending = []
+            for row in rows:
+                pending.append(_xlsx_row(row))
+                if len(pending) >= rows_per_flush:
+                    sheet.write(''.join(pending).encode('utf-8'))
+                    pending = []
+                    yield buffer.drain()
+            sheet.write(''.join(pending).encode('utf-8'))
+            sheet.write(b'</sheetData></worksheet>')
+        yield buffer.drain()
+    yield buffer.drain()
+
+
+EXPORT_WRITERS = {
+    'csv': iter_csv,
+    'jsonl': iter_jsonl,
+    'xlsx': iter_xlsx,
+}
+
+
+def stream_export(dataset: ExportDataset, export_format: str, filters: ExportFilters,
+                  chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator:
+    """
+    Générateur du fichier exporté (str pour csv/jsonl, bytes pour xlsx)
+
+    Raises:
+        ExportError: Format inconnu
+    """
+    writer = EXPORT_WRITERS.get(export_format)
+    if writer is None:
+        raise ExportError(f"Format non supporté : {export_format} (choix : {', '.join(EXPORT_WRITERS)})")
+    return writer(dataset.header, dataset.rows(filters, chunk_size))
+
+
+def get_export_filename(dataset: ExportDataset, export_format: str, filters: ExportFilters) -> str:
+    parts = [dataset.name]
+    if filters.date_from:
+        parts.append(filters.date_from.isoformat())
+    if filters.date_to:
+        parts.append(filters.date_to.isoformat())
+    if filters.status:
+        parts.append(filters.status)
+    if len(parts) == 1:
+        parts.append(timezone.localdate().isoformat())
+    return f"{'_'.join(parts)}.{EXPORT_FORMATS[export_format][1]}"
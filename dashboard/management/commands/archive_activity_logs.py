@@ -0,0 +1,70 @@
+"""
+Commande : archive_activity_logs
+================================
+
+Déplace les entrées du journal admin plus anciennes que la rétention
+(ADMIN_ACTIVITY_LOG_RETENTION_DAYS) vers des fichiers JSON Lines compressés,
+un par mois : logs/archives/admin_activity_AAAA-MM.jsonl.gz
+
+Usage (cron, chaque nuit) :
+    30 3 * * * python manage.py archive_activity_logs
+
+Relire une archive :
+    zcat logs/archives/admin_activity_2026-01.jsonl.gz | head
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from dashboard.activity_log import (
+    ARCHIVE_CHUNK_SIZE,
+    archive_activity_logs,
+    get_retention_cutoff,
+)
+
+
+class Command(BaseCommand):
+    help = "Archive en JSON Lines compressé puis supprime les anciennes entrées du journal admin"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=None,
+            help='Rétention en jours (défaut : ADMIN_ACTIVITY_LOG_RETENTION_DAYS)'
+        )
+        parser.add_argument(
+            '--output-dir',
+            default=str(settings.LOGS_DIR / 'archives'),
+            help='Dossier des archives (défaut : logs/archives)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=ARCHIVE_CHUNK_SIZE,
+            help=f'Entrées archivées par lot (défaut : {ARCHIVE_CHUNK_SIZE})'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Compter les entrées concernées sans rien écrire ni supprimer'
+        )
+
+    def handle(self, *args, **options):
+        cutoff = get_retention_cutoff(options['days'])
+        stats = archive_activity_logs(
+            before=cutoff,
+            output_dir=options['output_dir'],
+            chunk_size=max(1, options['chunk_size']),
+            dry_run=options['dry_run'],
+        )
+
+        if options['dry_run']:
+            self.stdout.write(f"{stats['archived']} entrée(s) antérieure(s) au {cutoff:%d/%m/%Y} à archiver")
+            return
+
+        for path in stats['files']:
+            self.stdout.write(f'  {path}')
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['archived']} entrée(s) archivée(s) dans {len(stats['files'])} fichier(s)"
+        ))
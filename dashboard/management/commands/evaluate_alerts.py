@@ -0,0 +1,34 @@
+"""
+Commande : evaluate_alerts
+==========================
+
+Évalue les règles d'alerte du dashboard en quelques requêtes groupées,
+crée/dédoublonne les DashboardAlert et résout celles qui ne sont plus vraies.
+
+Usage (cron, toutes les 5 minutes) :
+    */5 * * * * python manage.py evaluate_alerts
+"""
+
+from django.core.management.base import BaseCommand
+
+from dashboard.alert_service import evaluate_alerts, RULE_EVALUATORS
+
+
+class Command(BaseCommand):
+    help = "Évalue les règles d'alerte du dashboard et synchronise les DashboardAlert"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--type',
+            action='append',
+            dest='alert_types',
+            choices=sorted(RULE_EVALUATORS),
+            help='Limiter l\'évaluation à ce type d\'alerte (répétable)'
+        )
+
+    def handle(self, *args, **options):
+        stats = evaluate_alerts(alert_types=options['alert_types'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['created']} alerte(s) créée(s), {stats['updated']} mise(s) à jour, "
+            f"{stats['resolved']} résolue(s)"
+        ))
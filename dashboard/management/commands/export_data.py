@@ -0,0 +1,80 @@
+"""
+Commande : export_data
+======================
+
+Exporte en flux les commandes (avec articles), les clients ou les paiements
+en CSV, JSON Lines ou XLSX, à mémoire constante.
+
+Usage :
+    python manage.py export_data orders --format xlsx --from 2025-01-01 --to 2025-12-31 -o commandes.xlsx
+    python manage.py export_data payments --status failed --format jsonl > echecs.jsonl
+"""
+
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.exports import (
+    EXPORT_CHUNK_SIZE,
+    EXPORT_DATASETS,
+    EXPORT_FORMATS,
+    ExportError,
+    get_export_dataset,
+    parse_export_filters,
+    stream_export,
+)
+
+
+class Command(BaseCommand):
+    help = "Exporte les commandes, clients ou paiements en CSV, JSON Lines ou XLSX"
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=sorted(EXPORT_DATASETS))
+        parser.add_argument(
+            '--format',
+            default='csv',
+            choices=sorted(EXPORT_FORMATS),
+            help='Format du fichier (défaut : csv)'
+        )
+        parser.add_argument('--from', dest='date_from', help='Date de début incluse (AAAA-MM-JJ)')
+        parser.add_argument('--to', dest='date_to', help='Date de fin incluse (AAAA-MM-JJ)')
+        parser.add_argument('--status', help='Filtrer sur le statut')
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=EXPORT_CHUNK_SIZE,
+            help=f'Lignes lues par aller-retour avec la base (défaut : {EXPORT_CHUNK_SIZE})'
+        )
+        parser.add_argument(
+            '-o', '--output',
+            help='Fichier de sortie (sortie standard par défaut)'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            filters = parse_export_filters(options)
+            dataset = get_export_dataset(options['dataset'], filters)
+            chunks = stream_export(dataset, options['format'], filters, max(1, options['chunk_size']))
+        except ExportError as e:
+            raise CommandError(str(e))
+
+        binary = options['format'] == 'xlsx'
+        if options['output']:
+            mode = 'wb' if binary else 'w'
+            encoding = None if binary else 'utf-8'
+            with open(options['output'], mode, encoding=encoding, newline=None if binary else '') as output:
+                self._write(chunks, output.write)
+            self.stderr.write(self.style.SUCCESS(
+                f"Export {dataset.name} écrit dans {options['output']}"
+            ))
+            return
+
+        if binary:
+            self._write(chunks, sys.stdout.buffer.write)
+            sys.stdout.buffer.flush()
+        else:
+            self._write(chunks, lambda chunk: self.stdout.write(chunk, ending=''))
+
+    def _write(self, chunks, write):
+        for chunk in chunks:
+            write(chunk)
@@ -0,0 +1,83 @@
+"""
+Commande : snapshot_metrics
+===========================
+
+Enregistre un snapshot des indicateurs du dashboard puis sous-échantillonne
+les snapshots anciens (minute -> heure -> jour) selon les règles de rétention.
+
+Usage (cron, une fois par minute) :
+    * * * * * python manage.py snapshot_metrics
+
+Usage (processus long, cadence fixe) :
+    python manage.py snapshot_metrics --loop --interval 60
+"""
+
+import time
+import logging
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from dashboard.models import DashboardSnapshot
+from dashboard.services import downsample_snapshots
+
+logger = logging.getLogger('dashboard')
+
+
+class Command(BaseCommand):
+    help = "Enregistre les snapshots du dashboard à cadence fixe et sous-échantillonne l'historique"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Tourne en boucle au lieu de s\'arrêter après un snapshot'
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=60,
+            help='Cadence des snapshots en secondes (mode --loop, défaut : 60)'
+        )
+        parser.add_argument(
+            '--no-downsample',
+            action='store_true',
+            help='Ne pas sous-échantillonner ni purger les anciens snapshots'
+        )
+
+    def handle(self, *args, **options):
+        interval = max(1, options['interval'])
+
+        if not options['loop']:
+            self.tick(downsample=not options['no_downsample'])
+            return
+
+        self.stdout.write(f'Snapshots toutes les {interval}s (Ctrl+C pour arrêter)')
+        try:
+            while True:
+                # Comme pour une requête : pas de connexion périmée entre deux cycles
+                close_old_connections()
+                try:
+                    self.tick(downsample=not options['no_downsample'])
+                except Exception as e:
+                    # En boucle, une erreur ponctuelle ne doit pas arrêter le planificateur
+                    logger.error(f'Erreur lors du snapshot des indicateurs: {str(e)}', exc_info=True)
+                    self.stderr.write(self.style.ERROR(f'Erreur : {str(e)}'))
+                # Alignement sur la cadence : pas de dérive liée à la durée du calcul
+                time.sleep(interval - (time.time() % interval))
+        except KeyboardInterrupt:
+            self.stdout.write('Arrêt du planificateur de snapshots')
+
+    def tick(self, downsample=True):
+        """Un cycle : snapshot + sous-échantillonnage"""
+        snapshot = DashboardSnapshot.create_snapshot()
+        message = f'{snapshot} enregistré'
+
+        if downsample:
+            stats = downsample_snapshots()
+            message += (
+                f" — {stats['hour']} horaire(s), {stats['day']} journalier(s) créés, "
+                f"{stats['deleted']} supprimé(s)"
+            )
+
+        self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.26 on 2026-10-19 06:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dashboardsnapshot',
+            name='granularity',
+            field=models.CharField(choices=[('minute', 'Minute'), ('hour', 'Heure'), ('day', 'Jour')], default='minute', help_text='Résolution de la série à laquelle appartient ce snapshot', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='dashboardsnapshot',
+            index=models.Index(fields=['granularity', 'snapshot_date'], name='dashboard_d_granula_fe3201_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.26 on 2026-10-19 06:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0002_snapshot_granularity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dashboardalert',
+            name='fingerprint',
+            field=models.CharField(blank=True, help_text='Identifiant de la condition (vide pour les alertes manuelles)', max_length=150),
+        ),
+        migrations.AddField(
+            model_name='dashboardalert',
+            name='url',
+            field=models.CharField(blank=True, help_text="Lien vers la page d'administration concernée", max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='dashboardalert',
+            name='alert_type',
+            field=models.CharField(choices=[('stock_low', 'Stock faible'), ('stock_out', 'Rupture de stock'), ('orders_pending', 'Commandes en attente'), ('revenue_drop', 'Baisse du CA'), ('customer_inactive', 'Clients inactifs'), ('payment_failed', 'Paiements échoués'), ('coupon_exhausted', 'Coupon épuisé'), ('custom', 'Alerte personnalisée')], max_length=50),
+        ),
+        migrations.AddIndex(
+            model_name='dashboardalert',
+            index=models.Index(fields=['is_resolved', 'fingerprint'], name='dashboard_d_is_reso_066b30_idx'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.26 on 2026-10-19 07:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_phone_index'),
+        ('dashboard', '0003_alert_fingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerCohort',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cohort_month', models.DateField(help_text="Premier jour du mois d'acquisition")),
+                ('period', models.PositiveSmallIntegerField(help_text="Mois écoulés depuis l'acquisition")),
+                ('cohort_size', models.PositiveIntegerField()),
+                ('active_customers', models.PositiveIntegerField()),
+                ('retention_rate', models.FloatField()),
+                ('computed_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Cohorte clients',
+                'verbose_name_plural': 'Cohortes clients',
+                'ordering': ['-cohort_month', 'period'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CustomerRFMScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recency_days', models.PositiveIntegerField(help_text='Jours depuis la dernière commande payée')),
+                ('frequency', models.PositiveIntegerField(help_text='Nombre de commandes payées')),
+                ('monetary', models.DecimalField(decimal_places=2, help_text='Total payé (FCFA)', max_digits=14)),
+                ('last_order_at', models.DateTimeField()),
+                ('recency_score', models.PositiveSmallIntegerField()),
+                ('frequency_score', models.PositiveSmallIntegerField()),
+                ('monetary_score', models.PositiveSmallIntegerField()),
+                ('segment', models.CharField(choices=[('champions', 'Champions'), ('loyal', 'Fidèles'), ('new', 'Nouveaux'), ('at_risk', 'À risque'), ('lost', 'Perdus'), ('regular', 'Réguliers')], db_index=True, max_length=20)),
+                ('computed_at', models.DateTimeField()),
+                ('customer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='rfm_score', to='accounts.customer')),
+            ],
+            options={
+                'verbose_name': 'Score RFM client',
+                'verbose_name_plural': 'Scores RFM clients',
+                'ordering': ['-monetary'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='customercohort',
+            constraint=models.UniqueConstraint(fields=('cohort_month', 'period'), name='uniq_cohort_period'),
+        ),
+        migrations.AddIndex(
+            model_name='customerrfmscore',
+            index=models.Index(fields=['-monetary'], name='dashboard_c_monetar_d5fc6a_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.26 on 2026-10-19 07:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0004_customer_analytics'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='dashboardalert',
+            name='alert_type',
+            field=models.CharField(choices=[('stock_low', 'Stock faible'), ('stock_out', 'Rupture de stock'), ('orders_pending', 'Commandes en attente'), ('revenue_drop', 'Baisse du CA'), ('customer_inactive', 'Clients inactifs'), ('payment_failed', 'Paiements échoués'), ('payment_stale', 'Paiements non confirmés'), ('coupon_exhausted', 'Coupon épuisé'), ('custom', 'Alerte personnalisée')], max_length=50),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.26 on 2026-10-19 08:20
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.utils import timezone
+
+
+def resolve_duplicate_open_alerts(apps, schema_editor):
+    """Doublons ouverts d'une même condition : seule la plus ancienne alerte reste ouverte"""
+    DashboardAlert = apps.get_model('dashboard', 'DashboardAlert')
+
+    duplicated = (
+        DashboardAlert.objects.filter(is_resolved=False).exclude(fingerprint='')
+        .values('fingerprint').annotate(count=Count('pk')).filter(count__gt=1)
+        .values_list('fingerprint', flat=True)
+    )
+    for fingerprint in list(duplicated):
+        alerts = DashboardAlert.objects.filter(is_resolved=False, fingerprint=fingerprint).order_by('pk')
+        DashboardAlert.objects.filter(pk__in=list(alerts.values_list('pk', flat=True)[1:])).update(
+            is_resolved=True,
+            resolved_at=timezone.now()
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0005_payment_stale_alert'),
+    ]
+
+    operations = [
+        migrations.RunPython(resolve_duplicate_open_alerts, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='dashboardalert',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_resolved', False), models.Q(('fingerprint', ''), _negated=True)), fields=('fingerprint',), name='uniq_open_alert_fingerprint'),
+        ),
+    ]
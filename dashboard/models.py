@@ -21,10 +21,26 @@ class DashboardSnapshot(models.Model):
     - Comparer les performances dans le temps
     - Générer des rapports historiques
     - Analyser les tendances
+    
+    Les snapshots sont enregistrés à la minute par la commande
+    `manage.py snapshot_metrics`, puis sous-échantillonnés à l'heure
+    et au jour au-delà de leur durée de rétention.
     """
     
+    GRANULARITY_CHOICES = [
+        ('minute', 'Minute'),
+        ('hour', 'Heure'),
+        ('day', 'Jour'),
+    ]
+    
     # Date et heure du snapshot
     snapshot_date = models.DateTimeField(default=timezone.now, db_index=True)
+    granularity = models.CharField(
+        max_length=10,
+        choices=GRANULARITY_CHOICES,
+        default='minute',
+        help_text="Résolution de la série à laquelle appartient ce snapshot"
+    )
     created_by = models.ForeignKey(
         User, 
         on_delete=models.SET_NULL, 
@@ -80,68 +96,50 @@ class DashboardSnapshot(models.Model):
         ordering = ['-snapshot_date']
         indexes = [
             models.Index(fields=['-snapshot_date']),
+            models.Index(fields=['granularity', 'snapshot_date']),
         ]
     
     def __str__(self):
         return f"Snapshot du {self.snapshot_date.strftime('%d/%m/%Y %H:%M')}"
     
     @classmethod
-    def create_snapshot(cls, user=None):
+    def create_snapshot(cls, user=None, granularity='minute'):
         """
         Crée un snapshot des statistiques actuelles
         
         Usage:
             DashboardSnapshot.create_snapshot(user=request.user)
         """
-        from orders.models import Order
-        from shop.models import Product
-        from accounts.models import Customer
+        from .services import compute_dashboard_metrics
         
-        today = timezone.now()
-        start_of_today = today.replace(hour=0, minute=0, second=0, microsecond=0)
-        start_of_month = today.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        metrics = compute_dashboard_metrics(include_series=False)
         
         snapshot = cls.objects.create(
             created_by=user,
-            snapshot_date=today,
+            snapshot_date=metrics.periods.now,
+            granularity=granularity,
             
             # Commandes
-            total_orders=Order.objects.count(),
-            orders_today=Order.objects.filter(created_at__gte=start_of_today).count(),
-            orders_month=Order.objects.filter(created_at__gte=start_of_month).count(),
-            pending_orders=Order.objects.filter(
-                status__in=['pending', 'processing']
-            ).count(),
+            total_orders=metrics.total_orders,
+            orders_today=metrics.orders_today,
+            orders_month=metrics.orders_month,
+            pending_orders=metrics.pending_orders,
             
             # Finances
-            total_revenue=Order.objects.filter(
-                is_paid=True
-            ).aggregate(total=models.Sum('total'))['total'] or Decimal('0.00'),
-            
-            revenue_today=Order.objects.filter(
-                is_paid=True,
-                paid_at__gte=start_of_today
-            ).aggregate(total=models.Sum('total'))['total'] or Decimal('0.00'),
-            
-            revenue_month=Order.objects.filter(
-                is_paid=True,
-                paid_at__gte=start_of_month
-            ).aggregate(total=models.Sum('total'))['total'] or Decimal('0.00'),
+            total_revenue=metrics.total_revenue,
+            revenue_today=metrics.revenue_today,
+            revenue_month=metrics.revenue_month,
+            avg_order_value=metrics.avg_order_value,
             
             # Produits
-            total_products=Product.objects.filter(is_active=True).count(),
-            out_of_stock=Product.objects.filter(
-                variants__stock__available_quantity=0
-            ).distinct().count(),
+            total_products=metrics.total_products,
+            out_of_stock=metrics.out_of_stock,
+            total_items_sold=metrics.total_items_sold,
             
             # Clients
-            total_customers=Customer.objects.count(),
-            new_customers_month=Customer.objects.filter(
-                created_at__gte=start_of_month
-            ).count(),
-            active_customers=Customer.objects.filter(
-                orders__isnull=False
-            ).distinct().count(),
+            total_customers=metrics.total_customers,
+            new_customers_month=metrics.new_customers_month,
+            active_customers=metrics.active_customers,
         )
         
         return snapshot
@@ -241,15 +239,21 @@ class AdminActivityLog(models.Model):
                 object_id=12345,
                 request=request
             )
+        
+        Avec ADMIN_ACTIVITY_LOG_ASYNC (par défaut), l'entrée est mise en
+        tampon et écrite par lots en arrière-plan (dashboard/activity_log.py) :
+        l'objet retourné n'a pas encore de pk.
         """
+        from django.conf import settings
+        
         ip_address = None
-        user_agent = None
+        user_agent = ''
         
         if request:
             ip_address = cls._get_client_ip(request)
             user_agent = request.META.get('HTTP_USER_AGENT', '')[:255]
         
-        return cls.objects.create(
+        entry = cls(
             user=user,
             action_type=action_type,
             action_description=description,
@@ -260,6 +264,14 @@ class AdminActivityLog(models.Model):
             data_before=data_before,
             data_after=data_after,
         )
+        
+        if getattr(settings, 'ADMIN_ACTIVITY_LOG_ASYNC', True):
+            from .activity_log import get_activity_log_buffer
+            
+            get_activity_log_buffer().add(entry)
+        else:
+            entry.save()
+        return entry
     
     @staticmethod
     def _get_client_ip(request):
@@ -281,6 +293,10 @@ class DashboardAlert(models.Model):
     - Nombre de commandes en attente
     - Baisse du CA
     - Etc.
+    
+    Les alertes générées par le moteur de règles (dashboard/alert_service.py)
+    portent une empreinte (fingerprint) qui permet de les dédoublonner et de
+    les résoudre automatiquement lorsque la condition disparaît.
     """
     
     ALERT_TYPES = [
@@ -290,6 +306,8 @@ class DashboardAlert(models.Model):
         ('revenue_drop', 'Baisse du CA'),
         ('customer_inactive', 'Clients inactifs'),
         ('payment_failed', 'Paiements échoués'),
+        ('payment_stale', 'Paiements non confirmés'),
+        ('coupon_exhausted', 'Coupon épuisé'),
         ('custom', 'Alerte personnalisée'),
     ]
     
@@ -303,6 +321,16 @@ class DashboardAlert(models.Model):
     alert_type = models.CharField(max_length=50, choices=ALERT_TYPES)
     title = models.CharField(max_length=200)
     message = models.TextField()
+    url = models.CharField(
+        max_length=255,
+        blank=True,
+        help_text="Lien vers la page d'administration concernée"
+    )
+    fingerprint = models.CharField(
+        max_length=150,
+        blank=True,
+        help_text="Identifiant de la condition (vide pour les alertes manuelles)"
+    )
     severity = models.CharField(
         max_length=20, 
         choices=SEVERITY_LEVELS, 
@@ -341,6 +369,15 @@ class DashboardAlert(models.Model):
         ordering = ['-triggered_at']
         indexes = [
             models.Index(fields=['is_active', 'is_resolved', '-triggered_at']),
+            models.Index(fields=['is_resolved', 'fingerprint']),
+        ]
+        constraints = [
+            # Une seule alerte ouverte par condition, même si deux évaluations se croisent
+            models.UniqueConstraint(
+                fields=['fingerprint'],
+                condition=models.Q(is_resolved=False) & ~models.Q(fingerprint=''),
+                name='uniq_open_alert_fingerprint'
+            ),
         ]
     
     def __str__(self):
@@ -355,8 +392,99 @@ class DashboardAlert(models.Model):
     def check_condition(self):
         """
         Vérifie si la condition de l'alerte est toujours vraie
-        À implémenter selon les besoins
+        
+        Les alertes du moteur de règles sont réévaluées (et résolues si la
+        condition a disparu) ; les alertes manuelles sont seulement horodatées.
+        
+        Returns:
+            bool: True si l'alerte est toujours ouverte
         """
-        self.last_checked = timezone.now()
-        self.save(update_fields=['last_checked'])
+        if self.fingerprint:
+            from .alert_service import evaluate_alerts
+            
+            evaluate_alerts(alert_types=[self.alert_type])
+            self.refresh_from_db()
+        else:
+            self.last_checked = timezone.now()
+            self.save(update_fields=['last_checked'])
+        
+        return not self.is_resolved
+
 
+
+class CustomerRFMScore(models.Model):
+    """
+    Score RFM (Récence, Fréquence, Montant) d'un client
+    
+    Table de synthèse recalculée en bloc par `manage.py compute_customer_analytics`
+    (dashboard/analytics.py) à partir des commandes payées. Les scores vont
+    de 1 (quintile le plus faible) à 5 (le meilleur).
+    """
+    
+    SEGMENT_CHOICES = [
+        ('champions', 'Champions'),
+        ('loyal', 'Fidèles'),
+        ('new', 'Nouveaux'),
+        ('at_risk', 'À risque'),
+        ('lost', 'Perdus'),
+        ('regular', 'Réguliers'),
+    ]
+    
+    customer = models.OneToOneField(
+        'accounts.Customer',
+        on_delete=models.CASCADE,
+        related_name='rfm_score'
+    )
+    
+    # Valeurs brutes
+    recency_days = models.PositiveIntegerField(help_text="Jours depuis la dernière commande payée")
+    frequency = models.PositiveIntegerField(help_text="Nombre de commandes payées")
+    monetary = models.DecimalField(max_digits=14, decimal_places=2, help_text="Total payé (FCFA)")
+    last_order_at = models.DateTimeField()
+    
+    # Scores par quintile (1 à 5)
+    recency_score = models.PositiveSmallIntegerField()
+    frequency_score = models.PositiveSmallIntegerField()
+    monetary_score = models.PositiveSmallIntegerField()
+    segment = models.CharField(max_length=20, choices=SEGMENT_CHOICES, db_index=True)
+    
+    computed_at = models.DateTimeField()
+    
+    class Meta:
+        verbose_name = "Score RFM client"
+        verbose_name_plural = "Scores RFM clients"
+        ordering = ['-monetary']
+        indexes = [
+            models.Index(fields=['-monetary']),
+        ]
+    
+    def __str__(self):
+        return f"{self.customer_id} - R{self.recency_score}F{self.frequency_score}M{self.monetary_score}"
+
+
+class CustomerCohort(models.Model):
+    """
+    Rétention d'une cohorte d'acquisition mensuelle
+    
+    Une cohorte regroupe les clients dont la première commande payée tombe
+    dans le même mois ; period = nombre de mois écoulés depuis ce mois.
+    Une ligne par (cohorte, période) : la matrice de rétention complète.
+    """
+    
+    cohort_month = models.DateField(help_text="Premier jour du mois d'acquisition")
+    period = models.PositiveSmallIntegerField(help_text="Mois écoulés depuis l'acquisition")
+    cohort_size = models.PositiveIntegerField()
+    active_customers = models.PositiveIntegerField()
+    retention_rate = models.FloatField()
+    computed_at = models.DateTimeField()
+    
+    class Meta:
+        verbose_name = "Cohorte clients"
+        verbose_name_plural = "Cohortes clients"
+        ordering = ['-cohort_month', 'period']
+        constraints = [
+            models.UniqueConstraint(fields=['cohort_month', 'period'], name='uniq_cohort_period'),
+        ]
+    
+    def __str__(self):
+        return f"Cohorte {self.cohort_month:%m/%Y} - M+{self.period} : {self.retention_rate:.0%}"
@@ -0,0 +1,739 @@
+"""
+dashboard/services.py - Couche de Service du Tableau de Bord
+=============================================================
+
+Calcule en une seule passe les indicateurs clés (KPI) utilisés par :
+- dashboard.views.dashboard_view
+- dashboard.admin.CustomAdminSite.dashboard_view
+- dashboard.models.DashboardSnapshot.create_snapshot
+
+Chaque famille d'indicateurs est obtenue par UNE requête d'agrégation
+conditionnelle (Count/Sum avec filter=), au lieu d'un count()/aggregate()
+par indicateur. Le nombre de requêtes reste donc fixe quel que soit le
+volume de commandes, de produits ou de clients.
+
+Les indicateurs sont servis depuis le cache (stale-while-revalidate) :
+le dernier résultat calculé est renvoyé immédiatement et, s'il est plus
+ancien que DASHBOARD_METRICS_FRESHNESS, un seul recalcul est lancé en
+arrière-plan grâce à un verrou posé dans le cache.
+"""
+
+from dataclasses import dataclass, field, replace
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+import logging
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.models import Count, Sum, Q, F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from orders.models import Order, OrderItem
+from shop.models import Product, Category
+from accounts.models import Customer
+from payments.models import Payment
+
+logger = logging.getLogger(__name__)
+
+# Seuil en dessous duquel un produit est considéré en stock faible
+LOW_STOCK_THRESHOLD = 10
+
+# Nombre de jours couverts par les graphiques
+CHART_DAYS = 30
+
+# Nombre minimum de commandes pour qu'un client soit considéré VIP
+VIP_MIN_ORDERS = 3
+
+# Clés de cache partagées entre les vues et le recalcul en arrière-plan
+DASHBOARD_METRICS_CACHE_KEY = 'dashboard_metrics'
+DASHBOARD_METRICS_LOCK_KEY = 'dashboard_metrics_lock'
+
+# Durée de conservation du dernier résultat (servi même s'il est périmé)
+DASHBOARD_METRICS_CACHE_TIMEOUT = 60 * 60
+
+# Durée maximale du verrou (libéré plus tôt à la fin du recalcul)
+DASHBOARD_METRICS_LOCK_TIMEOUT = 120
+
+
+# ============================================
+# CLASSES DE DONNÉES (DATA TRANSFER OBJECTS)
+# ============================================
+
+@dataclass
+class DashboardPeriods:
+    """Bornes temporelles utilisées pour le calcul des indicateurs"""
+    now: datetime
+    start_of_today: datetime
+    start_of_week: datetime
+    start_of_month: datetime
+    start_of_year: datetime
+
+
+@dataclass
+class DashboardMetrics:
+    """Résultat typé du calcul des indicateurs du tableau de bord"""
+    periods: DashboardPeriods
+
+    # Commandes
+    total_orders: int = 0
+    orders_today: int = 0
+    orders_week: int = 0
+    orders_month: int = 0
+    pending_orders: int = 0
+    paid_orders: int = 0
+
+    # Finances
+    total_revenue: Decimal = Decimal('0.00')
+    revenue_today: Decimal = Decimal('0.00')
+    revenue_week: Decimal = Decimal('0.00')
+    revenue_month: Decimal = Decimal('0.00')
+    revenue_year: Decimal = Decimal('0.00')
+
+    # Produits
+    total_products: int = 0
+    total_categories: int = 0
+    out_of_stock: int = 0
+    low_stock: int = 0
+    total_items_sold: int = 0
+
+    # Clients
+    total_customers: int = 0
+    new_customers_month: int = 0
+    active_customers: int = 0
+    vip_customers: int = 0
+
+    # Paiements
+    successful_payments: int = 0
+    pending_payments: int = 0
+    failed_payments: int = 0
+
+    # Répartitions et séries (optionnelles pour les snapshots)
+    orders_by_status: List[Dict] = field(default_factory=list)
+    payments_by_method: List[Dict] = field(default_factory=list)
+    chart_labels: List[str] = field(default_factory=list)
+    revenue_chart_data: List[float] = field(default_factory=list)
+    orders_chart_data: List[int] = field(default_factory=list)
+
+    # Fraîcheur (renseignée par get_dashboard_metrics)
+    is_stale: bool = False
+
+    @property
+    def computed_at(self) -> datetime:
+        """Date et heure du calcul des indicateurs"""
+        return self.periods.now
+
+    @property
+    def avg_order_value(self) -> Decimal:
+        """Panier moyen calculé sur les commandes payées"""
+        if self.paid_orders > 0:
+            return self.total_revenue / self.paid_orders
+        return Decimal('0.00')
+
+    @property
+    def conversion_rate(self) -> float:
+        """Taux de conversion (commandes payées / total commandes) en %"""
+        if self.total_orders > 0:
+            return round((self.paid_orders / self.total_orders) * 100, 2)
+        return 0
+
+    def to_context(self) -> Dict:
+        """Retourne les indicateurs sous forme de contexte de template"""
+        return {
+            'today': self.periods.now,
+            'start_of_month': self.periods.start_of_month,
+            'metrics_computed_at': self.computed_at,
+            'metrics_is_stale': self.is_stale,
+
+            # Commandes
+            'total_orders': self.total_orders,
+            'orders_today': self.orders_today,
+            'orders_week': self.orders_week,
+            'orders_month': self.orders_month,
+            'pending_orders': self.pending_orders,
+            'orders_by_status': self.orders_by_status,
+
+            # Finances
+            'total_revenue': self.total_revenue,
+            'revenue_today': self.revenue_today,
+            'revenue_week': self.revenue_week,
+            'revenue_month': self.revenue_month,
+            'revenue_year': self.revenue_year,
+            'avg_order_value': self.avg_order_value,
+            'conversion_rate': self.conversion_rate,
+
+            # Produits
+            'total_products': self.total_products,
+            'total_categories': self.total_categories,
+            'out_of_stock': self.out_of_stock,
+            'low_stock': self.low_stock,
+            'total_items_sold': self.total_items_sold,
+
+            # Clients
+            'total_customers': self.total_customers,
+            'new_customers_month': self.new_customers_month,
+            'active_customers': self.active_customers,
+            'vip_customers': self.vip_customers,
+
+            # Paiements
+            'successful_payments': self.successful_payments,
+            'pending_payments': self.pending_payments,
+            'failed_payments': self.failed_payments,
+            'payments_by_method': self.payments_by_method,
+
+            # Graphiques
+            'last_30_days': self.chart_labels,
+            'revenue_chart_data': self.revenue_chart_data,
+            'orders_chart_data': self.orders_chart_data,
+        }
+
+
+# ============================================
+# PÉRIODES D'ANALYSE
+# ============================================
+
+def get_dashboard_periods(now: Optional[datetime] = None) -> DashboardPeriods:
+    """
+    Calcule les bornes des périodes d'analyse dans le fuseau local
+
+    Args:
+        now: Instant de référence (timezone.now() par défaut)
+
+    Returns:
+        DashboardPeriods: Début du jour, de la semaine, du mois et de l'année
+    """
+    now = timezone.localtime(now or timezone.now())
+    start_of_today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    return DashboardPeriods(
+        now=now,
+        start_of_today=start_of_today,
+        start_of_week=start_of_today - timedelta(days=now.weekday()),
+        start_of_month=start_of_today.replace(day=1),
+        start_of_year=start_of_today.replace(month=1, day=1),
+    )
+
+
+# ============================================
+# AGRÉGATIONS PAR FAMILLE D'INDICATEURS
+# ============================================
+
+def _aggregate_orders(periods: DashboardPeriods) -> Dict:
+    """Compteurs et chiffres d'affaires des commandes (1 requête)"""
+    paid = Q(is_paid=True)
+    totals = Order.objects.aggregate(
+        total_orders=Count('id'),
+        orders_today=Count('id', filter=Q(created_at__gte=periods.start_of_today)),
+        orders_week=Count('id', filter=Q(created_at__gte=periods.start_of_week)),
+        orders_month=Count('id', filter=Q(created_at__gte=periods.start_of_month)),
+        pending_orders=Count('id', filter=Q(status__in=['pending', 'processing'])),
+        paid_orders=Count('id', filter=paid),
+        total_revenue=Sum('total', filter=paid),
+        revenue_today=Sum('total', filter=paid & Q(paid_at__gte=periods.start_of_today)),
+        revenue_week=Sum('total', filter=paid & Q(paid_at__gte=periods.start_of_week)),
+        revenue_month=Sum('total', filter=paid & Q(paid_at__gte=periods.start_of_month)),
+        revenue_year=Sum('total', filter=paid & Q(paid_at__gte=periods.start_of_year)),
+    )
+
+    for key in ('total_revenue', 'revenue_today', 'revenue_week', 'revenue_month', 'revenue_year'):
+        totals[key] = totals[key] or Decimal('0.00')
+
+    return totals
+
+
+def _aggregate_products() -> Dict:
+    """Compteurs du catalogue et de l'état des stocks (1 requête)"""
+    active = Q(is_active=True)
+    return Product.objects.aggregate(
+        total_products=Count('id', filter=active, distinct=True),
+        out_of_stock=Count(
+            'id',
+            filter=active & Q(
+                variants__stock__quantity__lte=F('variants__stock__reserved_quantity')
+            ),
+            distinct=True
+        ),
+        low_stock=Count(
+            'id',
+            filter=active & Q(
+                variants__stock__quantity__gt=F('variants__stock__reserved_quantity'),
+                variants__stock__quantity__lt=(
+                    F('variants__stock__reserved_quantity') + LOW_STOCK_THRESHOLD
+                ),
+            ),
+            distinct=True
+        ),
+    )
+
+
+def _aggregate_customers(periods: DashboardPeriods) -> Dict:
+    """Compteurs des clients (2 requêtes : totaux + VIP)"""
+    totals = Customer.objects.aggregate(
+        total_customers=Count('id', distinct=True),
+        new_customers_month=Count(
+            'id',
+            filter=Q(created_at__gte=periods.start_of_month),
+            distinct=True
+        ),
+        active_customers=Count('id', filter=Q(orders__isnull=False), distinct=True),
+    )
+
+    totals['vip_customers'] = Order.objects.order_by().values('customer').annotate(
+        order_count=Count('id')
+    ).filter(order_count__gte=VIP_MIN_ORDERS).count()
+
+    return totals
+
+
+def _aggregate_payments() -> Dict:
+    """Compteurs des paiements par statut (1 requête)"""
+    return Payment.objects.aggregate(
+        successful_payments=Count('id', filter=Q(status='completed')),
+        pending_payments=Count('id', filter=Q(status='pending')),
+        failed_payments=Count('id', filter=Q(status='failed')),
+    )
+
+
+def _build_chart_series(periods: DashboardPeriods, days: int = CHART_DAYS) -> Dict:
+    """
+    Séries journalières du CA et des commandes (2 requêtes groupées)
+
+    Les jours sans activité sont complétés à zéro côté Python.
+    """
+    start = periods.start_of_today - timedelta(days=days - 1)
+
+    orders_per_day = {
+        row['day']: row['count']
+        for row in Order.objects.filter(created_at__gte=start).order_by().annotate(
+            day=TruncDate('created_at')
+        ).values('day').annotate(count=Count('id'))
+    }
+    revenue_per_day = {
+        row['day']: row['total']
+        for row in Order.objects.filter(is_paid=True, paid_at__gte=start).order_by().annotate(
+            day=TruncDate('paid_at')
+        ).values('day').annotate(total=Sum('total'))
+    }
+
+    labels, revenue_data, orders_data = [], [], []
+    for offset in range(days):
+        day: date = (start + timedelta(days=offset)).date()
+        labels.append(day.strftime('%d/%m'))
+        revenue_data.append(float(revenue_per_day.get(day) or 0))
+        orders_data.append(orders_per_day.get(day, 0))
+
+    return {
+        'chart_labels': labels,
+        'revenue_chart_data': revenue_data,
+        'orders_chart_data': orders_data,
+    }
+
+
+# ============================================
+# SERVICE PRINCIPAL
+# ============================================
+
+def compute_dashboard_metrics(
+    now: Optional[datetime] = None,
+    include_series: bool = True
+) -> DashboardMetrics:
+    """
+    Calcule tous les indicateurs du tableau de bord en un nombre fixe de requêtes
+
+    Args:
+        now: Instant de référence (timezone.now() par défaut)
+        include_series: Inclure les répartitions et les séries des graphiques
+            (inutile pour les snapshots)
+
+    Returns:
+        DashboardMetrics: Indicateurs typés
+    """
+    periods = get_dashboard_periods(now)
+
+    metrics = DashboardMetrics(
+        periods=periods,
+        total_categories=Category.objects.filter(is_active=True).count(),
+        total_items_sold=OrderItem.objects.filter(
+            order__is_paid=True
+        ).aggregate(total=Sum('quantity'))['total'] or 0,
+        **_aggregate_orders(periods),
+        **_aggregate_products(),
+        **_aggregate_customers(periods),
+        **_aggregate_payments(),
+    )
+
+    if include_series:
+        metrics.orders_by_status = list(
+            Order.objects.order_by().values('status').annotate(
+                count=Count('id')
+            ).order_by('-count')
+        )
+        metrics.payments_by_method = list(
+            Payment.objects.filter(status='completed').values(
+                'payment_method__name'
+            ).annotate(
+                count=Count('id'),
+                total=Sum('amount')
+            ).order_by('-count')
+        )
+        for key, value in _build_chart_series(periods).items():
+            setattr(metrics, key, value)
+
+    return metrics
+
+
+# ============================================
+# CACHE STALE-WHILE-REVALIDATE
+# ============================================
+
+def get_freshness_window() -> int:
+    """Durée (secondes) pendant laquelle les indicateurs sont considérés frais"""
+    return getattr(settings, 'DASHBOARD_METRICS_FRESHNESS', 60)
+
+
+def refresh_dashboard_metrics() -> DashboardMetrics:
+    """
+    Recalcule les indicateurs et remplace l'entrée du cache
+
+    Returns:
+        DashboardMetrics: Indicateurs fraîchement calculés
+    """
+    metrics = compute_dashboard_metrics()
+    cache.set(DASHBOARD_METRICS_CACHE_KEY, metrics, DASHBOARD_METRICS_CACHE_TIMEOUT)
+    return metrics
+
+
+def _refresh_in_background():
+    """Corps du thread de recalcul : libère toujours le verrou et la connexion"""
+    try:
+        refresh_dashboard_metrics()
+        logger.info('Indicateurs du dashboard recalculés en arrière-plan')
+    except Exception as e:
+        logger.error(f'Erreur lors du recalcul des indicateurs: {str(e)}', exc_info=True)
+    finally:
+        cache.delete(DASHBOARD_METRICS_LOCK_KEY)
+        connections.close_all()
+
+
+def _start_background_refresh():
+    """Lance le recalcul dans un thread démon"""
+    thread = threading.Thread(
+        target=_refresh_in_background,
+        name='dashboard-metrics-refresh',
+        daemon=True
+    )
+    thread.start()
+
+
+def get_dashboard_metrics(force_refresh: bool = False) -> DashboardMetrics:
+    """
+    Retourne les indicateurs du tableau de bord depuis le cache
+
+    - Aucun résultat en cache : calcul synchrone
+    - Résultat frais : servi tel quel
+    - Résultat périmé : servi immédiatement, et un seul recalcul est lancé
+      en arrière-plan (verrou cache.add, pas d'effet de ruée)
+
+    Args:
+        force_refresh: Recalculer immédiatement (bouton « Actualiser » du staff)
+
+    Returns:
+        DashboardMetrics: Indicateurs, avec is_stale=True si un recalcul est en cours
+    """
+    metrics = None if force_refresh else cache.get(DASHBOARD_METRICS_CACHE_KEY)
+
+    if metrics is None:
+        return refresh_dashboard_metrics()
+
+    age = (timezone.now() - metrics.computed_at).total_seconds()
+    if age <= get_freshness_window():
+        return metrics
+
+    # cache.add est atomique : seul le premier appelant obtient le verrou
+    if cache.add(DASHBOARD_METRICS_LOCK_KEY, True, DASHBOARD_METRICS_LOCK_TIMEOUT):
+        try:
+            _start_background_refresh()
+        except Exception as e:
+            cache.delete(DASHBOARD_METRICS_LOCK_KEY)
+            logger.error(f'Impossible de lancer le recalcul des indicateurs: {str(e)}')
+
+    return replace(metrics, is_stale=True)
+
+
+# ============================================
+# LISTES ET ALERTES
+# ============================================
+
+def get_recent_orders(limit: int = 10):
+    """Dernières commandes avec leurs relations préchargées"""
+    return Order.objects.select_related(
+        'customer__user',
+        'shipping_zone',
+        'shipping_rate'
+    ).order_by('-created_at')[:limit]
+
+
+def get_top_products(limit: int = 5):
+    """Produits actifs les plus vendus"""
+    return Product.objects.filter(
+        is_active=True
+    ).select_related('category').order_by('-sales_count')[:limit]
+
+
+def get_top_customers(limit: int = 5):
+    """
+    Clients ayant le plus dépensé (commandes payées)
+
+    Lu depuis la table de synthèse RFM (index sur monetary) plutôt qu'en
+    agrégeant toutes les commandes ; à jour au dernier
+    `manage.py compute_customer_analytics`.
+    """
+    return Customer.objects.filter(rfm_score__isnull=False).select_related('user').annotate(
+        total_spent_calc=F('rfm_score__monetary')
+    ).order_by('-rfm_score__monetary')[:limit]
+
+
+def build_dashboard_alerts(metrics: DashboardMetrics) -> List[Dict]:
+    """
+    Construit les alertes affichées en tête du tableau de bord
+
+    Les alertes proviennent de la table DashboardAlert, alimentée par
+    `manage.py evaluate_alerts` ; seules les informations déjà présentes
+    dans les indicateurs sont ajoutées, sans requête supplémentaire.
+
+    Args:
+        metrics: Indicateurs calculés
+
+    Returns:
+        List[Dict]: Alertes triées par priorité
+    """
+    from .alert_service import get_open_alerts_for_display
+
+    alerts = get_open_alerts_for_display()
+
+    if metrics.pending_payments > 0:
+        alerts.append({
+            'type': 'info',
+            'icon': 'fas fa-credit-card',
+            'message': f'{metrics.pending_payments} paiement(s) en attente de confirmation',
+            'url': '/admin/payments/payment/?status=pending',
+            'priority': 4
+        })
+
+    if metrics.new_customers_month > 0:
+        alerts.append({
+            'type': 'success',
+            'icon': 'fas fa-user-plus',
+            'message': f'{metrics.new_customers_month} nouveau(x) client(s) ce mois',
+            'url': '/admin/accounts/customer/',
+            'priority': 5
+        })
+
+    alerts.sort(key=lambda x: x['priority'])
+    return alerts
+
+
+# ============================================
+# SÉRIES TEMPORELLES (SNAPSHOTS)
+# ============================================
+
+# Durée de conservation de chaque résolution avant sous-échantillonnage
+# (minute -> heure -> jour) puis suppression des snapshots journaliers
+SNAPSHOT_RETENTION = {
+    'minute': timedelta(hours=24),
+    'hour': timedelta(days=30),
+    'day': timedelta(days=730),
+}
+
+# Résolution immédiatement supérieure
+SNAPSHOT_ROLLUP = {
+    'minute': 'hour',
+    'hour': 'day',
+}
+
+
+def get_snapshot_retention() -> Dict[str, timedelta]:
+    """Règles de rétention, surchargeables via settings.DASHBOARD_SNAPSHOT_RETENTION"""
+    return {**SNAPSHOT_RETENTION, **getattr(settings, 'DASHBOARD_SNAPSHOT_RETENTION', {})}
+
+
+def truncate_to_granularity(moment: datetime, granularity: str) -> datetime:
+    """Ramène un instant au début de sa minute, heure ou journée (fuseau local)"""
+    moment = timezone.localtime(moment).replace(second=0, microsecond=0)
+    if granularity in ('hour', 'day'):
+        moment = moment.replace(minute=0)
+    if granularity == 'day':
+        moment = moment.replace(hour=0)
+    return moment
+
+
+def downsample_snapshots(now: Optional[datetime] = None) -> Dict[str, int]:
+    """
+    Sous-échantillonne les snapshots anciens et applique la rétention
+
+    Les compteurs d'un snapshot sont des valeurs instantanées : chaque
+    intervalle (heure ou jour) complet au-delà de la rétention est remplacé
+    par son DERNIER snapshot, daté du début de l'intervalle.
+
+    Args:
+        now: Instant de référence (timezone.now() par défaut)
+
+    Returns:
+        Dict[str, int]: Nombre de snapshots créés par résolution et supprimés
+    """
+    from .models import DashboardSnapshot
+
+    now = now or timezone.now()
+    retention = get_snapshot_retention()
+    stats = {'hour': 0, 'day': 0, 'deleted': 0}
+
+    for source, target in SNAPSHOT_ROLLUP.items():
+        # Seuls les intervalles complets sont agrégés
+        cutoff = truncate_to_granularity(now - retention[source], target)
+        expired = DashboardSnapshot.objects.filter(
+            granularity=source,
+            snapshot_date__lt=cutoff
+        )
+
+        last_per_bucket = {}
+        for snapshot in expired.order_by('snapshot_date').iterator(chunk_size=1000):
+            last_per_bucket[truncate_to_granularity(snapshot.snapshot_date, target)] = snapshot
+
+        if not last_per_bucket:
+            continue
+
+        rollups = []
+        for bucket, snapshot in last_per_bucket.items():
+            snapshot.pk = None
+            snapshot._state.adding = True
+            snapshot.granularity = target
+            snapshot.snapshot_date = bucket
+            rollups.append(snapshot)
+
+        with transaction.atomic():
+            deleted, _ = expired.delete()
+            DashboardSnapshot.objects.bulk_create(rollups, batch_size=500)
+
+        stats[target] += len(rollups)
+        stats['deleted'] += deleted
+
+    deleted, _ = DashboardSnapshot.objects.filter(
+        granularity='day',
+        snapshot_date__lt=now - retention['day']
+    ).delete()
+    stats['deleted'] += deleted
+
+    return stats
+
+
+def get_stored_granularities(start: datetime, end: datetime, now: Optional[datetime] = None) -> List[str]:
+    """
+    Résolutions des snapshots conservés entre `start` et `end`
+
+    Après downsample_snapshots(), chaque période n'existe qu'à une seule
+    résolution : minute au-delà de la première limite, heure entre les deux,
+    jour avant la seconde.
+    """
+    now = now or timezone.now()
+    retention = get_snapshot_retention()
+    granularities = []
+    for source, target in SNAPSHOT_ROLLUP.items():
+        cutoff = truncate_to_granularity(now - retention[source], target)
+        if end >= cutoff:
+            granularities.append(source)
+        if start >= cutoff:
+            return granularities
+    return granularities + ['day']
+
+
+def get_snapshot_series(
+    start: datetime,
+    end: Optional[datetime] = None,
+    fields: Tuple[str, ...] = ('total_orders', 'total_revenue'),
+    granularity: str = 'hour'
+) -> List[Dict]:
+    """
+    Série temporelle compacte lue depuis les snapshots (sans parcourir Order)
+
+    Lit uniquement les colonnes demandées, des seules résolutions conservées
+    sur la plage (index granularity + snapshot_date), et ne conserve que le
+    dernier point de chaque intervalle demandé.
+
+    Args:
+        start: Début de la plage
+        end: Fin de la plage (maintenant par défaut)
+        fields: Compteurs à retourner
+        granularity: 'minute', 'hour' ou 'day'
+
+    Returns:
+        List[Dict]: Points {'date': ..., <champ>: valeur} triés par date
+    """
+    from .models import DashboardSnapshot
+
+    now = timezone.now()
+    end = end or now
+    rows = DashboardSnapshot.objects.filter(
+        granularity__in=get_stored_granularities(start, end, now),
+        snapshot_date__gte=start,
+        snapshot_date__lte=end
+    ).order_by('snapshot_date').values('snapshot_date', *fields)
+
+    points = {}
+    for row in rows.iterator(chunk_size=1000):
+        bucket = truncate_to_granularity(row.pop('snapshot_date'), granularity)
+        points[bucket] = row
+
+    return [{'date': bucket, **values} for bucket, values in points.items()]
+
+
+def get_snapshot_value_at(field_name: str, moment: datetime):
+    """Valeur d'un compteur dans le dernier snapshot antérieur à `moment`"""
+    from .models import DashboardSnapshot
+
+    return DashboardSnapshot.objects.filter(
+        snapshot_date__lte=moment
+    ).order_by('-snapshot_date').values_list(field_name, flat=True).first()
+
+
+def compare_periods(
+    field_name: str = 'total_revenue',
+    days: int = 7,
+    now: Optional[datetime] = None
+) -> Dict:
+    """
+    Compare la progression d'un compteur cumulé sur deux périodes consécutives
+
+    Exemple : CA des 7 derniers jours comparé aux 7 jours précédents, en
+    3 lectures indexées de snapshots au lieu d'agréger les commandes.
+
+    Args:
+        field_name: Compteur cumulé (total_orders, total_revenue, ...)
+        days: Durée de chaque période
+        now: Fin de la période courante
+
+    Returns:
+        Dict: current, previous et change_percent (None si données manquantes)
+    """
+    now = now or timezone.now()
+    period = timedelta(days=days)
+
+    value_now = get_snapshot_value_at(field_name, now)
+    value_start = get_snapshot_value_at(field_name, now - period)
+    value_previous = get_snapshot_value_at(field_name, now - 2 * period)
+
+    current = previous = change_percent = None
+    if value_now is not None and value_start is not None:
+        current = value_now - value_start
+    if value_start is not None and value_previous is not None:
+        previous = value_start - value_previous
+    if current is not None and previous:
+        change_percent = round(float((current - previous) / previous) * 100, 2)
+
+    return {
+        'current': current,
+        'previous': previous,
+        'change_percent': change_percent,
+    }
@@ -1,3 +1,861 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import mock
+import gzip
+import json
+import zipfile
 
-# Create your tests here.
+import numpy as np
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from marketing.models import Coupon
+from orders.models import Order, OrderItem, ShippingRate, ShippingZone
+from payments.models import Payment, PaymentMethod
+from shop.models import Category, Product, ProductVariant, Stock
+
+from .activity_log import ActivityLogBuffer, archive_activity_logs
+from .analytics import (
+    OrderArrays,
+    compute_cohorts,
+    compute_rfm,
+    get_customer_analytics_context,
+    quintile_scores,
+    refresh_customer_analytics,
+)
+from .admin import admin_site
+from .alert_service import evaluate_alerts
+from .models import (
+    AdminActivityLog,
+    CustomerCohort,
+    CustomerRFMScore,
+    DashboardAlert,
+    DashboardSnapshot,
+)
+from .services import (
+    DASHBOARD_METRICS_CACHE_KEY,
+    DASHBOARD_METRICS_LOCK_KEY,
+    build_dashboard_alerts,
+    compare_periods,
+    compute_dashboard_metrics,
+    downsample_snapshots,
+    get_dashboard_metrics,
+    get_snapshot_series,
+    get_stored_granularities,
+    truncate_to_granularity,
+)
+
+
+class DashboardDataMixin:
+    """Génère des commandes, produits et clients de test"""
+
+    def create_catalog(self, count, start=0):
+        category, _ = Category.objects.get_or_create(name='Vêtements', slug='vetements')
+        for i in range(start, start + count):
+            product = Product.objects.create(
+                name=f'Produit {i}',
+                slug=f'produit-{i}',
+                description='Description',
+                category=category,
+                base_price=Decimal('1000'),
+                main_image='products/test.jpg',
+            )
+            variant = ProductVariant.objects.create(product=product, sku=f'SKU-{i}', size='M')
+            # Un produit sur deux est en rupture
+            Stock.objects.create(variant=variant, quantity=(i % 2) * 20, reserved_quantity=0)
+
+    def create_orders(self, count, start=0):
+        for i in range(start, start + count):
+            user = User.objects.create_user(username=f'client{i}', email=f'client{i}@test.ga')
+            paid = i % 2 == 0
+            order = Order.objects.create(
+                order_number=f'ORD-TEST-{i:05d}',
+                customer=user.customer,
+                customer_email=user.email,
+                customer_phone='+24101020304',
+                subtotal=Decimal('5000'),
+                total=Decimal('5000'),
+                status='pending' if paid else 'processing',
+                is_paid=paid,
+                paid_at=timezone.now() if paid else None,
+            )
+            OrderItem.objects.create(
+                order=order,
+                product_name='Produit',
+                unit_price=Decimal('2500'),
+                quantity=2,
+            )
+            Payment.objects.create(
+                order=order,
+                amount=order.total,
+                status='completed' if paid else 'pending',
+            )
+
+
+class DashboardMetricsTests(DashboardDataMixin, TestCase):
+
+    def test_metrics_values(self):
+        self.create_catalog(4)
+        self.create_orders(6)
+
+        metrics = compute_dashboard_metrics()
+
+        self.assertEqual(metrics.total_orders, 6)
+        self.assertEqual(metrics.orders_today, 6)
+        self.assertEqual(metrics.paid_orders, 3)
+        self.assertEqual(metrics.pending_orders, 6)
+        self.assertEqual(metrics.total_revenue, Decimal('15000'))
+        self.assertEqual(metrics.revenue_today, Decimal('15000'))
+        self.assertEqual(metrics.avg_order_value, Decimal('5000'))
+        self.assertEqual(metrics.conversion_rate, 50.0)
+        self.assertEqual(metrics.total_products, 4)
+        self.assertEqual(metrics.out_of_stock, 2)
+        self.assertEqual(metrics.total_items_sold, 6)
+        self.assertEqual(metrics.total_customers, 6)
+        self.assertEqual(metrics.active_customers, 6)
+        self.assertEqual(metrics.successful_payments, 3)
+        self.assertEqual(metrics.pending_payments, 3)
+        self.assertEqual(len(metrics.orders_chart_data), 30)
+        self.assertEqual(metrics.orders_chart_data[-1], 6)
+        self.assertEqual(metrics.revenue_chart_data[-1], 15000.0)
+
+    def test_query_count_is_constant(self):
+        self.create_catalog(2)
+        self.create_orders(2)
+        with CaptureQueriesContext(connection) as small:
+            compute_dashboard_metrics()
+
+        self.create_catalog(20, start=2)
+        self.create_orders(40, start=2)
+        with CaptureQueriesContext(connection) as large:
+            compute_dashboard_metrics()
+
+        self.assertEqual(len(small), len(large))
+        self.assertLessEqual(len(large), 12)
+
+    def test_snapshot_query_count_is_constant(self):
+        self.create_orders(2)
+        with CaptureQueriesContext(connection) as small:
+            DashboardSnapshot.create_snapshot()
+
+        self.create_orders(30, start=2)
+        with CaptureQueriesContext(connection) as large:
+            snapshot = DashboardSnapshot.create_snapshot()
+
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(snapshot.total_orders, 32)
+        self.assertEqual(snapshot.total_revenue, Decimal('80000'))
+
+
+class DashboardMetricsCacheTests(DashboardDataMixin, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.create_orders(2)
+
+    def test_fresh_metrics_are_served_from_cache(self):
+        first = get_dashboard_metrics()
+        self.create_orders(1, start=2)
+
+        with self.assertNumQueries(0):
+            second = get_dashboard_metrics()
+
+        self.assertEqual(second.total_orders, first.total_orders)
+        self.assertFalse(second.is_stale)
+
+    @override_settings(DASHBOARD_METRICS_FRESHNESS=-1)
+    def test_stale_metrics_trigger_a_single_refresh(self):
+        get_dashboard_metrics()
+
+        with mock.patch('dashboard.services._start_background_refresh') as refresh:
+            with self.assertNumQueries(0):
+                results = [get_dashboard_metrics() for _ in range(5)]
+
+        refresh.assert_called_once()
+        self.assertTrue(all(metrics.is_stale for metrics in results))
+        self.assertTrue(cache.get(DASHBOARD_METRICS_LOCK_KEY))
+
+    def test_force_refresh_recomputes(self):
+        get_dashboard_metrics()
+        self.create_orders(1, start=2)
+
+        metrics = get_dashboard_metrics(force_refresh=True)
+
+        self.assertEqual(metrics.total_orders, 3)
+        self.assertEqual(get_dashboard_metrics().total_orders, 3)
+
+
+class SnapshotTimeSeriesTests(TestCase):
+
+    def setUp(self):
+        self.now = truncate_to_granularity(timezone.now(), 'day') + timedelta(hours=12)
+
+    def create_minute_snapshots(self, start, count, step=timedelta(minutes=1)):
+        DashboardSnapshot.objects.bulk_create([
+            DashboardSnapshot(
+                snapshot_date=start + i * step,
+                total_orders=i,
+                total_revenue=Decimal(i * 100),
+            )
+            for i in range(count)
+        ])
+
+    def test_minutes_roll_up_to_last_value_per_hour(self):
+        # 3 heures complètes de snapshots minute, 2 jours plus tôt
+        start = self.now - timedelta(days=2)
+        self.create_minute_snapshots(start, 180)
+        # Snapshots récents : conservés à la minute
+        self.create_minute_snapshots(self.now - timedelta(minutes=10), 5)
+
+        stats = downsample_snapshots(now=self.now)
+
+        hourly = DashboardSnapshot.objects.filter(granularity='hour').order_by('snapshot_date')
+        self.assertEqual(stats['hour'], 3)
+        self.assertEqual([s.total_orders for s in hourly], [59, 119, 179])
+        self.assertEqual(hourly[0].snapshot_date, start)
+        self.assertEqual(DashboardSnapshot.objects.filter(granularity='minute').count(), 5)
+
+    def test_hours_roll_up_to_days_and_old_days_are_purged(self):
+        old_hours = [
+            DashboardSnapshot(
+                snapshot_date=self.now - timedelta(days=40) + timedelta(hours=i),
+                granularity='hour',
+                total_orders=i,
+            )
+            for i in range(24)
+        ]
+        ancient = DashboardSnapshot(
+            snapshot_date=self.now - timedelta(days=1000),
+            granularity='day',
+        )
+        DashboardSnapshot.objects.bulk_create(old_hours + [ancient])
+
+        stats = downsample_snapshots(now=self.now)
+
+        self.assertEqual(stats['day'], 2)
+        self.assertEqual(DashboardSnapshot.objects.filter(granularity='hour').count(), 0)
+        self.assertEqual(
+            list(DashboardSnapshot.objects.filter(granularity='day').values_list('total_orders', flat=True)),
+            [23, 11]
+        )
+
+    def test_series_and_period_comparison(self):
+        # Moins de 30 jours : snapshots conservés à l'heure
+        for day in range(14, -1, -1):
+            DashboardSnapshot.objects.create(
+                snapshot_date=self.now - timedelta(days=day),
+                granularity='hour',
+                total_orders=(14 - day) * 2,
+                total_revenue=Decimal((14 - day) * 1000) + (Decimal(500) * max(0, 7 - day)),
+            )
+
+        series = get_snapshot_series(self.now - timedelta(days=3), self.now, granularity='day')
+        self.assertEqual(len(series), 4)
+        self.assertEqual(series[-1]['total_orders'], 28)
+
+        comparison = compare_periods('total_orders', days=7, now=self.now)
+        self.assertEqual(comparison['current'], 14)
+        self.assertEqual(comparison['previous'], 14)
+        self.assertEqual(comparison['change_percent'], 0.0)
+
+        comparison = compare_periods('total_revenue', days=7, now=self.now)
+        self.assertEqual(comparison['current'], Decimal('10500'))
+        self.assertEqual(comparison['previous'], Decimal('7000'))
+        self.assertEqual(comparison['change_percent'], 50.0)
+
+    def test_series_reads_only_the_resolutions_kept_for_the_range(self):
+        self.assertEqual(get_stored_granularities(self.now - timedelta(hours=2), self.now, self.now), ['minute'])
+        self.assertEqual(
+            get_stored_granularities(self.now - timedelta(days=3), self.now, self.now), ['minute', 'hour']
+        )
+        self.assertEqual(
+            get_stored_granularities(self.now - timedelta(days=60), self.now - timedelta(days=40), self.now),
+            ['day']
+        )
+
+        # Seule la résolution conservée sur la plage est lue
+        DashboardSnapshot.objects.bulk_create([
+            DashboardSnapshot(snapshot_date=self.now - timedelta(days=45), granularity='day', total_orders=1),
+            DashboardSnapshot(snapshot_date=self.now - timedelta(days=45, minutes=-5), total_orders=99),
+        ])
+        with mock.patch('django.utils.timezone.now', return_value=self.now):
+            series = get_snapshot_series(self.now - timedelta(days=60), self.now - timedelta(days=40), granularity='day')
+        self.assertEqual([point['total_orders'] for point in series], [1])
+
+    def test_snapshot_metrics_command(self):
+        out = StringIO()
+        call_command('snapshot_metrics', stdout=out)
+
+        self.assertEqual(DashboardSnapshot.objects.filter(granularity='minute').count(), 1)
+        self.assertIn('enregistré', out.getvalue())
+
+
+@override_settings(DASHBOARD_ALERT_THRESHOLDS={'orders_pending': 2})
+class AlertEngineTests(DashboardDataMixin, TestCase):
+
+    def test_rules_create_deduplicate_and_resolve(self):
+        self.create_catalog(4)
+        self.create_orders(3)
+        coupon = Coupon.objects.create(
+            code='FLASH',
+            discount_value=Decimal('10'),
+            usage_limit=10,
+            times_used=10,
+            valid_from=timezone.now() - timedelta(days=1),
+            valid_until=timezone.now() + timedelta(days=1),
+        )
+
+        stats = evaluate_alerts()
+
+        # 1 commandes en attente + 2 ruptures + 1 coupon
+        self.assertEqual(stats['created'], 4)
+        self.assertEqual(DashboardAlert.objects.filter(alert_type='stock_out').count(), 2)
+        self.assertTrue(DashboardAlert.objects.filter(fingerprint='orders_pending').exists())
+        self.assertTrue(
+            DashboardAlert.objects.filter(fingerprint=f'coupon_exhausted:coupon:{coupon.pk}').exists()
+        )
+
+        # Deuxième passage : aucune nouvelle alerte
+        self.assertEqual(evaluate_alerts()['created'], 0)
+        self.assertEqual(DashboardAlert.objects.count(), 4)
+
+        # La condition disparaît : résolution automatique
+        Stock.objects.update(quantity=50)
+        Coupon.objects.update(usage_limit=100)
+        stats = evaluate_alerts()
+        self.assertEqual(stats['resolved'], 3)
+        self.assertEqual(DashboardAlert.objects.filter(is_resolved=False).count(), 1)
+
+    def test_concurrent_evaluation_does_not_duplicate_open_alerts(self):
+        self.create_orders(3)
+        bulk_create = DashboardAlert.objects.bulk_create
+
+        def racing_bulk_create(alerts, **kwargs):
+            # Une autre évaluation insère la même alerte après notre lecture
+            DashboardAlert.objects.create(
+                fingerprint='orders_pending', alert_type='orders_pending', title='Concurrente', message=''
+            )
+            return bulk_create(alerts, **kwargs)
+
+        with mock.patch.object(DashboardAlert.objects, 'bulk_create', racing_bulk_create):
+            stats = evaluate_alerts(alert_types=['orders_pending'])
+
+        # L'alerte de l'autre évaluation n'est pas comptée comme créée
+        self.assertEqual(stats['created'], 0)
+        self.assertEqual(
+            DashboardAlert.objects.filter(fingerprint='orders_pending', is_resolved=False).count(), 1
+        )
+
+    def test_query_count_is_constant(self):
+        self.create_catalog(4)
+        self.create_orders(3)
+        with CaptureQueriesContext(connection) as small:
+            evaluate_alerts()
+
+        self.create_catalog(40, start=4)
+        Stock.objects.update(quantity=0)
+        with CaptureQueriesContext(connection) as large:
+            stats = evaluate_alerts()
+
+        self.assertEqual(stats['created'], 42)
+        self.assertEqual(len(small), len(large))
+
+    def test_payment_failure_rate(self):
+        self.create_orders(10)
+        Payment.objects.filter(status='pending').update(status='failed')
+
+        evaluate_alerts(alert_types=['payment_failed'])
+
+        alert = DashboardAlert.objects.get(fingerprint='payment_failed')
+        self.assertIn('50.0%', alert.message)
+
+        Payment.objects.update(status='completed')
+        self.assertFalse(alert.check_condition())
+
+    def test_stale_mobile_payments(self):
+        self.create_orders(4)
+        method = PaymentMethod.objects.create(name='Moov Money', slug='moov')
+        Payment.objects.filter(status='pending').update(
+            payment_method=method, created_at=timezone.now() - timedelta(hours=2)
+        )
+
+        evaluate_alerts(alert_types=['payment_stale'])
+
+        alert = DashboardAlert.objects.get(fingerprint='payment_stale')
+        self.assertIn('2 paiement(s)', alert.message)
+
+        Payment.objects.update(status='failed')
+        self.assertFalse(alert.check_condition())
+
+    def test_dashboard_reads_open_alerts(self):
+        self.create_catalog(4)
+        call_command('evaluate_alerts', stdout=StringIO())
+        metrics = compute_dashboard_metrics()
+
+        with self.assertNumQueries(1):
+            alerts = build_dashboard_alerts(metrics)
+
+        # Les deux ruptures sont regroupées en une seule ligne
+        stock_alerts = [a for a in alerts if a['type'] == 'danger']
+        self.assertEqual(len(stock_alerts), 1)
+        self.assertIn('2 variante(s)', stock_alerts[0]['message'])
+
+
+TEST_STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class AdminDashboardViewTests(DashboardDataMixin, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser('admin', 'admin@test.ga', 'pass')
+        self.client.force_login(self.admin)
+
+    def test_admin_index_query_count_is_constant(self):
+        self.create_catalog(5)
+        self.create_orders(5)
+        # Premier appel : mise en cache des paramètres du site
+        self.client.get('/admin/')
+        cache.delete(DASHBOARD_METRICS_CACHE_KEY)
+        with CaptureQueriesContext(connection) as small:
+            response = self.client.get('/admin/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('error_message', response.context)
+
+        self.create_catalog(20, start=5)
+        self.create_orders(40, start=5)
+        cache.delete(DASHBOARD_METRICS_CACHE_KEY)
+        with CaptureQueriesContext(connection) as large:
+            self.client.get('/admin/')
+
+        self.assertEqual(len(small), len(large))
+
+    def test_force_refresh_button(self):
+        self.create_orders(1)
+        response = self.client.get('/admin/')
+        self.assertContains(response, 'Données calculées le')
+        self.assertContains(response, 'refresh_metrics')
+
+        self.create_orders(2, start=1)
+        response = self.client.post('/admin/', {'refresh_metrics': '1'})
+        self.assertRedirects(response, '/admin/')
+
+        response = self.client.get('/admin/')
+        self.assertEqual(response.context['total_orders'], 3)
+
+
+class StreamingExportTests(DashboardDataMixin, TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@test.ga', 'pass')
+        self.client.force_login(self.admin)
+
+    def export(self, dataset, **params):
+        response = self.client.get(f'/admin/export/{dataset}/', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_orders_csv_with_items_and_status_filter(self):
+        self.create_orders(4)
+
+        lines = self.export('orders').decode('utf-8-sig').splitlines()
+        self.assertEqual(len(lines), 5)
+        self.assertTrue(lines[0].startswith('order_number;created_at;status'))
+
+        lines = self.export('orders', status='processing').decode('utf-8-sig').splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertIn('ORD-TEST-00001', lines[1])
+
+    def test_payments_jsonl_with_date_filter(self):
+        self.create_orders(3)
+        Payment.objects.filter(order__order_number='ORD-TEST-00000').update(
+            created_at=timezone.now() - timedelta(days=10)
+        )
+        since = (timezone.localdate() - timedelta(days=1)).isoformat()
+
+        rows = [
+            json.loads(line)
+            for line in self.export('payments', format='jsonl', date_from=since).splitlines()
+        ]
+
+        self.assertEqual(len(rows), 2)
+        self.assertEqual({row['order_number'] for row in rows}, {'ORD-TEST-00001', 'ORD-TEST-00002'})
+        self.assertEqual(rows[0]['amount'], '5000.00')
+
+    def test_customers_xlsx_is_a_valid_workbook(self):
+        self.create_orders(3)
+
+        content = self.export('customers', format='xlsx')
+
+        with zipfile.ZipFile(BytesIO(content)) as archive:
+            self.assertIsNone(archive.testzip())
+            sheet = archive.read('xl/worksheets/sheet1.xml').decode('utf-8')
+        # En-tête + 3 clients + l'administrateur
+        self.assertEqual(sheet.count('<row>'), 5)
+        self.assertIn('client2@test.ga', sheet)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self.create_orders(3)
+        with CaptureQueriesContext(connection) as small:
+            self.export('orders')
+
+        self.create_orders(40, start=3)
+        with CaptureQueriesContext(connection) as large:
+            self.export('orders')
+
+        self.assertEqual(len(small), len(large))
+
+    def test_invalid_parameters_and_permissions(self):
+        response = self.client.get('/admin/export/orders/', {'date_from': '2025-13-45'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/admin/export/orders/', {'format': 'pdf'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/admin/export/unknown/')
+        self.assertEqual(response.status_code, 400)
+
+        staff = User.objects.create_user('staff', 'staff@test.ga', 'pass', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get('/admin/export/orders/')
+        self.assertEqual(response.status_code, 403)
+
+        self.client.logout()
+        response = self.client.get('/admin/export/orders/')
+        self.assertEqual(response.status_code, 302)
+
+    def test_export_data_command(self):
+        self.create_orders(2)
+        out = StringIO()
+
+        call_command('export_data', 'orders', '--format', 'jsonl', '--status', 'pending', stdout=out)
+
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['item_quantity'], 2)
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class AdminChangelistQueryCountTests(DashboardDataMixin, TestCase):
+    """Le nombre de requêtes d'une page de liste ne dépend pas du nombre de lignes"""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser('admin', 'admin@test.ga', 'pass')
+        self.client.force_login(self.admin)
+
+    def assertConstantChangelistQueries(self, model, create_rows, sort_column):
+        url = reverse(f'admin:{model._meta.app_label}_{model._meta.model_name}_changelist')
+        model_admin = admin_site._registry[model]
+        sort_index = list(model_admin.list_display).index(sort_column)
+        self.client.get(url)
+
+        create_rows(0, 10)
+        with CaptureQueriesContext(connection) as small:
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+        create_rows(10, 100)
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(url, {'o': f'-{sort_index + 1}'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['cl'].result_count, model.objects.count())
+        self.assertEqual(len(response.context['cl'].result_list), 100)
+        self.assertEqual(len(small), len(large), msg=f'{model.__name__} : requêtes par ligne')
+
+    def create_zones(self, start, end):
+        for i in range(start, end):
+            zone = ShippingZone.objects.create(name=f'Zone {i}', slug=f'zone-{i}')
+            rate = ShippingRate.objects.create(zone=zone, delivery_type='standard', price=Decimal('1000'))
+            Order.objects.create(
+                order_number=f'ORD-ZONE-{i:05d}',
+                customer=self.admin.customer,
+                customer_email=self.admin.email,
+                customer_phone='+24101020304',
+                subtotal=Decimal('5000'),
+                shipping_cost=Decimal('1000'),
+                total=Decimal('6000'),
+                shipping_zone=zone,
+                shipping_rate=rate,
+            )
+
+    def test_shipping_zone_changelist(self):
+        self.assertConstantChangelistQueries(ShippingZone, self.create_zones, 'orders_count')
+
+    def test_shipping_rate_changelist(self):
+        self.assertConstantChangelistQueries(ShippingRate, self.create_zones, 'orders_count')
+
+    def test_order_changelist(self):
+        self.assertConstantChangelistQueries(
+            Order, lambda start, end: self.create_orders(end - start, start=start), 'item_count_display'
+        )
+
+    def test_product_changelist(self):
+        self.assertConstantChangelistQueries(
+            Product, lambda start, end: self.create_catalog(end - start, start=start), 'stock_status'
+        )
+
+    def test_category_changelist(self):
+        def create_categories(start, end):
+            for i in range(start, end):
+                category = Category.objects.create(name=f'Catégorie {i}', slug=f'categorie-{i}')
+                Category.objects.create(name=f'Sous-catégorie {i}', slug=f'sous-categorie-{i}', parent=category)
+
+        self.assertConstantChangelistQueries(Category, create_categories, 'product_count')
+
+    def test_payment_method_changelist(self):
+        def create_methods(start, end):
+            for i in range(start, end):
+                PaymentMethod.objects.create(name=f'Méthode {i}', slug=f'methode-{i}')
+
+        self.assertConstantChangelistQueries(PaymentMethod, create_methods, 'payment_count')
+
+
+@mock.patch('dashboard.activity_log._start_flush_worker')
+class ActivityLogBufferTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('staff', 'staff@test.ga')
+        self.buffer = ActivityLogBuffer(batch_size=3)
+        for target, value in [('_buffer', self.buffer), ('atexit', mock.DEFAULT)]:
+            patcher = mock.patch(f'dashboard.activity_log.{target}', value)
+            patched = patcher.start()
+            self.addCleanup(patcher.stop)
+        self.atexit = patched
+
+    def log(self, count):
+        for i in range(count):
+            AdminActivityLog.log_action(
+                user=self.user,
+                action_type='order_edit',
+                description=f'Modification de la commande #{i}',
+                object_type='Order',
+                object_id=i,
+                data_after={'status': 'shipped'},
+            )
+
+    def test_actions_are_written_in_one_batch(self, start_worker):
+        with self.assertNumQueries(0):
+            self.log(5)
+
+        start_worker.assert_called_once_with(self.buffer)
+        self.atexit.register.assert_called_once_with(self.buffer._flush_at_exit)
+        self.assertEqual(self.buffer.pending, 5)
+        self.assertEqual(AdminActivityLog.objects.count(), 0)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.buffer.flush(), 5)
+        self.assertEqual(self.buffer.pending, 0)
+        self.assertEqual(AdminActivityLog.objects.filter(user=self.user).count(), 5)
+
+    def test_full_batch_wakes_the_writer(self, start_worker):
+        self.log(2)
+        self.assertFalse(self.buffer._wakeup.is_set())
+        self.log(1)
+        self.assertTrue(self.buffer._wakeup.is_set())
+
+    def failing_bulk_create(self, fails):
+        """bulk_create qui échoue dès qu'une entrée du lot vérifie fails(entry)"""
+        bulk_create = AdminActivityLog.objects.bulk_create
+
+        def create(entries, **kwargs):
+            if any(fails(entry) for entry in entries):
+                raise DatabaseError('écriture refusée')
+            return bulk_create(entries, **kwargs)
+        return mock.patch.object(AdminActivityLog.objects, 'bulk_create', create)
+
+    def test_failed_batch_is_written_row_by_row(self, start_worker):
+        self.log(5)
+
+        with self.failing_bulk_create(lambda entry: entry.object_id == 1):
+            self.assertEqual(self.buffer.flush(), 4)
+            # L'entrée en échec est retentée, puis abandonnée avec son contenu en log
+            self.assertEqual(self.buffer.pending, 1)
+            self.assertEqual(self.buffer.flush(), 0)
+            with self.assertLogs('dashboard.activity_log', 'ERROR') as logs:
+                self.assertEqual(self.buffer.flush(), 0)
+
+        self.assertEqual(self.buffer.pending, 0)
+        self.assertIn('commande #1', logs.output[0])
+        self.assertEqual(
+            sorted(AdminActivityLog.objects.values_list('object_id', flat=True)), [0, 2, 3, 4]
+        )
+
+    def test_entries_survive_a_database_outage(self, start_worker):
+        self.log(3)
+
+        with self.failing_bulk_create(lambda entry: True):
+            self.assertEqual(self.buffer.flush(), 0)
+        self.assertEqual(self.buffer.pending, 3)
+
+        self.assertEqual(self.buffer.flush(), 3)
+        self.assertEqual(AdminActivityLog.objects.count(), 3)
+
+    @override_settings(ADMIN_ACTIVITY_LOG_ASYNC=False)
+    def test_synchronous_mode(self, start_worker):
+        self.log(1)
+
+        start_worker.assert_not_called()
+        self.assertEqual(AdminActivityLog.objects.count(), 1)
+
+
+class ActivityLogArchiveTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('staff', 'staff@test.ga')
+        self.tmp = TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def create_logs(self, dates):
+        AdminActivityLog.objects.bulk_create([
+            AdminActivityLog(
+                user=self.user,
+                action_type='stock_update',
+                action_description=f'Stock {i}',
+                action_date=action_date,
+                data_before={'quantity': i},
+            )
+            for i, action_date in enumerate(dates)
+        ])
+
+    def read_archive(self, name):
+        with gzip.open(Path(self.tmp.name) / name, 'rt', encoding='utf-8') as archive:
+            return [json.loads(line) for line in archive]
+
+    def test_old_rows_are_moved_to_monthly_archives(self):
+        january = timezone.make_aware(timezone.datetime(2026, 1, 15, 12))
+        february = timezone.make_aware(timezone.datetime(2026, 2, 10, 12))
+        self.create_logs([january] * 3 + [february] * 2 + [timezone.now()])
+
+        out = StringIO()
+        call_command(
+            'archive_activity_logs', '--days', '30', '--chunk-size', '2',
+            '--output-dir', self.tmp.name, stdout=out
+        )
+
+        self.assertIn('5 entrée(s) archivée(s) dans 2 fichier(s)', out.getvalue())
+        self.assertEqual(AdminActivityLog.objects.count(), 1)
+        january_rows = self.read_archive('admin_activity_2026-01.jsonl.gz')
+        self.assertEqual(len(january_rows), 3)
+        self.assertEqual(january_rows[0]['data_before'], {'quantity': 0})
+        self.assertEqual(len(self.read_archive('admin_activity_2026-02.jsonl.gz')), 2)
+
+    def test_later_runs_append_to_the_month_archive(self):
+        january = timezone.make_aware(timezone.datetime(2026, 1, 15, 12))
+        cutoff = timezone.make_aware(timezone.datetime(2026, 2, 1))
+        self.create_logs([january] * 2)
+        archive_activity_logs(cutoff, self.tmp.name)
+        self.create_logs([january])
+        archive_activity_logs(cutoff, self.tmp.name)
+
+        rows = self.read_archive('admin_activity_2026-01.jsonl.gz')
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(len({row['id'] for row in rows}), 3)
+
+    def test_dry_run_keeps_rows(self):
+        self.create_logs([timezone.now() - timedelta(days=400)])
+
+        stats = archive_activity_logs(timezone.now(), self.tmp.name, dry_run=True)
+
+        self.assertEqual(stats['archived'], 1)
+        self.assertEqual(AdminActivityLog.objects.count(), 1)
+        self.assertFalse(any(Path(self.tmp.name).iterdir()))
+
+
+class CustomerAnalyticsTests(DashboardDataMixin, TestCase):
+
+    def orders(self, rows):
+        customer_ids, dates, totals = zip(*rows)
+        return OrderArrays(
+            np.array(customer_ids, dtype=np.int64),
+            np.array(dates, dtype='datetime64[s]'),
+            np.array(totals, dtype=np.float64),
+        )
+
+    def test_rfm_values_and_scores(self):
+        orders = self.orders([
+            (1, '2026-01-10T10:00', 1000),
+            (1, '2026-03-01T10:00', 3000),
+            (2, '2025-06-01T10:00', 500),
+            (3, '2026-02-20T10:00', 8000),
+        ])
+
+        rfm = compute_rfm(orders, np.datetime64('2026-03-11T10:00'))
+
+        self.assertEqual(rfm.customer_ids.tolist(), [1, 2, 3])
+        self.assertEqual(rfm.frequency.tolist(), [2, 1, 1])
+        self.assertEqual(rfm.monetary.tolist(), [4000, 500, 8000])
+        self.assertEqual(rfm.recency_days.tolist(), [10, 283, 19])
+        self.assertEqual(rfm.recency_score.tolist(), [5, 1, 3])
+        self.assertEqual(rfm.monetary_score.tolist(), [3, 1, 5])
+        self.assertEqual(rfm.segments[1], 'lost')
+
+    def test_ties_stay_in_the_lowest_quintile(self):
+        self.assertEqual(quintile_scores(np.array([1, 1, 1, 1, 1, 1, 4])).tolist(), [1] * 6 + [5])
+
+    def test_cohort_retention_matrix(self):
+        orders = self.orders([
+            (1, '2026-01-05T10:00', 1000),
+            (1, '2026-01-20T10:00', 1000),
+            (1, '2026-02-03T10:00', 1000),
+            (2, '2026-01-15T10:00', 1000),
+            (3, '2026-02-10T10:00', 1000),
+            (2, '2026-03-15T10:00', 1000),
+        ])
+
+        cohorts = compute_cohorts(orders)
+        cells = {
+            (str(month), int(period)): (int(size), int(active))
+            for month, period, size, active in zip(
+                cohorts.cohort_months, cohorts.periods, cohorts.cohort_sizes, cohorts.active_customers
+            )
+        }
+
+        self.assertEqual(cells, {
+            ('2026-01', 0): (2, 2),
+            ('2026-01', 1): (2, 1),
+            ('2026-01', 2): (2, 1),
+            ('2026-02', 0): (1, 1),
+        })
+
+    @override_settings(STORAGES=TEST_STORAGES)
+    def test_summary_tables_are_rendered_on_the_dashboard(self):
+        self.create_orders(6)
+
+        stats = refresh_customer_analytics(chunk_size=2)
+
+        self.assertEqual(stats['orders'], 3)
+        self.assertEqual(CustomerRFMScore.objects.count(), 3)
+        cohort = CustomerCohort.objects.get()
+        self.assertEqual((cohort.period, cohort.cohort_size, cohort.retention_rate), (0, 3, 1.0))
+
+        with self.assertNumQueries(2):
+            context = get_customer_analytics_context()
+        self.assertEqual(sum(row['count'] for row in context['customer_segments']), 3)
+        self.assertEqual(context['customer_cohorts'][0]['rates'][:2], [100, None])
+
+        admin = User.objects.create_superuser('admin', 'admin@test.ga', 'pass')
+        self.client.force_login(admin)
+        response = self.client.get('/admin/')
+        self.assertContains(response, 'Segments clients (RFM)')
+        self.assertContains(response, 'Rétention par cohorte mensuelle')
+        self.assertEqual(len(response.context['top_customers']), 3)
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('compute_customer_analytics', '--benchmark', '5000', stdout=out)
+        self.assertIn('5000 commande(s)', out.getvalue())
+        self.assertEqual(CustomerRFMScore.objects.count(), 0)
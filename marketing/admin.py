@@ -1,12 +1,50 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.http import StreamingHttpResponse
+from django.template.response import TemplateResponse
+from django.db.models import Count, Q
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils import timezone
-from .models import Coupon, CouponUsage, Promotion
+from core.paginator import LargeTableAdminMixin
+from dashboard.exports import iter_csv
+from .code_generator import (
+    CSV_HEADER,
+    DEFAULT_CODE_LENGTH,
+    CodeGenerationError,
+    CodeTemplate,
+    generate_coupon_codes,
+    iter_batch_rows,
+)
+from .campaigns import prepare_recipients
+from .models import CampaignRecipient, Coupon, CouponUsage, EmailCampaign, Promotion
+from .services import invalidate_coupon_cache
+
+
+class CouponCodeGenerationForm(forms.Form):
+    """Paramètres de l'action « Générer des codes uniques »"""
+    count = forms.IntegerField(
+        label="Nombre de codes",
+        min_value=1,
+        max_value=200000
+    )
+    prefix = forms.CharField(
+        label="Préfixe",
+        required=False,
+        max_length=40,
+        help_text="Exemple : RENTREE- donne RENTREE-7KQ2M9XD"
+    )
+    length = forms.IntegerField(
+        label="Caractères aléatoires",
+        min_value=4,
+        max_value=16,
+        initial=DEFAULT_CODE_LENGTH
+    )
 
 
 @admin.register(Coupon)
-class CouponAdmin(admin.ModelAdmin):
+class CouponAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     """
     Administration des coupons de réduction
     """
@@ -25,8 +63,8 @@ class CouponAdmin(admin.ModelAdmin):
         'valid_until',
         'created_at'
     ]
-    search_fields = ['code', 'description']
-    readonly_fields = ['times_used', 'created_at', 'updated_at']
+    search_fields = ['code', 'description', '=batch']
+    readonly_fields = ['times_used', 'batch', 'created_at', 'updated_at']
     date_hierarchy = 'valid_from'
     ordering = ['-created_at']
     
@@ -53,7 +91,7 @@ class CouponAdmin(admin.ModelAdmin):
             'fields': ('valid_from', 'valid_until')
         }),
         ('Configuration', {
-            'fields': ('is_active',)
+            'fields': ('is_active', 'batch')
         }),
         ('Dates', {
             'fields': ('created_at', 'updated_at'),
@@ -165,19 +203,64 @@ class CouponAdmin(admin.ModelAdmin):
             )
     status_display.short_description = "Statut"
     
-    actions = ['activate_coupons', 'deactivate_coupons']
+    actions = ['activate_coupons', 'deactivate_coupons', 'generate_codes']
     
     def activate_coupons(self, request, queryset):
         """Action pour activer des coupons"""
         updated = queryset.update(is_active=True)
+        invalidate_coupon_cache(*queryset.values_list('code', flat=True))
         self.message_user(request, f'{updated} coupon(s) activé(s).')
     activate_coupons.short_description = "Activer les coupons sélectionnés"
     
     def deactivate_coupons(self, request, queryset):
         """Action pour désactiver des coupons"""
         updated = queryset.update(is_active=False)
+        invalidate_coupon_cache(*queryset.values_list('code', flat=True))
         self.message_user(request, f'{updated} coupon(s) désactivé(s).')
     deactivate_coupons.short_description = "Désactiver les coupons sélectionnés"
+    
+    def generate_codes(self, request, queryset):
+        """
+        Action pour générer des codes à usage unique à partir d'un coupon modèle.
+        
+        Affiche le formulaire (nombre, préfixe, longueur), puis crée les codes
+        et renvoie leur liste en CSV, lue en flux depuis la base.
+        """
+        if queryset.count() != 1:
+            self.message_user(request, "Sélectionnez un seul coupon modèle.", messages.WARNING)
+            return None
+        template_coupon = queryset.get()
+        
+        form = CouponCodeGenerationForm(request.POST if 'apply' in request.POST else None)
+        if form.is_valid():
+            try:
+                result = generate_coupon_codes(
+                    template_coupon,
+                    form.cleaned_data['count'],
+                    CodeTemplate(prefix=form.cleaned_data['prefix'], length=form.cleaned_data['length'])
+                )
+            except CodeGenerationError as e:
+                form.add_error(None, str(e))
+            else:
+                response = StreamingHttpResponse(
+                    iter_csv(CSV_HEADER, iter_batch_rows(result.batch)),
+                    content_type='text/csv; charset=utf-8'
+                )
+                response['Content-Disposition'] = (
+                    f'attachment; filename="codes_{result.batch[:8]}.csv"'
+                )
+                return response
+        
+        context = {
+            **self.admin_site.each_context(request),
+            'title': f"Générer des codes à partir de {template_coupon.code}",
+            'opts': self.model._meta,
+            'form': form,
+            'template_coupon': template_coupon,
+            'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+        }
+        return TemplateResponse(request, 'admin/marketing/coupon/generate_codes.html', context)
+    generate_codes.short_description = "Générer des codes uniques à partir de ce coupon"
 
 
 @admin.register(CouponUsage)
@@ -200,6 +283,8 @@ class CouponUsageAdmin(admin.ModelAdmin):
         'order__order_number'
     ]
     readonly_fields = ['coupon', 'customer', 'order', 'discount_amount', 'used_at']
+    autocomplete_fields = ['coupon', 'customer', 'order']
+    list_select_related = ['coupon', 'customer__user', 'order']
     date_hierarchy = 'used_at'
     ordering = ['-used_at']
     
@@ -267,7 +352,8 @@ class PromotionAdmin(admin.ModelAdmin):
     ]
     search_fields = ['name', 'description']
     readonly_fields = ['created_at', 'updated_at']
-    filter_horizontal = ['products', 'categories']
+    autocomplete_fields = ['products']
+    filter_horizontal = ['categories']
     date_hierarchy = 'valid_from'
     ordering = ['-priority', '-created_at']
     
@@ -397,4 +483,107 @@ class PromotionAdmin(admin.ModelAdmin):
         """Action pour désactiver des promotions"""
         updated = queryset.update(is_active=False)
         self.message_user(request, f'{updated} promotion(s) désactivée(s).')
-    deactivate_promotions.short_description = "Désactiver les promotions sélectionnées"
\ No newline at end of file
+    deactivate_promotions.short_description = "Désactiver les promotions sélectionnées"
+
+
+@admin.register(EmailCampaign)
+class EmailCampaignAdmin(admin.ModelAdmin):
+    """
+    Administration des campagnes email
+    
+    L'envoi se fait hors requête : python manage.py send_campaign <id>
+    """
+    list_display = [
+        'name',
+        'target_segment',
+        'status_display',
+        'progress_display',
+        'started_at',
+        'completed_at'
+    ]
+    list_filter = ['status', 'target_segment', 'created_at']
+    search_fields = ['name', 'subject']
+    readonly_fields = ['status', 'created_at', 'started_at', 'completed_at']
+    
+    fieldsets = (
+        ('Message', {
+            'fields': ('name', 'subject', 'content')
+        }),
+        ('Destinataires', {
+            'fields': ('target_segment',),
+            'description': 'Clients actifs ayant accepté les notifications par email'
+        }),
+        ('Envoi', {
+            'fields': ('status', 'created_at', 'started_at', 'completed_at'),
+            'description': 'Lancer ou reprendre l\'envoi : python manage.py send_campaign <id>'
+        }),
+    )
+    
+    def get_queryset(self, request):
+        """Compteurs d'envoi calculés en une seule requête pour toute la liste"""
+        return super().get_queryset(request).annotate(
+            recipients_total=Count('recipients'),
+            recipients_sent=Count('recipients', filter=Q(recipients__status='sent')),
+            recipients_failed=Count('recipients', filter=Q(recipients__status='failed')),
+        )
+    
+    def status_display(self, obj):
+        """Affiche le statut avec un badge coloré"""
+        colors = {
+            'draft': '#999',
+            'sending': '#5bc0de',
+            'paused': '#f0ad4e',
+            'completed': '#5cb85c',
+        }
+        return format_html(
+            '<span style="background-color: {}; color: white; padding: 3px 8px; '
+            'border-radius: 3px; font-weight: bold;">{}</span>',
+            colors.get(obj.status, '#999'),
+            obj.get_status_display()
+        )
+    status_display.short_description = "Statut"
+    status_display.admin_order_field = 'status'
+    
+    def progress_display(self, obj):
+        """Affiche les envois réussis / total et les échecs"""
+        if not obj.recipients_total:
+            return '-'
+        return format_html(
+            '{} / {} envoyé(s)<br><small style="color: #d9534f;">{} échec(s)</small>',
+            obj.recipients_sent,
+            obj.recipients_total,
+            obj.recipients_failed
+        )
+    progress_display.short_description = "Progression"
+    
+    actions = ['prepare_campaign_recipients', 'pause_campaigns']
+    
+    def prepare_campaign_recipients(self, request, queryset):
+        """Action pour figer la liste des destinataires avant l'envoi"""
+        for campaign in queryset.filter(status='draft'):
+            total = prepare_recipients(campaign)
+            self.message_user(request, f'{campaign.name} : {total} destinataire(s).')
+    prepare_campaign_recipients.short_description = "Préparer les destinataires"
+    
+    def pause_campaigns(self, request, queryset):
+        """Action pour interrompre l'envoi (repris par send_campaign)"""
+        updated = queryset.filter(status='sending').update(status='paused')
+        self.message_user(request, f'{updated} campagne(s) mise(s) en pause.')
+    pause_campaigns.short_description = "Mettre en pause l'envoi"
+
+
+@admin.register(CampaignRecipient)
+class CampaignRecipientAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    """
+    Suivi des envois par destinataire (lecture seule)
+    """
+    list_display = ['email', 'campaign', 'segment', 'status', 'attempts', 'sent_at', 'error']
+    list_filter = ['status', 'campaign']
+    search_fields = ['=email']
+    list_select_related = ['campaign']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
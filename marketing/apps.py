@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class MarketingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'marketing'
+
+    def ready(self):
+        # Invalidation du cache des codes promo
+        import marketing.signals  # noqa: F401
@@ -0,0 +1,374 @@
+"""
+marketing/campaigns.py - Envoi des campagnes d'emailing
+=======================================================
+
+Boucler sur EmailService.send_email() rendrait le template et ouvrirait une
+connexion SMTP pour chaque destinataire. Ici :
+- le template est rendu une seule fois par segment RFM ; la personnalisation
+  ([[prenom]], [[nom]], [[email]]) est une simple substitution de chaînes
+  sur le rendu découpé à l'avance
+- les destinataires sont traités par lots, répartis entre quelques threads
+  qui gardent chacun leur connexion SMTP ouverte pendant tout l'envoi
+- le débit global est plafonné (messages par seconde)
+- l'état de chaque destinataire (en attente, envoyé, échec) est enregistré
+  après chaque lot : un envoi interrompu reprend là où il s'était arrêté.
+  Au pire, les messages du lot en cours au moment de l'interruption sont
+  renvoyés : garder des lots modestes.
+
+Utilisé par la commande manage.py send_campaign.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import logging
+import re
+import threading
+import time
+from typing import Tuple
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db.models import Count, F, Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.html import escape, strip_tags
+
+from accounts.models import Customer
+from core.email_service import EmailService
+
+from .models import CampaignRecipient, EmailCampaign
+
+logger = logging.getLogger(__name__)
+
+CAMPAIGN_TEMPLATE = 'emails/campaign.html'
+PREPARE_CHUNK_SIZE = 2000
+
+# Variable -> champ du destinataire
+PLACEHOLDERS = {
+    'prenom': 'first_name',
+    'nom': 'last_name',
+    'email': 'email',
+}
+PLACEHOLDER_PATTERN = re.compile(r'\[\[(%s)\]\]' % '|'.join(PLACEHOLDERS))
+
+
+# ============================================
+# RENDU ET PERSONNALISATION
+# ============================================
+
+def _split_placeholders(text) -> Tuple[str, ...]:
+    """
+    Découpe un texte en alternance (littéral, variable, littéral, ...)
+
+    Les indices impairs sont des noms de champ du destinataire.
+    """
+    parts = PLACEHOLDER_PATTERN.split(text)
+    for index in range(1, len(parts), 2):
+        parts[index] = PLACEHOLDERS[parts[index]]
+    return tuple(parts)
+
+
+def _fill(parts, recipient, transform=str):
+    return ''.join(
+        part if index % 2 == 0 else transform(getattr(recipient, part) or '')
+        for index, part in enumerate(parts)
+    )
+
+
+@dataclass(frozen=True)
+class RenderedCampaign:
+    """Rendu d'une campagne pour un segment, prêt à être personnalisé"""
+    subject: Tuple[str, ...]
+    html: Tuple[str, ...]
+    text: Tuple[str, ...]
+
+    def personalize(self, recipient):
+        """(objet, texte, html) pour ce destinataire ; valeurs échappées dans le HTML"""
+        return (
+            _fill(self.subject, recipient),
+            _fill(self.text, recipient),
+            _fill(self.html, recipient, escape),
+        )
+
+
+def render_campaign(campaign, segment):
+    """Rend le template de la campagne pour un segment (une fois par envoi)"""
+    context = {
+        **EmailService._get_shop_context(),
+        'campaign': campaign,
+        'content': campaign.content,
+        'segment': segment,
+    }
+    html = render_to_string(CAMPAIGN_TEMPLATE, context)
+    return RenderedCampaign(
+        subject=_split_placeholders(campaign.subject),
+        html=_split_placeholders(html),
+        text=_split_placeholders(strip_tags(html)),
+    )
+
+
+# ============================================
+# DESTINATAIRES
+# ============================================
+
+def prepare_recipients(campaign, chunk_size=PREPARE_CHUNK_SIZE):
+    """
+    Fige la liste des destinataires : clients actifs, avec email, abonnés
+    aux notifications par email et, le cas échéant, du segment ciblé.
+
+    Idempotent (contrainte unique campagne + client) : un second appel
+    n'ajoute que les nouveaux abonnés.
+
+    Returns:
+        int: Nombre total de destinataires de la campagne
+    """
+    customers = Customer.objects.filter(
+        email_notifications=True,
+        user__is_active=True
+    ).exclude(user__email='')
+    if campaign.target_segment:
+        customers = customers.filter(rfm_score__segment=campaign.target_segment)
+    
+    rows = customers.order_by('pk').values_list(
+        'pk', 'user__email', 'user__first_name', 'user__last_name', 'rfm_score__segment'
+    )
+    batch = []
+    for pk, email, first_name, last_name, segment in rows.iterator(chunk_size=chunk_size):
+        batch.append(CampaignRecipient(
+            campaign=campaign,
+            customer_id=pk,
+            email=email,
+            first_name=first_name,
+            last_name=last_name,
+            segment=segment or '',
+        ))
+        if len(batch) >= chunk_size:
+            CampaignRecipient.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    CampaignRecipient.objects.bulk_create(batch, ignore_conflicts=True)
+    
+    return campaign.recipients.count()
+
+
+def get_campaign_progress(campaign):
+    """Compteurs par état en une requête"""
+    return campaign.recipients.aggregate(
+        total=Count('pk'),
+        sent=Count('pk', filter=Q(status='sent')),
+        failed=Count('pk', filter=Q(status='failed')),
+        pending=Count('pk', filter=Q(status='pending')),
+    )
+
+
+# ============================================
+# ENVOI
+# ============================================
+
+class SendRateLimiter:
+    """
+    Espace les envois pour ne pas dépasser `rate` messages par seconde,
+    tous threads confondus (0 = pas de limite)
+    """
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class _ConnectionPool:
+    """Une connexion email ouverte par thread d'envoi, réutilisée pour tous ses messages"""
+
+    def __init__(self):
+        self.local = threading.local()
+        self.connections = []
+        self.lock = threading.Lock()
+
+    def get(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = get_connection()
+            connection.open()
+            self.local.connection = connection
+            with self.lock:
+                self.connections.append(connection)
+        return connection
+
+    def discard(self):
+        """Ferme la connexion du thread courant (erreur SMTP) ; la suivante sera rouverte"""
+        connection = getattr(self.local, 'connection', None)
+        self.local.connection = None
+        if connection is not None:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+    def close_all(self):
+        with self.lock:
+            connections, self.connections = self.connections, []
+        for connection in connections:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+
+@dataclass(frozen=True)
+class CampaignRunStats:
+    """Bilan d'un passage de send_campaign()"""
+    sent: int
+    failed: int
+    remaining: int
+    duration: float
+
+
+def _record_batch(recipients, errors):
+    """
+    Enregistre l'état des destinataires d'un lot : un UPDATE pour les envois
+    réussis, un bulk_update pour les échecs (messages d'erreur différents)
+
+    Returns:
+        tuple: (envoyés, échecs)
+    """
+    now = timezone.now()
+    delivered = [recipient.pk for recipient, error in zip(recipients, errors) if error is None]
+    undelivered = []
+    for recipient, error in zip(recipients, errors):
+        if error is not None:
+            recipient.status = 'failed'
+            recipient.error = error
+            recipient.attempts += 1
+            undelivered.append(recipient)
+    
+    if delivered:
+        CampaignRecipient.objects.filter(pk__in=delivered).update(
+            status='sent',
+            sent_at=now,
+            error='',
+            attempts=F('attempts') + 1
+        )
+    if undelivered:
+        CampaignRecipient.objects.bulk_update(undelivered, ['status', 'error', 'attempts'])
+    return len(delivered), len(undelivered)
+
+
+def send_campaign(campaign, batch_size=None, rate=None, workers=None, retry_failed=False):
+    """
+    Envoie (ou reprend) une campagne.
+
+    Prépare les destinataires si la campagne est encore en brouillon, puis
+    traite les destinataires en attente par lots. S'arrête à la fin, ou dès
+    que la campagne est mise en pause depuis l'admin (vérifié entre deux lots).
+
+    Args:
+        campaign (EmailCampaign): La campagne
+        batch_size (int): Destinataires par lot (défaut : CAMPAIGN_BATCH_SIZE)
+        rate (float): Messages par seconde au maximum (défaut : CAMPAIGN_SEND_RATE)
+        workers (int): Threads d'envoi, une connexion SMTP chacun (défaut : CAMPAIGN_WORKERS)
+        retry_failed (bool): Remettre en attente les échecs (sous CAMPAIGN_MAX_ATTEMPTS tentatives)
+
+    Returns:
+        CampaignRunStats: Envoyés, échecs, restants, durée
+    """
+    batch_size = batch_size or getattr(settings, 'CAMPAIGN_BATCH_SIZE', 200)
+    rate = getattr(settings, 'CAMPAIGN_SEND_RATE', 10) if rate is None else rate
+    workers = workers or getattr(settings, 'CAMPAIGN_WORKERS', 2)
+    started = time.perf_counter()
+    
+    if campaign.status == 'completed' and not retry_failed:
+        return CampaignRunStats(sent=0, failed=0, remaining=0, duration=0.0)
+    if campaign.status == 'draft':
+        prepare_recipients(campaign)
+    if retry_failed:
+        campaign.recipients.filter(
+            status='failed',
+            attempts__lt=getattr(settings, 'CAMPAIGN_MAX_ATTEMPTS', 3)
+        ).update(status='pending')
+    
+    EmailCampaign.objects.filter(pk=campaign.pk).update(
+        status='sending',
+        started_at=campaign.started_at or timezone.now()
+    )
+    
+    from_email = EmailService._get_from_email()
+    renders = {}
+    limiter = SendRateLimiter(rate)
+    pool = _ConnectionPool()
+    
+    def deliver(recipient):
+        """Envoie un message ; retourne None ou le message d'erreur"""
+        if recipient.segment not in renders:
+            # Rendu partagé entre threads : au pire calculé deux fois
+            renders[recipient.segment] = render_campaign(campaign, recipient.segment)
+        subject, text, html = renders[recipient.segment].personalize(recipient)
+        
+        limiter.wait()
+        try:
+            message = EmailMultiAlternatives(
+                subject=subject,
+                body=text,
+                from_email=from_email,
+                to=[recipient.email],
+                connection=pool.get()
+            )
+            message.attach_alternative(html, 'text/html')
+            message.send()
+            return None
+        except Exception as e:
+            pool.discard()
+            return str(e)[:255] or e.__class__.__name__
+    
+    sent = failed = 0
+    last_pk = 0
+    pending = campaign.recipients.filter(status='pending').only(
+        'pk', 'email', 'first_name', 'last_name', 'segment', 'attempts'
+    ).order_by('pk')
+    
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while True:
+                if EmailCampaign.objects.filter(pk=campaign.pk, status='paused').exists():
+                    logger.info(f"Campagne {campaign.pk} mise en pause")
+                    break
+                
+                batch = list(pending.filter(pk__gt=last_pk)[:batch_size])
+                if not batch:
+                    break
+                last_pk = batch[-1].pk
+                
+                errors = list(executor.map(deliver, batch))
+                batch_sent, batch_failed = _record_batch(batch, errors)
+                sent += batch_sent
+                failed += batch_failed
+    finally:
+        pool.close_all()
+    
+    progress = get_campaign_progress(campaign)
+    if not progress['pending']:
+        EmailCampaign.objects.filter(pk=campaign.pk, status='sending').update(
+            status='completed',
+            completed_at=timezone.now()
+        )
+    
+    stats = CampaignRunStats(
+        sent=sent,
+        failed=failed,
+        remaining=progress['pending'],
+        duration=time.perf_counter() - started
+    )
+    logger.info(
+        f"Campagne {campaign.pk} : {stats.sent} envoyé(s), {stats.failed} échec(s), "
+        f"{stats.remaining} en attente ({stats.duration:.1f} s)"
+    )
+    return stats
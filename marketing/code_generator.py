@@ -0,0 +1,223 @@
+"""
+marketing/code_generator.py - Génération en masse de codes promo uniques
+========================================================================
+
+Les campagnes distribuent des dizaines de milliers de codes à usage unique.
+Chaque code est créé à partir d'un coupon modèle (réduction, validité...)
+avec un code « préfixe + suffixe aléatoire en base32 » :
+- les suffixes sont tirés par paquets (secrets.token_bytes) et comparés en
+  mémoire à l'ensemble des codes existants de même préfixe, chargé une fois
+- les lignes sont insérées par paquets avec bulk_create(ignore_conflicts=True) ;
+  un code créé entre-temps par un autre processus est simplement ignoré
+- les lignes réellement insérées sont recomptées et les codes manquants
+  (collisions) sont régénérés
+
+La liste des codes du lot est relue en flux pour l'export CSV.
+Utilisé par :
+- la commande manage.py generate_coupon_codes
+- l'action « Générer des codes uniques » de CouponAdmin
+"""
+
+from dataclasses import dataclass
+import logging
+import secrets
+import time
+import uuid
+
+from django.db import transaction
+
+from .coupon_filter import invalidate_coupon_filter
+from .models import Coupon, normalize_coupon_code
+
+logger = logging.getLogger(__name__)
+
+# Base32 de Crockford : sans I, L, O ni U, pour éviter les confusions à la saisie
+CODE_ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+
+# Chaque octet aléatoire donne un caractère (256 est un multiple de 32 : tirage uniforme)
+_BYTE_TO_SYMBOL = bytes(ord(CODE_ALPHABET[i % 32]) for i in range(256))
+
+DEFAULT_CODE_LENGTH = 8
+GENERATION_CHUNK_SIZE = 5000
+
+# Au-delà, le préfixe n'offre plus assez de combinaisons libres
+MAX_CODE_SPACE_USAGE = 0.5
+
+# Tours de régénération sans aucun nouveau code avant abandon
+MAX_EMPTY_ROUNDS = 5
+
+# Champs recopiés du coupon modèle
+TEMPLATE_FIELDS = (
+    'description',
+    'discount_type',
+    'discount_value',
+    'max_discount_amount',
+    'minimum_purchase',
+    'valid_from',
+    'valid_until',
+    'is_active',
+)
+
+CSV_HEADER = ['Code', 'Réduction', 'Type', 'Valide jusqu\'au']
+
+
+class CodeGenerationError(ValueError):
+    """Paramètres de génération impossibles à satisfaire"""
+    pass
+
+
+@dataclass(frozen=True)
+class CodeTemplate:
+    """Forme des codes générés : préfixe + `length` caractères base32"""
+    prefix: str = ''
+    length: int = DEFAULT_CODE_LENGTH
+
+    @property
+    def normalized_prefix(self):
+        return normalize_coupon_code(self.prefix)
+
+    @property
+    def capacity(self):
+        return len(CODE_ALPHABET) ** self.length
+
+    def random_codes(self, count):
+        """`count` codes aléatoires (doublons possibles, filtrés par l'appelant)"""
+        symbols = secrets.token_bytes(count * self.length).translate(_BYTE_TO_SYMBOL).decode('ascii')
+        prefix = self.normalized_prefix
+        return [
+            prefix + symbols[i:i + self.length]
+            for i in range(0, len(symbols), self.length)
+        ]
+
+
+@dataclass(frozen=True)
+class GenerationResult:
+    """Bilan d'une génération"""
+    batch: str
+    created: int
+    collisions: int
+    duration: float
+
+
+def _check_template(code_template, count):
+    max_length = Coupon._meta.get_field('code').max_length
+    if code_template.length < 4:
+        raise CodeGenerationError("Le suffixe aléatoire doit compter au moins 4 caractères")
+    if len(code_template.normalized_prefix) + code_template.length > max_length:
+        raise CodeGenerationError(f"Les codes ne peuvent pas dépasser {max_length} caractères")
+    if count < 1:
+        raise CodeGenerationError("Le nombre de codes doit être positif")
+
+
+def _insert_codes(codes, prototype):
+    """
+    Insère les coupons `codes` sur le modèle de `prototype`, conflits ignorés.
+
+    bulk_create(ignore_conflicts=True) ne renvoie pas les lignes réellement
+    créées : elles sont recomptées ensuite (codes du lot, requête indexée).
+
+    Returns:
+        int: Nombre de coupons insérés
+    """
+    fields = [
+        field.attname for field in Coupon._meta.concrete_fields
+        if not field.primary_key and field.attname not in ('code', 'code_normalized')
+    ]
+    shared = {attname: getattr(prototype, attname) for attname in fields}
+    Coupon.objects.bulk_create(
+        [Coupon(code=code, code_normalized=code, **shared) for code in codes],
+        batch_size=len(codes),
+        ignore_conflicts=True,
+    )
+    return Coupon.objects.filter(batch=prototype.batch, code__in=codes).count()
+
+
+def generate_coupon_codes(template_coupon, count, code_template=CodeTemplate(),
+                          chunk_size=GENERATION_CHUNK_SIZE):
+    """
+    Crée `count` coupons à usage unique sur le modèle de `template_coupon`.
+
+    Tout le lot est créé dans une seule transaction : en cas d'erreur, aucun
+    code n'est conservé. Le filtre de Bloom des codes est invalidé après le
+    commit (l'insertion en masse ne déclenche pas les signaux).
+
+    Args:
+        template_coupon (Coupon): Coupon dont la réduction et la validité sont recopiées
+        count (int): Nombre de codes à créer
+        code_template (CodeTemplate): Préfixe et longueur du suffixe aléatoire
+        chunk_size (int): Lignes par bulk_create
+
+    Returns:
+        GenerationResult: Référence du lot, codes créés, collisions rencontrées
+
+    Raises:
+        CodeGenerationError: Préfixe/longueur invalides ou combinaisons insuffisantes
+    """
+    _check_template(code_template, count)
+    started = time.perf_counter()
+    batch = uuid.uuid4().hex
+    prefix = code_template.normalized_prefix
+
+    # Codes déjà pris pour ce préfixe, chargés une seule fois
+    taken = set(
+        Coupon.objects.filter(code_normalized__startswith=prefix)
+        .values_list('code_normalized', flat=True)
+        .iterator(chunk_size=chunk_size)
+    )
+    if len(taken) + count > code_template.capacity * MAX_CODE_SPACE_USAGE:
+        raise CodeGenerationError(
+            f"Combinaisons insuffisantes pour {count} codes : allongez le suffixe ou changez de préfixe"
+        )
+
+    prototype = Coupon(
+        usage_limit=1,
+        usage_limit_per_customer=1,
+        batch=batch,
+        **{field: getattr(template_coupon, field) for field in TEMPLATE_FIELDS}
+    )
+    attempted = 0
+    created = 0
+    empty_rounds = 0
+
+    with transaction.atomic():
+        while created < count:
+            remaining = count - created
+            codes = []
+            while len(codes) < remaining:
+                for code in code_template.random_codes(remaining - len(codes)):
+                    if code not in taken:
+                        taken.add(code)
+                        codes.append(code)
+
+            # Les codes insérés entre-temps par un autre processus ont été ignorés
+            inserted = sum(
+                _insert_codes(codes[start:start + chunk_size], prototype)
+                for start in range(0, len(codes), chunk_size)
+            )
+            attempted += len(codes)
+            created += inserted
+            empty_rounds = 0 if inserted else empty_rounds + 1
+            if empty_rounds >= MAX_EMPTY_ROUNDS:
+                raise CodeGenerationError("Trop de collisions : impossible de compléter le lot")
+
+        transaction.on_commit(invalidate_coupon_filter)
+
+    result = GenerationResult(
+        batch=batch,
+        created=created,
+        collisions=attempted - created,
+        duration=time.perf_counter() - started
+    )
+    logger.info(
+        f"Lot {batch} : {result.created} codes {prefix}* générés en {result.duration:.2f} s "
+        f"({result.collisions} collision(s))"
+    )
+    return result
+
+
+def iter_batch_rows(batch, chunk_size=GENERATION_CHUNK_SIZE):
+    """Lignes (code, réduction, type, fin de validité) du lot, lues en flux"""
+    rows = Coupon.objects.filter(batch=batch).order_by('pk').values_list(
+        'code', 'discount_value', 'discount_type', 'valid_until'
+    )
+    return rows.iterator(chunk_size=chunk_size)
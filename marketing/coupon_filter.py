@@ -0,0 +1,133 @@
+"""
+marketing/coupon_filter.py - Filtre de Bloom des codes promo
+============================================================
+
+Les scripts qui essaient des codes au hasard sur /marketing/api/apply/
+transformaient chaque tentative en requête SQL. Le filtre de Bloom contient
+tous les codes existants (normalisés) : un code absent du filtre est refusé
+sans toucher la base. Un code présent peut être un faux positif (~1 %), il
+est alors vérifié normalement (cache, puis colonne indexée code_normalized).
+
+Le filtre est partagé entre processus via le cache, avec un jeton de version :
+- toute création, suppression ou renommage de coupon change la version
+  (après le commit), ce qui force une reconstruction au prochain usage
+- chaque processus garde une copie locale tant que la version ne change pas :
+  une vérification coûte une seule lecture de cache
+"""
+
+import hashlib
+import logging
+import math
+import uuid
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+COUPON_FILTER_KEY = 'marketing:coupon_filter'
+COUPON_FILTER_VERSION_KEY = 'marketing:coupon_filter_version'
+
+# Taux de faux positifs visé et taille minimale du filtre
+FALSE_POSITIVE_RATE = 0.01
+MIN_CAPACITY = 1000
+
+
+class BloomFilter:
+    """
+    Ensemble probabiliste : « absent » est certain, « présent » est probable
+
+    Les k positions d'un élément sont dérivées de deux empreintes d'un même
+    hachage blake2b (double hachage de Kirsch-Mitzenmacher).
+    """
+
+    def __init__(self, size, hash_count, bits=None):
+        self.size = size
+        self.hash_count = hash_count
+        self.bits = bytearray(bits) if bits is not None else bytearray((size + 7) // 8)
+
+    @classmethod
+    def for_capacity(cls, capacity, false_positive_rate=FALSE_POSITIVE_RATE):
+        """Filtre dimensionné pour `capacity` éléments au taux de faux positifs donné"""
+        capacity = max(capacity, 1)
+        size = math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2)
+        hash_count = max(1, round(size / capacity * math.log(2)))
+        return cls(size, hash_count)
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return ((first + i * second) % self.size for i in range(self.hash_count))
+
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+    def to_state(self):
+        """Représentation sérialisable (cache)"""
+        return self.size, self.hash_count, bytes(self.bits)
+
+    @classmethod
+    def from_state(cls, state):
+        size, hash_count, bits = state
+        return cls(size, hash_count, bits)
+
+
+# Copie locale au processus : (version, filtre), remplacée d'un bloc
+_local_filter = (None, None)
+
+
+def _current_version():
+    version = cache.get(COUPON_FILTER_VERSION_KEY)
+    if version is None:
+        # Version perdue (éviction, redémarrage du cache) : en créer une
+        cache.add(COUPON_FILTER_VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(COUPON_FILTER_VERSION_KEY)
+    return version
+
+
+def build_coupon_filter():
+    """Construit le filtre à partir de tous les codes (une requête, en flux)"""
+    from .models import Coupon
+
+    codes = Coupon.objects.values_list('code_normalized', flat=True)
+    bloom = BloomFilter.for_capacity(max(codes.count() * 2, MIN_CAPACITY))
+    for code in codes.iterator(chunk_size=5000):
+        bloom.add(code)
+    return bloom
+
+
+def get_coupon_filter():
+    """Filtre à jour : copie locale, sinon cache partagé, sinon reconstruction"""
+    global _local_filter
+
+    version = _current_version()
+    local_version, local_bloom = _local_filter
+    if local_version == version:
+        return local_bloom
+
+    cached = cache.get(COUPON_FILTER_KEY)
+    if cached is not None and cached[0] == version:
+        bloom = BloomFilter.from_state(cached[1])
+    else:
+        # La version est lue AVANT les codes : si un coupon est créé pendant la
+        # construction, la version change et ce filtre ne sera pas réutilisé
+        bloom = build_coupon_filter()
+        cache.set(COUPON_FILTER_KEY, (version, bloom.to_state()), None)
+        logger.info("Filtre des codes promo reconstruit (%s bits)", bloom.size)
+
+    _local_filter = (version, bloom)
+    return bloom
+
+
+def coupon_code_might_exist(normalized_code):
+    """False si le code n'existe certainement pas"""
+    return normalized_code in get_coupon_filter()
+
+
+def invalidate_coupon_filter():
+    """Change la version : le filtre sera reconstruit au prochain usage"""
+    cache.set(COUPON_FILTER_VERSION_KEY, uuid.uuid4().hex, None)
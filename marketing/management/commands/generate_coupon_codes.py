@@ -0,0 +1,79 @@
+"""
+Commande : generate_coupon_codes
+================================
+
+Crée N coupons à usage unique sur le modèle d'un coupon existant (réduction,
+minimum d'achat, validité) et exporte la liste des codes en CSV
+(marketing/code_generator.py).
+
+Usage :
+    python manage.py generate_coupon_codes RENTREE --count 100000 --prefix RENTREE- -o codes.csv
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.exports import iter_csv
+from marketing.code_generator import (
+    CSV_HEADER,
+    DEFAULT_CODE_LENGTH,
+    GENERATION_CHUNK_SIZE,
+    CodeGenerationError,
+    CodeTemplate,
+    generate_coupon_codes,
+    iter_batch_rows,
+)
+from marketing.models import Coupon, normalize_coupon_code
+
+
+class Command(BaseCommand):
+    help = "Génère des codes promo uniques à usage unique à partir d'un coupon modèle"
+
+    def add_arguments(self, parser):
+        parser.add_argument('template', help='Code du coupon modèle')
+        parser.add_argument('--count', type=int, required=True, help='Nombre de codes à créer')
+        parser.add_argument('--prefix', default='', help='Préfixe des codes générés')
+        parser.add_argument(
+            '--length',
+            type=int,
+            default=DEFAULT_CODE_LENGTH,
+            help=f'Caractères aléatoires après le préfixe (défaut : {DEFAULT_CODE_LENGTH})'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=GENERATION_CHUNK_SIZE,
+            help=f'Lignes par INSERT (défaut : {GENERATION_CHUNK_SIZE})'
+        )
+        parser.add_argument(
+            '-o', '--output',
+            help='Fichier CSV des codes (sortie standard par défaut)'
+        )
+
+    def handle(self, *args, **options):
+        template = Coupon.objects.filter(code_normalized=normalize_coupon_code(options['template'])).first()
+        if template is None:
+            raise CommandError(f"Coupon modèle introuvable : {options['template']}")
+
+        try:
+            result = generate_coupon_codes(
+                template,
+                options['count'],
+                CodeTemplate(prefix=options['prefix'], length=options['length']),
+                chunk_size=max(1, options['chunk_size'])
+            )
+        except CodeGenerationError as e:
+            raise CommandError(str(e))
+
+        chunks = iter_csv(CSV_HEADER, iter_batch_rows(result.batch))
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+                for chunk in chunks:
+                    output.write(chunk)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+
+        self.stderr.write(self.style.SUCCESS(
+            f"{result.created} code(s) créé(s) en {result.duration:.2f} s "
+            f"(lot {result.batch}, {result.collisions} collision(s))"
+        ))
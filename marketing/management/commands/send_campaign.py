@@ -0,0 +1,47 @@
+"""
+Commande : send_campaign
+========================
+
+Envoie une campagne email aux clients abonnés (marketing/campaigns.py),
+par lots et à débit limité. Relancer la commande sur une campagne
+interrompue ou mise en pause reprend l'envoi aux destinataires en attente.
+
+Usage :
+    python manage.py send_campaign 12 --rate 20 --workers 4
+    python manage.py send_campaign 12 --retry-failed
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from marketing.campaigns import get_campaign_progress, send_campaign
+from marketing.models import EmailCampaign
+
+
+class Command(BaseCommand):
+    help = "Envoie ou reprend une campagne email"
+
+    def add_arguments(self, parser):
+        parser.add_argument('campaign_id', type=int)
+        parser.add_argument('--batch-size', type=int, help='Destinataires par lot (défaut : CAMPAIGN_BATCH_SIZE)')
+        parser.add_argument('--rate', type=float, help='Messages par seconde au maximum, 0 = illimité (défaut : CAMPAIGN_SEND_RATE)')
+        parser.add_argument('--workers', type=int, help='Connexions SMTP simultanées (défaut : CAMPAIGN_WORKERS)')
+        parser.add_argument('--retry-failed', action='store_true', help='Renvoyer aux destinataires en échec')
+
+    def handle(self, *args, **options):
+        try:
+            campaign = EmailCampaign.objects.get(pk=options['campaign_id'])
+        except EmailCampaign.DoesNotExist:
+            raise CommandError(f"Campagne introuvable : {options['campaign_id']}")
+
+        stats = send_campaign(
+            campaign,
+            batch_size=options['batch_size'],
+            rate=options['rate'],
+            workers=options['workers'],
+            retry_failed=options['retry_failed'],
+        )
+        progress = get_campaign_progress(campaign)
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats.sent} envoyé(s), {stats.failed} échec(s) en {stats.duration:.1f} s — "
+            f"campagne : {progress['sent']}/{progress['total']} envoyé(s), {progress['pending']} en attente"
+        ))
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.26 on 2026-10-19 07:15
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_redemptions(apps, schema_editor):
+    """Compteurs initiaux à partir de l'historique des utilisations"""
+    CouponUsage = apps.get_model('marketing', 'CouponUsage')
+    CouponRedemption = apps.get_model('marketing', 'CouponRedemption')
+
+    rows = CouponUsage.objects.order_by().values('coupon_id', 'customer_id').annotate(
+        times_used=models.Count('pk')
+    )
+    CouponRedemption.objects.bulk_create(
+        (CouponRedemption(**row) for row in rows.iterator()),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_customer_lifetime_stats'),
+        ('marketing', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CouponRedemption',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('times_used', models.IntegerField(default=0, validators=[django.core.validators.MinValueValidator(0)], verbose_name="Nombre d'utilisations")),
+                ('coupon', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='redemptions', to='marketing.coupon', verbose_name='Coupon')),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='coupon_redemptions', to='accounts.customer', verbose_name='Client')),
+            ],
+            options={
+                'verbose_name': "Compteur d'utilisation par client",
+                'verbose_name_plural': "Compteurs d'utilisation par client",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='couponredemption',
+            constraint=models.UniqueConstraint(fields=('coupon', 'customer'), name='uniq_coupon_redemption'),
+        ),
+        migrations.RunPython(backfill_redemptions, migrations.RunPython.noop),
+    ]
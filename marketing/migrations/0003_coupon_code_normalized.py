@@ -0,0 +1,33 @@
+from django.db import migrations, models
+
+
+def backfill_code_normalized(apps, schema_editor):
+    """Code normalisé des coupons existants (même règle que normalize_coupon_code)"""
+    Coupon = apps.get_model('marketing', 'Coupon')
+
+    coupons = list(Coupon.objects.only('code'))
+    for coupon in coupons:
+        coupon.code_normalized = coupon.code.strip().upper()
+    Coupon.objects.bulk_update(coupons, ['code_normalized'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketing', '0002_coupon_redemption'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coupon',
+            name='code_normalized',
+            field=models.CharField(default='', editable=False, max_length=50, verbose_name='Code normalisé'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_code_normalized, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='coupon',
+            name='code_normalized',
+            field=models.CharField(db_index=True, editable=False, max_length=50, verbose_name='Code normalisé'),
+        ),
+    ]
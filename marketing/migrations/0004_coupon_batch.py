@@ -0,0 +1,18 @@
+# Generated by Django 4.2.26 on 2026-10-19 07:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketing', '0003_coupon_code_normalized'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coupon',
+            name='batch',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=32, verbose_name='Lot de génération'),
+        ),
+    ]
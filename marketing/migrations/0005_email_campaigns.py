@@ -0,0 +1,59 @@
+# Generated by Django 4.2.26 on 2026-10-19 07:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_customer_lifetime_stats'),
+        ('marketing', '0004_coupon_batch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailCampaign',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, verbose_name='Nom de la campagne')),
+                ('subject', models.CharField(help_text='Variables : [[prenom]], [[nom]]', max_length=200, verbose_name="Objet de l'email")),
+                ('content', models.TextField(help_text='Variables remplacées pour chaque destinataire : [[prenom]], [[nom]], [[email]]', verbose_name='Contenu (HTML)')),
+                ('target_segment', models.CharField(blank=True, choices=[('', 'Tous les abonnés'), ('champions', 'Champions'), ('loyal', 'Fidèles'), ('new', 'Nouveaux'), ('at_risk', 'À risque'), ('lost', 'Perdus'), ('regular', 'Réguliers')], help_text='Segment RFM des destinataires (vide = tous les clients abonnés)', max_length=20, verbose_name='Segment ciblé')),
+                ('status', models.CharField(choices=[('draft', 'Brouillon'), ('sending', "En cours d'envoi"), ('paused', 'En pause'), ('completed', 'Terminée')], default='draft', max_length=20, verbose_name='Statut')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Créée le')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Envoi commencé le')),
+                ('completed_at', models.DateTimeField(blank=True, null=True, verbose_name='Envoi terminé le')),
+            ],
+            options={
+                'verbose_name': 'Campagne email',
+                'verbose_name_plural': 'Campagnes email',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CampaignRecipient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', models.EmailField(max_length=254, verbose_name='Email')),
+                ('first_name', models.CharField(blank=True, max_length=150, verbose_name='Prénom')),
+                ('last_name', models.CharField(blank=True, max_length=150, verbose_name='Nom')),
+                ('segment', models.CharField(blank=True, max_length=20, verbose_name='Segment')),
+                ('status', models.CharField(choices=[('pending', 'En attente'), ('sent', 'Envoyé'), ('failed', 'Échec')], default='pending', max_length=20, verbose_name='Statut')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Tentatives')),
+                ('error', models.CharField(blank=True, max_length=255, verbose_name='Dernière erreur')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='Envoyé le')),
+                ('campaign', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recipients', to='marketing.emailcampaign', verbose_name='Campagne')),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='campaign_messages', to='accounts.customer', verbose_name='Client')),
+            ],
+            options={
+                'verbose_name': 'Destinataire de campagne',
+                'verbose_name_plural': 'Destinataires de campagne',
+                'indexes': [models.Index(fields=['campaign', 'status', 'id'], name='campaign_recipient_queue')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='campaignrecipient',
+            constraint=models.UniqueConstraint(fields=('campaign', 'customer'), name='uniq_campaign_recipient'),
+        ),
+    ]
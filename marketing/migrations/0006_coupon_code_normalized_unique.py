@@ -0,0 +1,39 @@
+# Generated by Django 4.2.26 on 2026-10-19 08:32
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def check_duplicate_codes(apps, schema_editor):
+    """
+    Codes ne différant que par la casse : la migration s'arrête
+
+    Ces coupons ont pu être utilisés (CouponUsage) : ni suppression ni
+    renommage automatique, les doublons sont à corriger dans l'admin.
+    """
+    Coupon = apps.get_model('marketing', 'Coupon')
+
+    duplicated = list(
+        Coupon.objects.values('code_normalized').annotate(count=Count('pk')).filter(count__gt=1)
+        .values_list('code_normalized', flat=True)[:20]
+    )
+    if duplicated:
+        raise RuntimeError(
+            "Codes promo en double (casse ignorée), à renommer avant la migration : " + ', '.join(duplicated)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketing', '0005_email_campaigns'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicate_codes, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='coupon',
+            name='code_normalized',
+            field=models.CharField(editable=False, max_length=50, unique=True, verbose_name='Code normalisé'),
+        ),
+    ]
@@ -1,10 +1,17 @@
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.core.exceptions import ValidationError
 from django.utils import timezone
 from accounts.models import Customer
+from dashboard.models import CustomerRFMScore
 from shop.models import Product, Category
 
 
+def normalize_coupon_code(code):
+    """Forme canonique d'un code promo saisi : sans espaces autour, en majuscules"""
+    return code.strip().upper()
+
+
 class Coupon(models.Model):
     """
     Codes promo / bons de réduction
@@ -20,6 +27,15 @@ class Coupon(models.Model):
         unique=True,
         verbose_name="Code promo"
     )
+    # Recherche insensible à la casse par égalité sur une colonne indexée
+    # (un code__iexact ne peut pas utiliser l'index unique de `code`) ;
+    # unique : deux codes ne différant que par la casse seraient ambigus
+    code_normalized = models.CharField(
+        max_length=50,
+        unique=True,
+        editable=False,
+        verbose_name="Code normalisé"
+    )
     description = models.TextField(
         blank=True,
         verbose_name="Description"
@@ -92,6 +108,15 @@ class Coupon(models.Model):
         verbose_name="Actif"
     )
     
+    # Codes générés en masse (marketing.code_generator) : référence du lot
+    batch = models.CharField(
+        max_length=32,
+        blank=True,
+        db_index=True,
+        editable=False,
+        verbose_name="Lot de génération"
+    )
+    
     # Dates
     created_at = models.DateTimeField(
         auto_now_add=True,
@@ -110,6 +135,20 @@ class Coupon(models.Model):
     def __str__(self):
         return self.code
 
+    def clean(self):
+        super().clean()
+        # code_normalized n'est pas éditable : son unicité n'est pas vérifiée par le formulaire
+        duplicates = Coupon.objects.filter(code_normalized=normalize_coupon_code(self.code or '')).exclude(pk=self.pk)
+        if duplicates.exists():
+            raise ValidationError({'code': "Un coupon utilise déjà ce code (casse ignorée)."})
+
+    def save(self, *args, **kwargs):
+        self.code_normalized = normalize_coupon_code(self.code)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'code' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'code_normalized'}
+        super().save(*args, **kwargs)
+
     def calculate_discount(self, subtotal):
         """Calcule le montant de la réduction pour un sous-total donné"""
         if self.discount_type == 'percentage':
@@ -144,13 +183,10 @@ class Coupon(models.Model):
 
     def can_be_used_by_customer(self, customer):
         """Vérifie si le coupon peut être utilisé par ce client"""
-        from orders.models import Order
-        
-        # Compter les utilisations par ce client
-        usage_count = Order.objects.filter(
-            customer=customer,
-            coupon_code=self.code
-        ).count()
+        # Compteur par client (index unique coupon + client) tenu par redeem_coupon
+        usage_count = next(iter(
+            CouponRedemption.objects.filter(coupon=self, customer=customer).values_list('times_used', flat=True)
+        ), 0)
         
         if usage_count >= self.usage_limit_per_customer:
             return False, f"Vous avez déjà utilisé ce coupon {self.usage_limit_per_customer} fois"
@@ -200,6 +236,43 @@ class CouponUsage(models.Model):
         return f"{self.coupon.code} - {self.customer.full_name} - {self.used_at.strftime('%d/%m/%Y')}"
 
 
+class CouponRedemption(models.Model):
+    """
+    Compteur d'utilisations d'un coupon par client
+
+    Incrémenté par un UPDATE conditionnel (marketing.services.redeem_coupon) :
+    la limite par client reste exacte sous forte concurrence sans verrou
+    explicite sur le coupon.
+    """
+    coupon = models.ForeignKey(
+        Coupon,
+        on_delete=models.CASCADE,
+        related_name='redemptions',
+        verbose_name="Coupon"
+    )
+    customer = models.ForeignKey(
+        Customer,
+        on_delete=models.CASCADE,
+        related_name='coupon_redemptions',
+        verbose_name="Client"
+    )
+    times_used = models.IntegerField(
+        default=0,
+        validators=[MinValueValidator(0)],
+        verbose_name="Nombre d'utilisations"
+    )
+
+    class Meta:
+        verbose_name = "Compteur d'utilisation par client"
+        verbose_name_plural = "Compteurs d'utilisation par client"
+        constraints = [
+            models.UniqueConstraint(fields=['coupon', 'customer'], name='uniq_coupon_redemption'),
+        ]
+
+    def __str__(self):
+        return f"{self.coupon_id} - {self.customer_id} : {self.times_used}"
+
+
 class Promotion(models.Model):
     """
     Promotions sur produits/catégories
@@ -333,4 +406,128 @@ class Promotion(models.Model):
         if self.promotion_type == 'category':
             return self.categories.filter(pk=product.category.pk).exists()
         
-        return False
\ No newline at end of file
+        return False
+
+
+class EmailCampaign(models.Model):
+    """
+    Campagne d'emailing (newsletter, offre) envoyée aux clients abonnés
+
+    Envoi par `manage.py send_campaign` (marketing/campaigns.py) : un rendu du
+    template par segment, personnalisation par simple substitution, envoi par
+    lots à débit limité et état par destinataire pour reprendre un envoi
+    interrompu.
+    """
+    STATUS_CHOICES = [
+        ('draft', 'Brouillon'),
+        ('sending', 'En cours d\'envoi'),
+        ('paused', 'En pause'),
+        ('completed', 'Terminée'),
+    ]
+    SEGMENT_CHOICES = [('', 'Tous les abonnés')] + CustomerRFMScore.SEGMENT_CHOICES
+
+    name = models.CharField(
+        max_length=200,
+        verbose_name="Nom de la campagne"
+    )
+    subject = models.CharField(
+        max_length=200,
+        verbose_name="Objet de l'email",
+        help_text="Variables : [[prenom]], [[nom]]"
+    )
+    content = models.TextField(
+        verbose_name="Contenu (HTML)",
+        help_text="Variables remplacées pour chaque destinataire : [[prenom]], [[nom]], [[email]]"
+    )
+    target_segment = models.CharField(
+        max_length=20,
+        blank=True,
+        choices=SEGMENT_CHOICES,
+        verbose_name="Segment ciblé",
+        help_text="Segment RFM des destinataires (vide = tous les clients abonnés)"
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='draft',
+        verbose_name="Statut"
+    )
+    
+    # Dates
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Créée le"
+    )
+    started_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Envoi commencé le"
+    )
+    completed_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Envoi terminé le"
+    )
+
+    class Meta:
+        verbose_name = "Campagne email"
+        verbose_name_plural = "Campagnes email"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return self.name
+
+
+class CampaignRecipient(models.Model):
+    """
+    Destinataire d'une campagne et état de sa livraison
+
+    Les destinataires sont figés à la préparation de la campagne ; l'envoi ne
+    traite que les lignes en attente, ce qui permet de reprendre un envoi
+    interrompu sans renvoyer les messages déjà partis.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'En attente'),
+        ('sent', 'Envoyé'),
+        ('failed', 'Échec'),
+    ]
+
+    campaign = models.ForeignKey(
+        EmailCampaign,
+        on_delete=models.CASCADE,
+        related_name='recipients',
+        verbose_name="Campagne"
+    )
+    customer = models.ForeignKey(
+        Customer,
+        on_delete=models.CASCADE,
+        related_name='campaign_messages',
+        verbose_name="Client"
+    )
+    email = models.EmailField(verbose_name="Email")
+    first_name = models.CharField(max_length=150, blank=True, verbose_name="Prénom")
+    last_name = models.CharField(max_length=150, blank=True, verbose_name="Nom")
+    segment = models.CharField(max_length=20, blank=True, verbose_name="Segment")
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='pending',
+        verbose_name="Statut"
+    )
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="Tentatives")
+    error = models.CharField(max_length=255, blank=True, verbose_name="Dernière erreur")
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name="Envoyé le")
+
+    class Meta:
+        verbose_name = "Destinataire de campagne"
+        verbose_name_plural = "Destinataires de campagne"
+        constraints = [
+            models.UniqueConstraint(fields=['campaign', 'customer'], name='uniq_campaign_recipient'),
+        ]
+        indexes = [
+            # Lots suivants : WHERE campaign = ? AND status = 'pending' AND id > ? ORDER BY id
+            models.Index(fields=['campaign', 'status', 'id'], name='campaign_recipient_queue'),
+        ]
+
+    def __str__(self):
+        return f"{self.campaign_id} - {self.email} ({self.status})"
@@ -1,7 +1,77 @@
 from decimal import Decimal
-from django.db.models import F
-from django.core.exceptions import ObjectDoesNotExist
-from .models import Coupon, CouponUsage
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from .coupon_filter import coupon_code_might_exist
+from .models import Coupon, CouponRedemption, CouponUsage, normalize_coupon_code
+
+
+class CouponRedemptionError(Exception):
+    """Le coupon ne peut plus être consommé (limite atteinte, expiré, désactivé)"""
+    pass
+
+
+# Valeur mise en cache pour un code inconnu ou inactif (cache négatif)
+UNKNOWN_COUPON = 'unknown'
+
+
+def get_coupon_cache_key(code):
+    """Clé de cache d'un code promo, insensible à la casse comme la recherche"""
+    return f"marketing:coupon:{normalize_coupon_code(code)}"
+
+
+def get_active_coupon(code):
+    """
+    Retourne le coupon actif correspondant au code, ou None.
+    
+    Trois barrages avant la base de données :
+    1. un code vide ou trop long pour la colonne est refusé d'emblée
+    2. un code absent du filtre de Bloom n'existe certainement pas
+    3. le résultat est mis en cache, y compris l'absence de coupon (cache
+       négatif), invalidé à chaque modification d'un coupon (marketing.signals)
+    Sinon : une requête par égalité sur la colonne indexée code_normalized.
+    
+    Le compteur global (times_used) du coupon en cache peut être en retard :
+    la limite fait foi dans redeem_coupon(), au moment de la commande.
+    
+    Args:
+        code (str): Le code promo saisi
+    
+    Returns:
+        Coupon|None: Le coupon actif, ou None si le code est inconnu/inactif
+    """
+    normalized = normalize_coupon_code(code)
+    if not normalized or len(normalized) > Coupon._meta.get_field('code').max_length:
+        return None
+    
+    if not coupon_code_might_exist(normalized):
+        return None
+    
+    cache_key = get_coupon_cache_key(normalized)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return None if cached == UNKNOWN_COUPON else cached
+    
+    coupon = Coupon.objects.filter(code_normalized=normalized, is_active=True).first()
+    
+    cache.set(
+        cache_key,
+        UNKNOWN_COUPON if coupon is None else coupon,
+        getattr(settings, 'COUPON_CACHE_TIMEOUT', 300)
+    )
+    return coupon
+
+
+def invalidate_coupon_cache(*codes):
+    """
+    Supprime les coupons (ou leur absence) du cache.
+    
+    À appeler après un queryset.update() sur des coupons, qui ne déclenche
+    pas les signaux de sauvegarde.
+    """
+    cache.delete_many([get_coupon_cache_key(code) for code in codes])
 
 
 def validate_coupon(code, customer, cart_total):
@@ -23,10 +93,9 @@ def validate_coupon(code, customer, cart_total):
     
     code = code.strip()
     
-    # 2. Recherche : Récupérer le coupon en base de données
-    try:
-        coupon = Coupon.objects.get(code__iexact=code, is_active=True)
-    except ObjectDoesNotExist:
+    # 2. Recherche : Récupérer le coupon (cache, puis base de données)
+    coupon = get_active_coupon(code)
+    if coupon is None:
         return False, "Ce code promo n'existe pas ou n'est plus valide", Decimal('0.00'), None
     
     # 3. Validité globale : Vérifier la validité du coupon
@@ -64,9 +133,73 @@ def validate_coupon(code, customer, cart_total):
     return True, success_message, discount_amount, coupon
 
 
+def redeem_coupon(coupon, customer):
+    """
+    Consomme une utilisation du coupon pour ce client, sans verrou explicite.
+    
+    validate_coupon() ne fait qu'une vérification indicative : entre la
+    validation et la commande, d'autres clients peuvent épuiser le coupon.
+    Ici, chaque limite est vérifiée ET incrémentée par un seul UPDATE
+    conditionnel (« ... SET times_used = times_used + 1 WHERE times_used < limite ») :
+    la base applique les mises à jour concurrentes l'une après l'autre, et
+    celles qui trouvent la limite atteinte ne modifient aucune ligne.
+    
+    Le compteur global (ligne la plus disputée) est incrémenté en dernier
+    pour être retenu le moins longtemps possible.
+    
+    Args:
+        coupon (Coupon): Le coupon validé
+        customer (Customer): Le client qui passe commande
+    
+    Raises:
+        CouponRedemptionError: Si une limite est atteinte ou le coupon n'est plus valide
+    """
+    with transaction.atomic():
+        # 1. Limite par client
+        claimed = CouponRedemption.objects.filter(
+            coupon=coupon,
+            customer=customer,
+            times_used__lt=coupon.usage_limit_per_customer
+        ).update(times_used=F('times_used') + 1)
+        
+        if not claimed:
+            # Première utilisation par ce client : créer son compteur
+            try:
+                with transaction.atomic():
+                    CouponRedemption.objects.create(coupon=coupon, customer=customer, times_used=1)
+            except IntegrityError:
+                # Compteur déjà présent (limite atteinte ou création concurrente)
+                claimed = CouponRedemption.objects.filter(
+                    coupon=coupon,
+                    customer=customer,
+                    times_used__lt=coupon.usage_limit_per_customer
+                ).update(times_used=F('times_used') + 1)
+                if not claimed:
+                    raise CouponRedemptionError(
+                        f"Vous avez déjà utilisé ce coupon {coupon.usage_limit_per_customer} fois"
+                    )
+        
+        # 2. Limite globale et validité, vérifiées par la base au moment de l'écriture
+        now = timezone.now()
+        consumed = Coupon.objects.filter(
+            Q(usage_limit__isnull=True) | Q(times_used__lt=F('usage_limit')),
+            pk=coupon.pk,
+            is_active=True,
+            valid_from__lte=now,
+            valid_until__gte=now
+        ).update(times_used=F('times_used') + 1)
+        
+        if not consumed:
+            # L'annulation de la transaction rend l'utilisation réservée au client
+            raise CouponRedemptionError("Ce coupon a atteint sa limite d'utilisation ou n'est plus valide")
+
+
 def record_coupon_usage(order, coupon):
     """
-    Enregistre l'utilisation d'un coupon après validation d'une commande.
+    Consomme le coupon et enregistre son utilisation pour une commande.
+    
+    À appeler dans la transaction de création de la commande : si le coupon
+    ne peut plus être consommé, l'exception doit annuler la commande.
     
     Args:
         order (Order): L'objet commande validée
@@ -74,18 +207,18 @@ def record_coupon_usage(order, coupon):
     
     Returns:
         CouponUsage: L'objet CouponUsage créé
+    
+    Raises:
+        CouponRedemptionError: Si le coupon est épuisé pour ce client ou globalement
     """
     
-    # 1. Créer l'historique : Enregistrer l'utilisation du coupon
-    coupon_usage = CouponUsage.objects.create(
+    # 1. Consommer : limites globale et par client vérifiées atomiquement
+    redeem_coupon(coupon, order.customer)
+    
+    # 2. Créer l'historique : Enregistrer l'utilisation du coupon
+    return CouponUsage.objects.create(
         coupon=coupon,
         customer=order.customer,
         order=order,
         discount_amount=order.discount_amount
     )
-    
-    # 2. Incrémenter le compteur : Mettre à jour times_used de manière atomique
-    # Utilisation de F() pour éviter les problèmes de concurrence
-    Coupon.objects.filter(pk=coupon.pk).update(times_used=F('times_used') + 1)
-    
-    return coupon_usage
\ No newline at end of file
@@ -0,0 +1,59 @@
+"""
+Signaux pour l'application Marketing
+====================================
+
+Invalide le cache des codes promo (marketing.services.get_active_coupon) et
+le filtre de Bloom des codes (marketing.coupon_filter) lorsqu'un coupon est
+créé, modifié ou supprimé.
+
+L'invalidation est faite tout de suite puis répétée après le commit : une
+requête concurrente qui relirait la base avant le commit remettrait sinon
+en cache l'ancien état (code inconnu, filtre sans le nouveau code).
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .coupon_filter import invalidate_coupon_filter
+from .services import invalidate_coupon_cache
+
+
+def _invalidate(codes, codes_changed):
+    def invalidate():
+        invalidate_coupon_cache(*codes)
+        if codes_changed:
+            invalidate_coupon_filter()
+
+    invalidate()
+    transaction.on_commit(invalidate)
+
+
+@receiver(post_init, sender='marketing.Coupon')
+def remember_loaded_coupon_code(sender, instance, **kwargs):
+    """Mémorise le code chargé pour invalider aussi l'ancien code en cas de renommage"""
+    # __dict__ : ne pas déclencher de requête si le champ est différé (only/defer)
+    instance._loaded_code = instance.__dict__.get('code')
+
+
+@receiver(post_save, sender='marketing.Coupon')
+def invalidate_coupon_cache_on_save(sender, instance, created, **kwargs):
+    """
+    Invalide le cache du code après une sauvegarde.
+    
+    Couvre aussi la création : un code mis en cache comme inconnu devient
+    immédiatement utilisable. Si le code a été renommé, l'ancien code est
+    également invalidé. Le filtre de Bloom n'est reconstruit que si
+    l'ensemble des codes change.
+    """
+    previous_code = getattr(instance, '_loaded_code', None)
+    renamed = bool(previous_code) and previous_code != instance.code
+    codes = [instance.code, previous_code] if renamed else [instance.code]
+    _invalidate(codes, created or renamed)
+    instance._loaded_code = instance.code
+
+
+@receiver(post_delete, sender='marketing.Coupon')
+def invalidate_coupon_cache_on_delete(sender, instance, **kwargs):
+    """Invalide le cache du code et le filtre après une suppression"""
+    _invalidate([instance.code], True)
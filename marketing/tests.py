@@ -1,3 +1,475 @@
-from django.test import TestCase
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+import os
+import re
+import tempfile
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.mail.backends.locmem import EmailBackend as LocmemEmailBackend
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from dashboard.models import CustomerRFMScore
+
+from . import campaigns, code_generator
+from .campaigns import SendRateLimiter, get_campaign_progress, send_campaign
+from .code_generator import CodeGenerationError, CodeTemplate, generate_coupon_codes
+from .coupon_filter import BloomFilter, get_coupon_filter
+from .models import CampaignRecipient, Coupon, CouponRedemption, EmailCampaign
+from .services import CouponRedemptionError, redeem_coupon, validate_coupon
+
+
+def create_coupon(code='FLASH', usage_limit=None, per_customer=1, **kwargs):
+    now = timezone.now()
+    return Coupon.objects.create(
+        code=code,
+        discount_type='percentage',
+        discount_value=Decimal('10'),
+        usage_limit=usage_limit,
+        usage_limit_per_customer=per_customer,
+        valid_from=now - timedelta(days=1),
+        valid_until=now + timedelta(days=1),
+        **kwargs
+    )
+
+
+TEST_STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+def create_customers(count):
+    return [User.objects.create_user(f'client{i}', f'client{i}@test.ga').customer for i in range(count)]
+
+
+class CouponRedemptionTests(TestCase):
+
+    def test_per_customer_limit(self):
+        coupon = create_coupon(per_customer=2)
+        customer, other = create_customers(2)
+
+        redeem_coupon(coupon, customer)
+        redeem_coupon(coupon, customer)
+        with self.assertRaisesMessage(CouponRedemptionError, 'déjà utilisé ce coupon 2 fois'):
+            redeem_coupon(coupon, customer)
+        redeem_coupon(coupon, other)
+
+        coupon.refresh_from_db()
+        self.assertEqual(coupon.times_used, 3)
+        self.assertEqual(CouponRedemption.objects.get(coupon=coupon, customer=customer).times_used, 2)
+
+    def test_global_limit_rolls_back_the_customer_counter(self):
+        coupon = create_coupon(usage_limit=1)
+        first, second = create_customers(2)
+
+        redeem_coupon(coupon, first)
+        with self.assertRaises(CouponRedemptionError):
+            redeem_coupon(coupon, second)
+
+        self.assertFalse(CouponRedemption.objects.filter(customer=second).exists())
+
+    def test_expired_or_inactive_coupon_is_refused(self):
+        expired = create_coupon(code='OLD')
+        Coupon.objects.filter(pk=expired.pk).update(valid_until=timezone.now() - timedelta(minutes=1))
+        inactive = create_coupon(code='OFF', is_active=False)
+        customer, = create_customers(1)
+
+        for coupon in (expired, inactive):
+            with self.assertRaises(CouponRedemptionError):
+                redeem_coupon(coupon, customer)
+
+    def test_returning_customer_uses_a_single_update_per_limit(self):
+        coupon = create_coupon(per_customer=5)
+        customer, = create_customers(1)
+        redeem_coupon(coupon, customer)
+
+        # SAVEPOINT + UPDATE client + UPDATE coupon + RELEASE
+        with self.assertNumQueries(4):
+            redeem_coupon(coupon, customer)
+
+
+class CouponValidationCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.customer, = create_customers(1)
+
+    def test_guessed_code_is_rejected_without_query(self):
+        create_coupon()
+        get_coupon_filter()
+
+        with self.assertNumQueries(0):
+            for guess in ('FLASH1', 'AAAA', 'X' * 60, '   '):
+                self.assertFalse(validate_coupon(guess, self.customer, Decimal('10000'))[0])
+
+        # La création du code reconstruit le filtre
+        create_coupon(code='AAAA')
+        self.assertTrue(validate_coupon('aaaa', self.customer, Decimal('10000'))[0])
+
+    def test_inactive_code_is_negatively_cached(self):
+        create_coupon(code='OFF', is_active=False)
+        get_coupon_filter()
+
+        with self.assertNumQueries(1):
+            self.assertFalse(validate_coupon('OFF', self.customer, Decimal('10000'))[0])
+        with self.assertNumQueries(0):
+            self.assertFalse(validate_coupon(' off ', self.customer, Decimal('10000'))[0])
+
+    def test_lookup_uses_normalized_code(self):
+        coupon = create_coupon(code='été2026 ')
+        self.assertEqual(coupon.code_normalized, 'ÉTÉ2026')
+        self.assertEqual(validate_coupon('ÉTÉ2026', self.customer, Decimal('10000'))[3].pk, coupon.pk)
+
+    def test_codes_differing_only_by_case_are_refused(self):
+        create_coupon(code='FLASH')
+        duplicate = Coupon(code='flash ', discount_type='percentage', discount_value=Decimal('10'),
+                           valid_from=timezone.now(), valid_until=timezone.now() + timedelta(days=1))
+
+        with self.assertRaises(ValidationError) as error:
+            duplicate.full_clean()
+        self.assertIn('code', error.exception.message_dict)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            duplicate.save()
+
+    def test_known_code_costs_one_indexed_query(self):
+        coupon = create_coupon(per_customer=2)
+        redeem_coupon(coupon, self.customer)
+        validate_coupon('FLASH', self.customer, Decimal('10000'))
+
+        # Seul le compteur (coupon, client) est lu
+        with self.assertNumQueries(1):
+            success, _, discount, cached = validate_coupon('flash', self.customer, Decimal('10000'))
+        self.assertTrue(success)
+        self.assertEqual(discount, Decimal('1000'))
+        self.assertEqual(cached.pk, coupon.pk)
+
+    def test_per_customer_limit_reads_redemption_counter(self):
+        coupon = create_coupon(per_customer=1)
+        redeem_coupon(coupon, self.customer)
+
+        success, message, _, _ = validate_coupon('FLASH', self.customer, Decimal('10000'))
+        self.assertFalse(success)
+        self.assertIn('déjà utilisé ce coupon 1 fois', message)
+
+    def test_changes_invalidate_the_cache(self):
+        coupon = create_coupon()
+        self.assertTrue(validate_coupon('FLASH', self.customer, Decimal('10000'))[0])
+
+        coupon.is_active = False
+        coupon.save()
+        self.assertFalse(validate_coupon('FLASH', self.customer, Decimal('10000'))[0])
+
+        coupon = Coupon.objects.get(pk=coupon.pk)
+        coupon.is_active = True
+        coupon.code = 'SUMMER'
+        coupon.save()
+        self.assertFalse(validate_coupon('FLASH', self.customer, Decimal('10000'))[0])
+        self.assertTrue(validate_coupon('SUMMER', self.customer, Decimal('10000'))[0])
+
+        coupon.delete()
+        self.assertFalse(validate_coupon('SUMMER', self.customer, Decimal('10000'))[0])
+
+
+class BloomFilterTests(TestCase):
+
+    def test_no_false_negatives_and_bounded_false_positives(self):
+        bloom = BloomFilter.for_capacity(2000)
+        codes = [f'PROMO-{i:05d}' for i in range(2000)]
+        for code in codes:
+            bloom.add(code)
+
+        self.assertTrue(all(code in bloom for code in codes))
+        false_positives = sum(f'GUESS-{i:05d}' in bloom for i in range(10000))
+        self.assertLess(false_positives, 300)
+
+        restored = BloomFilter.from_state(bloom.to_state())
+        self.assertTrue(all(code in restored for code in codes))
+
+
+class ApplyCouponRateLimitTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('client', 'client@test.ga', 'secret')
+        self.client.force_login(self.user)
+
+    @override_settings(COUPON_RATE_LIMIT_BURST=3, COUPON_RATE_LIMIT_PER_MINUTE=1)
+    def test_token_bucket_per_client(self):
+        url = reverse('marketing:api_apply_coupon')
+        statuses = [self.client.post(url, {'code': f'GUESS{i}'}).status_code for i in range(4)]
+        self.assertEqual(statuses, [200, 200, 200, 429])
+
+        # Autre client : seau indépendant
+        self.client.force_login(User.objects.create_user('autre', 'autre@test.ga'))
+        self.assertEqual(self.client.post(url, {'code': 'GUESS'}).status_code, 200)
+
+
+class CouponCodeGenerationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.template = create_coupon(code='MODELE', per_customer=3, minimum_purchase=Decimal('5000'))
+
+    def test_codes_are_unique_and_copy_the_template(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            result = generate_coupon_codes(self.template, 500, CodeTemplate(prefix='rent-', length=6), chunk_size=128)
+
+        self.assertEqual((result.created, result.collisions), (500, 0))
+        coupons = Coupon.objects.filter(batch=result.batch)
+        codes = set(coupons.values_list('code', flat=True))
+        self.assertEqual(len(codes), 500)
+        self.assertTrue(all(re.fullmatch(r'RENT-[0-9A-HJKMNP-TV-Z]{6}', code) for code in codes))
+
+        coupon = coupons.first()
+        self.assertEqual(coupon.code_normalized, coupon.code)
+        self.assertEqual((coupon.usage_limit, coupon.usage_limit_per_customer), (1, 1))
+        self.assertEqual(coupon.minimum_purchase, Decimal('5000'))
+        self.assertEqual(coupon.valid_until, self.template.valid_until)
+
+        # Le filtre de Bloom reconstruit après le commit connaît les nouveaux codes
+        customer, = create_customers(1)
+        self.assertTrue(validate_coupon(coupon.code.lower(), customer, Decimal('10000'))[0])
+
+    def test_collisions_are_regenerated(self):
+        insert_codes = code_generator._insert_codes
+        stolen = []
+
+        def insert_with_concurrent_writer(codes, prototype):
+            # Un autre processus crée le premier code juste avant la première insertion
+            if not stolen:
+                stolen.append(create_coupon(code=codes[0]))
+            return insert_codes(codes, prototype)
+
+        with mock.patch.object(code_generator, '_insert_codes', insert_with_concurrent_writer):
+            result = generate_coupon_codes(self.template, 50, CodeTemplate(prefix='X'))
+
+        self.assertEqual((result.created, result.collisions), (50, 1))
+        self.assertEqual(stolen[0].batch, '')
+        self.assertEqual(Coupon.objects.filter(batch=result.batch).count(), 50)
+
+    def test_too_few_combinations_are_refused(self):
+        with self.assertRaises(CodeGenerationError):
+            generate_coupon_codes(self.template, 600000, CodeTemplate(length=4))
+        with self.assertRaises(CodeGenerationError):
+            generate_coupon_codes(self.template, 10, CodeTemplate(prefix='P' * 45))
+        self.assertEqual(Coupon.objects.count(), 1)
+
+    def test_command_writes_csv(self):
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+
+        call_command('generate_coupon_codes', 'modele', '--count', '20', '--prefix', 'NOEL-', '-o', path, stderr=StringIO())
+
+        with open(path, encoding='utf-8') as csv_file:
+            lines = csv_file.read().splitlines()
+        self.assertTrue(lines[0].startswith('\ufeffCode;'))
+        self.assertEqual(len(lines), 21)
+        self.assertTrue(all(line.startswith('NOEL-') for line in lines[1:]))
+
+    @override_settings(STORAGES=TEST_STORAGES)
+    def test_admin_action_streams_csv(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@test.ga', 'pass'))
+        url = reverse('admin:marketing_coupon_changelist')
+        data = {'action': 'generate_codes', '_selected_action': [self.template.pk]}
+
+        form_page = self.client.post(url, data)
+        self.assertContains(form_page, 'Générer et télécharger')
+
+        response = self.client.post(url, {**data, 'apply': '1', 'count': '30', 'prefix': 'VIP-', 'length': '8'})
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual(len(rows), 31)
+        self.assertEqual(Coupon.objects.filter(code__startswith='VIP-').count(), 30)
+
+
+class BouncingEmailBackend(LocmemEmailBackend):
+    """Refuse les adresses contenant « bounce »"""
+
+    def send_messages(self, messages):
+        for message in messages:
+            if any('bounce' in address for address in message.to):
+                raise ConnectionError(f"Adresse refusée : {message.to[0]}")
+        return super().send_messages(messages)
+
+
+@override_settings(CAMPAIGN_SEND_RATE=0, CAMPAIGN_WORKERS=2)
+class EmailCampaignTests(TestCase):
+
+    def setUp(self):
+        names = ['Awa', 'Paul', '<Zoé>', 'Jean', 'Inès']
+        self.customers = []
+        for i, name in enumerate(names):
+            user = User.objects.create_user(f'client{i}', f'client{i}@test.ga', first_name=name)
+            self.customers.append(user.customer)
+        # Non abonné, inactif, sans email : exclus
+        optout = User.objects.create_user('optout', 'optout@test.ga').customer
+        optout.email_notifications = False
+        optout.save()
+        User.objects.create_user('inactive', 'inactive@test.ga', is_active=False)
+        User.objects.create_user('noemail', '')
+
+        for customer in self.customers[:2]:
+            self.set_segment(customer, 'lost')
+
+        self.campaign = EmailCampaign.objects.create(
+            name='Soldes',
+            subject='[[prenom]], les soldes commencent',
+            content='<p>-30 % sur tout le site</p>'
+        )
+
+    def set_segment(self, customer, segment):
+        CustomerRFMScore.objects.create(
+            customer=customer,
+            recency_days=200,
+            frequency=1,
+            monetary=Decimal('1000'),
+            last_order_at=timezone.now(),
+            recency_score=1,
+            frequency_score=1,
+            monetary_score=1,
+            segment=segment,
+            computed_at=timezone.now()
+        )
+
+    def test_renders_once_per_segment_and_personalizes(self):
+        with mock.patch.object(campaigns, 'render_to_string', wraps=campaigns.render_to_string) as render:
+            stats = send_campaign(self.campaign, batch_size=2)
+
+        self.assertEqual(render.call_count, 2)
+        self.assertEqual((stats.sent, stats.failed, stats.remaining), (5, 0, 0))
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), [f'client{i}@test.ga' for i in range(5)])
+
+        message = next(m for m in mail.outbox if m.to == ['client2@test.ga'])
+        self.assertEqual(message.subject, '<Zoé>, les soldes commencent')
+        self.assertIn('Bonjour <Zoé>', message.body)
+        self.assertIn('Bonjour &lt;Zoé&gt;', message.alternatives[0][0])
+        self.assertIn('client2@test.ga', message.alternatives[0][0])
+
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.status, 'completed')
+
+    def test_target_segment(self):
+        self.campaign.target_segment = 'lost'
+        self.campaign.save()
+
+        send_campaign(self.campaign)
+
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), ['client0@test.ga', 'client1@test.ga'])
+        self.assertIn('Vous nous avez manqué', mail.outbox[0].alternatives[0][0])
+
+    def test_paused_campaign_resumes_without_duplicates(self):
+        record_batch = campaigns._record_batch
+
+        def record_then_pause(recipients, errors):
+            result = record_batch(recipients, errors)
+            EmailCampaign.objects.filter(pk=self.campaign.pk).update(status='paused')
+            return result
+
+        with mock.patch.object(campaigns, '_record_batch', record_then_pause):
+            stats = send_campaign(self.campaign, batch_size=2)
+        self.assertEqual((stats.sent, stats.remaining), (2, 3))
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.status, 'paused')
+
+        stats = send_campaign(self.campaign, batch_size=2)
+
+        self.assertEqual((stats.sent, stats.remaining), (3, 0))
+        self.assertEqual(len({m.to[0] for m in mail.outbox}), len(mail.outbox))
+        self.assertEqual(get_campaign_progress(self.campaign)['sent'], 5)
+
+    def test_failures_are_recorded_and_retried(self):
+        bouncing = self.customers[3].user
+        bouncing.email = 'bounce@test.ga'
+        bouncing.save()
+
+        with override_settings(EMAIL_BACKEND='marketing.tests.BouncingEmailBackend'):
+            stats = send_campaign(self.campaign)
+        self.assertEqual((stats.sent, stats.failed), (4, 1))
+        failed = CampaignRecipient.objects.get(status='failed')
+        self.assertEqual((failed.email, failed.attempts), ('bounce@test.ga', 1))
+        self.assertIn('Adresse refusée', failed.error)
+
+        stats = send_campaign(self.campaign, retry_failed=True)
+        self.assertEqual((stats.sent, stats.failed), (1, 0))
+        self.assertEqual(CampaignRecipient.objects.get(email='bounce@test.ga').attempts, 2)
+
+    @override_settings(STORAGES=TEST_STORAGES)
+    def test_admin_shows_progress(self):
+        send_campaign(self.campaign)
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@test.ga', 'pass'))
+
+        response = self.client.get(reverse('admin:marketing_emailcampaign_changelist'))
+
+        self.assertContains(response, '5 / 5 envoyé(s)')
+
+    def test_send_rate_is_capped(self):
+        limiter = SendRateLimiter(rate=100)
+        started = time.perf_counter()
+        for _ in range(11):
+            limiter.wait()
+        self.assertGreaterEqual(time.perf_counter() - started, 0.09)
+
+
+class ConcurrentCouponRedemptionTests(TransactionTestCase):
+    """50 commandes simultanées sur un coupon limité à 20 utilisations"""
+
+    REDEEMERS = 50
+    USAGE_LIMIT = 20
+
+    def setUp(self):
+        # Base de test connue seulement ici (pas à l'import du module)
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest("SQLite en mémoire partagée refuse les écritures concurrentes au lieu de les sérialiser")
+
+    def redeem_all(self, coupon, customers):
+        barrier = threading.Barrier(len(customers))
+
+        def redeem(customer):
+            try:
+                barrier.wait()
+                redeem_coupon(coupon, customer)
+                return True
+            except CouponRedemptionError:
+                return False
+            finally:
+                connection.close()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(customers)) as executor:
+            results = list(executor.map(redeem, customers))
+        return results, time.perf_counter() - started
+
+    def test_limit_is_exact_under_concurrency(self):
+        coupon = create_coupon(usage_limit=self.USAGE_LIMIT)
+        customers = create_customers(self.REDEEMERS)
+
+        results, elapsed = self.redeem_all(coupon, customers)
+
+        coupon.refresh_from_db()
+        self.assertEqual(results.count(True), self.USAGE_LIMIT)
+        self.assertEqual(coupon.times_used, self.USAGE_LIMIT)
+        self.assertEqual(CouponRedemption.objects.filter(coupon=coupon).count(), self.USAGE_LIMIT)
+        # Pas de verrou applicatif : les rachats refusés ne font pas la queue
+        self.assertLess(elapsed, 10)
+
+    def test_per_customer_limit_under_concurrency(self):
+        coupon = create_coupon(per_customer=3)
+        customer, = create_customers(1)
+
+        results, _ = self.redeem_all(coupon, [customer] * self.REDEEMERS)
+
+        self.assertEqual(results.count(True), 3)
+        self.assertEqual(CouponRedemption.objects.get(coupon=coupon, customer=customer).times_used, 3)
@@ -1,19 +1,27 @@
 from decimal import Decimal
+from django.conf import settings
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
 from django.contrib.auth.decorators import login_required
-from accounts.models import Customer
+from core.ratelimit import rate_limit
 from orders.services import calculate_cart_subtotal
 from .services import validate_coupon
 
 
 @require_POST
 @login_required
+@rate_limit(
+    'apply_coupon',
+    capacity=lambda: getattr(settings, 'COUPON_RATE_LIMIT_BURST', 10),
+    refill_rate=lambda: getattr(settings, 'COUPON_RATE_LIMIT_PER_MINUTE', 10) / 60,
+    message="Trop de codes promo essayés. Veuillez patienter avant de réessayer."
+)
 def apply_coupon(request):
     """
     API AJAX pour valider et appliquer un code promo au panier.
     
     Cette vue :
+    - Limite les tentatives par client (seau à jetons, réponse 429)
     - Reçoit un code promo via POST
     - Valide le code avec le service validate_coupon
     - Stocke le résultat en session si valide
@@ -41,18 +49,8 @@ def apply_coupon(request):
             'message': 'Votre panier est vide. Ajoutez des produits avant d\'appliquer un code promo.'
         })
     
-    # S'assurer que l'utilisateur a un profil Customer
-    # Vérification/Création robuste
-    if not hasattr(request.user, 'customer'):
-        customer = Customer.objects.create(
-            user=request.user,
-            phone_number='',  # À compléter par l'utilisateur plus tard
-            address='',
-            city='',
-            country='Tunisia'
-        )
-    else:
-        customer = request.user.customer
+    # Profil client chargé (et créé au besoin) avec l'utilisateur
+    customer = request.user.customer
     
     # 3. Calculer le montant du panier
     cart_total = calculate_cart_subtotal(cart)
@@ -4,12 +4,14 @@ Inclut la gestion des commandes, articles, statuts, zones et tarifs de livraison
 ✅ OPTIMISÉ : Requêtes N+1 corrigées avec select_related et prefetch_related
 """
 
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
-from django.db.models import Count, Sum, Prefetch, Q
-from django.utils import timezone
+from django.db.models import (
+    Case, Count, DecimalField, F, IntegerField, OuterRef, Q, Value, When
+)
+from django.db import transaction
 from .models import (
     Order, 
     OrderItem, 
@@ -17,7 +19,17 @@ from .models import (
     ShippingZone, 
     ShippingRate
 )
+from .status_service import (
+    enqueue_order_followups,
+    mark_orders_paid,
+    recalculate_shipping_costs,
+    transition_orders,
+)
+from core.admin_search import RankedAutocompleteMixin, normalize_phone, phone_prefix_filter
+from core.paginator import LargeTableAdminMixin
+from core.db_utils import subquery_count, subquery_sum
 from core.email_service import EmailService
+from decimal import Decimal
 import logging
 
 logger = logging.getLogger('core.email_service')
@@ -97,7 +109,12 @@ class ShippingZoneAdmin(admin.ModelAdmin):
             active_rates_count=Count('rates', filter=Q(rates__is_active=True)),
             total_rates_count=Count('rates')
         )
-        return qs
+        # Commandes par sous-requête : pas de multiplication avec le JOIN des tarifs
+        zone_orders = Order.objects.filter(shipping_zone=OuterRef('pk'))
+        return qs.annotate(
+            orders_total=subquery_count(zone_orders, 'shipping_zone'),
+            revenue_total=subquery_sum(zone_orders, 'shipping_zone', 'total')
+        )
     
     def cities_preview(self, obj):
         """Affiche un aperçu des villes couvertes"""
@@ -148,10 +165,10 @@ class ShippingZoneAdmin(admin.ModelAdmin):
     rates_count.short_description = "Tarifs actifs"
     
     def orders_count(self, obj):
-        """Affiche le nombre de commandes utilisant cette zone"""
-        count = obj.orders.count()
-        return format_html('<strong>{}</strong>', count)
+        """Affiche le nombre de commandes utilisant cette zone (annotation)"""
+        return format_html('<strong>{}</strong>', obj.orders_total)
     orders_count.short_description = "Commandes"
+    orders_count.admin_order_field = 'orders_total'
     
     def orders_count_readonly(self, obj):
         """Version readonly pour le fieldset"""
@@ -159,12 +176,11 @@ class ShippingZoneAdmin(admin.ModelAdmin):
     orders_count_readonly.short_description = "Nombre de commandes"
     
     def total_revenue(self, obj):
-        """Calcule le revenu total des commandes de cette zone"""
-        total = obj.orders.aggregate(total=Sum('total'))['total'] or 0
-        total_float = float(total)
-        formatted_total = f'{total_float:,.0f}'
+        """Affiche le revenu total des commandes de cette zone (annotation)"""
+        formatted_total = f'{float(obj.revenue_total):,.0f}'
         return format_html('<strong>{} FCFA</strong>', formatted_total)
     total_revenue.short_description = "Revenu total"
+    total_revenue.admin_order_field = 'revenue_total'
     
     def is_active_display(self, obj):
         """Affiche le statut actif/inactif"""
@@ -287,7 +303,11 @@ class ShippingRateAdmin(admin.ModelAdmin):
         ✅ OPTIMISATION N+1 : Précharge la zone associée
         """
         qs = super().get_queryset(request)
-        return qs.select_related('zone')
+        rate_orders = Order.objects.filter(shipping_rate=OuterRef('pk'))
+        return qs.select_related('zone').annotate(
+            orders_total=subquery_count(rate_orders, 'shipping_rate'),
+            shipping_revenue_total=subquery_sum(rate_orders, 'shipping_rate', 'shipping_cost')
+        )
     
     def zone_name(self, obj):
         """Affiche le nom de la zone avec lien"""
@@ -358,12 +378,13 @@ class ShippingRateAdmin(admin.ModelAdmin):
     min_order_display.short_description = "Minimum"
     
     def orders_count(self, obj):
-        """Affiche le nombre de commandes utilisant ce tarif"""
-        count = obj.orders.count()
+        """Affiche le nombre de commandes utilisant ce tarif (annotation)"""
+        count = obj.orders_total
         if count > 0:
             return format_html('<strong style="color: #5cb85c;">{}</strong>', count)
         return format_html('<span style="color: #999;">{}</span>', count)
     orders_count.short_description = "Commandes"
+    orders_count.admin_order_field = 'orders_total'
     
     def orders_count_readonly(self, obj):
         """Version readonly pour le fieldset"""
@@ -371,12 +392,11 @@ class ShippingRateAdmin(admin.ModelAdmin):
     orders_count_readonly.short_description = "Nombre de commandes"
     
     def total_revenue(self, obj):
-        """Calcule le revenu total des commandes avec ce tarif"""
-        total = obj.orders.aggregate(total=Sum('shipping_cost'))['total'] or 0
-        total_float = float(total)
-        formatted_total = f'{total_float:,.0f}'
+        """Affiche le revenu livraison des commandes avec ce tarif (annotation)"""
+        formatted_total = f'{float(obj.shipping_revenue_total):,.0f}'
         return format_html('<strong>{} FCFA</strong>', formatted_total)
     total_revenue.short_description = "Revenu livraison"
+    total_revenue.admin_order_field = 'shipping_revenue_total'
     
     def is_active_display(self, obj):
         """Affiche le statut actif/inactif"""
@@ -446,6 +466,8 @@ class OrderItemInline(admin.TabularInline):
     extra = 0
     fields = ['product_name', 'variant_details', 'quantity', 'unit_price', 'subtotal']
     readonly_fields = ['product_name', 'variant_details', 'unit_price', 'quantity', 'subtotal']
+    # Si produit/variante deviennent éditables : pas de <select> du catalogue entier
+    autocomplete_fields = ['product', 'variant']
     can_delete = False
     
     def has_add_permission(self, request, obj=None):
@@ -484,7 +506,7 @@ class OrderStatusInline(admin.TabularInline):
 # ========================================
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(RankedAutocompleteMixin, LargeTableAdminMixin, admin.ModelAdmin):
     """
     Administration des commandes avec support complet des zones de livraison
     """
@@ -527,6 +549,7 @@ class OrderAdmin(admin.ModelAdmin):
         'total',
         'calculated_shipping_cost'
     ]
+    autocomplete_fields = ['shipping_address', 'billing_address']
     ordering = ['-created_at']
     
     inlines = [OrderItemInline, OrderStatusInline]
@@ -583,8 +606,24 @@ class OrderAdmin(admin.ModelAdmin):
             'shipping_rate',
             'shipping_address',
             'billing_address'
-        ).prefetch_related(
-            Prefetch('items', queryset=OrderItem.objects.select_related('product', 'variant'))
+        ).annotate(
+            # Nombre d'articles par sous-requête (au lieu de précharger tous les articles)
+            items_quantity=subquery_sum(
+                OrderItem.objects.filter(order=OuterRef('pk')),
+                'order',
+                'quantity',
+                output_field=IntegerField()
+            ),
+            # Coût de livraison selon le tarif actuel, calculé en SQL pour le tri
+            expected_shipping_cost=Case(
+                When(
+                    shipping_rate__free_shipping_threshold__isnull=False,
+                    subtotal__gte=F('shipping_rate__free_shipping_threshold'),
+                    then=Value(Decimal('0'))
+                ),
+                default=F('shipping_rate__price'),
+                output_field=DecimalField(max_digits=10, decimal_places=2)
+            )
         )
     
     actions = [
@@ -597,6 +636,22 @@ class OrderAdmin(admin.ModelAdmin):
         'recalculate_shipping'
     ]
     
+    def get_ranked_search_filters(self, term):
+        """
+        Autocomplete : numéro de commande exact ou préfixe (index unique),
+        email puis téléphone du client
+        """
+        order_number = term.upper()
+        filters = [
+            Q(order_number=order_number),
+            Q(order_number__startswith=order_number),
+            Q(customer_email__iexact=term),
+        ]
+        phone = normalize_phone(term)
+        if phone:
+            filters.append(phone_prefix_filter('customer_phone', phone))
+        return filters
+    
     def customer_info(self, obj):
         """Affiche les informations du client avec lien"""
         customer_url = reverse('admin:accounts_customer_change', args=[obj.customer.pk])
@@ -651,7 +706,9 @@ class OrderAdmin(admin.ModelAdmin):
     def calculated_shipping_cost(self, obj):
         """Affiche le coût de livraison calculé"""
         if obj.shipping_rate:
-            calculated_cost = obj.shipping_rate.calculate_shipping_cost(obj.subtotal)
+            calculated_cost = getattr(obj, 'expected_shipping_cost', None)
+            if calculated_cost is None:
+                calculated_cost = obj.shipping_rate.calculate_shipping_cost(obj.subtotal)
             if calculated_cost == 0:
                 threshold = obj.shipping_rate.free_shipping_threshold or 0
                 threshold_float = float(threshold)
@@ -670,6 +727,7 @@ class OrderAdmin(admin.ModelAdmin):
                 )
         return format_html('<span style="color: #999;">N/A</span>')
     calculated_shipping_cost.short_description = "Coût calculé"
+    calculated_shipping_cost.admin_order_field = 'expected_shipping_cost'
     
     def total_display(self, obj):
         """Affiche le total avec formatage"""
@@ -682,10 +740,10 @@ class OrderAdmin(admin.ModelAdmin):
     total_display.short_description = "Total"
     
     def item_count_display(self, obj):
-        """Affiche le nombre d'articles"""
-        count = obj.item_count
-        return format_html('<strong>{}</strong> article(s)', count)
+        """Affiche le nombre d'articles (annotation)"""
+        return format_html('<strong>{}</strong> article(s)', obj.items_quantity)
     item_count_display.short_description = "Articles"
+    item_count_display.admin_order_field = 'items_quantity'
     
     def status_display(self, obj):
         """Affiche le statut avec code couleur"""
@@ -736,143 +794,82 @@ class OrderAdmin(admin.ModelAdmin):
     
     # Actions admin
     
+    def _apply_transition(self, request, queryset, target_status, comment):
+        """Applique une transition en masse via la machine à états"""
+        result = transition_orders(
+            queryset,
+            target_status,
+            comment=comment,
+            created_by=request.user.username
+        )
+        if result.skipped:
+            self.message_user(
+                request,
+                f'{result.skipped} commande(s) ignorée(s) : transition non autorisée depuis leur statut.',
+                level=messages.WARNING
+            )
+        return result
+
     def mark_as_processing(self, request, queryset):
-        """
-        Action pour marquer comme en traitement
-        ✅ FAILLE #7 CORRIGÉE : Logique explicite de mise à jour du statut
-        """
-        count = 0
-        for order in queryset:
-            if order.status == 'pending':
-                # 1. Mettre à jour le statut de la commande
-                order.status = 'processing'
-                order.save()
-                
-                # 2. Créer l'historique de statut (sans effet de bord)
-                OrderStatus.objects.create(
-                    order=order,
-                    status='processing',
-                    comment='Marqué en traitement depuis l\'admin',
-                    created_by=request.user.username
-                )
-                count += 1
-        
-        self.message_user(request, f'{count} commande(s) marquée(s) en traitement.')
+        """Action pour marquer comme en traitement"""
+        result = self._apply_transition(
+            request, queryset, 'processing', 'Marqué en traitement depuis l\'admin'
+        )
+        self.message_user(request, f'{result.count} commande(s) marquée(s) en traitement.')
     mark_as_processing.short_description = "Marquer comme 'En traitement'"
     
     def mark_as_shipped(self, request, queryset):
         """
-        Action pour marquer les commandes comme expédiées avec envoi d'email
-        ✅ FAILLE #7 CORRIGÉE : Logique explicite de mise à jour du statut
+        Action pour marquer les commandes comme expédiées
+        Les emails d'expédition partent en arrière-plan après validation
         """
-        count = 0
-        for order in queryset:
-            if order.status in ['pending', 'processing']:
-                # 1. Mettre à jour le statut de la commande
-                order.status = 'shipped'
-                order.save()
-                
-                # 2. Créer l'historique de statut (sans effet de bord)
-                OrderStatus.objects.create(
-                    order=order,
-                    status='shipped',
-                    comment='Marqué comme expédié depuis l\'admin',
-                    created_by=request.user.username
-                )
-                
-                # 3. Envoyer l'email
-                try:
-                    EmailService.send_order_shipped(order)
-                    logger.info(f'Email d\'expédition envoyé pour {order.order_number}')
-                except Exception as e:
-                    logger.error(f'Échec envoi email pour {order.order_number}: {str(e)}')
-                
-                count += 1
-        
+        result = self._apply_transition(
+            request, queryset, 'shipped', 'Marqué comme expédié depuis l\'admin'
+        )
         self.message_user(
             request,
-            f'{count} commande(s) marquée(s) comme expédiée(s) et emails envoyés.'
+            f'{result.count} commande(s) marquée(s) comme expédiée(s), emails en cours d\'envoi.'
         )
     mark_as_shipped.short_description = "Marquer comme 'Expédié' (avec email)"
     
     def mark_as_delivered(self, request, queryset):
         """Action pour marquer les commandes comme livrées"""
-        count = 0
-        for order in queryset:
-            if order.status == 'shipped':
-                order.status = 'delivered'
-                order.save()
-                
-                OrderStatus.objects.create(
-                    order=order,
-                    status='delivered',
-                    comment='Marqué comme livré depuis l\'admin',
-                    created_by=request.user.username
-                )
-                count += 1
-        
-        self.message_user(request, f'{count} commande(s) marquée(s) comme livrée(s).')
+        result = self._apply_transition(
+            request, queryset, 'delivered', 'Marqué comme livré depuis l\'admin'
+        )
+        self.message_user(request, f'{result.count} commande(s) marquée(s) comme livrée(s).')
     mark_as_delivered.short_description = "Marquer comme 'Livré'"
     
     def mark_as_paid(self, request, queryset):
         """Action pour marquer comme payé"""
-        updated = queryset.filter(is_paid=False).update(is_paid=True, paid_at=timezone.now())
-        self.message_user(request, f'{updated} commande(s) marquée(s) comme payée(s).')
+        order_ids = mark_orders_paid(queryset)
+        self.message_user(request, f'{len(order_ids)} commande(s) marquée(s) comme payée(s).')
     mark_as_paid.short_description = "Marquer comme payé"
     
     def cancel_orders(self, request, queryset):
         """
-        Action pour annuler des commandes
-        ✅ FAILLE #7 CORRIGÉE : Logique explicite de mise à jour du statut
+        Action pour annuler des commandes (seules celles en attente ou en traitement)
+        Le stock réservé est libéré et les clients prévenus en arrière-plan
         """
-        count = 0
-        for order in queryset:
-            if order.status in ['pending', 'processing']:
-                # 1. Mettre à jour le statut de la commande
-                order.status = 'cancelled'
-                order.save()
-                
-                # 2. Créer l'historique de statut (sans effet de bord)
-                OrderStatus.objects.create(
-                    order=order,
-                    status='cancelled',
-                    comment='Commande annulée via action admin',
-                    created_by=request.user.username
-                )
-                count += 1
-        
-        self.message_user(
-            request, 
-            f'{count} commande(s) annulée(s) (seules celles en attente ou en traitement).'
+        result = self._apply_transition(
+            request, queryset, 'cancelled', 'Commande annulée via action admin'
         )
+        self.message_user(request, f'{result.count} commande(s) annulée(s).')
     cancel_orders.short_description = "Annuler les commandes sélectionnées"
     
     def send_shipping_email(self, request, queryset):
-        """Action pour renvoyer l'email d'expédition"""
-        count = 0
-        for order in queryset:
-            try:
-                EmailService.send_order_shipped(order)
-                count += 1
-                logger.info(f'Email d\'expédition renvoyé pour {order.order_number}')
-            except Exception as e:
-                logger.error(f'Échec envoi email pour {order.order_number}: {str(e)}')
+        """Action pour renvoyer l'email d'expédition (envoi en arrière-plan)"""
+        order_ids = list(queryset.order_by().values_list('pk', flat=True))
+        transaction.on_commit(
+            lambda: enqueue_order_followups(('send_shipped_email',), order_ids)
+        )
         
-        self.message_user(request, f'{count} email(s) d\'expédition envoyé(s).')
+        self.message_user(request, f'{len(order_ids)} email(s) d\'expédition en cours d\'envoi.')
     send_shipping_email.short_description = "Renvoyer l'email d'expédition"
     
     def recalculate_shipping(self, request, queryset):
         """Recalcule les frais de livraison en fonction des tarifs actuels"""
-        count = 0
-        for order in queryset:
-            if order.shipping_rate:
-                old_cost = order.shipping_cost
-                new_cost = order.shipping_rate.calculate_shipping_cost(order.subtotal)
-                
-                if old_cost != new_cost:
-                    order.shipping_cost = new_cost
-                    order.calculate_total()
-                    count += 1
+        count = recalculate_shipping_costs(queryset)
         
         if count > 0:
             self.message_user(request, f'Frais de livraison recalculés pour {count} commande(s).')
@@ -886,7 +883,7 @@ class OrderAdmin(admin.ModelAdmin):
 # ========================================
 
 @admin.register(OrderItem)
-class OrderItemAdmin(admin.ModelAdmin):
+class OrderItemAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     """
     Administration des articles de commande
     """
@@ -970,7 +967,7 @@ class OrderItemAdmin(admin.ModelAdmin):
 # ========================================
 
 @admin.register(OrderStatus)
-class OrderStatusAdmin(admin.ModelAdmin):
+class OrderStatusAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     """
     Administration de l'historique des statuts
     """
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.26 on 2026-10-19 07:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_ordernumbersequence_alter_order_order_number_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['-created_at'], name='idx_order_created'),
+        ),
+    ]
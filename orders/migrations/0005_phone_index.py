@@ -0,0 +1,18 @@
+# Generated by Django 4.2.26 on 2026-10-19 07:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_created_at_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='customer_phone',
+            field=models.CharField(db_index=True, max_length=17, verbose_name='Téléphone client'),
+        ),
+    ]
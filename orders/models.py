@@ -339,7 +339,7 @@ class Order(models.Model):
     
     # Informations de contact (sauvegardées au moment de la commande)
     customer_email = models.EmailField(verbose_name="Email client")
-    customer_phone = models.CharField(max_length=17, verbose_name="Téléphone client")
+    customer_phone = models.CharField(max_length=17, db_index=True, verbose_name="Téléphone client")
     
     # Montants
     subtotal = models.DecimalField(
@@ -437,6 +437,8 @@ class Order(models.Model):
             models.Index(fields=['order_number'], name='idx_order_number'),
             models.Index(fields=['customer', '-created_at'], name='idx_customer_date'),
             models.Index(fields=['status'], name='idx_status'),
+            # Tri par défaut des listes et plages de date_hierarchy
+            models.Index(fields=['-created_at'], name='idx_order_created'),
         ]
 
     def __str__(self):
@@ -32,7 +32,7 @@ from .models import (
 )
 
 # ✅ NOUVEAUX IMPORTS MARKETING
-from marketing.services import validate_coupon, record_coupon_usage
+from marketing.services import CouponRedemptionError, validate_coupon, record_coupon_usage
 
 # Configuration du logger
 logger = logging.getLogger(__name__)
@@ -552,20 +552,15 @@ def create_order_from_cart(
                 item_data.variant.product.sales_count = F('sales_count') + item_data.quantity
                 item_data.variant.product.save(update_fields=['sales_count'])
             
-            # ✅ 4.6 - Enregistrer l'utilisation du coupon si appliqué
+            # ✅ 4.6 - Consommer le coupon si appliqué
+            # Limites vérifiées par UPDATE conditionnel : si le coupon a été
+            # épuisé depuis la validation, la commande entière est annulée
             if applied_coupon:
-                try:
-                    record_coupon_usage(order=order, coupon=applied_coupon)
-                    logger.info(
-                        f"Utilisation du coupon '{applied_coupon.code}' enregistrée "
-                        f"pour la commande {order.order_number}"
-                    )
-                except Exception as e:
-                    # En cas d'erreur, logger mais ne pas bloquer la commande
-                    logger.error(
-                        f"Erreur lors de l'enregistrement de l'utilisation du coupon "
-                        f"'{applied_coupon.code}' : {str(e)}"
-                    )
+                record_coupon_usage(order=order, coupon=applied_coupon)
+                logger.info(
+                    f"Utilisation du coupon '{applied_coupon.code}' enregistrée "
+                    f"pour la commande {order.order_number}"
+                )
             
             # 4.7 - Créer l'historique de statut
             status_comment = (
@@ -584,9 +579,11 @@ def create_order_from_cart(
             )
             
             # 4.8 - Mettre à jour les statistiques du client
-            customer.total_orders = F('total_orders') + 1
-            customer.total_spent = F('total_spent') + calculation.total
-            customer.save(update_fields=['total_orders', 'total_spent'])
+            # (total_spent n'augmente qu'au paiement : accounts/services.py)
+            Customer.objects.filter(pk=customer.pk).update(
+                total_orders=F('total_orders') + 1,
+                last_order_at=order.created_at
+            )
         
         # ============================================
         # PHASE 5 : SUCCÈS
@@ -597,6 +594,14 @@ def create_order_from_cart(
             order=order
         )
         
+    except CouponRedemptionError as e:
+        # Coupon épuisé entre la validation et la commande (transaction annulée)
+        logger.info(f"Coupon '{coupon_code}' refusé à la commande: {str(e)}")
+        return OrderCreationResult(
+            success=False,
+            error_message=str(e)
+        )
+        
     except Exception as e:
         # Capturer toute erreur inattendue
         logger.exception(f"Erreur lors de la création de la commande: {str(e)}")
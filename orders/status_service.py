@@ -0,0 +1,387 @@
+"""
+orders/status_service.py - Machine à états des commandes
+========================================================
+
+Centralise les transitions de statut autorisées et les applique en masse :
+- UN UPDATE pour toutes les commandes éligibles
+- UN bulk_create pour l'historique (OrderStatus)
+- le stock réservé des commandes annulées est libéré dans la même
+  transaction (quelques UPDATE groupés) : jamais de commande annulée qui
+  garde son stock si le processus s'arrête après le commit
+- les emails sont mis en file après le commit et envoyés hors de la requête
+- les compteurs des clients concernés sont recalculés dans la même
+  transaction lorsque la commande sort des compteurs (annulation,
+  remboursement) ou est payée (mark_orders_paid)
+- le résumé « Mon compte » mis en cache de ces clients est invalidé
+  (accounts.account_service), les UPDATE ne déclenchant pas les signaux
+
+Utilisé par les actions de orders.admin.OrderAdmin.
+"""
+
+from dataclasses import dataclass, field
+from decimal import Decimal
+from functools import partial
+from typing import Dict, Iterable, List, Union
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F, QuerySet, Sum, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from accounts.account_service import invalidate_account_cache
+from accounts.services import UNCOUNTED_ORDER_STATUSES, refresh_stats_for_orders
+from core.email_service import EmailService
+from shop.models import Stock
+from .models import Order, OrderItem, OrderStatus
+from .services import OrderServiceException
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================
+# TRANSITIONS AUTORISÉES
+# ============================================
+
+# statut actuel -> statuts atteignables
+ORDER_TRANSITIONS: Dict[str, frozenset] = {
+    'pending': frozenset({'processing', 'shipped', 'cancelled'}),
+    'processing': frozenset({'shipped', 'cancelled'}),
+    'shipped': frozenset({'delivered'}),
+    'delivered': frozenset({'refunded'}),
+    'cancelled': frozenset(),
+    'refunded': frozenset(),
+}
+
+# Suites exécutées après le commit pour chaque statut atteint (emails)
+TRANSITION_FOLLOWUPS: Dict[str, tuple] = {
+    'shipped': ('send_shipped_email',),
+    'cancelled': ('send_cancelled_email',),
+}
+
+
+class InvalidTransitionException(OrderServiceException):
+    """Statut cible inconnu ou inatteignable"""
+    pass
+
+
+@dataclass
+class TransitionResult:
+    """Résultat d'une transition appliquée en masse"""
+    target_status: str
+    order_ids: List[int] = field(default_factory=list)
+    skipped: int = 0
+    followups: tuple = ()
+
+    @property
+    def count(self) -> int:
+        return len(self.order_ids)
+
+
+def can_transition(current_status: str, target_status: str) -> bool:
+    return target_status in ORDER_TRANSITIONS.get(current_status, frozenset())
+
+
+def get_source_statuses(target_status: str) -> List[str]:
+    """
+    Statuts depuis lesquels target_status est atteignable
+
+    Raises:
+        InvalidTransitionException: Si aucun statut ne mène à target_status
+    """
+    sources = [
+        status for status, targets in ORDER_TRANSITIONS.items()
+        if target_status in targets
+    ]
+    if not sources:
+        raise InvalidTransitionException(f"Statut cible invalide : {target_status}")
+    return sources
+
+
+# ============================================
+# APPLICATION EN MASSE
+# ============================================
+
+def transition_orders(
+    orders: Union[QuerySet, Iterable[int]],
+    target_status: str,
+    comment: str = '',
+    created_by: str = '',
+    enqueue_followups: bool = True
+) -> TransitionResult:
+    """
+    Fait passer plusieurs commandes au statut target_status
+
+    Les commandes dont le statut actuel n'autorise pas la transition sont
+    ignorées (comptées dans skipped). Le nombre de requêtes ne dépend pas
+    du nombre de commandes.
+
+    Args:
+        orders: QuerySet de commandes ou liste d'identifiants
+        target_status: Statut à atteindre
+        comment: Commentaire enregistré dans l'historique
+        created_by: Auteur enregistré dans l'historique
+        enqueue_followups: Mettre en file les emails
+
+    Returns:
+        TransitionResult
+
+    Raises:
+        InvalidTransitionException: Si target_status n'est atteignable depuis aucun statut
+    """
+    sources = get_source_statuses(target_status)
+    if isinstance(orders, QuerySet):
+        selection = Order.objects.filter(pk__in=orders.order_by().values('pk'))
+    else:
+        selection = Order.objects.filter(pk__in=list(orders))
+
+    now = timezone.now()
+    with transaction.atomic():
+        # Verrouiller les commandes éligibles : pas de transition concurrente
+        rows = list(
+            selection.filter(status__in=sources)
+            .select_for_update()
+            .order_by('pk')
+            .values_list('pk', 'customer_id')
+        )
+        order_ids = [order_id for order_id, _ in rows]
+        selected = selection.count()
+
+        if order_ids:
+            Order.objects.filter(pk__in=order_ids).update(
+                status=target_status,
+                updated_at=now
+            )
+            OrderStatus.objects.bulk_create(
+                [
+                    OrderStatus(
+                        order_id=order_id,
+                        status=target_status,
+                        comment=comment,
+                        created_by=created_by
+                    )
+                    for order_id in order_ids
+                ],
+                batch_size=500
+            )
+
+            if target_status == 'cancelled':
+                release_reserved_stock(order_ids)
+            if target_status in UNCOUNTED_ORDER_STATUSES:
+                refresh_stats_for_orders(order_ids)
+            invalidate_account_cache(customer_id for _, customer_id in rows)
+
+        followups = TRANSITION_FOLLOWUPS.get(target_status, ()) if enqueue_followups else ()
+        if order_ids and followups:
+            transaction.on_commit(partial(enqueue_order_followups, followups, order_ids))
+
+    result = TransitionResult(
+        target_status=target_status,
+        order_ids=order_ids,
+        skipped=selected - len(order_ids),
+        followups=followups,
+    )
+    logger.info(
+        f"{result.count} commande(s) passée(s) au statut '{target_status}' "
+        f"({result.skipped} ignorée(s)) par {created_by or 'système'}"
+    )
+    return result
+
+
+def mark_orders_paid(orders: Union[QuerySet, Iterable[int]], paid_at=None) -> List[int]:
+    """
+    Marque comme payées les commandes qui ne l'étaient pas encore
+
+    Un UPDATE pour toutes les commandes, puis recalcul des compteurs de
+    leurs clients dans la même transaction.
+
+    Returns:
+        List[int]: Identifiants des commandes effectivement marquées
+    """
+    if isinstance(orders, QuerySet):
+        selection = Order.objects.filter(pk__in=orders.order_by().values('pk'))
+    else:
+        selection = Order.objects.filter(pk__in=list(orders))
+
+    with transaction.atomic():
+        rows = list(
+            selection.filter(is_paid=False)
+            .select_for_update()
+            .order_by('pk')
+            .values_list('pk', 'customer_id')
+        )
+        order_ids = [order_id for order_id, _ in rows]
+        if order_ids:
+            Order.objects.filter(pk__in=order_ids).update(
+                is_paid=True,
+                paid_at=paid_at or timezone.now(),
+                updated_at=timezone.now()
+            )
+            refresh_stats_for_orders(order_ids)
+            invalidate_account_cache(customer_id for _, customer_id in rows)
+
+    return order_ids
+
+
+def recalculate_shipping_costs(orders: QuerySet) -> int:
+    """
+    Recalcule les frais de livraison selon les tarifs actuels
+
+    Sous-totaux relus en une requête groupée sur les articles, puis un seul
+    bulk_update des commandes modifiées (au lieu d'un calculate_total() et
+    d'un save() complet par commande).
+
+    Returns:
+        int: Nombre de commandes modifiées
+    """
+    orders = list(
+        Order.objects.filter(
+            pk__in=orders.order_by().values('pk'),
+            shipping_rate__isnull=False
+        ).select_related('shipping_rate').only(
+            'customer_id', 'shipping_cost', 'tax_amount', 'discount_amount', 'subtotal', 'total',
+            'shipping_rate__price', 'shipping_rate__free_shipping_threshold',
+        )
+    )
+    if not orders:
+        return 0
+
+    subtotals = dict(
+        OrderItem.objects.filter(
+            order_id__in=[order.pk for order in orders]
+        ).values('order_id').annotate(
+            total=Sum('subtotal')
+        ).values_list('order_id', 'total')
+    )
+
+    now = timezone.now()
+    changed = []
+    for order in orders:
+        new_cost = order.shipping_rate.calculate_shipping_cost(order.subtotal)
+        if order.shipping_cost == new_cost:
+            continue
+        order.shipping_cost = new_cost
+        order.subtotal = subtotals.get(order.pk) or Decimal('0')
+        order.total = order.subtotal + order.shipping_cost + order.tax_amount - order.discount_amount
+        order.updated_at = now
+        changed.append(order)
+
+    Order.objects.bulk_update(
+        changed,
+        ['shipping_cost', 'subtotal', 'total', 'updated_at'],
+        batch_size=500
+    )
+    invalidate_account_cache(order.customer_id for order in changed)
+    return len(changed)
+
+
+# ============================================
+# SUITES DES TRANSITIONS (HORS REQUÊTE)
+# ============================================
+
+def enqueue_order_followups(followups: Iterable[str], order_ids: List[int]) -> None:
+    """
+    Met en file les suites d'une transition
+
+    Exécutées dans un thread d'arrière-plan (un seul pour tout le lot), ou
+    immédiatement si ORDER_FOLLOWUPS_ASYNC vaut False.
+    """
+    followups = tuple(followups)
+    if not getattr(settings, 'ORDER_FOLLOWUPS_ASYNC', True):
+        run_order_followups(followups, order_ids)
+        return
+    _start_followup_worker(followups, order_ids)
+
+
+def _start_followup_worker(followups: tuple, order_ids: List[int]) -> None:
+    thread = threading.Thread(
+        target=_run_followups_in_background,
+        args=(followups, order_ids),
+        name='order-followups',
+        daemon=True
+    )
+    thread.start()
+
+
+def _run_followups_in_background(followups: tuple, order_ids: List[int]) -> None:
+    try:
+        run_order_followups(followups, order_ids)
+    except Exception as e:
+        logger.error(f"Erreur lors des suites de transition : {str(e)}", exc_info=True)
+    finally:
+        # Le thread ne doit pas garder de connexion ouverte
+        connections.close_all()
+
+
+def run_order_followups(followups: Iterable[str], order_ids: List[int]) -> None:
+    """Exécute les suites demandées pour un lot de commandes"""
+    for name in followups:
+        try:
+            FOLLOWUP_HANDLERS[name](order_ids)
+        except Exception as e:
+            # Une suite en échec ne doit pas empêcher les autres
+            logger.error(f"Échec de la suite '{name}' : {str(e)}", exc_info=True)
+
+
+def release_reserved_stock(order_ids: List[int]) -> int:
+    """
+    Libère le stock réservé par des commandes annulées
+
+    Une requête groupée par variante, puis un UPDATE par quantité distincte.
+    Appelée par transition_orders() dans la transaction de l'annulation.
+
+    Returns:
+        int: Nombre de stocks mis à jour
+    """
+    reserved = OrderItem.objects.filter(
+        order_id__in=order_ids,
+        variant__isnull=False
+    ).values('variant_id').annotate(
+        quantity=Sum('quantity')
+    ).values_list('variant_id', 'quantity')
+
+    variants_by_quantity: Dict[int, List[int]] = {}
+    for variant_id, quantity in reserved:
+        variants_by_quantity.setdefault(quantity, []).append(variant_id)
+
+    updated = 0
+    with transaction.atomic():
+        for quantity, variant_ids in variants_by_quantity.items():
+            updated += Stock.objects.filter(variant_id__in=variant_ids).update(
+                reserved_quantity=Greatest(F('reserved_quantity') - quantity, Value(0)),
+                updated_at=timezone.now()
+            )
+    logger.info(f"Stock réservé libéré pour {len(order_ids)} commande(s) annulée(s)")
+    return updated
+
+
+def _send_order_emails(order_ids: List[int], sender) -> int:
+    sent = 0
+    orders = Order.objects.filter(pk__in=order_ids).select_related('customer__user')
+    for order in orders.iterator(chunk_size=200):
+        if sender(order):
+            sent += 1
+        else:
+            logger.warning(f"Email non envoyé pour {order.order_number}")
+    return sent
+
+
+def send_shipped_emails(order_ids: List[int]) -> int:
+    return _send_order_emails(order_ids, EmailService.send_order_shipped)
+
+
+def send_cancelled_emails(order_ids: List[int]) -> int:
+    return _send_order_emails(order_ids, EmailService.send_order_cancelled)
+
+
+def send_confirmation_emails(order_ids: List[int]) -> int:
+    return _send_order_emails(order_ids, EmailService.send_order_confirmation)
+
+
+FOLLOWUP_HANDLERS = {
+    'send_shipped_email': send_shipped_emails,
+    'send_cancelled_email': send_cancelled_emails,
+    'send_confirmation_email': send_confirmation_emails,
+}
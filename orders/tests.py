@@ -1,3 +1,146 @@
-from django.test import TestCase
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from shop.models import Category, Product, ProductVariant, Stock
+
+from .models import Order, OrderItem, OrderStatus, ShippingRate, ShippingZone
+from .status_service import (
+    InvalidTransitionException,
+    recalculate_shipping_costs,
+    transition_orders,
+)
+
+TEST_STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+class OrderDataMixin:
+
+    def create_orders(self, count, status='pending', start=0, variant=None, quantity=1):
+        user, _ = User.objects.get_or_create(username='client', email='client@test.ga')
+        orders = []
+        for i in range(start, start + count):
+            order = Order.objects.create(
+                order_number=f'ORD-{status}-{i:05d}',
+                customer=user.customer,
+                customer_email=user.email,
+                customer_phone='+24101020304',
+                subtotal=Decimal('5000'),
+                total=Decimal('5000'),
+                status=status,
+            )
+            OrderItem.objects.create(
+                order=order,
+                variant=variant,
+                product_name='Produit',
+                unit_price=Decimal('5000'),
+                quantity=quantity,
+            )
+            orders.append(order)
+        return orders
+
+    def create_variant(self, sku='SKU-1', reserved=0):
+        category, _ = Category.objects.get_or_create(name='Vêtements', slug='vetements')
+        product = Product.objects.create(
+            name=sku,
+            slug=sku.lower(),
+            description='Description',
+            category=category,
+            base_price=Decimal('5000'),
+            main_image='products/test.jpg',
+        )
+        variant = ProductVariant.objects.create(product=product, sku=sku, size='M')
+        Stock.objects.create(variant=variant, quantity=50, reserved_quantity=reserved)
+        return variant
+
+
+@mock.patch('orders.status_service._start_followup_worker')
+class OrderTransitionTests(OrderDataMixin, TestCase):
+
+    def test_only_allowed_transitions_are_applied(self, start_worker):
+        self.create_orders(3, status='pending')
+        self.create_orders(2, status='delivered')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            result = transition_orders(Order.objects.all(), 'shipped', created_by='admin')
+
+        self.assertEqual(result.count, 3)
+        self.assertEqual(result.skipped, 2)
+        self.assertEqual(Order.objects.filter(status='shipped').count(), 3)
+        self.assertEqual(Order.objects.filter(status='delivered').count(), 2)
+        self.assertEqual(
+            OrderStatus.objects.filter(status='shipped', created_by='admin').count(), 3
+        )
+        # Les emails partent dans UN travail d'arrière-plan pour tout le lot
+        start_worker.assert_called_once_with(('send_shipped_email',), result.order_ids)
+
+    def test_query_count_is_constant(self, start_worker):
+        self.create_orders(5)
+        with CaptureQueriesContext(connection) as small:
+            transition_orders(Order.objects.all(), 'processing')
+
+        self.create_orders(100, start=5)
+        with CaptureQueriesContext(connection) as large:
+            result = transition_orders(Order.objects.filter(status='pending'), 'processing')
+
+        self.assertEqual(result.count, 100)
+        self.assertEqual(len(small), len(large))
+
+    def test_invalid_target_status(self, start_worker):
+        self.create_orders(1)
+        with self.assertRaises(InvalidTransitionException):
+            transition_orders(Order.objects.all(), 'pending')
+
+    def test_cancellation_releases_reserved_stock(self, start_worker):
+        variant = self.create_variant(reserved=5)
+        self.create_orders(2, variant=variant, quantity=2)
+
+        with self.captureOnCommitCallbacks():
+            result = transition_orders(Order.objects.all(), 'cancelled')
+
+        # Libéré avant le commit, sans attendre les suites d'arrière-plan
+        self.assertEqual(Stock.objects.get(variant=variant).reserved_quantity, 1)
+        self.assertEqual(result.count, 2)
+        self.assertEqual(result.followups, ('send_cancelled_email',))
+        start_worker.assert_not_called()
+
+    @override_settings(STORAGES=TEST_STORAGES)
+    def test_admin_action_uses_the_state_machine(self, start_worker):
+        orders = self.create_orders(3)
+        admin = User.objects.create_superuser('admin', 'admin@test.ga', 'pass')
+        self.client.force_login(admin)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/admin/orders/order/', {
+                'action': 'mark_as_shipped',
+                '_selected_action': [order.pk for order in orders],
+            })
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Order.objects.filter(status='shipped').count(), 3)
+        start_worker.assert_called_once()
+
+
+class ShippingRecalculationTests(OrderDataMixin, TestCase):
+
+    def test_recalculate_shipping_costs(self):
+        zone = ShippingZone.objects.create(name='Libreville', slug='libreville')
+        rate = ShippingRate.objects.create(zone=zone, delivery_type='standard', price=Decimal('1500'))
+        orders = self.create_orders(3)
+        Order.objects.filter(pk__in=[order.pk for order in orders]).update(shipping_rate=rate)
+
+        with self.assertNumQueries(3):
+            updated = recalculate_shipping_costs(Order.objects.all())
+
+        self.assertEqual(updated, 3)
+        order = Order.objects.get(pk=orders[0].pk)
+        self.assertEqual(order.shipping_cost, Decimal('1500'))
+        self.assertEqual(order.total, Decimal('6500'))
+        self.assertEqual(recalculate_shipping_costs(Order.objects.all()), 0)
@@ -322,11 +322,6 @@ def checkout(request):
     - Affichage des options de livraison (standard/express)
     - Calcul dynamique des frais de livraison
     """
-    # Vérifier que l'utilisateur a un profil Customer
-    if not hasattr(request.user, 'customer'):
-        from accounts.models import Customer
-        Customer.objects.create(user=request.user)
-    
     # Récupérer le panier
     cart = request.session.get('cart', {})
     
@@ -448,9 +443,7 @@ def checkout_confirm(request):
     # ÉTAPE 1 : VÉRIFICATION DU PROFIL CLIENT
     # ============================================
     
-    if not hasattr(request.user, 'customer'):
-        from accounts.models import Customer
-        Customer.objects.create(user=request.user)
+    # Chargé (et créé au besoin) avec l'utilisateur : accounts/backends.py
     
     # ============================================
     # ÉTAPE 2 : EXTRACTION DES DONNÉES
@@ -598,10 +591,6 @@ def order_success(request, order_number):
     
     # Vérifier que l'utilisateur est bien le propriétaire de la commande
     if request.user.is_authenticated:
-        if not hasattr(request.user, 'customer'):
-            from accounts.models import Customer
-            Customer.objects.create(user=request.user)
-        
         if order.customer != request.user.customer:
             messages.error(request, 'Vous n\'avez pas accès à cette commande.')
             return redirect('core:home')
@@ -669,9 +658,7 @@ def download_invoice(request, order_number):
     # ÉTAPE 1 : VÉRIFICATION DU PROFIL CLIENT
     # ============================================
     
-    if not hasattr(request.user, 'customer'):
-        from accounts.models import Customer
-        Customer.objects.create(user=request.user)
+    # Chargé (et créé au besoin) avec l'utilisateur : accounts/backends.py
     
     # ============================================
     # ÉTAPE 2 : RÉCUPÉRATION SÉCURISÉE
@@ -739,11 +726,6 @@ def preview_invoice(request, order_number):
         HttpResponse: Rendu HTML de la facture
     """
     
-    # Vérification du profil Customer
-    if not hasattr(request.user, 'customer'):
-        from accounts.models import Customer
-        Customer.objects.create(user=request.user)
-    
     # Récupération sécurisée de la commande
     try:
         order = Order.objects.select_related(
@@ -1,7 +1,13 @@
 from django.contrib import admin
+from django.db import transaction
+from django.db.models import OuterRef
 from django.utils.html import format_html
 from django.urls import reverse
-from .models import PaymentMethod, Payment
+from accounts.services import refresh_customer_stats
+from core.paginator import LargeTableAdminMixin
+from core.db_utils import subquery_count
+from .models import PaymentMethod, Payment, PaymentEvent, PaymentWebhookEvent
+from .services import record_payment_events
 
 
 @admin.register(PaymentMethod)
@@ -83,11 +89,20 @@ class PaymentMethodAdmin(admin.ModelAdmin):
             )
     is_active_display.short_description = "Statut"
     
+    def get_queryset(self, request):
+        """Annoter le nombre de paiements (une seule requête pour la liste)"""
+        qs = super().get_queryset(request)
+        return qs.annotate(
+            payments_total=subquery_count(
+                Payment.objects.filter(payment_method=OuterRef('pk')), 'payment_method'
+            )
+        )
+    
     def payment_count(self, obj):
         """Affiche le nombre de paiements avec cette méthode"""
-        count = obj.payments.count()
-        return format_html('<strong>{}</strong> paiement(s)', count)
+        return format_html('<strong>{}</strong> paiement(s)', obj.payments_total)
     payment_count.short_description = "Utilisations"
+    payment_count.admin_order_field = 'payments_total'
     
     actions = ['activate_methods', 'deactivate_methods']
     
@@ -104,8 +119,23 @@ class PaymentMethodAdmin(admin.ModelAdmin):
     deactivate_methods.short_description = "Désactiver les moyens de paiement sélectionnés"
 
 
+class PaymentEventInline(admin.TabularInline):
+    """
+    Échanges avec le fournisseur (lecture seule)
+    """
+    model = PaymentEvent
+    extra = 0
+    fields = ['created_at', 'kind', 'status', 'provider_reference', 'data']
+    readonly_fields = fields
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        # Journal en ajout seul, alimenté par les échanges fournisseur
+        return False
+
+
 @admin.register(Payment)
-class PaymentAdmin(admin.ModelAdmin):
+class PaymentAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     """
     Administration des paiements
     """
@@ -136,10 +166,14 @@ class PaymentAdmin(admin.ModelAdmin):
         'created_at',
         'updated_at',
         'completed_at',
+        'provider_status',
+        'last_event_at',
         'metadata_display'
     ]
+    autocomplete_fields = ['order']
     date_hierarchy = 'created_at'
     ordering = ['-created_at']
+    inlines = [PaymentEventInline]
     
     fieldsets = (
         ('Identification', {
@@ -154,6 +188,9 @@ class PaymentAdmin(admin.ModelAdmin):
         ('Statut et Suivi', {
             'fields': ('status', 'external_reference', 'provider_transaction_id')
         }),
+        ('Fournisseur', {
+            'fields': ('phone_number', 'provider_status', 'last_event_at')
+        }),
         ('Messages', {
             'fields': ('customer_message', 'admin_notes', 'failure_reason'),
             'classes': ('collapse',)
@@ -249,17 +286,22 @@ class PaymentAdmin(admin.ModelAdmin):
         """Action pour marquer comme complété"""
         from django.utils import timezone
         updated = 0
-        for payment in queryset.filter(status__in=['pending', 'processing']):
-            payment.status = 'completed'
-            payment.completed_at = timezone.now()
-            payment.save()
-            
-            # Marquer la commande comme payée
-            payment.order.is_paid = True
-            payment.order.paid_at = timezone.now()
-            payment.order.save()
+        customer_ids = set()
+        with transaction.atomic():
+            for payment in queryset.filter(status__in=['pending', 'processing']):
+                payment.status = 'completed'
+                payment.completed_at = timezone.now()
+                payment.save()
+                
+                # Marquer la commande comme payée
+                payment.order.is_paid = True
+                payment.order.paid_at = timezone.now()
+                payment.order.save()
+                customer_ids.add(payment.order.customer_id)
+                
+                updated += 1
             
-            updated += 1
+            refresh_customer_stats(customer_ids)
         
         self.message_user(request, f'{updated} paiement(s) marqué(s) comme complété(s).')
     mark_as_completed.short_description = "Marquer comme 'Complété'"
@@ -272,6 +314,70 @@ class PaymentAdmin(admin.ModelAdmin):
     
     def mark_as_refunded(self, request, queryset):
         """Action pour marquer comme remboursé"""
-        updated = queryset.filter(status='completed').update(status='refunded')
+        from django.utils import timezone
+        now = timezone.now()
+        with transaction.atomic():
+            payment_ids = list(queryset.filter(status='completed').values_list('pk', flat=True))
+            updated = Payment.objects.filter(pk__in=payment_ids).update(status='refunded', updated_at=now)
+            record_payment_events(
+                PaymentEvent(
+                    payment_id=pk, kind='refund', status='refunded',
+                    data={'by': request.user.username}, created_at=now
+                )
+                for pk in payment_ids
+            )
         self.message_user(request, f'{updated} paiement(s) marqué(s) comme remboursé(s).')
     mark_as_refunded.short_description = "Marquer comme 'Remboursé'"
+
+
+@admin.register(PaymentWebhookEvent)
+class PaymentWebhookEventAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    """
+    Notifications reçues des fournisseurs (lecture seule)
+    """
+    list_display = [
+        'transaction_id',
+        'status',
+        'state_display',
+        'attempts',
+        'received_at',
+        'processed_at'
+    ]
+    list_filter = ['state', 'status', 'received_at']
+    search_fields = ['=transaction_id', '=provider_reference']
+    date_hierarchy = 'received_at'
+    readonly_fields = [
+        'transaction_id', 'status', 'provider_reference', 'payload', 'received_at',
+        'state', 'attempts', 'error', 'next_attempt_at', 'processed_at'
+    ]
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def state_display(self, obj):
+        """Affiche l'état du traitement avec un badge coloré"""
+        colors = {
+            'pending': '#5bc0de',
+            'processed': '#5cb85c',
+            'ignored': '#999',
+            'failed': '#d9534f',
+        }
+        return format_html(
+            '<span style="background-color: {}; color: white; padding: 3px 8px; '
+            'border-radius: 3px; font-weight: bold;" title="{}">{}</span>',
+            colors.get(obj.state, '#999'),
+            obj.error,
+            obj.get_state_display()
+        )
+    state_display.short_description = "Traitement"
+    state_display.admin_order_field = 'state'
+    
+    actions = ['retry_events']
+    
+    def retry_events(self, request, queryset):
+        """Action pour remettre des notifications en échec dans la file"""
+        updated = queryset.filter(state='failed').update(
+            state='pending', attempts=0, error='', next_attempt_at=None
+        )
+        self.message_user(request, f'{updated} notification(s) remise(s) en file.')
+    retry_events.short_description = "Retraiter les notifications en échec"
@@ -0,0 +1,50 @@
+"""
+Commande : migrate_payment_metadata
+===================================
+
+Déplace vers la table PaymentEvent les échanges fournisseur accumulés dans
+Payment.metadata par l'ancienne version (initiation, notifications), par
+lots d'une transaction chacun (payments/services.py). Peut être
+interrompue et relancée.
+
+Usage :
+    python manage.py migrate_payment_metadata --dry-run
+    python manage.py migrate_payment_metadata --batch-size 2000
+"""
+
+from django.core.management.base import BaseCommand
+
+from payments.services import METADATA_MIGRATION_BATCH_SIZE, migrate_payment_metadata
+
+
+class Command(BaseCommand):
+    help = "Déplace les métadonnées des paiements vers le journal des échanges fournisseur"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=METADATA_MIGRATION_BATCH_SIZE,
+            help=f'Paiements traités par lot (défaut : {METADATA_MIGRATION_BATCH_SIZE})'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Compter les paiements et événements concernés sans rien écrire'
+        )
+
+    def handle(self, *args, **options):
+        stats = migrate_payment_metadata(
+            batch_size=max(1, options['batch_size']),
+            dry_run=options['dry_run']
+        )
+
+        if options['dry_run']:
+            self.stdout.write(
+                f"{stats['payments']} paiement(s) à migrer, {stats['events']} événement(s) à créer"
+            )
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['payments']} paiement(s) migré(s), {stats['events']} événement(s) créé(s)"
+        ))
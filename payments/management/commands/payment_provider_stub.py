@@ -0,0 +1,99 @@
+"""
+Commande : payment_provider_stub
+================================
+
+Démarre le faux fournisseur de paiement (payments/provider_stub.py), pour
+développer sans compte Aitel / Moov (AITEL_MONEY_API_URL=http://127.0.0.1:8765)
+ou mesurer l'adaptateur HTTP sous charge.
+
+Usage :
+    python manage.py payment_provider_stub --port 8765 --latency 0.2
+    python manage.py payment_provider_stub --benchmark 5000 --concurrency 50 --latency 0.05 --error-rate 0.02
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+import time
+
+from django.core.management.base import BaseCommand
+
+from payments.provider_stub import StubProviderServer
+from payments.providers import ProviderError, build_http_provider
+
+
+class Command(BaseCommand):
+    help = "Faux fournisseur de paiement mobile (développement, tests de charge)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=8765, help='Port d\'écoute (défaut : 8765)')
+        parser.add_argument('--latency', type=float, default=0.0, help='Délai de réponse en secondes')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Part de réponses 503 (0 à 1)')
+        parser.add_argument('--decline-rate', type=float, default=0.0, help='Part de paiements refusés (0 à 1)')
+        parser.add_argument(
+            '--confirm-after',
+            type=float,
+            default=0.0,
+            help='Secondes avant confirmation d\'un paiement (défaut : immédiate)'
+        )
+        parser.add_argument(
+            '--benchmark',
+            type=int,
+            metavar='N',
+            help='Envoie N initiations via l\'adaptateur HTTP puis affiche les mesures'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=20,
+            help='Appels simultanés pendant le benchmark (défaut : 20)'
+        )
+
+    def handle(self, *args, **options):
+        stub = StubProviderServer(
+            latency=options['latency'],
+            error_rate=options['error_rate'],
+            decline_rate=options['decline_rate'],
+            confirm_after=options['confirm_after'],
+            port=0 if options['benchmark'] else options['port'],
+        )
+
+        if not options['benchmark']:
+            self.stdout.write(f"Faux fournisseur à l'écoute sur {stub.url} (Ctrl+C pour arrêter)")
+            try:
+                stub.serve_forever()
+            except KeyboardInterrupt:
+                pass
+            finally:
+                stub.stop()
+            return
+
+        with stub:
+            self._benchmark(stub, options['benchmark'], max(1, options['concurrency']))
+
+    def _benchmark(self, stub, count, concurrency):
+        provider = build_http_provider('stub', stub.url)
+        outcomes = {}
+
+        def initiate(index):
+            payment = SimpleNamespace(transaction_id=f'BENCH-{index}', total_amount=15000)
+            try:
+                return provider.initiate(payment, '01020304').status
+            except ProviderError as e:
+                return e.__class__.__name__
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for outcome in executor.map(initiate, range(count)):
+                outcomes[outcome] = outcomes.get(outcome, 0) + 1
+        duration = time.perf_counter() - started
+
+        metrics = provider.metrics.snapshot()
+        self.stdout.write(self.style.SUCCESS(
+            f"{count} initiation(s) en {duration:.2f} s ({count / duration:.0f}/s), "
+            f"{stub.requests} requête(s) reçue(s) par le fournisseur"
+        ))
+        self.stdout.write(f"  Résultats : {outcomes}")
+        self.stdout.write(
+            f"  Latence : p50 {metrics['p50_ms']} ms, p95 {metrics['p95_ms']} ms, max {metrics['max_ms']} ms ; "
+            f"{metrics['retries']} nouvelle(s) tentative(s), {metrics['rejected_by_breaker']} refus du disjoncteur"
+        )
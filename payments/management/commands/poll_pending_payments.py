@@ -0,0 +1,148 @@
+"""
+Commande : poll_pending_payments
+================================
+
+Interroge les fournisseurs pour les paiements mobiles restés en attente et
+applique les issues (payments/status_poller.py). À lancer régulièrement
+(cron toutes les 5 minutes) ou en continu avec --loop.
+
+Usage :
+    python manage.py poll_pending_payments
+    python manage.py poll_pending_payments --loop --interval 60
+    python manage.py poll_pending_payments --simulate 10000 --latency 0.05
+
+--simulate crée N paiements en attente et un faux fournisseur local, vide la
+file puis annule tout (transaction annulée) : mesure du débit sans toucher
+aux données.
+"""
+
+from collections import Counter
+from datetime import timedelta
+from decimal import Decimal
+import random
+import time
+import uuid
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import override_settings
+from django.utils import timezone
+
+from orders.models import Order
+from payments.models import Payment, PaymentMethod
+from payments.provider_stub import StubProviderServer
+from payments.providers import get_provider_metrics
+from payments.status_poller import POLL_BATCH_SIZE, PollSettings, poll_pending_payments
+
+
+class Command(BaseCommand):
+    help = "Vérifie auprès des fournisseurs les paiements mobiles restés en attente"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=POLL_BATCH_SIZE,
+            help=f'Paiements vérifiés par passage (défaut : {POLL_BATCH_SIZE})'
+        )
+        parser.add_argument('--workers', type=int, help='Appels simultanés (défaut : PAYMENT_POLL_WORKERS)')
+        parser.add_argument('--loop', action='store_true', help='Ne pas s\'arrêter quand la file est vide')
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=60.0,
+            help='Attente (secondes) quand aucune vérification n\'est due, avec --loop (défaut : 60)'
+        )
+        parser.add_argument(
+            '--simulate',
+            type=int,
+            metavar='N',
+            help='Simulation sur N paiements fictifs et un faux fournisseur (rien n\'est conservé)'
+        )
+        parser.add_argument(
+            '--latency',
+            type=float,
+            default=0.05,
+            help='Latence du faux fournisseur en secondes, avec --simulate (défaut : 0.05)'
+        )
+
+    def handle(self, *args, **options):
+        poll_settings = PollSettings.from_settings(
+            workers=options['workers'],
+            batch_size=max(1, options['batch_size'])
+        )
+        if options['simulate']:
+            return self._simulate(poll_settings, options['simulate'], options['latency'])
+
+        total = self._drain(poll_settings)
+        while options['loop']:
+            time.sleep(options['interval'])
+            total += self._drain(poll_settings)
+        self._report(total)
+
+    def _drain(self, poll_settings):
+        """Passages successifs jusqu'à ce qu'aucune vérification ne soit due"""
+        total = Counter()
+        while True:
+            stats = poll_pending_payments(poll_settings)
+            total += stats
+            if sum(stats.values()) < poll_settings.batch_size:
+                return total
+
+    def _report(self, total, duration=None):
+        timing = f" en {duration:.2f} s" if duration is not None else ''
+        self.stdout.write(self.style.SUCCESS(
+            f"{sum(total.values())} paiement(s) vérifié(s){timing} : "
+            f"{total['completed']} complété(s), {total['failed']} échoué(s), {total['expired']} expiré(s), "
+            f"{total['pending']} toujours en attente, {total['errors']} erreur(s) fournisseur"
+        ))
+
+    def _simulate(self, poll_settings, count, latency):
+        stub = StubProviderServer(latency=latency)
+        provider_settings = override_settings(
+            AITEL_MONEY_API_URL=stub.url,
+            PAYMENT_PROVIDER_POOL_SIZE=poll_settings.workers,
+        )
+        with stub, provider_settings, transaction.atomic():
+            method, _ = PaymentMethod.objects.get_or_create(slug='aitel', defaults={'name': 'Aitel Money'})
+            user = User.objects.create_user(f'simulation-{uuid.uuid4().hex[:8]}')
+            order = Order.objects.create(
+                order_number=f'SIM-{uuid.uuid4().hex[:8]}',
+                customer=user.customer,
+                customer_email='simulation@example.com',
+                customer_phone='00000000',
+                subtotal=Decimal('1000'),
+                total=Decimal('1000'),
+            )
+            payments = Payment.objects.bulk_create(
+                [
+                    Payment(
+                        order=order,
+                        payment_method=method,
+                        transaction_id=f'SIM-{index}-{uuid.uuid4().hex[:8]}',
+                        amount=Decimal('1000'),
+                        total_amount=Decimal('1000'),
+                        status='processing',
+                    )
+                    for index in range(count)
+                ],
+                batch_size=1000
+            )
+            Payment.objects.filter(order=order).update(created_at=timezone.now() - timedelta(hours=1))
+
+            # Issues chez le fournisseur : 70 % confirmés, 10 % refusés, 10 % en attente, 10 % inconnus
+            for payment in payments:
+                draw = random.random()
+                if draw < 0.7:
+                    stub.add_payment(payment.transaction_id, 'success', confirm_after=0)
+                elif draw < 0.8:
+                    stub.add_payment(payment.transaction_id, 'declined')
+                elif draw < 0.9:
+                    stub.add_payment(payment.transaction_id, 'success', confirm_after=3600)
+
+            started = time.perf_counter()
+            total = self._drain(poll_settings)
+            self._report(total, time.perf_counter() - started)
+            self.stdout.write(f"  Fournisseur : {get_provider_metrics().get('aitel')}")
+            transaction.set_rollback(True)
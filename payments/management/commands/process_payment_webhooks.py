@@ -0,0 +1,59 @@
+"""
+Commande : process_payment_webhooks
+===================================
+
+Applique aux paiements et aux commandes les notifications enregistrées par
+le webhook (payments/webhook_service.py), dans l'ordre de réception.
+
+Usage :
+    python manage.py process_payment_webhooks            # vide la file puis s'arrête
+    python manage.py process_payment_webhooks --loop     # worker permanent (supervisor, systemd)
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from payments.webhook_service import WEBHOOK_BATCH_SIZE, process_pending_webhooks
+
+
+class Command(BaseCommand):
+    help = "Traite les notifications de paiement en attente"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=WEBHOOK_BATCH_SIZE,
+            help=f'Notifications lues par passage (défaut : {WEBHOOK_BATCH_SIZE})'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Ne pas s\'arrêter quand la file est vide'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=1.0,
+            help='Attente (secondes) quand la file est vide, avec --loop (défaut : 1)'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+        total = {}
+        while True:
+            stats = process_pending_webhooks(batch_size=batch_size)
+            for state, count in stats.items():
+                total[state] = total.get(state, 0) + count
+
+            # File vide, ou seulement des échecs : nouvelle tentative plus tard
+            if not stats['processed'] and not stats['ignored']:
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{total.get('processed', 0)} traitée(s), {total.get('ignored', 0)} ignorée(s), "
+            f"{total.get('failed', 0)} en échec"
+        ))
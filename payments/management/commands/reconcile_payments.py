@@ -0,0 +1,101 @@
+"""
+Commande : reconcile_payments
+=============================
+
+Rapproche un relevé fournisseur (CSV : référence, montant, statut) des
+paiements et écrit la liste des écarts en CSV (payments/reconciliation.py).
+
+Usage :
+    python manage.py reconcile_payments releve_airtel_2024-05.csv --method airtel-money \\
+        --since 2024-05-01 --until 2024-06-01 -o ecarts.csv
+    python manage.py reconcile_payments releve.csv --fix     # corrige les paiements confirmés
+"""
+
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from dashboard.exports import iter_csv
+from payments.models import PaymentMethod
+from payments.reconciliation import (
+    DISCREPANCY_LABELS,
+    RECONCILIATION_CHUNK_SIZE,
+    REPORT_HEADER,
+    StatementFormatError,
+    StatementReconciler,
+    read_statement,
+)
+
+
+def _parse_day(value):
+    """Date AAAA-MM-JJ -> début de journée (fuseau du site)"""
+    if value is None:
+        return None
+    day = parse_date(value)
+    if day is None:
+        raise CommandError(f"Date invalide : {value} (format attendu : AAAA-MM-JJ)")
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+class Command(BaseCommand):
+    help = "Rapproche un relevé fournisseur des paiements enregistrés"
+
+    def add_arguments(self, parser):
+        parser.add_argument('statement', help='Fichier CSV du relevé')
+        parser.add_argument('--method', help='Slug du moyen de paiement du relevé (ex : airtel-money)')
+        parser.add_argument('--since', help='Début de la période du relevé (AAAA-MM-JJ)')
+        parser.add_argument('--until', help='Fin de la période du relevé, exclue (AAAA-MM-JJ)')
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Passer à « complété » les paiements confirmés par le relevé'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=RECONCILIATION_CHUNK_SIZE,
+            help=f'Lignes de relevé par requête (défaut : {RECONCILIATION_CHUNK_SIZE})'
+        )
+        parser.add_argument(
+            '-o', '--output',
+            help='Fichier CSV des écarts (sortie standard par défaut)'
+        )
+
+    def handle(self, *args, **options):
+        method = options['method']
+        if method and not PaymentMethod.objects.filter(slug=method).exists():
+            raise CommandError(f"Moyen de paiement introuvable : {method}")
+
+        reconciler = StatementReconciler(
+            payment_method=method,
+            fix=options['fix'],
+            since=_parse_day(options['since']),
+            until=_parse_day(options['until']),
+            chunk_size=max(1, options['chunk_size'])
+        )
+
+        try:
+            with open(options['statement'], encoding='utf-8-sig', newline='') as statement:
+                chunks = iter_csv(REPORT_HEADER, reconciler.run(read_statement(statement)))
+                if options['output']:
+                    with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+                        for chunk in chunks:
+                            output.write(chunk)
+                else:
+                    for chunk in chunks:
+                        self.stdout.write(chunk, ending='')
+        except OSError as e:
+            raise CommandError(f"Lecture du relevé impossible : {e}")
+        except StatementFormatError as e:
+            raise CommandError(str(e))
+
+        report = reconciler.report
+        self.stderr.write(self.style.SUCCESS(
+            f"{report.lines} ligne(s) en {report.duration:.2f} s : {report.matched} concordante(s), "
+            f"{report.fixed} paiement(s) corrigé(s)"
+        ))
+        for kind, label in DISCREPANCY_LABELS.items():
+            if report.discrepancies[kind]:
+                self.stderr.write(f"  {label} : {report.discrepancies[kind]}")
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.26 on 2026-10-19 07:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0002_created_at_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentWebhookEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('transaction_id', models.CharField(max_length=100, verbose_name='ID de transaction')),
+                ('status', models.CharField(max_length=50, verbose_name='Statut annoncé')),
+                ('provider_reference', models.CharField(blank=True, max_length=255, verbose_name='Référence fournisseur')),
+                ('payload', models.JSONField(default=dict, verbose_name='Contenu reçu')),
+                ('received_at', models.DateTimeField(auto_now_add=True, verbose_name='Reçu le')),
+                ('state', models.CharField(choices=[('pending', 'À traiter'), ('processed', 'Traité'), ('ignored', 'Ignoré'), ('failed', 'En échec')], default='pending', max_length=20, verbose_name='État du traitement')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Tentatives')),
+                ('error', models.TextField(blank=True, verbose_name='Dernière erreur')),
+                ('processed_at', models.DateTimeField(blank=True, null=True, verbose_name='Traité le')),
+            ],
+            options={
+                'verbose_name': 'Notification de paiement',
+                'verbose_name_plural': 'Notifications de paiement',
+                'ordering': ['-received_at'],
+                'indexes': [models.Index(fields=['state', 'id'], name='idx_webhook_queue')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='paymentwebhookevent',
+            constraint=models.UniqueConstraint(fields=('transaction_id', 'status'), name='uniq_webhook_event'),
+        ),
+    ]
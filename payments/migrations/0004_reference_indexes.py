@@ -0,0 +1,21 @@
+# Generated by Django 4.2.26 on 2026-10-19 07:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0003_payment_webhook_event'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['provider_transaction_id'], name='idx_payment_provider_ref'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['external_reference'], name='idx_payment_external_ref'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.26 on 2026-10-19 07:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0004_reference_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='next_status_check_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Prochaine vérification'),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='status_checks',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='Vérifications de statut'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['status', 'created_at'], name='idx_payment_status_created'),
+        ),
+    ]
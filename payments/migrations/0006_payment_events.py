@@ -0,0 +1,48 @@
+# Generated by Django 4.2.26 on 2026-10-19 07:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0005_payment_status_checks'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='last_event_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Dernier échange fournisseur'),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='phone_number',
+            field=models.CharField(blank=True, max_length=20, verbose_name='Téléphone débité'),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='provider_status',
+            field=models.CharField(blank=True, editable=False, max_length=20, verbose_name='Dernier statut fournisseur'),
+        ),
+        migrations.CreateModel(
+            name='PaymentEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('initiation', 'Initiation'), ('webhook', 'Notification'), ('poll', 'Vérification de statut'), ('refund', 'Remboursement'), ('legacy', 'Métadonnées migrées')], max_length=20, verbose_name='Type')),
+                ('status', models.CharField(blank=True, max_length=20, verbose_name='Statut annoncé')),
+                ('provider_reference', models.CharField(blank=True, max_length=255, verbose_name='Référence fournisseur')),
+                ('data', models.JSONField(blank=True, default=dict, verbose_name='Données')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Date')),
+                ('payment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='payments.payment', verbose_name='Paiement')),
+            ],
+            options={
+                'verbose_name': 'Échange fournisseur',
+                'verbose_name_plural': 'Échanges fournisseur',
+                'ordering': ['created_at', 'id'],
+                'indexes': [models.Index(fields=['payment', 'created_at'], name='idx_payment_event_payment'), models.Index(fields=['kind', 'created_at'], name='idx_payment_event_kind')],
+            },
+        ),
+    ]
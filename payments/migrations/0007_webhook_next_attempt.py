@@ -0,0 +1,18 @@
+# Generated by Django 4.2.26 on 2026-10-19 08:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0006_payment_events'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paymentwebhookevent',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Prochaine tentative'),
+        ),
+    ]
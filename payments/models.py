@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 from orders.models import Order
 import uuid
@@ -193,7 +194,27 @@ class Payment(models.Model):
         verbose_name="ID transaction fournisseur"
     )
     
-    # Métadonnées (JSON pour informations supplémentaires)
+    # Résumé des échanges avec le fournisseur (détail : PaymentEvent)
+    phone_number = models.CharField(
+        max_length=20,
+        blank=True,
+        verbose_name="Téléphone débité"
+    )
+    provider_status = models.CharField(
+        max_length=20,
+        blank=True,
+        editable=False,
+        verbose_name="Dernier statut fournisseur"
+    )
+    last_event_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="Dernier échange fournisseur"
+    )
+    
+    # Métadonnées libres (historique : les échanges fournisseur sont des
+    # PaymentEvent, manage.py migrate_payment_metadata y déplace l'existant)
     metadata = models.JSONField(
         default=dict,
         blank=True,
@@ -214,6 +235,19 @@ class Payment(models.Model):
         verbose_name="Raison de l'échec"
     )
     
+    # Vérifications de statut auprès du fournisseur (manage.py poll_pending_payments)
+    status_checks = models.PositiveSmallIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Vérifications de statut"
+    )
+    next_status_check_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="Prochaine vérification"
+    )
+    
     # Dates
     created_at = models.DateTimeField(
         auto_now_add=True,
@@ -233,6 +267,15 @@ class Payment(models.Model):
         verbose_name = "Paiement"
         verbose_name_plural = "Paiements"
         ordering = ['-created_at']
+        indexes = [
+            # Tri par défaut des listes et plages de date_hierarchy
+            models.Index(fields=['-created_at'], name='idx_payment_created'),
+            # Rapprochement des relevés fournisseurs (payments/reconciliation.py)
+            models.Index(fields=['provider_transaction_id'], name='idx_payment_provider_ref'),
+            models.Index(fields=['external_reference'], name='idx_payment_external_ref'),
+            # Paiements en attente depuis longtemps (payments/status_poller.py, alertes)
+            models.Index(fields=['status', 'created_at'], name='idx_payment_status_created'),
+        ]
 
     def __str__(self):
         return f"Paiement {self.transaction_id} - {self.order.order_number}"
@@ -266,4 +309,153 @@ class Payment(models.Model):
     @property
     def can_be_refunded(self):
         """Vérifie si le paiement peut être remboursé"""
-        return self.status == 'completed'
\ No newline at end of file
+        return self.status == 'completed'
+
+
+class PaymentEvent(models.Model):
+    """
+    Échange avec le fournisseur d'un paiement (journal en ajout seul)
+
+    Une ligne par initiation, notification, vérification de statut ou
+    remboursement, au lieu d'un document JSON réécrit à chaque mise à jour
+    du paiement. Le dernier statut et la date du dernier échange sont
+    recopiés sur le paiement (provider_status, last_event_at).
+    """
+    KIND_CHOICES = [
+        ('initiation', 'Initiation'),
+        ('webhook', 'Notification'),
+        ('poll', 'Vérification de statut'),
+        ('refund', 'Remboursement'),
+        ('legacy', 'Métadonnées migrées'),
+    ]
+
+    payment = models.ForeignKey(
+        Payment,
+        on_delete=models.CASCADE,
+        related_name='events',
+        verbose_name="Paiement"
+    )
+    kind = models.CharField(
+        max_length=20,
+        choices=KIND_CHOICES,
+        verbose_name="Type"
+    )
+    status = models.CharField(
+        max_length=20,
+        blank=True,
+        verbose_name="Statut annoncé"
+    )
+    provider_reference = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name="Référence fournisseur"
+    )
+    data = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name="Données"
+    )
+    # Pas d'auto_now_add : les métadonnées migrées gardent leur date d'origine
+    created_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name="Date"
+    )
+
+    class Meta:
+        verbose_name = "Échange fournisseur"
+        verbose_name_plural = "Échanges fournisseur"
+        ordering = ['created_at', 'id']
+        indexes = [
+            # Historique d'un paiement
+            models.Index(fields=['payment', 'created_at'], name='idx_payment_event_payment'),
+            # Volumes par type d'échange et période
+            models.Index(fields=['kind', 'created_at'], name='idx_payment_event_kind'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} : {self.status or '-'}"
+
+
+class PaymentWebhookEvent(models.Model):
+    """
+    Notification reçue d'un fournisseur de paiement (webhook)
+
+    Enregistrée telle quelle dès réception, puis appliquée au paiement par
+    `manage.py process_payment_webhooks` (payments/webhook_service.py).
+    Les données reçues ne sont jamais modifiées : seuls les champs de
+    traitement (état, tentatives, erreur) évoluent. Une même notification
+    renvoyée par le fournisseur (même transaction, même statut) n'est
+    enregistrée qu'une fois.
+    """
+    STATE_CHOICES = [
+        ('pending', 'À traiter'),
+        ('processed', 'Traité'),
+        ('ignored', 'Ignoré'),
+        ('failed', 'En échec'),
+    ]
+
+    # Données reçues
+    transaction_id = models.CharField(
+        max_length=100,
+        verbose_name="ID de transaction"
+    )
+    status = models.CharField(
+        max_length=50,
+        verbose_name="Statut annoncé"
+    )
+    provider_reference = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name="Référence fournisseur"
+    )
+    payload = models.JSONField(
+        default=dict,
+        verbose_name="Contenu reçu"
+    )
+    received_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Reçu le"
+    )
+
+    # Traitement
+    state = models.CharField(
+        max_length=20,
+        choices=STATE_CHOICES,
+        default='pending',
+        verbose_name="État du traitement"
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name="Tentatives"
+    )
+    error = models.TextField(
+        blank=True,
+        verbose_name="Dernière erreur"
+    )
+    # Après un échec : pas de nouvelle tentative avant cette date (attente exponentielle)
+    next_attempt_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="Prochaine tentative"
+    )
+    processed_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Traité le"
+    )
+
+    class Meta:
+        verbose_name = "Notification de paiement"
+        verbose_name_plural = "Notifications de paiement"
+        ordering = ['-received_at']
+        constraints = [
+            models.UniqueConstraint(fields=['transaction_id', 'status'], name='uniq_webhook_event'),
+        ]
+        indexes = [
+            # File du worker : WHERE state IN (...) ORDER BY id
+            models.Index(fields=['state', 'id'], name='idx_webhook_queue'),
+        ]
+
+    def __str__(self):
+        return f"{self.transaction_id} : {self.status} ({self.state})"
@@ -0,0 +1,168 @@
+"""
+payments/provider_stub.py - Faux fournisseur de paiement mobile
+===============================================================
+
+Serveur HTTP local qui imite l'API attendue par payments/providers.py,
+pour les tests et les mesures de charge (commande payment_provider_stub) :
+- POST /payments        : enregistre un paiement (idempotent sur la référence)
+- GET  /payments/<ref>  : statut d'un paiement, 404 si inconnu
+
+Latence, taux d'erreurs 503, taux de refus et délai de confirmation sont
+réglables. Avec un délai de confirmation, un paiement reste « pending »
+jusqu'à ce délai, comme un débit en attente de validation sur le téléphone.
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import itertools
+import json
+import random
+import sys
+import threading
+import time
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    # Connexions persistantes : le pool du client est réellement utilisé
+    protocol_version = 'HTTP/1.1'
+    # En-têtes et corps envoyés séparément : sans cela, Nagle + ACK retardé
+    # ajoutent ~40 ms à chaque réponse
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _simulate_conditions(self):
+        """Latence et erreurs aléatoires ; True si une erreur a été renvoyée"""
+        stub = self.server.stub
+        with stub._lock:
+            stub.requests += 1
+        if stub.latency:
+            time.sleep(stub.latency)
+        if stub.error_rate and random.random() < stub.error_rate:
+            self._reply(503, {'message': 'Service indisponible'})
+            return True
+        return False
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        if self.path.rstrip('/') != '/payments':
+            return self._reply(404, {'message': 'Ressource inconnue'})
+        if self._simulate_conditions():
+            return None
+        reference = payload.get('reference')
+        if not reference:
+            return self._reply(400, {'message': 'Référence manquante'})
+        return self._reply(200, self.server.stub.initiate(reference))
+
+    def do_GET(self):
+        if not self.path.startswith('/payments/'):
+            return self._reply(404, {'message': 'Ressource inconnue'})
+        if self._simulate_conditions():
+            return None
+        data = self.server.stub.status(self.path[len('/payments/'):])
+        if data is None:
+            return self._reply(404, {'message': 'Paiement inconnu'})
+        return self._reply(200, data)
+
+
+class _StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Client parti avant la réponse (délai dépassé) : comportement attendu
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class StubProviderServer:
+    """
+    Faux fournisseur démarré dans un thread
+
+    Args:
+        latency: Délai (secondes) avant chaque réponse
+        error_rate: Part des requêtes répondues en 503
+        decline_rate: Part des paiements refusés
+        confirm_after: Secondes avant confirmation d'un paiement (0 : immédiate)
+        port: Port d'écoute (0 : port libre)
+
+    Usage :
+        with StubProviderServer(latency=0.05) as stub:
+            settings.AITEL_MONEY_API_URL = stub.url
+    """
+
+    def __init__(self, latency=0.0, error_rate=0.0, decline_rate=0.0, confirm_after=0.0, port=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.decline_rate = decline_rate
+        self.confirm_after = confirm_after
+        self.requests = 0
+        self._payments = {}
+        self._lock = threading.Lock()
+        self._sequence = itertools.count(1)
+        self._server = _StubServer(('127.0.0.1', port), _StubHandler)
+        self._server.stub = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def add_payment(self, reference, outcome='success', confirm_after=None):
+        """Paiement déjà connu du fournisseur (simulations de vérification de statut)"""
+        with self._lock:
+            self._payments[reference] = {
+                'reference': f'STUB-{next(self._sequence)}',
+                'outcome': outcome,
+                'confirm_at': time.monotonic() + (self.confirm_after if confirm_after is None else confirm_after),
+            }
+
+    def initiate(self, reference):
+        with self._lock:
+            # Idempotence : une deuxième initiation renvoie le premier résultat
+            if reference not in self._payments:
+                declined = self.decline_rate and random.random() < self.decline_rate
+                self._payments[reference] = {
+                    'reference': f'STUB-{next(self._sequence)}',
+                    'outcome': 'declined' if declined else 'success',
+                    'confirm_at': time.monotonic() + self.confirm_after,
+                }
+        return self.status(reference)
+
+    def status(self, reference):
+        with self._lock:
+            payment = self._payments.get(reference)
+        if payment is None:
+            return None
+        if payment['outcome'] == 'success' and time.monotonic() < payment['confirm_at']:
+            status = 'pending'
+        else:
+            status = payment['outcome']
+        return {'status': status, 'reference': payment['reference'], 'message': ''}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, args=(0.05,), daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
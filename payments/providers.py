@@ -0,0 +1,423 @@
+"""
+payments/providers.py - Adaptateurs des fournisseurs de paiement mobile
+=======================================================================
+
+Appels aux API Aitel Money et Moov Money :
+- un client HTTP partagé (pool de connexions urllib3 par fournisseur) :
+  pas de nouvelle connexion TLS à chaque paiement
+- délais stricts de connexion et de réponse
+  (PAYMENT_PROVIDER_CONNECT_TIMEOUT / PAYMENT_PROVIDER_READ_TIMEOUT)
+- nouvelles tentatives sur erreur réseau, 429 et 5xx, avec attente
+  exponentielle aléatoire (« full jitter ») ; l'en-tête Idempotency-Key
+  (identifiant de transaction) évite un double débit si la première
+  requête avait abouti
+- disjoncteur par fournisseur : après PAYMENT_PROVIDER_BREAKER_THRESHOLD
+  échecs consécutifs, les appels sont refusés immédiatement pendant
+  PAYMENT_PROVIDER_BREAKER_RESET secondes, puis un appel d'essai décide
+  de la reprise
+- ProviderNotReached quand aucune requête n'a été envoyée (disjoncteur,
+  connexion impossible) : seul cas d'erreur où le fournisseur n'a
+  certainement rien traité, en dehors d'un refus (ProviderRejected)
+- latences, erreurs et nouvelles tentatives mesurées par fournisseur
+  (get_provider_metrics)
+
+Ces appels ne doivent jamais être faits dans une transaction : la vue
+enregistre le paiement, appelle le fournisseur, puis applique le résultat
+(payments/services.py) dans une nouvelle transaction courte.
+
+Sans URL d'API configurée, le fournisseur est simulé (paiement accepté
+immédiatement), comme avant l'intégration.
+"""
+
+from collections import deque
+from dataclasses import dataclass
+import json
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+import urllib3
+
+logger = logging.getLogger(__name__)
+
+# Fournisseur -> (setting de l'URL d'API, setting de la clé, préfixe des références simulées)
+PROVIDER_SETTINGS = {
+    'aitel': ('AITEL_MONEY_API_URL', 'AITEL_MONEY_API_KEY', 'AITEL'),
+    'moov': ('MOOV_MONEY_API_URL', 'MOOV_MONEY_API_KEY', 'MOOV'),
+}
+
+# Statuts des API fournisseurs -> statuts de Payment
+PROVIDER_STATUS_MAP = {
+    'success': 'completed',
+    'successful': 'completed',
+    'completed': 'completed',
+    'pending': 'processing',
+    'processing': 'processing',
+    'failed': 'failed',
+    'declined': 'failed',
+    'cancelled': 'failed',
+}
+
+RETRYABLE_HTTP_STATUSES = (429, 500, 502, 503, 504)
+
+# Attente avant nouvelle tentative : aléatoire entre 0 et base * 2^tentative, plafonnée
+RETRY_BACKOFF_BASE = 0.2
+RETRY_BACKOFF_MAX = 2.0
+
+# Échantillons de latence conservés par fournisseur (percentiles)
+LATENCY_SAMPLES = 1000
+
+
+class ProviderError(Exception):
+    """Échec d'un appel fournisseur"""
+    pass
+
+
+class ProviderUnavailable(ProviderError):
+    """
+    Fournisseur injoignable, en erreur ou coupé par le disjoncteur
+
+    Issue inconnue : la requête a pu être traitée (délai de réponse dépassé,
+    connexion coupée, erreur 5xx), sauf pour ProviderNotReached.
+    """
+    pass
+
+
+class ProviderNotReached(ProviderUnavailable):
+    """Requête jamais reçue (disjoncteur ouvert, connexion impossible) : rien n'a été traité"""
+    pass
+
+
+class ProviderRejected(ProviderError):
+    """Requête refusée par le fournisseur (erreur 4xx) : inutile de réessayer"""
+
+    def __init__(self, message, http_status=None):
+        super().__init__(message)
+        self.http_status = http_status
+
+
+@dataclass(frozen=True)
+class ProviderResult:
+    """Réponse d'un fournisseur, traduite en statut de Payment"""
+    status: str
+    provider_reference: str = ''
+    message: str = ''
+
+
+# ============================================
+# DISJONCTEUR ET MESURES
+# ============================================
+
+class CircuitBreaker:
+    """
+    Disjoncteur : fermé (appels autorisés), ouvert (appels refusés), puis
+    semi-ouvert après `reset_timeout` secondes (un seul appel d'essai)
+    """
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return 'open'
+            return 'half-open'
+
+    def allow(self):
+        """True si un appel peut être tenté maintenant"""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial_running:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+
+class ProviderMetrics:
+    """Compteurs et latences (secondes) des appels à un fournisseur"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.rejected_by_breaker = 0
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def record_call(self, duration, failed=False):
+        with self._lock:
+            self.calls += 1
+            if failed:
+                self.errors += 1
+            self._latencies.append(duration)
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def record_breaker_rejection(self):
+        with self._lock:
+            self.rejected_by_breaker += 1
+
+    def snapshot(self):
+        """Compteurs et percentiles de latence (ms) des derniers appels"""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            snapshot = {
+                'calls': self.calls,
+                'errors': self.errors,
+                'retries': self.retries,
+                'rejected_by_breaker': self.rejected_by_breaker,
+            }
+
+        def percentile(rank):
+            if not latencies:
+                return 0.0
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * rank))] * 1000, 1)
+
+        snapshot.update(p50_ms=percentile(0.5), p95_ms=percentile(0.95), max_ms=percentile(1))
+        return snapshot
+
+
+# ============================================
+# ADAPTATEURS
+# ============================================
+
+class SimulatedPaymentProvider:
+    """Fournisseur sans API configurée : tout paiement est accepté"""
+
+    def __init__(self, name, reference_prefix):
+        self.name = name
+        self.reference_prefix = reference_prefix
+        self.metrics = ProviderMetrics()
+
+    def initiate(self, payment, phone):
+        self.metrics.record_call(0.0)
+        return ProviderResult('completed', f"{self.reference_prefix}-{payment.transaction_id}")
+
+    def check_status(self, payment):
+        self.metrics.record_call(0.0)
+        return ProviderResult('completed', payment.provider_transaction_id)
+
+
+class HttpPaymentProvider:
+    """
+    Adaptateur d'une API de paiement mobile
+
+    POST {base_url}/payments           -> initiation (débit demandé au client)
+    GET  {base_url}/payments/<id>      -> statut d'un paiement
+    Réponses JSON : {"status": ..., "reference": ..., "message": ...}
+    """
+
+    def __init__(self, name, base_url, api_key, http, timeout, max_retries, breaker):
+        self.name = name
+        self.base_url = base_url.rstrip('/')
+        self.api_key = api_key
+        self.http = http
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.breaker = breaker
+        self.metrics = ProviderMetrics()
+
+    def initiate(self, payment, phone):
+        return self._call('POST', '/payments', payment.transaction_id, {
+            'reference': payment.transaction_id,
+            'amount': str(payment.total_amount),
+            'currency': 'XAF',
+            'phone': phone,
+        })
+
+    def check_status(self, payment):
+        return self._call('GET', f'/payments/{payment.transaction_id}', payment.transaction_id)
+
+    def _call(self, method, path, idempotency_key, payload=None):
+        if not self.breaker.allow():
+            self.metrics.record_breaker_rejection()
+            raise ProviderNotReached(f"{self.name} : service momentanément coupé (disjoncteur ouvert)")
+
+        started = time.perf_counter()
+        try:
+            data = self._request_with_retries(method, path, idempotency_key, payload)
+        except ProviderRejected:
+            # Le fournisseur a répondu : il est disponible
+            self.breaker.record_success()
+            self.metrics.record_call(time.perf_counter() - started, failed=True)
+            raise
+        except ProviderError:
+            self.breaker.record_failure()
+            self.metrics.record_call(time.perf_counter() - started, failed=True)
+            raise
+
+        self.breaker.record_success()
+        self.metrics.record_call(time.perf_counter() - started)
+
+        status = PROVIDER_STATUS_MAP.get(str(data.get('status', '')).lower())
+        if status is None:
+            raise ProviderError(f"{self.name} : statut inattendu {data.get('status')!r}")
+        return ProviderResult(status, str(data.get('reference') or ''), str(data.get('message') or ''))
+
+    def _request_with_retries(self, method, path, idempotency_key, payload):
+        headers = {
+            'Authorization': f'Bearer {self.api_key}',
+            'Accept': 'application/json',
+            'Idempotency-Key': idempotency_key,
+        }
+        body = None
+        if payload is not None:
+            headers['Content-Type'] = 'application/json'
+            body = json.dumps(payload).encode()
+
+        # Une requête envoyée a pu être traitée, même sans réponse exploitable
+        delivered = False
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.metrics.record_retry()
+                time.sleep(random.uniform(0, min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * 2 ** attempt)))
+            try:
+                response = self.http.request(
+                    method,
+                    self.base_url + path,
+                    body=body,
+                    headers=headers,
+                    timeout=self.timeout,
+                    retries=False,
+                )
+            except urllib3.exceptions.HTTPError as e:
+                # Connexion impossible (refusée, délai de connexion) : requête jamais envoyée
+                if not isinstance(e, urllib3.exceptions.ConnectTimeoutError):
+                    delivered = True
+                error = ProviderUnavailable(f"{self.name} : {e.__class__.__name__}")
+                logger.warning(f"{self.name} {method} {path} (tentative {attempt + 1}) : {e}")
+                continue
+
+            delivered = True
+            if response.status in RETRYABLE_HTTP_STATUSES:
+                error = ProviderUnavailable(f"{self.name} : erreur HTTP {response.status}")
+                logger.warning(f"{self.name} {method} {path} (tentative {attempt + 1}) : HTTP {response.status}")
+                continue
+
+            try:
+                data = json.loads(response.data or b'{}')
+            except ValueError:
+                raise ProviderError(f"{self.name} : réponse illisible (HTTP {response.status})")
+            if response.status >= 400:
+                raise ProviderRejected(
+                    data.get('message') or f"{self.name} : requête refusée (HTTP {response.status})",
+                    response.status
+                )
+            return data
+
+        if not delivered:
+            raise ProviderNotReached(str(error))
+        raise error
+
+
+# ============================================
+# REGISTRE
+# ============================================
+
+_providers = {}
+_http = None
+_lock = threading.Lock()
+_http_lock = threading.Lock()
+
+
+def _get_http():
+    """Client HTTP partagé par tous les fournisseurs (un pool par hôte)"""
+    global _http
+    with _http_lock:
+        if _http is None:
+            _http = urllib3.PoolManager(
+                num_pools=len(PROVIDER_SETTINGS) * 2,
+                maxsize=getattr(settings, 'PAYMENT_PROVIDER_POOL_SIZE', 10),
+                retries=False,
+            )
+        return _http
+
+
+def build_http_provider(name, base_url, api_key=''):
+    """Adaptateur HTTP configuré selon les settings PAYMENT_PROVIDER_*"""
+    return HttpPaymentProvider(
+        name,
+        base_url,
+        api_key,
+        http=_get_http(),
+        timeout=urllib3.Timeout(
+            connect=getattr(settings, 'PAYMENT_PROVIDER_CONNECT_TIMEOUT', 3.0),
+            read=getattr(settings, 'PAYMENT_PROVIDER_READ_TIMEOUT', 10.0),
+        ),
+        max_retries=getattr(settings, 'PAYMENT_PROVIDER_MAX_RETRIES', 2),
+        breaker=CircuitBreaker(
+            getattr(settings, 'PAYMENT_PROVIDER_BREAKER_THRESHOLD', 5),
+            getattr(settings, 'PAYMENT_PROVIDER_BREAKER_RESET', 30),
+        ),
+    )
+
+
+def get_provider(name):
+    """
+    Adaptateur du fournisseur `name` ('aitel' ou 'moov'), créé une fois par processus
+
+    Raises:
+        KeyError: Fournisseur inconnu
+    """
+    provider = _providers.get(name)
+    if provider is not None:
+        return provider
+
+    url_setting, key_setting, reference_prefix = PROVIDER_SETTINGS[name]
+    with _lock:
+        if name not in _providers:
+            base_url = getattr(settings, url_setting, '')
+            if base_url:
+                _providers[name] = build_http_provider(name, base_url, getattr(settings, key_setting, ''))
+            else:
+                _providers[name] = SimulatedPaymentProvider(name, reference_prefix)
+        return _providers[name]
+
+
+def get_provider_metrics():
+    """Mesures des fournisseurs utilisés par ce processus : {nom: mesures}"""
+    return {name: provider.metrics.snapshot() for name, provider in list(_providers.items())}
+
+
+def reset_providers():
+    """Oublie les adaptateurs (et leurs connexions) : relus depuis les settings au prochain appel"""
+    global _http
+    with _lock, _http_lock:
+        _providers.clear()
+        if _http is not None:
+            _http.clear()
+            _http = None
+
+
+@receiver(setting_changed)
+def _reset_on_setting_change(setting, **kwargs):
+    if setting.startswith(('AITEL_MONEY_', 'MOOV_MONEY_', 'PAYMENT_PROVIDER_')):
+        reset_providers()
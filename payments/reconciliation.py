@@ -0,0 +1,293 @@
+"""
+payments/reconciliation.py - Rapprochement des relevés fournisseurs
+===================================================================
+
+Les relevés Airtel Money / Moov Money (CSV) étaient pointés à la main
+contre les paiements. Le rapprochement :
+- lit le relevé en flux (une ligne à la fois, jamais le fichier entier)
+- traite les lignes par paquets : une seule requête par paquet, sur les
+  colonnes indexées provider_transaction_id / external_reference /
+  transaction_id
+- signale les écarts au fil de l'eau : référence inconnue, montant
+  différent, doublon (dans le relevé ou côté boutique), statut différent,
+  et en fin de traitement les paiements complétés absents du relevé
+- peut corriger en masse les paiements confirmés par le relevé mais
+  restés en attente ou en échec (--fix)
+
+La mémoire utilisée ne dépend que du nombre de références du relevé (pour
+détecter les doublons), pas de la taille du fichier.
+Utilisé par la commande manage.py reconcile_payments.
+"""
+
+from collections import Counter
+import csv
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+import itertools
+import logging
+import time
+from typing import Iterable, Iterator, Optional
+
+from django.utils.functional import cached_property
+
+from .models import Payment, PaymentMethod
+from .services import complete_payments
+
+logger = logging.getLogger(__name__)
+
+RECONCILIATION_CHUNK_SIZE = 2000
+
+# En-têtes acceptés pour chaque colonne du relevé (comparés en minuscules)
+STATEMENT_COLUMNS = {
+    'reference': ('reference', 'référence', 'transaction_id', 'id transaction', 'transaction', 'txn_id'),
+    'amount': ('amount', 'montant'),
+    'status': ('status', 'statut', 'etat', 'état'),
+}
+
+# Colonnes de Payment où chercher la référence du relevé (toutes indexées)
+REFERENCE_FIELDS = ('provider_transaction_id', 'external_reference', 'transaction_id')
+
+# Colonnes lues pour chaque paiement rapproché
+REPORT_FIELDS = (
+    'pk', 'transaction_id', 'provider_transaction_id', 'external_reference', 'total_amount', 'status',
+    'payment_method_id',
+)
+
+# Statuts de relevé signifiant que le client a bien été débité
+STATEMENT_SUCCESS_STATUSES = ('success', 'successful', 'completed', 'succes', 'succès', 'reussi', 'réussi', 'ok')
+
+# Paiements que le relevé peut passer à « complété » avec --fix
+FIXABLE_PAYMENT_STATUSES = ('pending', 'processing', 'failed')
+
+REPORT_HEADER = [
+    'Écart', 'Ligne', 'Référence relevé', 'Montant relevé',
+    'Transaction', 'Montant attendu', 'Statut paiement',
+]
+
+DISCREPANCY_LABELS = {
+    'missing': 'Référence inconnue',
+    'amount_mismatch': 'Montant différent',
+    'duplicate_line': 'Doublon dans le relevé',
+    'duplicate_payment': 'Plusieurs paiements pour la référence',
+    'status_mismatch': 'Statut différent',
+    'missing_in_statement': 'Absent du relevé',
+}
+
+
+class StatementFormatError(ValueError):
+    """Relevé illisible (colonnes obligatoires absentes)"""
+    pass
+
+
+@dataclass(frozen=True)
+class StatementLine:
+    """Ligne utile d'un relevé"""
+    line_number: int
+    reference: str
+    amount: Optional[Decimal]
+    succeeded: bool
+
+
+@dataclass
+class ReconciliationReport:
+    """Bilan d'un rapprochement"""
+    lines: int = 0
+    matched: int = 0
+    fixed: int = 0
+    discrepancies: Counter = field(default_factory=Counter)
+    duration: float = 0.0
+
+
+def parse_amount(value):
+    """
+    Montant d'un relevé : « 15 000,50 », « 15,000.50 » ou « 15000.5 »
+
+    Returns:
+        Decimal ou None si illisible
+    """
+    value = (value or '').replace('\xa0', '').replace(' ', '').strip()
+    if ',' in value and '.' in value:
+        # Le séparateur le plus à gauche est celui des milliers
+        thousands = ',' if value.index(',') < value.index('.') else '.'
+        value = value.replace(thousands, '')
+    value = value.replace(',', '.')
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        return None
+
+
+def read_statement(stream) -> Iterator[StatementLine]:
+    """
+    Lit un relevé CSV ligne par ligne (séparateur ; ou , détecté sur l'en-tête)
+
+    Raises:
+        StatementFormatError: Si les colonnes référence et montant sont introuvables
+    """
+    header_line = stream.readline().lstrip('\ufeff')
+    delimiter = ';' if header_line.count(';') >= header_line.count(',') else ','
+    header = [name.strip().lower() for name in next(csv.reader([header_line], delimiter=delimiter), [])]
+
+    positions = {}
+    for column, aliases in STATEMENT_COLUMNS.items():
+        for alias in aliases:
+            if alias in header:
+                positions[column] = header.index(alias)
+                break
+    if 'reference' not in positions or 'amount' not in positions:
+        raise StatementFormatError(
+            "Colonnes « référence » et « montant » introuvables dans l'en-tête du relevé"
+        )
+
+    status_position = positions.get('status')
+    width = max(positions.values()) + 1
+    for line_number, row in enumerate(csv.reader(stream, delimiter=delimiter), start=2):
+        if len(row) < width or not row[positions['reference']].strip():
+            continue
+        yield StatementLine(
+            line_number=line_number,
+            reference=row[positions['reference']].strip(),
+            amount=parse_amount(row[positions['amount']]),
+            # Sans colonne de statut, un relevé ne liste que les opérations réussies
+            succeeded=(
+                status_position is None
+                or row[status_position].strip().lower() in STATEMENT_SUCCESS_STATUSES
+            ),
+        )
+
+
+class StatementReconciler:
+    """
+    Rapproche un relevé des paiements
+
+    `run()` est un générateur de lignes d'écart (REPORT_HEADER) : le rapport
+    s'écrit au fil de la lecture. Le bilan est disponible dans `report` une
+    fois le générateur épuisé.
+
+    Args:
+        payment_method: Slug du moyen de paiement du relevé (None : tous)
+        fix: Corriger les paiements confirmés par le relevé
+        since, until: Période couverte, pour signaler les paiements absents du relevé
+        chunk_size: Lignes de relevé par requête
+    """
+
+    def __init__(self, payment_method=None, fix=False, since=None, until=None,
+                 chunk_size=RECONCILIATION_CHUNK_SIZE):
+        self.payment_method = payment_method
+        self.fix = fix
+        self.since = since
+        self.until = until
+        self.chunk_size = chunk_size
+        self.report = ReconciliationReport()
+        self._seen_references = set()
+        self._matched_ids = set()
+
+    @cached_property
+    def payment_method_id(self):
+        if not self.payment_method:
+            return None
+        return PaymentMethod.objects.get(slug=self.payment_method).pk
+
+    def _lookup(self, references):
+        """
+        Paiements correspondant aux références : {référence: [paiements]}
+
+        Une requête par colonne de référence plutôt qu'un OR : chacune
+        utilise son index, là où le OR finit souvent en parcours de table.
+        Le moyen de paiement est filtré ici et non en SQL : sinon la base
+        peut préférer l'index du moyen de paiement, qui couvre tout le relevé.
+        """
+        method_id = self.payment_method_id
+        found = {}
+        for column in REFERENCE_FIELDS:
+            rows = Payment.objects.filter(**{f'{column}__in': references}).order_by().values_list(*REPORT_FIELDS)
+            for row in rows:
+                if method_id is None or row[-1] == method_id:
+                    found.setdefault(row[REPORT_FIELDS.index(column)], {})[row[0]] = row
+        return {reference: list(matches.values()) for reference, matches in found.items()}
+
+    def _discrepancy(self, kind, line=None, payment=None):
+        self.report.discrepancies[kind] += 1
+        return [
+            DISCREPANCY_LABELS[kind],
+            line.line_number if line else '',
+            line.reference if line else '',
+            line.amount if line else '',
+            payment[1] if payment else '',
+            payment[4] if payment else '',
+            payment[5] if payment else '',
+        ]
+
+    def _reconcile_chunk(self, lines):
+        found = self._lookup({line.reference for line in lines})
+        to_fix = []
+
+        for line in lines:
+            self.report.lines += 1
+            if line.reference in self._seen_references:
+                yield self._discrepancy('duplicate_line', line)
+                continue
+            self._seen_references.add(line.reference)
+
+            payments = found.get(line.reference)
+            if not payments:
+                yield self._discrepancy('missing', line)
+                continue
+            if len(payments) > 1:
+                for payment in payments:
+                    yield self._discrepancy('duplicate_payment', line, payment)
+                continue
+
+            payment = payments[0]
+            self._matched_ids.add(payment[0])
+            if line.amount != payment[4]:
+                yield self._discrepancy('amount_mismatch', line, payment)
+                continue
+
+            is_completed = payment[5] in ('completed', 'refunded')
+            if line.succeeded == is_completed:
+                self.report.matched += 1
+                continue
+
+            yield self._discrepancy('status_mismatch', line, payment)
+            if self.fix and line.succeeded and payment[5] in FIXABLE_PAYMENT_STATUSES:
+                to_fix.append(payment[0])
+
+        if to_fix:
+            self.report.fixed += complete_payments(
+                to_fix, 'Paiement confirmé par le relevé fournisseur', from_statuses=FIXABLE_PAYMENT_STATUSES
+            )
+
+    def _unmatched_payments(self):
+        """Paiements complétés sur la période mais absents du relevé"""
+        payments = Payment.objects.filter(status='completed').order_by()
+        if self.payment_method_id is not None:
+            payments = payments.filter(payment_method_id=self.payment_method_id)
+        if self.since:
+            payments = payments.filter(created_at__gte=self.since)
+        if self.until:
+            payments = payments.filter(created_at__lt=self.until)
+
+        rows = payments.values_list(*REPORT_FIELDS)
+        for payment in rows.iterator(chunk_size=self.chunk_size):
+            if payment[0] not in self._matched_ids:
+                yield self._discrepancy('missing_in_statement', payment=payment)
+
+    def run(self, lines: Iterable[StatementLine]) -> Iterator[list]:
+        started = time.perf_counter()
+        lines = iter(lines)
+        while True:
+            chunk = list(itertools.islice(lines, self.chunk_size))
+            if not chunk:
+                break
+            yield from self._reconcile_chunk(chunk)
+
+        if self.since or self.until:
+            yield from self._unmatched_payments()
+
+        self.report.duration = time.perf_counter() - started
+        logger.info(
+            f"Relevé rapproché : {self.report.lines} ligne(s), {self.report.matched} concordante(s), "
+            f"écarts {dict(self.report.discrepancies)}, {self.report.fixed} paiement(s) corrigé(s) "
+            f"en {self.report.duration:.2f} s"
+        )
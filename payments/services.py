@@ -0,0 +1,317 @@
+"""
+payments/services.py - Application des statuts de paiement
+==========================================================
+
+Point unique de mise à jour d'un paiement à partir d'une réponse
+fournisseur, quelle qu'en soit la source : réponse à l'initiation
+(payments.views), notification (payments/webhook_service.py) ou
+vérification de statut.
+
+Le paiement est verrouillé le temps de la mise à jour et son état courant
+décide de l'effet : un paiement complété ou remboursé n'est jamais modifié,
+un échec n'est pas ré-appliqué. Un paiement complété marque sa commande
+payée, la fait passer en traitement et met en file l'email de confirmation
+(après le commit).
+
+Chaque réponse fournisseur, appliquée ou non, est journalisée en
+PaymentEvent (record_payment_events) ; seules les colonnes modifiées du
+paiement sont réécrites.
+
+complete_payments / fail_payments appliquent la même issue à tout un lot
+de paiements (rapprochement des relevés, vérification des paiements en
+attente) en un nombre fixe de requêtes.
+
+migrate_payment_metadata déplace vers PaymentEvent les échanges que
+l'ancienne version accumulait dans Payment.metadata.
+"""
+
+from collections import Counter, defaultdict
+from functools import partial
+import logging
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from orders.status_service import enqueue_order_followups, mark_orders_paid, transition_orders
+
+from .models import Payment, PaymentEvent
+from .providers import PROVIDER_STATUS_MAP
+
+logger = logging.getLogger(__name__)
+
+METADATA_MIGRATION_BATCH_SIZE = 1000
+
+# Statuts de paiement définitifs : aucune réponse fournisseur ne les modifie
+FINAL_PAYMENT_STATUSES = ('completed', 'refunded')
+
+# Paiements dont le fournisseur n'a pas encore donné l'issue
+PENDING_PAYMENT_STATUSES = ('pending', 'processing')
+
+# Statuts applicables depuis une réponse fournisseur
+PROVIDER_PAYMENT_STATUSES = ('completed', 'processing', 'failed')
+
+
+def record_payment_events(events):
+    """
+    Enregistre des échanges fournisseur et met à jour le résumé des paiements
+
+    Un INSERT pour tous les événements, puis un UPDATE par couple (statut,
+    date) : un lot de vérifications n'en produit que quelques-uns. Le
+    résumé n'est jamais ramené à un échange plus ancien.
+
+    Args:
+        events: Instances PaymentEvent non enregistrées
+    """
+    events = list(events)
+    if not events:
+        return
+    PaymentEvent.objects.bulk_create(events, batch_size=500)
+
+    payments_by_summary = defaultdict(list)
+    for event in events:
+        payments_by_summary[(event.status, event.created_at)].append(event.payment_id)
+    for (status, created_at), payment_ids in payments_by_summary.items():
+        Payment.objects.filter(
+            Q(last_event_at__isnull=True) | Q(last_event_at__lte=created_at),
+            pk__in=payment_ids
+        ).update(provider_status=status, last_event_at=created_at)
+
+
+def apply_payment_status(transaction_id, status, provider_reference='', failure_reason='',
+                         source='', created_by='System', event_kind='', event_data=None):
+    """
+    Applique au paiement un statut annoncé par son fournisseur
+
+    Args:
+        transaction_id (str): Identifiant de transaction du paiement
+        status (str): 'completed', 'processing' ou 'failed'
+        provider_reference (str): Référence de l'opération chez le fournisseur
+        failure_reason (str): Motif d'échec affiché au client
+        source (str): Origine de l'information, reprise dans l'historique de la commande
+        created_by (str): Auteur enregistré dans l'historique de la commande
+        event_kind (str): Type d'échange journalisé (PaymentEvent.KIND_CHOICES), vide pour aucun
+        event_data (dict): Données de l'échange (contenu reçu, téléphone...)
+
+    Returns:
+        tuple: ('processed' ou 'ignored', explication)
+    """
+    if status not in PROVIDER_PAYMENT_STATUSES:
+        return 'ignored', f"Statut inconnu : {status or '(vide)'}"
+
+    now = timezone.now()
+    with transaction.atomic():
+        payment = (
+            Payment.objects.select_for_update()
+            .select_related('payment_method')
+            .filter(transaction_id=transaction_id)
+            .first()
+        )
+        if payment is None:
+            return 'ignored', "Paiement introuvable"
+        if event_kind:
+            record_payment_events([PaymentEvent(
+                payment=payment,
+                kind=event_kind,
+                status=status,
+                provider_reference=provider_reference,
+                data=event_data or {},
+                created_at=now
+            )])
+        if payment.status in FINAL_PAYMENT_STATUSES:
+            return 'ignored', f"Paiement déjà {payment.get_status_display().lower()}"
+        if status == 'failed' and payment.status == 'failed':
+            return 'ignored', "Paiement déjà en échec"
+
+        payment.status = status
+        payment.provider_transaction_id = provider_reference or payment.provider_transaction_id
+        if status == 'completed':
+            payment.completed_at = now
+        elif status == 'failed':
+            payment.failure_reason = failure_reason or 'Paiement refusé par le fournisseur'
+        payment.save(update_fields=[
+            'status', 'provider_transaction_id', 'completed_at', 'failure_reason', 'updated_at'
+        ])
+
+        if status == 'completed':
+            mark_orders_paid([payment.order_id], paid_at=now)
+            method_name = payment.payment_method.name if payment.payment_method else 'fournisseur'
+            transition_orders(
+                [payment.order_id],
+                'processing',
+                comment=f'Paiement confirmé via {source or "fournisseur"} ({method_name})',
+                created_by=created_by
+            )
+            transaction.on_commit(partial(
+                enqueue_order_followups, ('send_confirmation_email',), [payment.order_id]
+            ))
+
+    logger.info(f"Paiement {transaction_id} : {status} ({source or 'fournisseur'})")
+    return 'processed', ''
+
+
+# ============================================
+# APPLICATION EN MASSE
+# ============================================
+
+def complete_payments(payment_ids, comment, from_statuses=PENDING_PAYMENT_STATUSES):
+    """
+    Passe en masse à « complété » des paiements confirmés par le fournisseur
+
+    Un UPDATE pour les paiements, puis les commandes sont marquées payées et
+    passent en traitement ; l'email de confirmation part après le commit.
+
+    Args:
+        payment_ids: Identifiants des paiements confirmés
+        comment: Commentaire enregistré dans l'historique des commandes
+        from_statuses: Statuts de paiement pouvant être complétés
+
+    Returns:
+        int: Nombre de paiements effectivement complétés
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        rows = list(
+            Payment.objects.filter(pk__in=list(payment_ids), status__in=from_statuses)
+            .select_for_update()
+            .values_list('pk', 'order_id')
+        )
+        if not rows:
+            return 0
+
+        Payment.objects.filter(pk__in=[pk for pk, _ in rows]).update(
+            status='completed',
+            completed_at=now,
+            failure_reason='',
+            next_status_check_at=None,
+            updated_at=now
+        )
+        order_ids = sorted({order_id for _, order_id in rows})
+        mark_orders_paid(order_ids, paid_at=now)
+        transition_orders(order_ids, 'processing', comment=comment, created_by='System')
+        transaction.on_commit(partial(enqueue_order_followups, ('send_confirmation_email',), order_ids))
+
+    return len(rows)
+
+
+def fail_payments(payment_ids, reason):
+    """
+    Passe en masse à « échoué » des paiements encore en attente (un UPDATE)
+
+    Returns:
+        int: Nombre de paiements effectivement modifiés
+    """
+    return Payment.objects.filter(pk__in=list(payment_ids), status__in=PENDING_PAYMENT_STATUSES).update(
+        status='failed',
+        failure_reason=reason,
+        next_status_check_at=None,
+        updated_at=timezone.now()
+    )
+
+
+# ============================================
+# REPRISE DES MÉTADONNÉES
+# ============================================
+
+def events_from_metadata(payment, metadata):
+    """
+    Échanges fournisseur contenus dans les métadonnées d'un paiement
+
+    Clés écrites par l'ancienne version : phone / provider / initiated_at /
+    note à l'initiation, webhook_received / webhook_data à chaque
+    notification. Les autres clés sont conservées dans un événement
+    « Métadonnées migrées ».
+
+    Returns:
+        list: Instances PaymentEvent non enregistrées, par date
+    """
+    metadata = dict(metadata)
+    events = []
+
+    initiation = {
+        key: metadata.pop(key) for key in ('phone', 'provider', 'note', 'initiated_at') if key in metadata
+    }
+    if initiation:
+        initiated_at = parse_datetime(str(initiation.pop('initiated_at', '')))
+        events.append(PaymentEvent(
+            payment_id=payment.pk,
+            kind='initiation',
+            data=initiation,
+            created_at=initiated_at or payment.created_at
+        ))
+
+    if 'webhook_data' in metadata or 'webhook_received' in metadata:
+        payload = metadata.pop('webhook_data', None) or {}
+        received_at = parse_datetime(str(metadata.pop('webhook_received', '')))
+        raw_status = str(payload.get('status') or '').lower() if isinstance(payload, dict) else ''
+        events.append(PaymentEvent(
+            payment_id=payment.pk,
+            kind='webhook',
+            status=PROVIDER_STATUS_MAP.get(raw_status, raw_status[:20]),
+            provider_reference=str(payload.get('provider_reference') or '')[:255] if isinstance(payload, dict) else '',
+            data={'payload': payload},
+            created_at=received_at or payment.updated_at
+        ))
+
+    if metadata:
+        events.append(PaymentEvent(
+            payment_id=payment.pk,
+            kind='legacy',
+            data=metadata,
+            created_at=payment.created_at
+        ))
+
+    return sorted(events, key=lambda event: event.created_at)
+
+
+def migrate_payment_metadata(batch_size=METADATA_MIGRATION_BATCH_SIZE, dry_run=False):
+    """
+    Déplace les métadonnées des paiements vers PaymentEvent, par lots
+
+    Chaque lot (parcours par clé primaire) est une transaction : événements
+    créés en un INSERT, métadonnées vidées et résumé (téléphone, dernier
+    statut, dernier échange) renseigné en un bulk_update. Relancer la
+    commande après une interruption reprend là où elle s'est arrêtée.
+
+    Returns:
+        Counter: payments (paiements traités), events (événements créés)
+    """
+    stats = Counter()
+    last_pk = 0
+    while True:
+        with transaction.atomic():
+            payments = list(
+                Payment.objects.filter(pk__gt=last_pk).exclude(metadata={})
+                .order_by('pk')
+                .only('pk', 'metadata', 'phone_number', 'provider_status', 'last_event_at',
+                      'created_at', 'updated_at')[:batch_size]
+            )
+            if not payments:
+                return stats
+            last_pk = payments[-1].pk
+
+            events = []
+            for payment in payments:
+                payment_events = events_from_metadata(payment, payment.metadata)
+                events.extend(payment_events)
+                phone = payment.metadata.get('phone')
+                if phone and not payment.phone_number:
+                    payment.phone_number = str(phone)[:20]
+                exchanges = [event for event in payment_events if event.kind != 'legacy']
+                latest = exchanges[-1] if exchanges else None
+                if latest and (payment.last_event_at is None or latest.created_at > payment.last_event_at):
+                    payment.provider_status = latest.status
+                    payment.last_event_at = latest.created_at
+                payment.metadata = {}
+
+            stats['payments'] += len(payments)
+            stats['events'] += len(events)
+            if dry_run:
+                continue
+
+            PaymentEvent.objects.bulk_create(events, batch_size=500)
+            Payment.objects.bulk_update(
+                payments, ['metadata', 'phone_number', 'provider_status', 'last_event_at'], batch_size=500
+            )
+        logger.info(f"Métadonnées de paiement migrées : {dict(stats)}")
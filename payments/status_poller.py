@@ -0,0 +1,185 @@
+"""
+payments/status_poller.py - Vérification des paiements restés en attente
+========================================================================
+
+Un paiement mobile dont la notification du fournisseur s'est perdue restait
+« en attente » indéfiniment, et le client repayait (nouveau Payment). La
+commande poll_pending_payments interroge le fournisseur pour ces paiements :
+- sélection par plage sur l'index (status, created_at) : paiements en
+  attente depuis plus de PAYMENT_POLL_MIN_AGE minutes dont la prochaine
+  vérification est due, les plus anciens d'abord, par lots
+- appels aux fournisseurs en parallèle (pool de PAYMENT_POLL_WORKERS
+  threads, sans accès à la base), via les adaptateurs de providers.py
+- résultats appliqués en masse : un UPDATE par issue (complété, échoué),
+  un bulk_update pour reporter les vérifications suivantes, un INSERT pour
+  journaliser les réponses (PaymentEvent)
+- attente exponentielle par paiement entre deux vérifications (1 min,
+  2 min, 4 min... plafonnée à 1 h) ; après PAYMENT_POLL_MAX_AGE heures sans
+  confirmation, le paiement passe en échec
+"""
+
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import timedelta
+import logging
+import time
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Payment, PaymentEvent, PaymentMethod
+from .providers import PROVIDER_SETTINGS, ProviderError, ProviderRejected, get_provider
+from .services import PENDING_PAYMENT_STATUSES, complete_payments, fail_payments, record_payment_events
+
+logger = logging.getLogger(__name__)
+
+POLL_BATCH_SIZE = 500
+
+# Délai entre deux vérifications d'un même paiement : base * 2^vérifications, plafonné
+POLL_BACKOFF_BASE = timedelta(minutes=1)
+POLL_BACKOFF_MAX = timedelta(hours=1)
+
+EXPIRED_REASON = "Paiement non confirmé par le fournisseur"
+
+
+@dataclass(frozen=True)
+class PollSettings:
+    """Paramètres d'un passage (valeurs par défaut : settings PAYMENT_POLL_*)"""
+    min_age: timedelta
+    max_age: timedelta
+    workers: int
+    batch_size: int = POLL_BATCH_SIZE
+
+    @classmethod
+    def from_settings(cls, **overrides):
+        values = {
+            'min_age': timedelta(minutes=getattr(settings, 'PAYMENT_POLL_MIN_AGE', 5)),
+            'max_age': timedelta(hours=getattr(settings, 'PAYMENT_POLL_MAX_AGE', 24)),
+            'workers': getattr(settings, 'PAYMENT_POLL_WORKERS', 8),
+        }
+        values.update({key: value for key, value in overrides.items() if value is not None})
+        return cls(**values)
+
+
+def next_check_delay(status_checks):
+    """Délai avant la vérification suivante d'un paiement déjà vérifié `status_checks` fois"""
+    return min(POLL_BACKOFF_MAX, POLL_BACKOFF_BASE * 2 ** min(status_checks, 16))
+
+
+def _provider_methods():
+    """
+    {id du moyen de paiement: nom du fournisseur} des fournisseurs dont l'API
+    est configurée (un fournisseur simulé n'a rien à confirmer)
+    """
+    providers = [
+        name for name, (url_setting, _, _) in PROVIDER_SETTINGS.items()
+        if getattr(settings, url_setting, '')
+    ]
+    return dict(PaymentMethod.objects.filter(slug__in=providers).values_list('pk', 'slug'))
+
+
+def select_due_payments(now, poll_settings, methods):
+    """Paiements en attente dont la vérification est due (lot, plus anciens d'abord)"""
+    return list(
+        Payment.objects.filter(
+            status__in=PENDING_PAYMENT_STATUSES,
+            created_at__lt=now - poll_settings.min_age,
+            payment_method_id__in=list(methods),
+        ).filter(
+            Q(next_status_check_at__isnull=True) | Q(next_status_check_at__lte=now)
+        ).order_by('created_at').only(
+            'pk', 'transaction_id', 'payment_method_id', 'created_at', 'status_checks', 'provider_transaction_id'
+        )[:poll_settings.batch_size]
+    )
+
+
+def _check(payment, provider_name):
+    """Statut d'un paiement chez son fournisseur (exécuté dans un thread du pool)"""
+    try:
+        return get_provider(provider_name).check_status(payment)
+    except ProviderError as e:
+        return e
+
+
+def _poll_event(payment, result, now):
+    """Réponse (ou erreur) du fournisseur à journaliser pour un paiement"""
+    if isinstance(result, Exception):
+        not_found = isinstance(result, ProviderRejected) and result.http_status == 404
+        return PaymentEvent(
+            payment_id=payment.pk,
+            kind='poll',
+            status='failed' if not_found else 'error',
+            data={'error': str(result)},
+            created_at=now
+        )
+    return PaymentEvent(
+        payment_id=payment.pk,
+        kind='poll',
+        status=result.status,
+        provider_reference=result.provider_reference,
+        data={'message': result.message} if result.message else {},
+        created_at=now
+    )
+
+
+def poll_pending_payments(poll_settings=None, now=None):
+    """
+    Un passage : vérifie un lot de paiements en attente et applique les issues
+
+    Returns:
+        Counter: Paiements par issue (completed, failed, expired, pending, errors)
+    """
+    poll_settings = poll_settings or PollSettings.from_settings()
+    now = now or timezone.now()
+    methods = _provider_methods()
+    stats = Counter()
+    if not methods:
+        return stats
+    payments = select_due_payments(now, poll_settings, methods)
+    if not payments:
+        return stats
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, poll_settings.workers)) as executor:
+        results = list(executor.map(
+            _check, payments, [methods[payment.payment_method_id] for payment in payments]
+        ))
+
+    completed, failed, expired, postponed = [], {}, [], []
+    events = []
+    for payment, result in zip(payments, results):
+        events.append(_poll_event(payment, result, now))
+        if isinstance(result, ProviderRejected) and result.http_status == 404:
+            # Paiement inconnu du fournisseur : l'initiation n'a jamais abouti
+            failed.setdefault(EXPIRED_REASON, []).append(payment.pk)
+        elif isinstance(result, Exception):
+            stats['errors'] += 1
+            postponed.append(payment)
+        elif result.status == 'completed':
+            completed.append(payment.pk)
+        elif result.status == 'failed':
+            failed.setdefault(result.message or 'Paiement refusé par le fournisseur', []).append(payment.pk)
+        elif payment.created_at < now - poll_settings.max_age:
+            expired.append(payment.pk)
+        else:
+            postponed.append(payment)
+
+    record_payment_events(events)
+    stats['completed'] = complete_payments(completed, 'Paiement confirmé par vérification auprès du fournisseur')
+    for reason, payment_ids in failed.items():
+        stats['failed'] += fail_payments(payment_ids, reason)
+    stats['expired'] = fail_payments(expired, EXPIRED_REASON)
+
+    for payment in postponed:
+        payment.next_status_check_at = now + next_check_delay(payment.status_checks)
+        payment.status_checks += 1
+    Payment.objects.bulk_update(postponed, ['status_checks', 'next_status_check_at'], batch_size=500)
+    stats['pending'] = len(postponed) - stats['errors']
+
+    logger.info(
+        f"Vérification de {len(payments)} paiement(s) en attente en {time.perf_counter() - started:.2f} s : "
+        f"{dict(+stats)}"
+    )
+    return stats
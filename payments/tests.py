@@ -1,3 +1,590 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+import json
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.db import connection
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from orders.models import Order, OrderStatus
+
+from .models import Payment, PaymentEvent, PaymentMethod, PaymentWebhookEvent
+from .provider_stub import StubProviderServer
+from .providers import (
+    HttpPaymentProvider,
+    ProviderNotReached,
+    ProviderRejected,
+    ProviderUnavailable,
+    get_provider,
+    reset_providers,
+)
+from .reconciliation import StatementReconciler, read_statement
+from .status_poller import EXPIRED_REASON, PollSettings, poll_pending_payments
+from .webhook_service import process_pending_webhooks
+
+
+def create_payment(username='client', order_status='pending'):
+    customer = User.objects.create_user(username, f'{username}@test.ga').customer
+    order = Order.objects.create(
+        order_number=f'ORD-{username}',
+        customer=customer,
+        customer_email=customer.user.email,
+        customer_phone='+24101020304',
+        subtotal=Decimal('15000'),
+        total=Decimal('15000'),
+        status=order_status,
+    )
+    method, _ = PaymentMethod.objects.get_or_create(name='Airtel Money', slug='airtel-money')
+    return Payment.objects.create(order=order, payment_method=method, amount=order.total)
+
+
+class PaymentCallbackTests(TestCase):
+
+    def post(self, data):
+        return self.client.post(
+            reverse('payments:payment_callback'),
+            data=json.dumps(data),
+            content_type='application/json'
+        )
+
+    def test_callback_only_records_the_notification(self):
+        payment = create_payment()
+        data = {'transaction_id': payment.transaction_id, 'status': 'SUCCESS', 'provider_reference': 'AM-1'}
+
+        with self.assertNumQueries(1):
+            response = self.post(data)
+
+        self.assertEqual(response.status_code, 200)
+        event = PaymentWebhookEvent.objects.get()
+        self.assertEqual((event.status, event.state, event.payload), ('success', 'pending', data))
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'pending')
+
+    def test_redelivered_notification_is_deduplicated(self):
+        payment = create_payment()
+        for _ in range(3):
+            self.assertEqual(self.post({'transaction_id': payment.transaction_id, 'status': 'success'}).status_code, 200)
+        self.post({'transaction_id': payment.transaction_id, 'status': 'failed'})
+
+        self.assertEqual(PaymentWebhookEvent.objects.count(), 2)
+
+    def test_invalid_payloads_are_refused(self):
+        self.assertEqual(self.post({'status': 'success'}).status_code, 400)
+        self.assertEqual(self.post(['success']).status_code, 400)
+        response = self.client.post(reverse('payments:payment_callback'), data='{', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(PaymentWebhookEvent.objects.exists())
+
+
+@mock.patch('orders.status_service._start_followup_worker')
+class WebhookProcessingTests(TestCase):
+
+    def record(self, payment, status, **extra):
+        return PaymentWebhookEvent.objects.create(
+            transaction_id=payment.transaction_id,
+            status=status,
+            payload={'transaction_id': payment.transaction_id, 'status': status, **extra},
+            provider_reference=extra.get('provider_reference', '')
+        )
+
+    def test_success_marks_payment_and_order_paid(self, start_worker):
+        payment = create_payment()
+        self.record(payment, 'success', provider_reference='AM-42')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            stats = process_pending_webhooks()
+
+        self.assertEqual(stats['processed'], 1)
+        payment.refresh_from_db()
+        self.assertEqual((payment.status, payment.provider_transaction_id), ('completed', 'AM-42'))
+        order = Order.objects.get(pk=payment.order_id)
+        self.assertTrue(order.is_paid)
+        self.assertEqual(order.status, 'processing')
+        self.assertEqual(order.customer.paid_orders, 1)
+        self.assertEqual(OrderStatus.objects.filter(order=order, status='processing').count(), 1)
+        start_worker.assert_called_once_with(('send_confirmation_email',), [order.pk])
+        self.assertEqual(PaymentWebhookEvent.objects.get().state, 'processed')
+
+    def test_processing_is_idempotent_and_ordered(self, start_worker):
+        payment = create_payment()
+        self.record(payment, 'failed', reason='Solde insuffisant')
+        self.record(payment, 'success')
+        # Notification d'échec tardive après le succès
+        self.record(payment, 'cancelled')
+
+        stats = process_pending_webhooks()
+
+        self.assertEqual((stats['processed'], stats['ignored']), (2, 1))
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'completed')
+        self.assertEqual(OrderStatus.objects.filter(order_id=payment.order_id).count(), 1)
+        self.assertEqual(process_pending_webhooks(), {})
+        # Toutes les notifications sont journalisées, même ignorées
+        self.assertEqual(
+            list(payment.events.values_list('kind', 'status')),
+            [('webhook', 'failed'), ('webhook', 'completed'), ('webhook', 'failed')]
+        )
+        self.assertEqual(payment.provider_status, 'failed')
+        self.assertEqual(payment.metadata, {})
+
+    def test_failure_defers_later_notifications_of_the_same_payment(self, start_worker):
+        payment = create_payment()
+        other = create_payment('autre')
+        self.record(payment, 'success')
+        self.record(payment, 'cancelled')
+        self.record(other, 'success')
+
+        with mock.patch('payments.services.mark_orders_paid', side_effect=[RuntimeError('panne'), []]):
+            stats = process_pending_webhooks()
+        self.assertEqual((stats['processed'], stats['failed'], stats['deferred']), (1, 1, 1))
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'pending')
+
+        # Pas de nouvelle tentative avant la fin de l'attente
+        self.assertEqual(process_pending_webhooks(), {})
+
+        # Le succès est retenté ; l'annulation, lue au passage suivant, arrive trop tard
+        stats = process_pending_webhooks(now=timezone.now() + timedelta(minutes=1))
+        self.assertEqual(stats['processed'], 1)
+        self.assertEqual(process_pending_webhooks()['ignored'], 1)
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'completed')
+        self.assertEqual(PaymentWebhookEvent.objects.get(transaction_id=payment.transaction_id, status='success').attempts, 2)
+
+    def test_retries_back_off_and_exhausted_failure_keeps_blocking(self, start_worker):
+        payment = create_payment()
+        self.record(payment, 'success')
+        later = self.record(payment, 'cancelled')
+
+        now = timezone.now()
+        with self.settings(PAYMENT_WEBHOOK_MAX_ATTEMPTS=2), \
+                mock.patch('payments.services.mark_orders_paid', side_effect=RuntimeError('panne')):
+            self.assertEqual(process_pending_webhooks(now=now)['failed'], 1)
+            failed = PaymentWebhookEvent.objects.get(status='success')
+            self.assertEqual(failed.next_attempt_at, now + timedelta(seconds=30))
+
+            self.assertEqual(process_pending_webhooks(now=now + timedelta(seconds=29)), {})
+            self.assertEqual(process_pending_webhooks(now=now + timedelta(seconds=30))['failed'], 1)
+            failed.refresh_from_db()
+            self.assertEqual(
+                (failed.attempts, failed.next_attempt_at),
+                (2, now + timedelta(seconds=90))
+            )
+
+            # Tentatives épuisées : l'annulation attend toujours
+            self.assertEqual(process_pending_webhooks(now=now + timedelta(days=1)), {})
+        later.refresh_from_db()
+        self.assertEqual((later.state, later.attempts), ('pending', 0))
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'pending')
+
+    def test_unknown_payment_is_ignored(self, start_worker):
+        PaymentWebhookEvent.objects.create(transaction_id='PAY-INCONNU', status='success')
+
+        out = StringIO()
+        call_command('process_payment_webhooks', stdout=out)
+
+        self.assertIn('0 traitée(s), 1 ignorée(s)', out.getvalue())
+        self.assertEqual(PaymentWebhookEvent.objects.get().error, 'Paiement introuvable')
+
+
+@mock.patch('orders.status_service._start_followup_worker')
+class StatementReconciliationTests(TestCase):
+
+    def setUp(self):
+        self.completed = create_payment('complet')
+        self.pending = create_payment('attente')
+        self.unlisted = create_payment('absent')
+        Payment.objects.filter(pk=self.completed.pk).update(status='completed', provider_transaction_id='AM-1')
+        Payment.objects.filter(pk=self.pending.pk).update(external_reference='AM-2')
+        Payment.objects.filter(pk=self.unlisted.pk).update(status='completed', provider_transaction_id='AM-9')
+
+    def reconcile(self, statement, **kwargs):
+        reconciler = StatementReconciler(**kwargs)
+        rows = list(reconciler.run(read_statement(StringIO(statement))))
+        return reconciler.report, rows
+
+    def test_statement_is_matched_on_provider_references(self, start_worker):
+        report, rows = self.reconcile(
+            '\ufeffRéférence;Montant;Statut\n'
+            'AM-1;15 000,00;SUCCESS\n'
+            'AM-2;15000;SUCCESS\n'
+            'AM-1;15000;SUCCESS\n'
+            'AM-3;5000;SUCCESS\n'
+            f'{self.unlisted.transaction_id};12000;SUCCESS\n',
+            chunk_size=2
+        )
+
+        self.assertEqual((report.lines, report.matched, report.fixed), (5, 1, 0))
+        self.assertEqual(dict(report.discrepancies), {
+            'status_mismatch': 1, 'duplicate_line': 1, 'missing': 1, 'amount_mismatch': 1,
+        })
+        self.assertEqual([row[1] for row in rows], [3, 4, 5, 6])
+        self.pending.refresh_from_db()
+        self.assertEqual(self.pending.status, 'pending')
+
+    def test_fix_completes_confirmed_payments_in_bulk(self, start_worker):
+        with self.captureOnCommitCallbacks(execute=True):
+            report, rows = self.reconcile('reference,amount\nAM-1,15000\nAM-2,15000.00\n', fix=True)
+
+        self.assertEqual(report.fixed, 1)
+        self.pending.refresh_from_db()
+        self.assertEqual(self.pending.status, 'completed')
+        order = Order.objects.get(pk=self.pending.order_id)
+        self.assertTrue(order.is_paid)
+        self.assertEqual(order.status, 'processing')
+        start_worker.assert_called_once_with(('send_confirmation_email',), [order.pk])
+
+    def test_completed_payments_missing_from_statement_are_reported(self, start_worker):
+        report, rows = self.reconcile(
+            'Reference;Montant\nAM-1;15000\n', since=timezone.now() - timedelta(days=1)
+        )
+
+        self.assertEqual(dict(report.discrepancies), {'missing_in_statement': 1})
+        self.assertEqual(rows[0][4], self.unlisted.transaction_id)
+
+    def test_command_writes_the_discrepancy_report(self, start_worker):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', encoding='utf-8', delete=False) as statement:
+            statement.write('Reference;Montant;Statut\nAM-1;15000;SUCCESS\nAM-4;100;FAILED\n')
+        path = statement.name
+        self.addCleanup(os.remove, path)
+
+        out, err = StringIO(), StringIO()
+        call_command('reconcile_payments', path, '--method', 'airtel-money', stdout=out, stderr=err)
+
+        self.assertIn('Référence inconnue;3;AM-4', out.getvalue())
+        self.assertIn('2 ligne(s)', err.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('reconcile_payments', path, '--method', 'inconnu', stdout=out, stderr=err)
+
+
+@mock.patch('payments.providers.RETRY_BACKOFF_BASE', 0)
+class PaymentProviderAdapterTests(TestCase):
+
+    def setUp(self):
+        self.stub = StubProviderServer().start()
+        self.addCleanup(self.stub.stop)
+        self.addCleanup(reset_providers)
+        self.payment = SimpleNamespace(transaction_id='PAY-TEST', total_amount=Decimal('15000'))
+
+    def provider(self, **overrides):
+        with self.settings(AITEL_MONEY_API_URL=self.stub.url, **overrides):
+            return get_provider('aitel')
+
+    def test_initiation_and_status_check(self):
+        self.stub.confirm_after = 60
+        provider = self.provider()
+
+        result = provider.initiate(self.payment, '01020304')
+        self.assertEqual(result.status, 'processing')
+        self.assertTrue(result.provider_reference.startswith('STUB-'))
+        # Même référence : le fournisseur renvoie le premier résultat
+        self.assertEqual(provider.initiate(self.payment, '01020304'), result)
+        self.assertEqual(provider.check_status(self.payment).status, 'processing')
+        self.assertEqual(provider.metrics.snapshot()['calls'], 3)
+
+    def test_server_errors_are_retried_then_open_the_breaker(self):
+        self.stub.error_rate = 1
+        provider = self.provider(PAYMENT_PROVIDER_MAX_RETRIES=2, PAYMENT_PROVIDER_BREAKER_THRESHOLD=2)
+
+        for _ in range(2):
+            with self.assertRaises(ProviderUnavailable) as raised:
+                provider.initiate(self.payment, '01020304')
+            # Requêtes reçues : le paiement a pu être traité
+            self.assertNotIsInstance(raised.exception, ProviderNotReached)
+        self.assertEqual(self.stub.requests, 6)
+        self.assertEqual(provider.breaker.state, 'open')
+
+        with self.assertRaises(ProviderNotReached):
+            provider.initiate(self.payment, '01020304')
+        self.assertEqual(self.stub.requests, 6)
+        self.assertEqual(provider.metrics.snapshot()['rejected_by_breaker'], 1)
+
+    def test_breaker_lets_a_trial_call_through_after_the_reset_delay(self):
+        self.stub.error_rate = 1
+        provider = self.provider(PAYMENT_PROVIDER_MAX_RETRIES=0, PAYMENT_PROVIDER_BREAKER_THRESHOLD=1)
+        with self.assertRaises(ProviderUnavailable):
+            provider.initiate(self.payment, '01020304')
+
+        self.stub.error_rate = 0
+        provider.breaker.reset_timeout = 0
+        self.assertEqual(provider.initiate(self.payment, '01020304').status, 'completed')
+        self.assertEqual(provider.breaker.state, 'closed')
+
+    def test_slow_provider_hits_the_read_timeout(self):
+        self.stub.latency = 0.5
+        provider = self.provider(PAYMENT_PROVIDER_READ_TIMEOUT=0.1, PAYMENT_PROVIDER_MAX_RETRIES=0)
+
+        started = time.perf_counter()
+        with self.assertRaises(ProviderUnavailable):
+            provider.check_status(self.payment)
+        self.assertLess(time.perf_counter() - started, 0.5)
+
+    def test_refused_connection_is_not_reached(self):
+        provider = self.provider(PAYMENT_PROVIDER_MAX_RETRIES=1)
+        self.stub.stop()
+
+        with self.assertRaises(ProviderNotReached):
+            provider.initiate(self.payment, '01020304')
+
+    def test_rejected_request_is_not_retried(self):
+        provider = self.provider()
+
+        with self.assertRaises(ProviderRejected):
+            provider.check_status(self.payment)
+        self.assertEqual(self.stub.requests, 1)
+        self.assertEqual(provider.breaker.state, 'closed')
+
+
+@mock.patch('orders.status_service._start_followup_worker')
+class MobileMoneyPaymentViewTests(TestCase):
+
+    def setUp(self):
+        self.payment_method = PaymentMethod.objects.create(name='Aitel Money', slug='aitel')
+        self.user = User.objects.create_user('mobile', 'mobile@test.ga', 'secret')
+        self.order = Order.objects.create(
+            order_number='ORD-MOBILE',
+            customer=self.user.customer,
+            customer_email=self.user.email,
+            customer_phone='+24101020304',
+            subtotal=Decimal('15000'),
+            total=Decimal('15000'),
+        )
+        self.client.force_login(self.user)
+        session = self.client.session
+        session['order_id'] = self.order.pk
+        session.save()
+        self.stub = StubProviderServer().start()
+        self.addCleanup(self.stub.stop)
+        self.addCleanup(reset_providers)
+
+    def pay(self, **overrides):
+        with self.settings(AITEL_MONEY_API_URL=self.stub.url, PAYMENT_PROVIDER_MAX_RETRIES=0, **overrides):
+            with self.captureOnCommitCallbacks(execute=True):
+                return self.client.post(reverse('payments:aitel_payment'), {'phone': '01020304'})
+
+    def test_provider_is_called_outside_any_transaction(self, start_worker):
+        depth = len(connection.atomic_blocks)
+        real_initiate = HttpPaymentProvider.initiate
+
+        def initiate(provider, payment, phone):
+            self.assertEqual(len(connection.atomic_blocks), depth)
+            self.assertEqual(Payment.objects.get(pk=payment.pk).status, 'processing')
+            return real_initiate(provider, payment, phone)
+
+        with mock.patch.object(HttpPaymentProvider, 'initiate', initiate):
+            response = self.pay()
+
+        payment = Payment.objects.get()
+        self.assertRedirects(
+            response, reverse('payments:payment_success', args=[payment.transaction_id]),
+            fetch_redirect_response=False
+        )
+        self.assertEqual(payment.status, 'completed')
+        self.assertTrue(payment.provider_transaction_id.startswith('STUB-'))
+        self.assertEqual((payment.phone_number, payment.provider_status), ('01020304', 'completed'))
+        event = payment.events.get()
+        self.assertEqual((event.kind, event.data['phone']), ('initiation', '01020304'))
+        self.order.refresh_from_db()
+        self.assertEqual((self.order.is_paid, self.order.status), (True, 'processing'))
+        start_worker.assert_called_once_with(('send_confirmation_email',), [self.order.pk])
+        self.assertNotIn('order_id', self.client.session)
+
+    def test_pending_confirmation_leaves_the_order_unpaid(self, start_worker):
+        self.stub.confirm_after = 60
+
+        self.pay()
+
+        payment = Payment.objects.get()
+        self.assertEqual(payment.status, 'processing')
+        self.assertTrue(payment.provider_transaction_id)
+        self.order.refresh_from_db()
+        self.assertFalse(self.order.is_paid)
+        start_worker.assert_not_called()
+
+    def test_unreachable_provider_fails_the_payment(self, start_worker):
+        self.stub.stop()
+
+        response = self.pay()
+
+        self.assertRedirects(response, reverse('payments:aitel_payment'), fetch_redirect_response=False)
+        payment = Payment.objects.get()
+        self.assertEqual(payment.status, 'failed')
+        self.assertIn('indisponible', payment.failure_reason)
+        self.order.refresh_from_db()
+        self.assertFalse(self.order.is_paid)
+        self.assertEqual(self.client.session['order_id'], self.order.pk)
+
+    def test_read_timeout_leaves_the_payment_processing(self, start_worker):
+        self.stub.latency = 0.5
+
+        response = self.pay(PAYMENT_PROVIDER_READ_TIMEOUT=0.1)
+
+        payment = Payment.objects.get()
+        self.assertRedirects(
+            response, reverse('payments:payment_success', args=[payment.transaction_id]),
+            fetch_redirect_response=False
+        )
+        # Débit peut-être demandé : le webhook ou status_poller tranchera
+        self.assertEqual(payment.status, 'processing')
+        self.assertIsNone(payment.next_status_check_at)
+        self.assertIn('error', payment.events.get().data)
+        self.order.refresh_from_db()
+        self.assertFalse(self.order.is_paid)
+        self.assertNotIn('order_id', self.client.session)
+
+    def test_server_errors_leave_the_payment_processing(self, start_worker):
+        self.stub.error_rate = 1
+
+        self.pay()
+
+        self.assertEqual(Payment.objects.get().status, 'processing')
+
+
+class PaymentMetadataMigrationTests(TestCase):
+
+    def setUp(self):
+        self.payment = create_payment()
+        Payment.objects.filter(pk=self.payment.pk).update(metadata={
+            'phone': '01020304',
+            'provider': 'aitel',
+            'initiated_at': '2026-01-10T09:00:00+00:00',
+            'webhook_received': '2026-01-10T09:02:00+00:00',
+            'webhook_data': {'transaction_id': self.payment.transaction_id, 'status': 'success'},
+            'agent': 'guichet 3',
+        })
+        self.cod = create_payment('livraison')
+        Payment.objects.filter(pk=self.cod.pk).update(metadata={'provider': 'cash_on_delivery'})
+
+    def test_metadata_becomes_events(self):
+        out = StringIO()
+        call_command('migrate_payment_metadata', '--batch-size', '1', stdout=out)
+
+        self.assertIn('2 paiement(s) migré(s), 4 événement(s) créé(s)', out.getvalue())
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.metadata, {})
+        self.assertEqual(self.payment.phone_number, '01020304')
+        self.assertEqual(self.payment.provider_status, 'completed')
+        self.assertEqual(self.payment.last_event_at.isoformat(), '2026-01-10T09:02:00+00:00')
+        events = {event.kind: event.data for event in self.payment.events.all()}
+        self.assertEqual(events['initiation'], {'phone': '01020304', 'provider': 'aitel'})
+        self.assertEqual(events['webhook']['payload']['status'], 'success')
+        self.assertEqual(events['legacy'], {'agent': 'guichet 3'})
+
+        # Relance : plus rien à migrer
+        call_command('migrate_payment_metadata', stdout=out)
+        self.assertEqual(PaymentEvent.objects.count(), 4)
+
+    def test_dry_run_writes_nothing(self):
+        out = StringIO()
+        call_command('migrate_payment_metadata', '--dry-run', stdout=out)
+
+        self.assertIn('2 paiement(s) à migrer, 4 événement(s) à créer', out.getvalue())
+        self.assertFalse(PaymentEvent.objects.exists())
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.metadata['phone'], '01020304')
+
+
+@mock.patch('orders.status_service._start_followup_worker')
+class PendingPaymentPollerTests(TestCase):
+
+    def setUp(self):
+        self.method = PaymentMethod.objects.create(name='Aitel Money', slug='aitel')
+        self.stub = StubProviderServer().start()
+        self.addCleanup(self.stub.stop)
+        self.addCleanup(reset_providers)
+        self.poll_settings = PollSettings(min_age=timedelta(minutes=5), max_age=timedelta(hours=24), workers=4)
+
+    def stale_payment(self, username, age=timedelta(minutes=30), outcome='success', confirm_after=0):
+        payment = create_payment(username)
+        Payment.objects.filter(pk=payment.pk).update(
+            payment_method=self.method, status='processing', created_at=timezone.now() - age
+        )
+        if outcome:
+            self.stub.add_payment(payment.transaction_id, outcome, confirm_after=confirm_after)
+        return Payment.objects.get(pk=payment.pk)
+
+    def poll(self, **settings):
+        with self.settings(AITEL_MONEY_API_URL=self.stub.url, PAYMENT_PROVIDER_MAX_RETRIES=0, **settings):
+            with self.captureOnCommitCallbacks(execute=True):
+                return poll_pending_payments(self.poll_settings)
+
+    def test_outcomes_are_applied_in_bulk(self, start_worker):
+        confirmed = self.stale_payment('confirme')
+        declined = self.stale_payment('refuse', outcome='declined')
+        waiting = self.stale_payment('attente', confirm_after=3600)
+        unknown = self.stale_payment('inconnu', outcome=None)
+
+        stats = self.poll()
+
+        self.assertEqual(dict(+stats), {'completed': 1, 'failed': 2, 'pending': 1})
+        confirmed.refresh_from_db()
+        self.assertEqual(confirmed.status, 'completed')
+        self.assertTrue(confirmed.order.is_paid)
+        self.assertEqual(confirmed.order.status, 'processing')
+        start_worker.assert_called_once_with(('send_confirmation_email',), [confirmed.order_id])
+        declined.refresh_from_db()
+        self.assertEqual(declined.status, 'failed')
+        unknown.refresh_from_db()
+        self.assertEqual((unknown.status, unknown.failure_reason), ('failed', EXPIRED_REASON))
+        waiting.refresh_from_db()
+        self.assertEqual((waiting.status, waiting.status_checks), ('processing', 1))
+        self.assertGreater(waiting.next_status_check_at, timezone.now())
+        self.assertEqual(waiting.provider_status, 'processing')
+        self.assertEqual(
+            sorted(PaymentEvent.objects.filter(kind='poll').values_list('status', flat=True)),
+            ['completed', 'failed', 'failed', 'processing']
+        )
+
+    def test_backoff_skips_payments_until_their_next_check(self, start_worker):
+        waiting = self.stale_payment('attente', confirm_after=3600)
+        self.poll()
+        requests = self.stub.requests
+
+        self.assertEqual(sum(self.poll().values()), 0)
+        self.assertEqual(self.stub.requests, requests)
+
+        Payment.objects.filter(pk=waiting.pk).update(next_status_check_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.poll()['pending'], 1)
+        waiting.refresh_from_db()
+        self.assertEqual(waiting.status_checks, 2)
+
+    def test_recent_and_unpolled_payments_are_left_alone(self, start_worker):
+        self.stale_payment('recent', age=timedelta(minutes=1))
+        cod = create_payment('livraison')
+        Payment.objects.filter(pk=cod.pk).update(created_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(sum(self.poll().values()), 0)
+        self.assertEqual(self.stub.requests, 0)
+
+        self.stale_payment('simule')
+        with self.settings(AITEL_MONEY_API_URL=''):
+            self.assertEqual(sum(poll_pending_payments(self.poll_settings).values()), 0)
+
+    def test_unconfirmed_payment_expires_after_max_age(self, start_worker):
+        payment = self.stale_payment('ancien', age=timedelta(hours=30), confirm_after=3600)
+
+        self.assertEqual(self.poll()['expired'], 1)
+
+        payment.refresh_from_db()
+        self.assertEqual((payment.status, payment.failure_reason), ('failed', EXPIRED_REASON))
+        self.assertIsNone(payment.next_status_check_at)
+
+    def test_unavailable_provider_postpones_the_check(self, start_worker):
+        payment = self.stale_payment('indisponible')
+        self.stub.error_rate = 1
+
+        self.assertEqual(dict(+self.poll()), {'errors': 1})
 
-# Create your tests here.
+        payment.refresh_from_db()
+        self.assertEqual((payment.status, payment.status_checks), ('processing', 1))
+        self.assertIsNotNone(payment.next_status_check_at)
@@ -19,14 +19,15 @@ import json
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.utils import timezone
 from django.db import transaction
 from django.http import JsonResponse, HttpResponse
 from django.views.decorators.csrf import csrf_exempt
 
 from orders.models import Order, OrderStatus
 from .models import PaymentMethod, Payment
-from core.email_service import EmailService
+from .providers import ProviderError, ProviderNotReached, ProviderRejected, ProviderResult, get_provider
+from .services import apply_payment_status
+from .webhook_service import WebhookPayloadError, record_webhook
 
 logger = logging.getLogger(__name__)
 
@@ -115,217 +116,167 @@ def payment_process(request, method):
         return redirect('payments:cash_on_delivery')
 
 
-@login_required
-def aitel_payment(request):
+def _mobile_money_payment(request, provider_name, label, url_name, template_name):
     """
-    Paiement Aitel Money
-    
-    Fonctionnalités :
-    - Validation du numéro de téléphone (8 chiffres)
-    - Création de l'enregistrement de paiement
-    - Simulation de l'API Airtel Money (à remplacer en production)
-    - Mise à jour du statut de la commande
-    - Envoi d'email de confirmation
-    - Nettoyage de la session
+    Paiement mobile (Aitel Money, Moov Money)
+
+    Trois étapes, pour ne jamais garder une transaction ouverte pendant
+    l'appel réseau au fournisseur :
+    1. Enregistrement du paiement « en traitement » (transaction courte)
+    2. Appel au fournisseur (payments/providers.py), hors transaction
+    3. Application de la réponse (payments/services.py) : paiement complété
+       et commande payée, paiement en échec, ou attente de la confirmation
+       du client sur son téléphone (notification ou vérification ultérieure)
+
+    L'email de confirmation part après le commit (file des suites de commande).
     """
     # Récupérer la commande
     order_id = request.session.get('order_id')
-    
+
     if not order_id:
         messages.error(request, 'Aucune commande en cours.')
         return redirect('orders:checkout')
-    
+
     try:
         order = Order.objects.get(id=order_id, customer=request.user.customer)
     except Order.DoesNotExist:
         messages.error(request, 'Commande introuvable.')
         return redirect('orders:cart_detail')
-    
-    # Récupérer la méthode de paiement Aitel
+
+    # Récupérer la méthode de paiement
     try:
-        payment_method = PaymentMethod.objects.get(slug='aitel', is_active=True)
+        payment_method = PaymentMethod.objects.get(slug=provider_name, is_active=True)
     except PaymentMethod.DoesNotExist:
-        messages.error(request, 'Le paiement Aitel Money n\'est pas disponible actuellement.')
+        messages.error(request, f'Le paiement {label} n\'est pas disponible actuellement.')
         return redirect('payments:payment_method')
-    
+
     if request.method == 'POST':
         phone = request.POST.get('phone', '').strip()
-        
+
         # Validation du numéro
         if not phone or len(phone) != 8:
             messages.error(request, 'Numéro de téléphone invalide. Veuillez entrer 8 chiffres.')
-            return redirect('payments:aitel_payment')
-        
+            return redirect(url_name)
+
+        # 1. Enregistrement du paiement
+        payment = Payment.objects.create(
+            order=order,
+            payment_method=payment_method,
+            amount=order.total,
+            status='processing',
+            phone_number=phone
+        )
+
+        # 2. Appel au fournisseur, hors transaction
+        unconfirmed = False
         try:
-            with transaction.atomic():
-                # Créer l'enregistrement de paiement
-                payment = Payment.objects.create(
-                    order=order,
-                    payment_method=payment_method,
-                    amount=order.total,
-                    status='processing',
-                    metadata={
-                        'phone': phone,
-                        'provider': 'aitel',
-                        'initiated_at': timezone.now().isoformat()
-                    }
-                )
-                
-                # SIMULATION : Dans un environnement réel, vous appelleriez l'API Aitel Money ici
-                # Pour la démo, on simule un paiement réussi
-                
-                # Marquer le paiement comme complété
-                payment.status = 'completed'
-                payment.completed_at = timezone.now()
-                payment.provider_transaction_id = f"AITEL-{payment.transaction_id}"
-                payment.save()
-                
-                # Mettre à jour la commande
-                order.is_paid = True
-                order.paid_at = timezone.now()
-                order.status = 'processing'
-                order.save()
-                
-                # Créer l'historique de statut
-                OrderStatus.objects.create(
-                    order=order,
-                    status='processing',
-                    comment=f'Paiement reçu via Aitel Money ({phone})',
-                    created_by=request.user.username
+            result = get_provider(provider_name).initiate(payment, phone)
+            event_data = {'phone': phone, 'message': result.message}
+        except (ProviderRejected, ProviderNotReached) as e:
+            # Demande refusée ou jamais reçue : aucun débit, le client peut réessayer
+            logger.error(f"Paiement {payment.transaction_id} ({label}) : {str(e)}")
+            rejected = isinstance(e, ProviderRejected)
+            apply_payment_status(
+                payment.transaction_id,
+                'failed',
+                failure_reason=str(e) if rejected else f'{label} est momentanément indisponible',
+                source=label,
+                created_by=request.user.username,
+                event_kind='initiation',
+                event_data={'phone': phone, 'error': str(e)}
+            )
+            if rejected:
+                messages.error(request, f'Paiement refusé par {label}. {str(e)}')
+            else:
+                messages.error(
+                    request,
+                    f'{label} est momentanément indisponible. Veuillez réessayer dans quelques instants.'
                 )
-                
-                # ENVOI DE L'EMAIL DE CONFIRMATION
-                try:
-                    EmailService.send_order_confirmation(order)
-                    logger.info(f"Email de confirmation envoyé pour la commande {order.order_number} (Airtel)")
-                except Exception as e:
-                    logger.error(
-                        f"Échec de l'envoi de l'email pour la commande {order.order_number} (Airtel): {str(e)}",
-                        exc_info=True
-                    )
-                
-                # Nettoyer la session
-                if 'order_id' in request.session:
-                    del request.session['order_id']
-                if 'payment_method' in request.session:
-                    del request.session['payment_method']
-                
-                messages.success(request, f'Paiement réussi ! Commande {order.order_number} confirmée.')
-                return redirect('payments:payment_success', transaction_id=payment.transaction_id)
-                
-        except Exception as e:
-            messages.error(request, f'Erreur lors du traitement du paiement : {str(e)}')
-            return redirect('payments:aitel_payment')
-    
+            return redirect(url_name)
+        except ProviderError as e:
+            # Issue inconnue (délai de réponse dépassé, connexion coupée, erreur 5xx) :
+            # le débit a pu être demandé. Le paiement reste « en traitement » jusqu'à
+            # la notification du fournisseur ou la vérification de statut
+            # (status_poller) ; un nouveau paiement risquerait un double débit.
+            logger.warning(f"Paiement {payment.transaction_id} ({label}) sans réponse sûre : {str(e)}")
+            unconfirmed = True
+            result = ProviderResult('processing')
+            event_data = {'phone': phone, 'error': str(e)}
+
+        # 3. Application de la réponse
+        apply_payment_status(
+            payment.transaction_id,
+            result.status,
+            provider_reference=result.provider_reference,
+            failure_reason=result.message,
+            source=f'{label} ({phone})',
+            created_by=request.user.username,
+            event_kind='initiation',
+            event_data=event_data
+        )
+
+        if result.status == 'failed':
+            messages.error(request, f'Paiement refusé par {label}. {result.message}'.strip())
+            return redirect('payments:payment_failed', transaction_id=payment.transaction_id)
+
+        # Nettoyer la session
+        if 'order_id' in request.session:
+            del request.session['order_id']
+        if 'payment_method' in request.session:
+            del request.session['payment_method']
+
+        if result.status == 'completed':
+            messages.success(request, f'Paiement réussi ! Commande {order.order_number} confirmée.')
+        elif unconfirmed:
+            messages.info(
+                request,
+                f'Confirmation en attente de {label} : la commande {order.order_number} sera '
+                f'confirmée dès sa réponse. Ne relancez pas le paiement.'
+            )
+        else:
+            messages.info(
+                request,
+                f'Validez le paiement sur votre téléphone : la commande {order.order_number} '
+                f'sera confirmée dès réception.'
+            )
+        return redirect('payments:payment_success', transaction_id=payment.transaction_id)
+
     context = {
         'order': order,
         'payment_method': payment_method,
-        'page_title': 'Paiement Aitel Money',
+        'page_title': f'Paiement {label}',
     }
-    return render(request, 'payments/aitel_payment.html', context)
+    return render(request, template_name, context)
+
+
+@login_required
+def aitel_payment(request):
+    """
+    Paiement Aitel Money
+
+    Fonctionnalités :
+    - Validation du numéro de téléphone (8 chiffres)
+    - Création de l'enregistrement de paiement
+    - Appel à l'API Aitel Money (simulée sans AITEL_MONEY_API_URL)
+    - Mise à jour du statut de la commande
+    - Envoi d'email de confirmation
+    - Nettoyage de la session
+    """
+    return _mobile_money_payment(
+        request, 'aitel', 'Aitel Money', 'payments:aitel_payment', 'payments/aitel_payment.html'
+    )
 
 
 @login_required
 def moov_payment(request):
     """
     Paiement Moov Money
-    
+
     Fonctionnalités identiques à Aitel Money mais pour Moov
     """
-    # Récupérer la commande
-    order_id = request.session.get('order_id')
-    
-    if not order_id:
-        messages.error(request, 'Aucune commande en cours.')
-        return redirect('orders:checkout')
-    
-    try:
-        order = Order.objects.get(id=order_id, customer=request.user.customer)
-    except Order.DoesNotExist:
-        messages.error(request, 'Commande introuvable.')
-        return redirect('orders:cart_detail')
-    
-    # Récupérer la méthode de paiement Moov
-    try:
-        payment_method = PaymentMethod.objects.get(slug='moov', is_active=True)
-    except PaymentMethod.DoesNotExist:
-        messages.error(request, 'Le paiement Moov Money n\'est pas disponible actuellement.')
-        return redirect('payments:payment_method')
-    
-    if request.method == 'POST':
-        phone = request.POST.get('phone', '').strip()
-        
-        # Validation du numéro
-        if not phone or len(phone) != 8:
-            messages.error(request, 'Numéro de téléphone invalide. Veuillez entrer 8 chiffres.')
-            return redirect('payments:moov_payment')
-        
-        try:
-            with transaction.atomic():
-                # Créer l'enregistrement de paiement
-                payment = Payment.objects.create(
-                    order=order,
-                    payment_method=payment_method,
-                    amount=order.total,
-                    status='processing',
-                    metadata={
-                        'phone': phone,
-                        'provider': 'moov',
-                        'initiated_at': timezone.now().isoformat()
-                    }
-                )
-                
-                # SIMULATION : Dans un environnement réel, vous appelleriez l'API Moov Money ici
-                
-                # Marquer le paiement comme complété
-                payment.status = 'completed'
-                payment.completed_at = timezone.now()
-                payment.provider_transaction_id = f"MOOV-{payment.transaction_id}"
-                payment.save()
-                
-                # Mettre à jour la commande
-                order.is_paid = True
-                order.paid_at = timezone.now()
-                order.status = 'processing'
-                order.save()
-                
-                # Créer l'historique de statut
-                OrderStatus.objects.create(
-                    order=order,
-                    status='processing',
-                    comment=f'Paiement reçu via Moov Money ({phone})',
-                    created_by=request.user.username
-                )
-                
-                # ENVOI DE L'EMAIL DE CONFIRMATION
-                try:
-                    EmailService.send_order_confirmation(order)
-                    logger.info(f"Email de confirmation envoyé pour la commande {order.order_number} (Moov)")
-                except Exception as e:
-                    logger.error(
-                        f"Échec de l'envoi de l'email pour la commande {order.order_number} (Moov): {str(e)}",
-                        exc_info=True
-                    )
-                
-                # Nettoyer la session
-                if 'order_id' in request.session:
-                    del request.session['order_id']
-                if 'payment_method' in request.session:
-                    del request.session['payment_method']
-                
-                messages.success(request, f'Paiement réussi ! Commande {order.order_number} confirmée.')
-                return redirect('payments:payment_success', transaction_id=payment.transaction_id)
-                
-        except Exception as e:
-            messages.error(request, f'Erreur lors du traitement du paiement : {str(e)}')
-            return redirect('payments:moov_payment')
-    
-    context = {
-        'order': order,
-        'payment_method': payment_method,
-        'page_title': 'Paiement Moov Money',
-    }
-    return render(request, 'payments/moov_payment.html', context)
+    return _mobile_money_payment(
+        request, 'moov', 'Moov Money', 'payments:moov_payment', 'payments/moov_payment.html'
+    )
 
 
 @login_required
@@ -367,11 +318,7 @@ def cash_on_delivery(request):
                     order=order,
                     payment_method=payment_method,
                     amount=order.total,
-                    status='pending',
-                    metadata={
-                        'provider': 'cash_on_delivery',
-                        'note': 'Paiement à effectuer lors de la livraison'
-                    }
+                    status='pending'
                 )
                 
                 # Mettre à jour la commande (non payée, mais confirmée)
@@ -416,7 +363,12 @@ def payment_callback(request):
     Callback des fournisseurs de paiement (Webhooks)
     
     Cette vue reçoit les notifications des fournisseurs de paiement
-    pour confirmer ou annuler les transactions
+    pour confirmer ou annuler les transactions.
+    
+    La notification est seulement enregistrée (PaymentWebhookEvent) puis
+    acquittée : la mise à jour du paiement, de la commande et l'email de
+    confirmation sont faits par `manage.py process_payment_webhooks`
+    (payments/webhook_service.py).
     
     Sécurité :
     - CSRF exempt car appelé par des services externes
@@ -427,65 +379,16 @@ def payment_callback(request):
         try:
             # Récupérer les données du webhook
             data = json.loads(request.body)
+            if not isinstance(data, dict):
+                return JsonResponse({'error': 'JSON invalide'}, status=400)
             
-            transaction_id = data.get('transaction_id')
-            status = data.get('status')
-            provider_reference = data.get('provider_reference')
-            
-            if not transaction_id:
-                return JsonResponse({'error': 'Transaction ID manquant'}, status=400)
-            
-            # Rechercher le paiement
-            try:
-                payment = Payment.objects.get(transaction_id=transaction_id)
-            except Payment.DoesNotExist:
-                return JsonResponse({'error': 'Paiement introuvable'}, status=404)
-            
-            # Mettre à jour le statut
-            with transaction.atomic():
-                if status == 'success' or status == 'completed':
-                    payment.status = 'completed'
-                    payment.completed_at = timezone.now()
-                    payment.provider_transaction_id = provider_reference
-                    
-                    # Mettre à jour la commande
-                    payment.order.is_paid = True
-                    payment.order.paid_at = timezone.now()
-                    payment.order.status = 'processing'
-                    payment.order.save()
-                    
-                    # Historique
-                    OrderStatus.objects.create(
-                        order=payment.order,
-                        status='processing',
-                        comment=f'Paiement confirmé via webhook ({payment.payment_method.name})',
-                        created_by='System'
-                    )
-                    
-                    # ENVOI DE L'EMAIL DE CONFIRMATION
-                    try:
-                        EmailService.send_order_confirmation(payment.order)
-                        logger.info(f"Email de confirmation envoyé via webhook pour {payment.order.order_number}")
-                    except Exception as e:
-                        logger.error(
-                            f"Échec de l'envoi de l'email via webhook pour {payment.order.order_number}: {str(e)}",
-                            exc_info=True
-                        )
-                    
-                elif status == 'failed' or status == 'cancelled':
-                    payment.status = 'failed'
-                    payment.failure_reason = data.get('reason', 'Paiement refusé par le fournisseur')
-                
-                payment.metadata.update({
-                    'webhook_received': timezone.now().isoformat(),
-                    'webhook_data': data
-                })
-                payment.save()
-            
-            return JsonResponse({'status': 'success', 'message': 'Callback traité'})
+            record_webhook(data)
+            return JsonResponse({'status': 'success', 'message': 'Callback reçu'})
             
         except json.JSONDecodeError:
             return JsonResponse({'error': 'JSON invalide'}, status=400)
+        except WebhookPayloadError as e:
+            return JsonResponse({'error': str(e)}, status=400)
         except Exception as e:
             logger.error(f"Erreur dans le webhook de paiement: {str(e)}", exc_info=True)
             return JsonResponse({'error': str(e)}, status=500)
@@ -0,0 +1,172 @@
+"""
+payments/webhook_service.py - Traitement des notifications de paiement
+======================================================================
+
+Le webhook (payments.views.payment_callback) ne fait plus qu'enregistrer la
+notification (un INSERT) et répondre : le fournisseur n'attend plus la mise
+à jour de la commande ni l'envoi de l'email avec facture PDF, et ne renvoie
+donc plus ses notifications pour cause de délai dépassé.
+
+Le traitement est fait par `manage.py process_payment_webhooks` :
+- dans l'ordre de réception, une notification à la fois
+- par paiement : si une notification échoue, les suivantes du même
+  paiement attendent qu'elle soit traitée, y compris quand elle a épuisé
+  ses PAYMENT_WEBHOOK_MAX_ATTEMPTS tentatives (à remettre en file depuis
+  l'admin) : jamais d'application dans le désordre
+- nouvelles tentatives espacées (attente exponentielle, next_attempt_at) :
+  une panne passagère n'épuise pas les tentatives en quelques millisecondes
+- de façon idempotente (payments/services.py) : le paiement est verrouillé
+  et son état courant décide de l'effet (un paiement complété n'est ni
+  recomplété, ni repassé en échec par une notification tardive)
+- l'email de confirmation part après le commit, hors du traitement
+  (orders.status_service.enqueue_order_followups)
+"""
+
+from collections import Counter
+from datetime import timedelta
+import logging
+
+from django.conf import settings
+from django.db.models import Exists, F, OuterRef, Q
+from django.utils import timezone
+
+from .models import PaymentWebhookEvent
+from .services import apply_payment_status
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_BATCH_SIZE = 100
+
+# Attente avant une nouvelle tentative : base * 2^(tentatives - 1), plafonnée
+WEBHOOK_RETRY_BASE = timedelta(seconds=30)
+WEBHOOK_RETRY_MAX = timedelta(hours=1)
+
+# Statuts annoncés par les fournisseurs
+SUCCESS_STATUSES = ('success', 'completed')
+FAILURE_STATUSES = ('failed', 'cancelled')
+
+
+class WebhookPayloadError(ValueError):
+    """Notification inexploitable (identifiant de transaction absent)"""
+    pass
+
+
+def record_webhook(data):
+    """
+    Enregistre une notification reçue (un seul INSERT)
+
+    Une notification déjà reçue (même transaction, même statut) est ignorée
+    par la base : les renvois du fournisseur ne créent pas de doublon.
+
+    Raises:
+        WebhookPayloadError: Si transaction_id est absent
+    """
+    transaction_id = str(data.get('transaction_id') or '').strip()
+    if not transaction_id:
+        raise WebhookPayloadError("Transaction ID manquant")
+
+    PaymentWebhookEvent.objects.bulk_create(
+        [
+            PaymentWebhookEvent(
+                transaction_id=transaction_id[:100],
+                status=str(data.get('status') or '').strip().lower()[:50],
+                provider_reference=str(data.get('provider_reference') or '')[:255],
+                payload=data,
+            )
+        ],
+        ignore_conflicts=True
+    )
+
+
+def apply_webhook_event(event):
+    """
+    Applique une notification au paiement et à sa commande
+
+    Returns:
+        tuple: (état du traitement : 'processed' ou 'ignored', explication)
+    """
+    if event.status in SUCCESS_STATUSES:
+        status = 'completed'
+    elif event.status in FAILURE_STATUSES:
+        status = 'failed'
+    else:
+        return 'ignored', f"Statut inconnu : {event.status or '(vide)'}"
+
+    return apply_payment_status(
+        event.transaction_id,
+        status,
+        provider_reference=event.provider_reference,
+        failure_reason=event.payload.get('reason', ''),
+        source='webhook',
+        event_kind='webhook',
+        event_data={'webhook_event': event.pk, 'payload': event.payload}
+    )
+
+
+def next_attempt_delay(attempts):
+    """Délai avant la tentative suivante d'une notification déjà tentée `attempts` fois"""
+    return min(WEBHOOK_RETRY_MAX, WEBHOOK_RETRY_BASE * 2 ** min(max(attempts - 1, 0), 16))
+
+
+def select_due_webhooks(now, batch_size):
+    """
+    Notifications à traiter maintenant, dans l'ordre de réception
+
+    Exclut les échecs dont l'attente n'est pas écoulée ou qui ont épuisé
+    leurs tentatives, et toute notification précédée d'un échec du même
+    paiement.
+    """
+    max_attempts = getattr(settings, 'PAYMENT_WEBHOOK_MAX_ATTEMPTS', 5)
+    earlier_failure = PaymentWebhookEvent.objects.filter(
+        transaction_id=OuterRef('transaction_id'),
+        state='failed',
+        pk__lt=OuterRef('pk')
+    )
+    return list(
+        PaymentWebhookEvent.objects.filter(
+            Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now),
+            ~Exists(earlier_failure),
+            state__in=('pending', 'failed'),
+            attempts__lt=max_attempts
+        ).order_by('pk')[:batch_size]
+    )
+
+
+def process_pending_webhooks(batch_size=WEBHOOK_BATCH_SIZE, now=None):
+    """
+    Traite un lot de notifications en attente (ou en échec à retenter)
+
+    Returns:
+        Counter: Notifications par résultat (processed, ignored, failed, deferred)
+    """
+    now = now or timezone.now()
+    events = select_due_webhooks(now, batch_size)
+
+    stats = Counter()
+    blocked = set()
+    for event in events:
+        if event.transaction_id in blocked:
+            # Une notification antérieure du même paiement vient d'échouer
+            stats['deferred'] += 1
+            continue
+
+        try:
+            state, message = apply_webhook_event(event)
+        except Exception as e:
+            logger.error(f"Échec du traitement de la notification {event.pk} : {str(e)}", exc_info=True)
+            state, message = 'failed', str(e)
+            blocked.add(event.transaction_id)
+
+        failed = state == 'failed'
+        PaymentWebhookEvent.objects.filter(pk=event.pk).update(
+            state=state,
+            error=message,
+            attempts=F('attempts') + 1,
+            next_attempt_at=now + next_attempt_delay(event.attempts + 1) if failed else None,
+            processed_at=None if failed else timezone.now()
+        )
+        stats[state] += 1
+
+    if events:
+        logger.info(f"Notifications de paiement traitées : {dict(stats)}")
+    return stats
@@ -1,6 +1,11 @@
 from django.contrib import admin
+from django.db.models import F, IntegerField, OuterRef, Q, Value
+from django.db.models.functions import Greatest
 from django.utils.html import format_html
-from .models import Category, Product, ProductImage, ProductVariant, Stock
+from django.utils.text import slugify
+from core.admin_search import RankedAutocompleteMixin
+from core.db_utils import subquery_count, subquery_sum
+from .models import Category, Product, ProductImage, ProductVariant, Stock, normalize_sku
 
 
 @admin.register(Category)
@@ -9,6 +14,7 @@ class CategoryAdmin(admin.ModelAdmin):
     Administration des catégories
     """
     list_display = ['name', 'parent', 'display_order', 'is_active', 'product_count', 'created_at']
+    list_select_related = ['parent']
     list_filter = ['is_active', 'parent', 'created_at']
     search_fields = ['name', 'description']
     prepopulated_fields = {'slug': ('name',)}
@@ -27,11 +33,20 @@ class CategoryAdmin(admin.ModelAdmin):
         }),
     )
     
+    def get_queryset(self, request):
+        """Annoter le nombre de produits (une seule requête pour la liste)"""
+        qs = super().get_queryset(request)
+        return qs.annotate(
+            products_total=subquery_count(
+                Product.objects.filter(category=OuterRef('pk')), 'category'
+            )
+        )
+    
     def product_count(self, obj):
         """Affiche le nombre de produits dans cette catégorie"""
-        count = obj.products.count()
-        return format_html('<strong>{}</strong> produit(s)', count)
+        return format_html('<strong>{}</strong> produit(s)', obj.products_total)
     product_count.short_description = "Nombre de produits"
+    product_count.admin_order_field = 'products_total'
 
 
 class ProductImageInline(admin.TabularInline):
@@ -53,7 +68,7 @@ class ProductVariantInline(admin.TabularInline):
 
 
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
+class ProductAdmin(RankedAutocompleteMixin, admin.ModelAdmin):
     """
     Administration des produits
     """
@@ -69,6 +84,7 @@ class ProductAdmin(admin.ModelAdmin):
         'views_count',
         'sales_count'
     ]
+    list_select_related = ['category']
     list_filter = ['category', 'is_active', 'is_featured', 'is_new', 'created_at']
     search_fields = ['name', 'description', 'slug']
     prepopulated_fields = {'slug': ('name',)}
@@ -102,6 +118,14 @@ class ProductAdmin(admin.ModelAdmin):
         }),
     )
     
+    def get_ranked_search_filters(self, term):
+        """Autocomplete : nom exact, début du nom, puis début du slug"""
+        return [
+            Q(name__iexact=term),
+            Q(name__istartswith=term),
+            Q(slug__startswith=slugify(term)),
+        ]
+    
     def display_price(self, obj):
         """Affiche le prix avec indication de promotion"""
         if obj.has_discount:
@@ -124,17 +148,30 @@ class ProductAdmin(admin.ModelAdmin):
         return format_html('<span style="color: #999;">-</span>')
     has_discount.short_description = "Promo"
     
+    def get_queryset(self, request):
+        """
+        Annoter le stock disponible et le nombre de variantes par sous-requête
+        (au lieu de parcourir variantes et stocks pour chaque ligne)
+        """
+        qs = super().get_queryset(request)
+        return qs.annotate(
+            variants_total=subquery_count(
+                ProductVariant.objects.filter(product=OuterRef('pk')), 'product'
+            ),
+            available_stock=subquery_sum(
+                Stock.objects.filter(variant__product=OuterRef('pk')),
+                'variant__product',
+                Greatest(F('quantity') - F('reserved_quantity'), Value(0)),
+                output_field=IntegerField()
+            )
+        )
+    
     def stock_status(self, obj):
         """Affiche le statut du stock"""
-        variants = obj.variants.all()
-        if not variants:
+        if not obj.variants_total:
             return format_html('<span style="color: #999;">Aucune variante</span>')
         
-        total_stock = sum(
-            v.stock.available_quantity 
-            for v in variants 
-            if hasattr(v, 'stock')
-        )
+        total_stock = obj.available_stock
         
         if total_stock == 0:
             color = '#d9534f'
@@ -148,6 +185,7 @@ class ProductAdmin(admin.ModelAdmin):
         
         return format_html('<span style="color: {};">{}</span>', color, status)
     stock_status.short_description = "Stock"
+    stock_status.admin_order_field = 'available_stock'
     
     actions = ['activate_products', 'deactivate_products', 'mark_as_featured']
     
@@ -171,7 +209,7 @@ class ProductAdmin(admin.ModelAdmin):
 
 
 @admin.register(ProductVariant)
-class ProductVariantAdmin(admin.ModelAdmin):
+class ProductVariantAdmin(RankedAutocompleteMixin, admin.ModelAdmin):
     """
     Administration des variantes de produits
     """
@@ -179,6 +217,7 @@ class ProductVariantAdmin(admin.ModelAdmin):
     list_filter = ['product__category', 'size', 'is_active']
     search_fields = ['sku', 'product__name', 'color']
     list_editable = ['is_active']
+    autocomplete_fields = ['product']
     
     fieldsets = (
         ('Produit', {
@@ -195,6 +234,27 @@ class ProductVariantAdmin(admin.ModelAdmin):
         }),
     )
     
+    def get_queryset(self, request):
+        """Produit (utilisé par __str__) et stock chargés avec la variante"""
+        qs = super().get_queryset(request)
+        return qs.select_related('product', 'stock')
+    
+    def get_ranked_search_filters(self, term):
+        """
+        Autocomplete : SKU exact, préfixe de SKU, début du nom du produit,
+        puis couleur
+        Les SKU sont enregistrés en majuscules (normalize_sku) : comparaison
+        sensible à la casse, servie par l'index unique de la colonne. La
+        recherche par sous-chaîne reste disponible dans la liste (search_fields).
+        """
+        sku = normalize_sku(term)
+        return [
+            Q(sku=sku),
+            Q(sku__startswith=sku),
+            Q(product__name__istartswith=term),
+            Q(color__istartswith=term),
+        ]
+    
     def stock_info(self, obj):
         """Affiche les informations de stock"""
         if hasattr(obj, 'stock'):
@@ -232,6 +292,8 @@ class StockAdmin(admin.ModelAdmin):
     list_filter = ['last_restocked', 'updated_at']
     search_fields = ['variant__product__name', 'variant__sku']
     readonly_fields = ['updated_at']
+    autocomplete_fields = ['variant']
+    list_select_related = ['variant__product']
     
     fieldsets = (
         ('Variante', {
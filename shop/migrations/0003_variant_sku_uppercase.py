@@ -0,0 +1,32 @@
+from django.db import migrations
+
+
+def uppercase_skus(apps, schema_editor):
+    """
+    SKU existants en majuscules (même règle que normalize_sku)
+
+    Un SKU dont la forme majuscule appartient déjà à une autre variante est
+    laissé tel quel : la contrainte d'unicité l'interdirait.
+    """
+    ProductVariant = apps.get_model('shop', 'ProductVariant')
+
+    taken = set(ProductVariant.objects.values_list('sku', flat=True))
+    variants = []
+    for variant in ProductVariant.objects.only('sku'):
+        sku = variant.sku.strip().upper()
+        if sku != variant.sku and sku not in taken:
+            taken.add(sku)
+            variant.sku = sku
+            variants.append(variant)
+    ProductVariant.objects.bulk_update(variants, ['sku'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0002_alter_product_name_alter_product_slug'),
+    ]
+
+    operations = [
+        migrations.RunPython(uppercase_skus, migrations.RunPython.noop),
+    ]
@@ -175,6 +175,11 @@ class ProductImage(models.Model):
         return f"Image {self.display_order} - {self.product.name}"
 
 
+def normalize_sku(sku: str) -> str:
+    """SKU tel qu'enregistré : sans espaces autour, en majuscules"""
+    return (sku or '').strip().upper()
+
+
 class ProductVariant(models.Model):
     """
     Variantes de produits (tailles, couleurs)
@@ -195,6 +200,8 @@ class ProductVariant(models.Model):
         related_name='variants',
         verbose_name="Produit"
     )
+    # Enregistré en majuscules (normalize_sku) : recherche par égalité et
+    # préfixe servie par l'index unique
     sku = models.CharField(
         max_length=100,
         unique=True,
@@ -238,6 +245,14 @@ class ProductVariant(models.Model):
             parts.append(f"Couleur {self.color}")
         return " - ".join(parts)
 
+    def clean(self):
+        # Avant validate_unique : 'ab-1' est refusé si 'AB-1' existe
+        self.sku = normalize_sku(self.sku)
+
+    def save(self, *args, **kwargs):
+        self.sku = normalize_sku(self.sku)
+        super().save(*args, **kwargs)
+
     @property
     def final_price(self):
         """Prix final de la variante"""